@@ -7,7 +7,7 @@ import { buildMistakeTopology, normalizeTopologyGraph } from '../src/core/mistak
 import { buildConceptDependencyGraph, normalizeConceptGraph, formatGraphForJSON } from '../src/core/concept_dependency.js';
 import { computeResponseTimeProfile } from '../src/core/response_time_profile.js';
 import { generatePatternSummary } from '../src/core/pattern_summary.js';
-import { loadDataset } from '../src/dashboard/logging.js';
+import { loadDataset, loadDatasetSummary } from '../src/dashboard/logging.js';
 
 // 🔍 Dashboard：分析リクエスト（サーバ側へ student_xxx.csv のパスを送る）
 async function requestAnalysis(studentFile) {
@@ -23,6 +23,9 @@ async function requestAnalysis(studentFile) {
 // =============================
 let currentDataset = null;
 
+// サマリから表示したデータセットの生ログの読み込み（{ name, promise }）
+let datasetLogsRequest = null;
+
 /**
  * データセット選択UIを初期化
  */
@@ -39,11 +42,14 @@ function initDatasetSelector() {
       if (index.datasets && Array.isArray(index.datasets)) {
         index.datasets.forEach(ds => {
           const opt = document.createElement("option");
-          opt.value = ds.id;
+          // scripts/regenerate_index*.py が書く index.json には id / name がないので file / dataset_name を使う
+          opt.value = ds.id || ds.file;
           
           // 表示テキスト：{dataset_name}（{ログ数} logs / {セッション数} sessions）
-          let label = ds.name;
-          if (ds.sessions && ds.sessions.length > 0) {
+          let label = ds.name || ds.dataset_name;
+          if (ds.sessions && ds.sessions.length > 0 && ds.logs == null) {
+            label += ` (${ds.sessions.length} sessions)`;
+          } else if (ds.sessions && ds.sessions.length > 0) {
             label += ` (${ds.sessions.length} sessions / ${ds.logs} logs)`;
           } else if (ds.logs > 0) {
             label += ` (${ds.logs} logs)`;
@@ -62,6 +68,9 @@ function initDatasetSelector() {
   // 選択変更時のイベント
   select.addEventListener('change', async (e) => {
     const datasetName = e.target.value;
+    window.currentDatasetName = datasetName || null;
+    window.currentSummary = null;
+    datasetLogsRequest = null;
     if (!datasetName) {
       currentDataset = null;
       window.currentStats = null;
@@ -71,8 +80,26 @@ function initDatasetSelector() {
     }
 
     try {
+      // 事前計算されたサマリが最新なら、生ログを読まずにサマリから表示する
+      // （生ログが必要なタブは開いたときに ensureDatasetLogs() で読み込む）
+      const summary = await loadDatasetSummary(datasetName);
+      if (window.currentDatasetName !== datasetName) return; // 読み込み中に別のデータセットが選ばれた
+      if (summary && summary.stats) {
+        renderDatasetSummary(summary);
+        if (summary.dataset) {
+          updateSessionSelector({
+            id: summary.dataset.id || summary.dataset.file,
+            name: summary.dataset.name || summary.dataset.dataset_name,
+            sessions: summary.dataset.sessions
+          });
+        }
+        renderActiveTab();
+        return;
+      }
+
       // loadDataset()関数を使用してデータセットをロード
       const datasetData = await loadDataset(datasetName);
+      if (window.currentDatasetName !== datasetName) return;
       
       // グローバル変数に保存（他のタブからも使用可能）
       currentDataset = {
@@ -80,7 +107,6 @@ function initDatasetSelector() {
         sessions: datasetData.sessions
       };
       window.currentDataset = currentDataset;
-      window.currentDatasetName = datasetName;
       
       // セッションセレクタを更新（もしあれば）
       if (datasetData.metadata) {
@@ -160,14 +186,19 @@ function loadStudentFilesForAnalysis() {
 // =============================
 // 🟩 分析完了通知バナー表示
 // =============================
-function showAnalysisBanner(resultFile) {
+function showAnalysisBanner(resultFile, job) {
   const banner = document.getElementById("analysis-banner");
   if (!banner) return;
   
   const openLink = document.getElementById("analysis-open");
   if (openLink) {
     openLink.onclick = () => {
-      loadAnalysisImage(resultFile);
+      // 分析サービス（scripts/analytics_server.py）経由の場合は画像ではなくジョブの結果が返る
+      if (job && job.result) {
+        displayReactionTimeResult(job.result, "analysis-result-area");
+      } else {
+        loadAnalysisImage(resultFile);
+      }
     };
   }
   banner.classList.remove("hidden");
@@ -187,8 +218,8 @@ function loadAnalysisImage(file) {
 setInterval(async () => {
   const res = await fetch("/analysis_status");
   if (!res.ok) return;
-  const { ready, file } = await res.json();
-  if (ready) showAnalysisBanner(file);
+  const { ready, file, job } = await res.json();
+  if (ready) showAnalysisBanner(file, job);
 }, 2000);
 
 // =============================
@@ -218,49 +249,7 @@ function initTabs() {
         targetPage.style.display = "block";
       }
 
-      // 分析実行タブが選択されたら学生ファイルを読み込む
-      if (targetTab === "analysis-run") {
-        loadStudentFilesForAnalysis();
-      }
-      
-      // 理解構造レポートタブが選択されたらレポートを更新
-      if (targetTab === "insights" && window.currentStats) {
-        renderInsights(window.currentStats);
-      }
-      
-      // 概念理解分析タブが選択されたらヒートマップとグラフを更新
-      if (targetTab === "concept-understanding") {
-        if (window.currentStats) {
-          renderConceptUnderstanding(window.currentStats);
-        }
-        if (window.currentLogs) {
-          renderConceptDependency(window.currentLogs);
-        }
-      }
-      
-      // 迷いパターン分析タブが選択されたらグラフを更新
-      if (targetTab === "paths" && window.currentLogs) {
-        renderMistakeTopology(window.currentLogs);
-      }
-      
-      // 反応時間プロファイルタブが選択されたらプロファイルを更新
-      if (targetTab === "response-time" && window.currentLogs) {
-        renderResponseTimeProfile(window.currentLogs);
-      }
-      
-      // 研究傾向サマリタブが選択されたらサマリを更新
-      if (targetTab === "pattern-summary" && window.currentStats && window.currentLogs) {
-        renderPatternSummary(window.currentStats, window.currentLogs);
-      }
-      
-      // 他のタブでも統計データがあれば更新
-      if (window.currentStats) {
-        if (targetTab === "questions") {
-          renderConcept(window.currentStats);
-        } else if (targetTab === "confusions") {
-          renderMistake(window.currentStats);
-        }
-      }
+      renderTab(targetTab);
     });
   });
 
@@ -270,6 +259,82 @@ function initTabs() {
   }
 }
 
+/**
+ * 選択中のタブの内容を現在のデータセットで更新
+ */
+function renderActiveTab() {
+  const activeButton = document.querySelector(".tab-btn.active");
+  if (activeButton) {
+    renderTab(activeButton.getAttribute("data-tab"));
+  }
+}
+
+/**
+ * タブの内容を現在のデータセットで更新
+ *
+ * サマリから表示している場合（window.currentSummary）、誤答パス・概念依存関係・反応時間プロファイルは
+ * 生ログが必要なので、そのタブを開いたときに初めてデータセットを読み込む。
+ * @param {string} targetTab - タブ名（data-tab）
+ */
+async function renderTab(targetTab) {
+  const summary = window.currentSummary;
+
+  // 分析実行タブが選択されたら学生ファイルを読み込む
+  if (targetTab === "analysis-run") {
+    loadStudentFilesForAnalysis();
+  }
+  
+  // 理解構造レポートタブが選択されたらレポートを更新
+  if (targetTab === "insights" && window.currentStats) {
+    renderInsights(window.currentStats, summary ? summary.insights : null);
+  }
+  
+  // 概念理解分析タブが選択されたらヒートマップとグラフを更新
+  if (targetTab === "concept-understanding") {
+    if (window.currentStats) {
+      renderConceptUnderstanding(window.currentStats, summary ? summary.conceptStats : null);
+    }
+    const logs = await ensureDatasetLogs();
+    if (logs) {
+      renderConceptDependency(logs);
+    }
+  }
+  
+  // 迷いパターン分析タブが選択されたらグラフを更新
+  if (targetTab === "paths") {
+    const logs = await ensureDatasetLogs();
+    if (logs) {
+      renderMistakeTopology(logs);
+    }
+  }
+  
+  // 反応時間プロファイルタブが選択されたらプロファイルを更新
+  if (targetTab === "response-time") {
+    const logs = await ensureDatasetLogs();
+    if (logs) {
+      renderResponseTimeProfile(logs);
+    }
+  }
+  
+  // 研究傾向サマリタブが選択されたらサマリを更新
+  if (targetTab === "pattern-summary" && window.currentStats) {
+    if (summary) {
+      renderPatternSummary(window.currentStats, null, summary.patternSummary);
+    } else if (window.currentLogs) {
+      renderPatternSummary(window.currentStats, window.currentLogs);
+    }
+  }
+  
+  // 他のタブでも統計データがあれば更新
+  if (window.currentStats) {
+    if (targetTab === "questions") {
+      renderConcept(window.currentStats);
+    } else if (targetTab === "confusions") {
+      renderMistake(window.currentStats);
+    }
+  }
+}
+
 // =============================
 // 📊 分析実行ボタン
 // =============================
@@ -367,8 +432,8 @@ async function runReactionTimeAnalysis() {
 }
 
 // 結果を表示する関数
-function displayReactionTimeResult(result) {
-  const resultArea = document.getElementById('rt-analysis-result');
+function displayReactionTimeResult(result, areaId = 'rt-analysis-result') {
+  const resultArea = document.getElementById(areaId);
   
   let html = '<h4>分析結果</h4>';
   
@@ -461,6 +526,65 @@ async function loadSessionData(dataset) {
   return stats;
 }
 
+/**
+ * 事前計算されたサマリ（scripts/summary_cache.py）から統計系のタブをすべて表示
+ * @param {Object} summary - loadDatasetSummary() の結果
+ */
+function renderDatasetSummary(summary) {
+  currentDataset = null;
+  window.currentDataset = null;
+  window.currentLogs = null;
+  window.currentSummary = summary;
+  window.currentStats = summary.stats;
+
+  renderSummary(summary.stats);
+  renderConcept(summary.stats);
+  renderMistake(summary.stats);
+  renderInsights(summary.stats, summary.insights);
+  renderConceptUnderstanding(summary.stats, summary.conceptStats);
+  renderPatternSummary(summary.stats, null, summary.patternSummary);
+
+  // 生ログが必要なタブは、開いたときに読み込むまで空にしておく
+  renderMistakeTopology(null);
+  renderConceptDependency(null);
+  renderResponseTimeProfile(null);
+}
+
+/**
+ * 現在のデータセットの生ログを返す（サマリから表示した場合は最初に呼ばれたときだけ読み込む）
+ * @returns {Promise<Array|null>} ログ配列（未選択・読み込み中に別のデータセットが選ばれた・失敗した場合は null）
+ */
+async function ensureDatasetLogs() {
+  if (window.currentLogs) return window.currentLogs;
+  const datasetName = window.currentDatasetName;
+  if (!datasetName || !window.currentSummary) return null;
+
+  if (!datasetLogsRequest || datasetLogsRequest.name !== datasetName) {
+    datasetLogsRequest = { name: datasetName, promise: loadDataset(datasetName) };
+  }
+  const request = datasetLogsRequest;
+  try {
+    const datasetData = await request.promise;
+    if (window.currentDatasetName !== datasetName) return null;
+    if (!window.currentLogs) {
+      currentDataset = {
+        logs: datasetData.logs,
+        sessions: datasetData.sessions
+      };
+      window.currentDataset = currentDataset;
+      window.currentLogs = datasetData.logs;
+    }
+    return window.currentLogs;
+  } catch (error) {
+    if (datasetLogsRequest === request) {
+      datasetLogsRequest = null;
+    }
+    console.error("Error loading dataset:", error);
+    alert(`データセットの読み込みに失敗しました: ${error.message}`);
+    return null;
+  }
+}
+
 /**
  * サマリーカードを更新（renderSummaryのエイリアス）
  * @param {Object} stats - 統計データ
@@ -550,8 +674,9 @@ function renderConcept(stats) {
 /**
  * 概念理解分析をレンダリング（ヒートマップ）
  * @param {Object} stats - 統計データ
+ * @param {Object} [conceptStats] - 事前計算済みの normalizeConceptStats(stats)
  */
-function renderConceptUnderstanding(stats) {
+function renderConceptUnderstanding(stats, conceptStats = null) {
   const container = document.getElementById('concept-heatmap-container');
   if (!container) return;
 
@@ -562,7 +687,7 @@ function renderConceptUnderstanding(stats) {
 
   try {
     // 正規化された統計を取得
-    const normalized = normalizeConceptStats(stats);
+    const normalized = conceptStats || normalizeConceptStats(stats);
     const concepts = Object.keys(normalized);
     
     if (concepts.length === 0) {
@@ -660,6 +785,9 @@ function renderConceptUnderstanding(stats) {
   }
 }
 
+// ログ配列 → 正規化済みの誤答パストポロジー
+const mistakeTopologyCache = new WeakMap();
+
 /**
  * 誤答パストポロジーをレンダリング（ネットワークグラフ）
  * @param {Array} logs - ログ配列
@@ -674,17 +802,19 @@ function renderMistakeTopology(logs) {
   }
 
   try {
-    // パストポロジーグラフを構築
-    const graph = buildMistakeTopology(logs);
+    // 同じログ配列なら前回構築したグラフを使う（タブを開くたびに全パスを辿り直さない）
+    let normalizedGraph = mistakeTopologyCache.get(logs);
+    if (!normalizedGraph) {
+      // パストポロジーグラフを構築して正規化
+      normalizedGraph = normalizeTopologyGraph(buildMistakeTopology(logs));
+      mistakeTopologyCache.set(logs, normalizedGraph);
+    }
     
-    if (!graph.nodes || graph.nodes.length === 0) {
+    if (!normalizedGraph.nodes || normalizedGraph.nodes.length === 0) {
       container.innerHTML = '<p style="color: #888;">誤答データが見つかりませんでした。</p>';
       return;
     }
 
-    // グラフを正規化
-    const normalizedGraph = normalizeTopologyGraph(graph);
-
     // SVGでネットワークグラフを描画
     renderTopologySVG(container, normalizedGraph);
   } catch (error) {
@@ -789,6 +919,9 @@ function renderTopologySVG(container, graph) {
   container.innerHTML = html;
 }
 
+// ログ配列 → 構築済みの概念依存関係グラフ
+const conceptDependencyCache = new WeakMap();
+
 /**
  * 概念依存関係グラフをレンダリング
  * @param {Array} logs - ログ配列
@@ -803,19 +936,26 @@ function renderConceptDependency(logs) {
   }
 
   try {
-    // 概念依存関係グラフを構築
-    const graph = buildConceptDependencyGraph(logs);
+    // 同じログ配列なら前回構築したグラフを使う（タブを開くたびに全ログを辿り直さない）
+    let cached = conceptDependencyCache.get(logs);
+    if (!cached) {
+      // 概念依存関係グラフを構築
+      const graph = buildConceptDependencyGraph(logs);
+      cached = { normalizedGraph: null, jsonData: null };
+      if (graph.nodes && graph.nodes.length > 0) {
+        // グラフを正規化し、JSON形式で保存用データを準備
+        cached.normalizedGraph = normalizeConceptGraph(graph);
+        cached.jsonData = formatGraphForJSON(graph);
+      }
+      conceptDependencyCache.set(logs, cached);
+    }
     
-    if (!graph.nodes || graph.nodes.length === 0) {
+    if (!cached.normalizedGraph) {
       container.innerHTML = '<p style="color: #888;">概念データが見つかりませんでした。</p>';
       return;
     }
 
-    // グラフを正規化
-    const normalizedGraph = normalizeConceptGraph(graph);
-
-    // JSON形式で保存用データを準備
-    const jsonData = formatGraphForJSON(graph);
+    const { normalizedGraph, jsonData } = cached;
     
     // グローバル変数に保存（他のタブからも使用可能）
     window.conceptDependencyGraph = jsonData;
@@ -1106,23 +1246,26 @@ function renderResponseTimeBoxplot(container, profile) {
  * 研究傾向サマリをレンダリング
  * @param {Object} stats - 統計データ
  * @param {Array} logs - ログ配列
+ * @param {Array} [patternSummary] - 事前計算済みの generatePatternSummary() の結果（あれば logs は不要）
  */
-function renderPatternSummary(stats, logs) {
+function renderPatternSummary(stats, logs, patternSummary = null) {
   const container = document.getElementById('pattern-summary-container');
   if (!container) return;
 
-  if (!stats || !logs || !Array.isArray(logs) || logs.length === 0) {
+  const precomputed = Array.isArray(patternSummary);
+  if (!stats || (!precomputed && (!logs || !Array.isArray(logs) || logs.length === 0))) {
     container.innerHTML = '<p style="color: #888;">データセットを選択すると、研究傾向サマリが表示されます。</p>';
     return;
   }
 
   try {
-    // 必要な統計を計算
-    const conceptStats = normalizeConceptStats(stats);
-    const rtProfile = computeResponseTimeProfile(logs);
-
-    // パターンサマリを生成
-    const summaries = generatePatternSummary(stats, conceptStats, rtProfile);
+    // パターンサマリを生成（事前計算済みならそれを使う）
+    let summaries = patternSummary;
+    if (!precomputed) {
+      const conceptStats = normalizeConceptStats(stats);
+      const rtProfile = computeResponseTimeProfile(logs);
+      summaries = generatePatternSummary(stats, conceptStats, rtProfile);
+    }
 
     if (summaries.length === 0) {
       container.innerHTML = '<p style="color: #888;">検出された傾向パターンはありません。</p>';
@@ -1181,8 +1324,9 @@ function renderMistake(stats) {
 /**
  * 理解構造レポートをレンダリング
  * @param {Object} stats - 統計データ
+ * @param {Array} [precomputedInsights] - 事前計算済みの generateInsights(stats) の結果
  */
-async function renderInsights(stats) {
+async function renderInsights(stats, precomputedInsights = null) {
   const reportEl = document.getElementById('insights-report');
   if (!reportEl) return;
 
@@ -1193,7 +1337,7 @@ async function renderInsights(stats) {
 
   try {
     // 洞察を生成
-    const insights = generateInsights(stats);
+    const insights = Array.isArray(precomputedInsights) ? precomputedInsights : generateInsights(stats);
     
     if (insights.length === 0) {
       reportEl.innerHTML = '<p style="color: #888;">分析結果がありません。</p>';
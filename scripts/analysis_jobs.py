@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+反応時間分析などのジョブを、起動済みのワーカープールで実行するジョブキュー
+
+server.js の /analyze/reaction-time と /api/run-analysis はリクエストのたびに julia を起動しており、
+インタプリタの起動とパッケージの読み込みだけで数秒かかる。/trigger_analysis はファイルを
+analysis/input/ にコピーするだけで、/analysis_status は analysis/results の最新の PNG を探している。
+ここでは次の仕組みで同じ分析を行う（analytics_server.py の /jobs から使う）。
+
+- ワーカープール: 起動時にワーカープロセスを立ち上げて numpy などを読み込んでおく（forkserver が使えればそれを使う）
+- ジョブキュー: 待ち行列の長さに上限を設け、溢れたら QueueFull を送出する（HTTP では 503）
+- 同じ入力の待ち合わせ: ジョブ ID は「分析の種類 + 入力の SHA-256」から決まり、実行中・待機中の
+  同じジョブに投入されたものは 1 回の計算を待ち合わせる
+- 結果のキャッシュ: 完了したジョブは MAX_FINISHED_JOBS 件まで保持し、同じ入力ならそのまま返す
+  （ファイルを対象にしたジョブは内容のハッシュを使うので、ファイルが変われば計算し直す）
+- 状態: status() でワーカー数・待ち行列・最近のジョブを返す
+
+分析は analysis/reaction_time.jl と analysis/run_analysis.jl の Python 版。PNG の代わりに
+ヒストグラムの区間と度数を返す（plotImage は null）。
+
+依存: numpy
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import multiprocessing
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from index_builder import resolve_workers
+from pipeline_common import _is_number
+from stats_core import extract_dashboard_logs
+
+DEFAULT_MAX_QUEUE = 256
+DEFAULT_JOB_TIMEOUT = 30.0
+MAX_FINISHED_JOBS = 1000
+HISTOGRAM_BINS = 30
+JOB_ID_LENGTH = 24
+# 分析の計算方法を変えたら上げる（キャッシュされた結果を使わなくなる）
+ANALYSIS_VERSION = 1
+
+
+class QueueFull(Exception):
+    """待ち行列が上限に達した"""
+
+
+def _is_finite_number(value):
+    return _is_number(value) and math.isfinite(value)
+
+
+def reaction_time_analysis(data):
+    """analysis/reaction_time.jl の Python 版（指数分布・正規分布の最尤推定とヒストグラム）"""
+    times = np.array([log['response_time'] for log in extract_dashboard_logs(data)
+                      if isinstance(log, dict) and _is_finite_number(log.get('response_time'))], dtype=np.float64)
+    if times.size == 0:
+        raise ValueError('反応時間データが見つかりませんでした')
+
+    mean = float(times.mean())
+    # Julia の std と同じ不偏標準偏差（1 件だけのときは 0）
+    std = float(times.std(ddof=1)) if times.size > 1 else 0.0
+    counts, edges = np.histogram(times, bins=HISTOGRAM_BINS)
+    return {
+        'mean': mean,
+        'median': float(np.median(times)),
+        'std': std,
+        'min': float(times.min()),
+        'max': float(times.max()),
+        'lambda': 1.0 / mean if mean > 0 else None,
+        'mu': mean,
+        'sigma': std,
+        'count': int(times.size),
+        'histogram': {'edges': edges.tolist(), 'counts': counts.tolist()},
+        'graph': None,
+        'plotImage': None
+    }
+
+
+def basic_analysis(data):
+    """analysis/run_analysis.jl の Python 版（正答率・平均反応時間・概念タグの種類数）"""
+    logs = data.get('logs') if isinstance(data, dict) else None
+    if not isinstance(logs, list):
+        return {'message': 'No logs found in data', 'keys': list(data) if isinstance(data, dict) else []}
+
+    logs = [log for log in logs if isinstance(log, dict)]
+    correct_count = sum(1 for log in logs if log.get('correct') is True)
+    times = [log['response_time'] for log in logs if _is_finite_number(log.get('response_time'))]
+    concepts = {str(tag) for log in logs if isinstance(log.get('conceptTags'), list) for tag in log['conceptTags']}
+    return {
+        'totalAnswers': len(logs),
+        'correctCount': correct_count,
+        'correctRate': round(correct_count / len(logs) * 100, 2) if logs else 0.0,
+        'avgResponseTime': round(sum(times) / len(times), 2) if times else 0.0,
+        'uniqueConcepts': len(concepts)
+    }
+
+
+ANALYSES = {
+    'reaction_time': reaction_time_analysis,
+    'basic': basic_analysis
+}
+
+
+def run_analysis(kind, source, payload):
+    """
+    ワーカープロセスで実行する
+
+    source は 'body'（payload は JSON のバイト列）か 'file'（payload は (パス, 投入時の内容の SHA-256)）。
+    ジョブは投入時のハッシュで同一視されるので、ファイルがその後に書き換えられていたら分析せずに失敗させる。
+    """
+    if source == 'file':
+        path, content_sha256 = payload
+        with open(path, 'rb') as f:
+            payload = f.read()
+        if hashlib.sha256(payload).hexdigest() != content_sha256:
+            raise ValueError(f'{path} がジョブの投入後に更新されました。もう一度投入してください')
+    return ANALYSES[kind](json.loads(payload))
+
+
+def _warm_up():
+    return True
+
+
+def job_key(kind, content_sha256):
+    return hashlib.sha256(f'{ANALYSIS_VERSION}:{kind}:{content_sha256}'.encode('utf-8')).hexdigest()
+
+
+class Job:
+    """1 つの分析ジョブ（ID は種類と入力のハッシュから決まる）"""
+
+    def __init__(self, job_id, kind, source, payload, label=None):
+        self.id = job_id
+        self.kind = kind
+        self.source = source
+        self.payload = payload
+        self.label = label
+        self.status = 'queued'
+        self.result = None
+        self.error = None
+        self.submissions = 1
+        self.queued_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.finished = asyncio.Event()
+
+    @property
+    def done(self):
+        return self.status in ('done', 'failed')
+
+    async def wait(self, timeout):
+        """完了するか timeout 秒経つまで待ち、完了したかを返す"""
+        try:
+            await asyncio.wait_for(asyncio.shield(self.finished.wait()), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.done
+
+    def to_dict(self, include_result=True):
+        job = {
+            'id': self.id,
+            'kind': self.kind,
+            'label': self.label,
+            'status': self.status,
+            'submissions': self.submissions,
+            'queuedAt': self.queued_at,
+            'startedAt': self.started_at,
+            'finishedAt': self.finished_at
+        }
+        if self.started_at is not None:
+            job['queueSeconds'] = round(self.started_at - self.queued_at, 6)
+        if self.finished_at is not None and self.started_at is not None:
+            job['runSeconds'] = round(self.finished_at - self.started_at, 6)
+        if self.error is not None:
+            job['error'] = self.error
+        if include_result and self.status == 'done':
+            job['result'] = self.result
+        return job
+
+
+class JobQueue:
+    """
+    起動済みのワーカープールと、上限付きの待ち行列
+
+    start() でワーカープロセスを起動し、ワーカー数と同じ数の取り出しタスクが待ち行列から
+    ジョブを取り出してプールに渡す。ジョブは self.jobs に ID で登録し、完了したものは
+    MAX_FINISHED_JOBS 件まで（古い順に捨てる）結果のキャッシュを兼ねて残す。
+    """
+
+    def __init__(self, workers=0, max_queue=DEFAULT_MAX_QUEUE, timeout=DEFAULT_JOB_TIMEOUT):
+        self.workers = resolve_workers(workers)
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.jobs = OrderedDict()
+        self.queue = None
+        self.pool = None
+        self.runners = []
+        self.cache_hits = 0
+        self.coalesced = 0
+        self.rejected = 0
+
+    async def start(self):
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else None)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        loop = asyncio.get_running_loop()
+        # ワーカー数だけ空のジョブを投げて、全プロセスを先に起動しておく
+        await asyncio.gather(*(loop.run_in_executor(self.pool, _warm_up) for _ in range(self.workers)))
+        self.queue = asyncio.Queue(self.max_queue)
+        self.runners = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+    async def close(self):
+        for runner in self.runners:
+            runner.cancel()
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, kind, content_sha256, source, payload, label=None):
+        """
+        ジョブを投入して Job を返す
+
+        同じ入力のジョブが完了済み（成功）ならそれを、待機中・実行中ならそれを返す。
+        失敗したジョブは投げ直す。待ち行列が一杯なら QueueFull を送出する。
+        """
+        if kind not in ANALYSES:
+            raise ValueError(f'未対応の分析です: {kind}')
+        job_id = job_key(kind, content_sha256)[:JOB_ID_LENGTH]
+        job = self.jobs.get(job_id)
+        if job is not None and job.status != 'failed':
+            job.submissions += 1
+            self.jobs.move_to_end(job_id)
+            if job.done:
+                self.cache_hits += 1
+            else:
+                self.coalesced += 1
+            return job
+
+        job = Job(job_id, kind, source, payload, label)
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise QueueFull(f'待ち行列が一杯です（{self.max_queue} 件）') from None
+        self.jobs.pop(job_id, None)
+        self.jobs[job_id] = job
+        self._trim()
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def _trim(self):
+        finished = [key for key, job in self.jobs.items() if job.done]
+        for key in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[key]
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            job.status = 'running'
+            job.started_at = time.time()
+            try:
+                # 時間切れでもワーカーの計算は止められないが、ジョブは失敗として待っている側に返す
+                job.result = await asyncio.wait_for(
+                    loop.run_in_executor(self.pool, run_analysis, job.kind, job.source, job.payload), self.timeout)
+                job.status = 'done'
+            except asyncio.TimeoutError:
+                job.error = f'{self.timeout:g} 秒以内に終わりませんでした'
+                job.status = 'failed'
+            except Exception as e:
+                job.error = str(e) or repr(e)
+                job.status = 'failed'
+            job.finished_at = time.time()
+            job.payload = None
+            job.finished.set()
+            self.queue.task_done()
+            self._trim()
+
+    def status(self, recent=20):
+        counts = {}
+        for job in self.jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        jobs = list(self.jobs.values())
+        return {
+            'workers': self.workers,
+            'queued': self.queue.qsize() if self.queue is not None else 0,
+            'maxQueue': self.max_queue,
+            'counts': counts,
+            'cacheHits': self.cache_hits,
+            'coalesced': self.coalesced,
+            'rejected': self.rejected,
+            'recent': [job.to_dict(include_result=False) for job in reversed(jobs[-recent:])]
+        }
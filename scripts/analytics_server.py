@@ -0,0 +1,696 @@
+#!/usr/bin/env python3
+"""
+students のインデックス・セッション・集計結果と分析ジョブを扱う HTTP サービス（asyncio）
+
+server.js（legacy/server.js も）はファイルをそのまま返すだけで、統計や反応時間のプロファイルは
+ダッシュボードを開いた各ブラウザが生ログから計算し直している。このサービスは
+
+- 解析済みのデータセットをメモリ上の LRU に保持する（重みの合計が --cache-mb を超えたら古いものから捨てる。
+  重みは解析後のオブジェクトを見込んだファイルサイズ × PARSED_OVERHEAD と、作成済みの応答の大きさの合計）
+- 集計結果はデータセットごとに 1 回だけ計算し、同じデータセットへの同時リクエストは 1 回の読み込み・計算を待ち合わせる
+- リクエストごとにファイルの (inode, サイズ, mtime) を確認し、変わっていればキャッシュを捨てて読み直す
+- 応答には内容から決まる強い ETag を付け、If-None-Match が一致すれば 304 を返す
+  （データセットの SHA-256 を覚えているので、集計を作り直さずに 304 を返せる）
+
+JSON の解析と集計はスレッドプールで行い、イベントループは接続の処理だけを行う。
+反応時間分析などのジョブは analysis_jobs.py の起動済みワーカープールで実行する。
+外部サービスや追加パッケージは不要で、ローカルでそのまま起動・確認できる。
+
+エンドポイント（GET / HEAD）:
+- /index.json                              students/index.json
+- /datasets/<ファイル名>/summary            summary_cache.py と同じ形式のサマリ
+- /datasets/<ファイル名>/stats              stats_core.py のサイドカーと同じ形式の統計
+- /datasets/<ファイル名>/rt                 反応時間の分位点（t-digest）と正誤別の平均
+- /datasets/<ファイル名>/rt_fits            exgauss_fit.py と同じ形式の学習者別・問題別の ex-Gaussian の当てはめ
+- /datasets/<ファイル名>/topology           誤答パストポロジー（normalizeTopologyGraph 済み）
+- /datasets/<ファイル名>/factors            factor_analysis.py と同じ形式の因子分析（負荷量・因子得点）
+- /datasets/<ファイル名>/clusters           cluster_kmeans.py の clustering とセッションごとのラベル
+- /datasets/<ファイル名>/percentiles        class_percentiles.py と同じ形式の指標ごとの分布と各学習者の順位
+- /datasets/<ファイル名>/sessions?offset=0&limit=50
+- /datasets/<ファイル名>/sessions/<番号>    index.json の sessions と同じ番号のセッション
+- /status                                   キャッシュの状況
+
+分析ジョブ（同じ入力のジョブは 1 回だけ計算し、結果を再利用する）:
+- POST /jobs/<種類>?wait=<秒>               本文の JSON を分析（種類は reaction_time / basic）
+- POST /jobs/<種類>?file=<ファイル名>        students のデータセット（folder/file も可）を分析
+- GET  /jobs/<ID>?wait=<秒>                 ジョブの状態と結果（wait を付けると完了まで待つ）
+- GET  /jobs                                ワーカー・待ち行列・最近のジョブ
+- server.js 互換: POST /analyze/reaction-time, GET /api/run-analysis?file=,
+  POST /trigger_analysis, GET /analysis_status（server.js は ANALYSIS_SERVICE_URL を設定すると転送する）
+
+実行方法:
+python scripts/analytics_server.py
+python scripts/analytics_server.py --port 8765 --cache-mb 512 --workers 8 --analysis-workers 4
+curl -i http://127.0.0.1:8765/datasets/quiz_log_dummy.json/summary
+curl -X POST 'http://127.0.0.1:8765/jobs/reaction_time?file=quiz_log_dummy.json&wait=10'
+
+依存: numpy
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from analysis_jobs import ANALYSES, DEFAULT_MAX_QUEUE, JobQueue, QueueFull
+from class_percentiles import build_class_percentiles
+from cluster_kmeans import find_sessions_container
+from exgauss_fit import build_rt_fits
+from factor_analysis import build_factor_sidecar
+from index_builder import INDEX_NAME, json_dump_options, resolve_workers
+from index_manifest import file_sha256
+from mistake_topology import DatasetTopology, normalize_topology_graph
+from regenerate_index_with_sessions import session_array_path
+from rt_sketch import DatasetSketches
+from stats_core import build_stats_sidecar, extract_dashboard_logs
+from summary_cache import SUMMARY_VERSION, build_summary, response_time_by_correctness
+from watch_index import is_dataset_file
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_CACHE_MB = 256
+DEFAULT_WORKERS = 4
+DEFAULT_ANALYSIS_WORKERS = 2
+# 解析後の dict / list はファイルサイズの 2〜3 倍程度のメモリを使う
+PARSED_OVERHEAD = 3
+KEEP_ALIVE_TIMEOUT = 15.0
+MAX_HEADER_BYTES = 16384
+MAX_BODY_BYTES = 64 * 1024 * 1024
+DEFAULT_SESSION_LIMIT = 50
+MAX_SESSION_LIMIT = 1000
+# server.js から転送される従来の分析エンドポイント
+JOB_COMPAT_ROUTES = ('/analyze/reaction-time', '/api/run-analysis', '/trigger_analysis', '/analysis_status')
+# 応答の形式を変えたら上げる（ETag が変わるので、クライアントは古い応答を使わなくなる）
+API_VERSION = 1
+
+
+class HttpError(Exception):
+    """ステータスコード付きで {"error": message} を返すための例外"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _encode(value):
+    return json.dumps(value, **json_dump_options(compact=True)).encode('utf-8')
+
+
+def file_signature(stat):
+    """ファイルが置き換えられた・書き換えられたことを検出するための (inode, サイズ, mtime)"""
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+def make_etag(source_sha256, resource):
+    """元ファイルの内容と応答の種類から決まる強い ETag"""
+    digest = hashlib.sha256(f'{API_VERSION}:{source_sha256}:{resource}'.encode('utf-8')).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match（カンマ区切り・W/ 付き・* を含む）が etag に一致するか"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*' or candidate.removeprefix('W/') == etag:
+            return True
+    return False
+
+
+class CachedDataset:
+    """解析済みの 1 データセットと、作成済みの応答（種類 → JSON のバイト列）"""
+
+    def __init__(self, name, signature, sha256, data, size):
+        self.name = name
+        self.signature = signature
+        self.sha256 = sha256
+        self.data = data
+        self.size = size
+        self.responses = {}
+        self.pending = {}
+
+    @property
+    def weight(self):
+        return self.size * PARSED_OVERHEAD + sum(len(body) for body in self.responses.values())
+
+
+def load_dataset(path):
+    """ファイルを読み込んで解析する（開いたファイルの fstat を使うので、読み込み中の置き換えと食い違わない）"""
+    with open(path, 'rb') as f:
+        signature = file_signature(os.fstat(f.fileno()))
+        raw = f.read()
+    data = json.loads(raw)
+    return CachedDataset(path.name, signature, hashlib.sha256(raw).hexdigest(), data, len(raw))
+
+
+def _sessions(data):
+    key_path = session_array_path(data) if isinstance(data, dict) else None
+    if key_path is None:
+        return []
+    sessions = data
+    for key in key_path:
+        sessions = sessions[key]
+    return sessions if isinstance(sessions, list) else []
+
+
+def summary_response(entry):
+    summary = {'version': SUMMARY_VERSION, 'source_sha256': entry.sha256, 'file': entry.name}
+    summary.update(build_summary(extract_dashboard_logs(entry.data)))
+    return summary
+
+
+def stats_response(entry):
+    return build_stats_sidecar(entry.name, entry.data)
+
+
+def rt_response(entry):
+    """rt_sketch.build_from_json と同じ規則で logs / sessions のスケッチを作る"""
+    data = entry.data
+    sketches = DatasetSketches(entry.name)
+    if isinstance(data, dict):
+        for log in data['logs'] if isinstance(data.get('logs'), list) else ():
+            sketches.parts['logs'].add_log(log)
+        container = find_sessions_container(data)
+        for session in container['sessions'] if container else ():
+            sketches.parts['sessions'].add_session(session)
+    return {
+        'file': entry.name,
+        'summary': sketches.combined().summary(),
+        'byCorrectness': response_time_by_correctness(extract_dashboard_logs(data))
+    }
+
+
+def rt_fits_response(entry):
+    sidecar, _ = build_rt_fits(entry.name, entry.data)
+    return sidecar
+
+
+def topology_response(entry):
+    dataset = DatasetTopology(entry.name)
+    dataset.parts['logs'].add_logs(extract_dashboard_logs(entry.data))
+    return {'file': entry.name, 'graph': normalize_topology_graph(dataset.combined().graph())}
+
+
+def clusters_response(entry):
+    container = find_sessions_container(entry.data) if isinstance(entry.data, dict) else None
+    if container is None or not isinstance(container.get('clustering'), dict):
+        raise HttpError(404, 'clustering がありません（cluster_kmeans.py を先に実行してください）')
+    labels = [session.get('cluster_label') if isinstance(session, dict) else None
+              for session in container['sessions']]
+    return {'file': entry.name, 'clustering': container['clustering'], 'labels': labels}
+
+
+def factors_response(entry):
+    return build_factor_sidecar(entry.name, entry.data)
+
+
+def percentiles_response(entry):
+    return build_class_percentiles(entry.name, entry.data)
+
+
+AGGREGATES = {
+    'summary': summary_response,
+    'stats': stats_response,
+    'rt': rt_response,
+    'rt_fits': rt_fits_response,
+    'topology': topology_response,
+    'clusters': clusters_response,
+    'factors': factors_response,
+    'percentiles': percentiles_response
+}
+
+
+def _query_int(query, name, default, minimum=0, maximum=None):
+    values = query.get(name)
+    if not values:
+        return default
+    try:
+        value = int(values[0])
+    except ValueError:
+        raise HttpError(400, f'{name} は整数で指定してください') from None
+    if value < minimum:
+        raise HttpError(400, f'{name} は {minimum} 以上で指定してください')
+    return min(value, maximum) if maximum is not None else value
+
+
+class DatasetCache:
+    """
+    解析済みデータセットの LRU
+
+    重みの合計が max_bytes を超えたら、最後に使われたのが古いものから捨てる（直前に使ったものは残す）。
+    捨てたデータセットも SHA-256 だけは覚えておき、ファイルが変わっていなければ ETag の計算に使う。
+    読み込み・集計はスレッドプールで行い、同じものへの同時リクエストは 1 つのタスクを待ち合わせる。
+    """
+
+    def __init__(self, students_dir, max_bytes, executor):
+        self.students_dir = students_dir
+        self.max_bytes = max_bytes
+        self.executor = executor
+        self.entries = OrderedDict()
+        self.loading = {}
+        self.digests = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def total_weight(self):
+        return sum(entry.weight for entry in self.entries.values())
+
+    def known_digest(self, name, signature):
+        digest = self.digests.get(name)
+        return digest[1] if digest and digest[0] == signature else None
+
+    def forget(self, name):
+        """ファイルが無くなったデータセットを捨てる"""
+        self.entries.pop(name, None)
+        self.digests.pop(name, None)
+
+    async def get(self, name, signature):
+        entry = self.entries.get(name)
+        if entry is not None and entry.signature == signature:
+            self.entries.move_to_end(name)
+            self.hits += 1
+            return entry
+        pending = self.loading.get(name)
+        if pending is None or pending[0] != signature:
+            self.misses += 1
+            task = asyncio.ensure_future(self._load(name))
+            pending = (signature, task)
+            self.loading[name] = pending
+            task.add_done_callback(lambda _, pending=pending: self._loaded(name, pending))
+        # 待っているクライアントが切断しても、他のクライアントのために読み込みは続ける
+        return await asyncio.shield(pending[1])
+
+    def _loaded(self, name, pending):
+        if self.loading.get(name) is pending:
+            del self.loading[name]
+
+    async def _load(self, name):
+        loop = asyncio.get_running_loop()
+        entry = await loop.run_in_executor(self.executor, load_dataset, self.students_dir / name)
+        self.entries.pop(name, None)
+        self.entries[name] = entry
+        self.digests[name] = (entry.signature, entry.sha256)
+        self._evict()
+        return entry
+
+    def _evict(self):
+        total = self.total_weight
+        while total > self.max_bytes and len(self.entries) > 1:
+            _, entry = self.entries.popitem(last=False)
+            total -= entry.weight
+            self.evictions += 1
+
+    async def response(self, entry, resource, build):
+        """entry の応答を作成（作成済みならそれを返す）。build(entry) はスレッドプールで実行する"""
+        body = entry.responses.get(resource)
+        if body is not None:
+            return body
+        task = entry.pending.get(resource)
+        if task is None:
+            task = asyncio.ensure_future(self._build(entry, resource, build))
+            entry.pending[resource] = task
+            task.add_done_callback(lambda _: entry.pending.pop(resource, None))
+        return await asyncio.shield(task)
+
+    async def _build(self, entry, resource, build):
+        loop = asyncio.get_running_loop()
+        body = await loop.run_in_executor(self.executor, lambda: _encode(build(entry)))
+        entry.responses[resource] = body
+        self._evict()
+        return body
+
+    def status(self):
+        return {
+            'datasets': list(self.entries),
+            'weight': self.total_weight,
+            'maxBytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+
+class AnalyticsServer:
+    """HTTP/1.1（keep-alive 対応）の最小限の実装と、パスごとの応答の振り分け"""
+
+    def __init__(self, students_dir, cache_bytes, workers=DEFAULT_WORKERS, jobs=None):
+        self.students_dir = Path(students_dir)
+        self.executor = ThreadPoolExecutor(max_workers=resolve_workers(workers))
+        self.cache = DatasetCache(self.students_dir, cache_bytes, self.executor)
+        self.jobs = jobs
+        self.triggered = None
+        self.index = None
+        self.started = time.time()
+        self.requests = 0
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEP_ALIVE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError):
+                    break
+                lines = head.decode('latin-1').split('\r\n')
+                request_line = lines[0].split(' ')
+                if len(request_line) != 3:
+                    await self._write(writer, 'GET', *self._error(HttpError(400, 'リクエスト行が不正です')), False)
+                    break
+                method, target, version = request_line
+                headers = {}
+                for line in lines[1:]:
+                    name, sep, value = line.partition(':')
+                    if sep:
+                        headers[name.strip().lower()] = value.strip()
+                max_body = MAX_BODY_BYTES if method == 'POST' else MAX_HEADER_BYTES
+                try:
+                    request_body = await self._read_body(reader, headers, max_body)
+                except HttpError as e:
+                    await self._write(writer, method, *self._error(e), False)
+                    break
+
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection == 'keep-alive' if version == 'HTTP/1.0' else connection != 'close'
+                self.requests += 1
+                status, extra, body = await self.respond(method, target, headers, request_body)
+                await self._write(writer, method, status, extra, body, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_body(self, reader, headers, max_body):
+        """Content-Length か chunked（server.js の fetch でそのまま転送した場合）の本文を読む"""
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            total = 0
+            while True:
+                size_line = await reader.readuntil(b'\r\n')
+                try:
+                    size = int(size_line.split(b';', 1)[0].strip(), 16)
+                except ValueError:
+                    raise HttpError(400, 'chunked の長さが不正です') from None
+                if size == 0:
+                    # トレーラーは使わないので空行まで読み捨てる
+                    while await reader.readuntil(b'\r\n') != b'\r\n':
+                        pass
+                    return b''.join(chunks)
+                total += size
+                if total > max_body:
+                    raise HttpError(413, '本文が大きすぎます')
+                chunks.append((await reader.readexactly(size + 2))[:-2])
+        try:
+            length = int(headers.get('content-length') or 0)
+        except ValueError:
+            raise HttpError(400, 'Content-Length が不正です') from None
+        if not 0 <= length <= max_body:
+            raise HttpError(413, '本文が大きすぎます')
+        return await reader.readexactly(length) if length else b''
+
+    async def _write(self, writer, method, status, extra, body, keep_alive):
+        lines = [f'HTTP/1.1 {status} {HTTPStatus(status).phrase}',
+                 'Access-Control-Allow-Origin: *',
+                 f'Connection: {"keep-alive" if keep_alive else "close"}']
+        lines += [f'{name}: {value}' for name, value in extra.items()]
+        if status != 304:
+            lines += ['Content-Type: application/json; charset=utf-8', f'Content-Length: {len(body)}']
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        if status != 304 and method != 'HEAD':
+            writer.write(body)
+        await writer.drain()
+
+    def _error(self, error):
+        return error.status, {}, _encode({'error': error.message})
+
+    async def respond(self, method, target, headers, request_body=b''):
+        """(ステータス, 追加ヘッダー, 本文) を返す"""
+        url = urlsplit(target)
+        path, query = unquote(url.path), parse_qs(url.query)
+        try:
+            if path in JOB_COMPAT_ROUTES or path == '/jobs' or path.startswith('/jobs/'):
+                return await self.job_route(method, path, query, request_body)
+            if method not in ('GET', 'HEAD'):
+                status, _, body = self._error(HttpError(405, 'GET と HEAD だけに対応しています'))
+                return status, {'Allow': 'GET, HEAD'}, body
+            etag, produce = await self.route(path, query)
+            if etag is None:
+                return 200, {'Cache-Control': 'no-store'}, await produce()
+            if etag_matches(headers.get('if-none-match'), etag):
+                return 304, {'ETag': etag, 'Cache-Control': 'no-cache'}, b''
+            etag, body = await produce()
+            return 200, {'ETag': etag, 'Cache-Control': 'no-cache'}, body
+        except HttpError as e:
+            return self._error(e)
+        except QueueFull as e:
+            return 503, {'Retry-After': '1'}, _encode({'error': str(e)})
+        except ValueError as e:
+            # 書き込み途中のファイルを読んだなど。次のリクエストで読み直す
+            return self._error(HttpError(503, f'データセットを解析できませんでした: {e}'))
+        except Exception as e:
+            print(f'[エラー] {target}: {e!r}')
+            return self._error(HttpError(500, '内部エラーが発生しました'))
+
+    async def route(self, path, query):
+        """
+        (ETag, 応答を作る関数) を返す
+
+        ETag が None の応答（/status）は produce() が本文だけを返し、それ以外は (ETag, 本文) を返す。
+        ETag は本文を作る前に分かるので、If-None-Match が一致すれば集計を行わずに 304 を返せる。
+        """
+        if path == '/status':
+            return None, self._status
+        if path == f'/{INDEX_NAME}':
+            index = await self._load_index()
+            return index[1], lambda: self._index_body(index)
+
+        parts = path.strip('/').split('/')
+        if len(parts) < 3 or parts[0] != 'datasets':
+            raise HttpError(404, f'{path} はありません')
+        name = parts[1]
+        resource, build = self._dataset_resource(parts[2:], query)
+        signature = self._dataset_signature(name)
+
+        sha256 = self.cache.known_digest(name, signature)
+        if sha256 is None:
+            sha256 = (await self.cache.get(name, signature)).sha256
+
+        async def produce():
+            entry = await self.cache.get(name, signature)
+            body = await self.cache.response(entry, resource, build) if resource in AGGREGATES else \
+                await asyncio.get_running_loop().run_in_executor(self.executor, lambda: _encode(build(entry)))
+            return make_etag(entry.sha256, resource), body
+
+        return make_etag(sha256, resource), produce
+
+    def _dataset_signature(self, name):
+        """students 直下のデータセットのシグネチャ（データセットでない・無ければ 404）"""
+        if not is_dataset_file(name) or '/' in name or '\\' in name:
+            raise HttpError(404, f'{name} はデータセットではありません')
+        try:
+            return file_signature(os.stat(self.students_dir / name))
+        except FileNotFoundError:
+            self.cache.forget(name)
+            raise HttpError(404, f'{name} が見つかりません') from None
+
+    def _job_file(self, name):
+        """
+        ジョブで分析する students 内のファイル（server.js の /api/run-analysis と同じく folder/file も受け付ける）
+
+        Returns:
+            tuple: (students からの相対パス, 絶対パス, シグネチャ)
+        """
+        root = self.students_dir.resolve()
+        path = (root / name).resolve()
+        if root not in path.parents or not is_dataset_file(path.name):
+            raise HttpError(404, f'{name} はデータセットではありません')
+        try:
+            signature = file_signature(os.stat(path))
+        except FileNotFoundError:
+            raise HttpError(404, f'{name} が見つかりません') from None
+        return path.relative_to(root).as_posix(), path, signature
+
+    def _dataset_resource(self, parts, query):
+        """パスの残りの部分から (ETag 用の種類, 応答を作る関数) を決める"""
+        kind = parts[0]
+        if kind in AGGREGATES and len(parts) == 1:
+            return kind, AGGREGATES[kind]
+        if kind != 'sessions' or len(parts) > 2:
+            raise HttpError(404, f'{"/".join(parts)} はありません')
+        if len(parts) == 2:
+            if not parts[1].isdigit():
+                raise HttpError(400, 'セッション番号は 0 以上の整数で指定してください')
+            number = int(parts[1])
+
+            def session(entry):
+                sessions = _sessions(entry.data)
+                if number >= len(sessions):
+                    raise HttpError(404, f'セッション {number} はありません（{len(sessions)} 件）')
+                return sessions[number]
+
+            return f'sessions/{number}', session
+
+        offset = _query_int(query, 'offset', 0)
+        limit = _query_int(query, 'limit', DEFAULT_SESSION_LIMIT, minimum=1, maximum=MAX_SESSION_LIMIT)
+
+        def session_slice(entry):
+            sessions = _sessions(entry.data)
+            return {'file': entry.name, 'total': len(sessions), 'offset': offset,
+                    'sessions': sessions[offset:offset + limit]}
+
+        return f'sessions?offset={offset}&limit={limit}', session_slice
+
+    async def job_route(self, method, path, query, request_body):
+        """分析ジョブのエンドポイント。(ステータス, 追加ヘッダー, 本文) を返す（応答はキャッシュさせない）"""
+        no_store = {'Cache-Control': 'no-store'}
+        if method in ('GET', 'HEAD'):
+            if path == '/jobs':
+                return 200, no_store, _encode(self.jobs.status())
+            if path == '/analysis_status':
+                # 最後に /trigger_analysis で投入したジョブの状態（analysis/results の PNG は探さない）
+                if self.triggered is None:
+                    return 200, no_store, _encode({'ready': False})
+                return 200, no_store, _encode({'ready': self.triggered.status == 'done',
+                                               'job': self.triggered.to_dict()})
+            if path == '/api/run-analysis':
+                return await self._legacy_result(await self._submit('basic', query, b''))
+            if path.startswith('/jobs/'):
+                job_id = path[len('/jobs/'):]
+                job = self.jobs.get(job_id)
+                if job is None:
+                    raise HttpError(404, f'ジョブ {job_id} はありません（完了後に破棄された可能性があります）')
+                await job.wait(self._wait_seconds(query))
+                return 200, no_store, _encode(job.to_dict())
+        elif method == 'POST':
+            if path == '/analyze/reaction-time':
+                return await self._legacy_result(await self._submit('reaction_time', {}, request_body))
+            if path == '/trigger_analysis':
+                try:
+                    file = json.loads(request_body).get('file')
+                except (ValueError, AttributeError):
+                    file = None
+                if not isinstance(file, str):
+                    raise HttpError(400, 'file を指定してください')
+                self.triggered = await self._submit('reaction_time', {'file': [file]}, b'')
+                return 200, no_store, _encode({'status': 'queued', 'job': self.triggered.id})
+            if path.startswith('/jobs/'):
+                kind = path[len('/jobs/'):]
+                if kind not in ANALYSES:
+                    raise HttpError(404, f'未対応の分析です: {kind}（{", ".join(ANALYSES)}）')
+                job = await self._submit(kind, query, request_body)
+                await job.wait(self._wait_seconds(query))
+                return 200 if job.done else 202, no_store, _encode(job.to_dict())
+        status, _, body = self._error(HttpError(405, f'{method} {path} には対応していません'))
+        return status, {'Allow': 'GET, HEAD, POST'}, body
+
+    async def _submit(self, kind, query, request_body):
+        """?file= があれば students のデータセットを、無ければ本文の JSON を分析するジョブを投入する"""
+        loop = asyncio.get_running_loop()
+        files = query.get('file')
+        if files:
+            name, path, signature = self._job_file(files[0])
+            sha256 = self.cache.known_digest(name, signature) or \
+                await loop.run_in_executor(self.executor, file_sha256, path)
+            # ワーカーは読み込んだ内容のハッシュを確かめてから分析する（投入後に書き換えられたら失敗させる）
+            return self.jobs.submit(kind, sha256, 'file', (str(path), sha256), label=name)
+        if not request_body:
+            raise HttpError(400, '分析するデータ（本文の JSON または file）がありません')
+        digest = await loop.run_in_executor(self.executor, hashlib.sha256, request_body)
+        return self.jobs.submit(kind, digest.hexdigest(), 'body', request_body)
+
+    async def _legacy_result(self, job):
+        """server.js と同じく、完了を待って結果そのもの（失敗時は {"error": ...}）を返す"""
+        await job.wait(self.jobs.timeout * 2)
+        if job.status == 'done':
+            return 200, {'Cache-Control': 'no-store'}, _encode(job.result)
+        return 500, {'Cache-Control': 'no-store'}, _encode({'error': job.error or '分析が時間内に終わりませんでした'})
+
+    def _wait_seconds(self, query):
+        try:
+            wait = float(query.get('wait', ['0'])[0])
+        except ValueError:
+            raise HttpError(400, 'wait は秒数で指定してください') from None
+        return min(max(wait, 0.0), self.jobs.timeout)
+
+    async def _load_index(self):
+        """index.json を (シグネチャ, ETag, 本文) として保持し、ファイルが変わったときだけ読み直す"""
+        path = self.students_dir / INDEX_NAME
+        try:
+            signature = file_signature(os.stat(path))
+        except FileNotFoundError:
+            self.index = None
+            raise HttpError(404, f'{INDEX_NAME} がありません（regenerate_index_with_sessions.py を実行してください）') from None
+        if self.index is None or self.index[0] != signature:
+            loop = asyncio.get_running_loop()
+            body = await loop.run_in_executor(self.executor, path.read_bytes)
+            self.index = (signature, make_etag(hashlib.sha256(body).hexdigest(), INDEX_NAME), body)
+        return self.index
+
+    async def _index_body(self, index):
+        return index[1], index[2]
+
+    async def _status(self):
+        return _encode({
+            'uptime': round(time.time() - self.started, 3),
+            'requests': self.requests,
+            'cache': self.cache.status()
+        })
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='students のインデックス・セッション・集計結果を返す HTTP サービス')
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f'待ち受けるアドレス（既定 {DEFAULT_HOST}）')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'待ち受けるポート（既定 {DEFAULT_PORT}）')
+    parser.add_argument('--cache-mb', type=float, default=DEFAULT_CACHE_MB,
+                        help=f'解析済みデータセットのキャッシュの上限（MB、既定 {DEFAULT_CACHE_MB}）')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'解析・集計に使うスレッド数（0 以下なら CPU コア数、既定 {DEFAULT_WORKERS}）')
+    parser.add_argument('--analysis-workers', type=int, default=DEFAULT_ANALYSIS_WORKERS,
+                        help=f'分析ジョブのワーカープロセス数（0 以下なら CPU コア数、既定 {DEFAULT_ANALYSIS_WORKERS}）')
+    parser.add_argument('--max-queue', type=int, default=DEFAULT_MAX_QUEUE,
+                        help=f'分析ジョブの待ち行列の上限（既定 {DEFAULT_MAX_QUEUE}）')
+    parser.add_argument('--students', help='students フォルダ（既定はリポジトリの students）')
+    return parser.parse_args()
+
+
+async def serve(students_dir, host=DEFAULT_HOST, port=DEFAULT_PORT, cache_mb=DEFAULT_CACHE_MB,
+                workers=DEFAULT_WORKERS, analysis_workers=DEFAULT_ANALYSIS_WORKERS, max_queue=DEFAULT_MAX_QUEUE):
+    jobs = JobQueue(analysis_workers, max_queue)
+    await jobs.start()
+    app = AnalyticsServer(students_dir, int(cache_mb * 1024 * 1024), workers, jobs)
+    server = await asyncio.start_server(app.handle_connection, host, port, limit=MAX_HEADER_BYTES, backlog=1024)
+    print(f'[OK] http://{host}:{port}/ で待ち受けています（{students_dir}、キャッシュ上限 {cache_mb:g}MB、'
+          f'分析ワーカー {jobs.workers} 個）')
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await jobs.close()
+
+
+def main(students=None, host=DEFAULT_HOST, port=DEFAULT_PORT, cache_mb=DEFAULT_CACHE_MB, workers=DEFAULT_WORKERS,
+         analysis_workers=DEFAULT_ANALYSIS_WORKERS, max_queue=DEFAULT_MAX_QUEUE):
+    students_dir = Path(students) if students else Path(__file__).parent.parent / 'students'
+    if not students_dir.is_dir():
+        print(f'[エラー] {students_dir} が見つかりません')
+        return
+    try:
+        asyncio.run(serve(students_dir, host, port, cache_mb, workers, analysis_workers, max_queue))
+    except KeyboardInterrupt:
+        print('\n[OK] 停止しました')
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    main(args.students, args.host, args.port, args.cache_mb, args.workers, args.analysis_workers, args.max_queue)
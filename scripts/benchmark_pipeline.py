@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+scripts/ のデータパイプラインを規模別に計測するベンチマーク
+
+一時ディレクトリに scripts/ をコピーした作業用プロジェクトを作り、
+ログ件数ごと（既定 1k / 100k / 1M）に次の段階を順に実行して計測する。
+students/ 以下の実データには触れない。
+
+    generate                        generate_bulk_sessions.py（quiz_log_dummy.json を生成）
+    integrate_cluster_features      integrate_cluster_features.py
+    compute_cluster_features        compute_cluster_features.py
+    regenerate_index_with_sessions  regenerate_index_with_sessions.py
+    verify_dummy_logs               verify_dummy_logs.py
+
+各段階は別プロセスで実行し、次の値を記録する。
+- wall_seconds: 経過時間
+- peak_rss_bytes: 最大常駐メモリ（getrusage の ru_maxrss）
+- read_bytes / write_bytes: /proc/self/io の rchar / wchar（Linux 以外では null）
+
+結果は JSON（-o で指定したファイル、省略時は標準出力の最後）に出力するので、
+コミット間で比較できる。
+
+実行方法:
+python scripts/benchmark_pipeline.py
+python scripts/benchmark_pipeline.py --scales 1000,100000 -o bench.json
+python scripts/benchmark_pipeline.py --scales 1000000 --keep  # 作業用ディレクトリを残す
+"""
+
+import argparse
+import json
+import math
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).parent
+DEFAULT_SCALES = (1000, 100000, 1000000)
+# generate_session() は 1 セッションあたり 3〜10 件（平均 6.5 件）のログを生成する
+AVG_LOGS_PER_SESSION = 6.5
+
+STAGES = (
+    ('generate', 'generate_bulk_sessions.py'),
+    ('integrate_cluster_features', 'integrate_cluster_features.py'),
+    ('compute_cluster_features', 'compute_cluster_features.py'),
+    ('regenerate_index_with_sessions', 'regenerate_index_with_sessions.py'),
+    ('verify_dummy_logs', 'verify_dummy_logs.py')
+)
+
+# 子プロセス側: スクリプトを __main__ として実行し、終了時に資源使用量を書き出す
+STAGE_RUNNER = '''
+import json, resource, runpy, sys
+stats_path, script = sys.argv[1], sys.argv[2]
+sys.argv = sys.argv[2:]
+sys.path.insert(0, str(__import__('pathlib').Path(script).parent))
+code = 0
+try:
+    runpy.run_path(script, run_name='__main__')
+except SystemExit as e:
+    code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+finally:
+    io = {}
+    try:
+        with open('/proc/self/io') as f:
+            io = dict(line.split(': ') for line in f.read().splitlines())
+    except OSError:
+        pass
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with open(stats_path, 'w') as f:
+        json.dump({
+            'peak_rss_bytes': rss if sys.platform == 'darwin' else rss * 1024,
+            'read_bytes': int(io['rchar']) if 'rchar' in io else None,
+            'write_bytes': int(io['wchar']) if 'wchar' in io else None
+        }, f)
+sys.exit(code)
+'''
+
+
+def stage_args(stage, sessions, workers):
+    if stage == 'generate':
+        return ['--sessions', str(sessions), '--workers', str(workers),
+                '-o', 'students/quiz_log_dummy.json']
+    return []
+
+
+def run_stage(workdir, stage, script, args):
+    """1 段階を作業用プロジェクトで実行して計測値を返す"""
+    stats_path = workdir / f'.bench_{stage}.json'
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, '-c', STAGE_RUNNER, str(stats_path), str(workdir / 'scripts' / script), *args],
+        cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    wall = time.perf_counter() - started
+
+    result = {'stage': stage, 'wall_seconds': round(wall, 4), 'returncode': completed.returncode,
+              'peak_rss_bytes': None, 'read_bytes': None, 'write_bytes': None}
+    if stats_path.exists():
+        with open(stats_path, 'r', encoding='utf-8') as f:
+            result.update(json.load(f))
+        stats_path.unlink()
+    if completed.returncode != 0:
+        result['error'] = completed.stderr.strip().splitlines()[-1:] or None
+    return result
+
+
+def prepare_workdir(root):
+    """scripts/ と空の students/ を持つ作業用プロジェクトを作る"""
+    shutil.copytree(SCRIPTS_DIR, root / 'scripts',
+                    ignore=shutil.ignore_patterns('__pycache__', '*.pyc'))
+    (root / 'students').mkdir()
+
+
+def count_logs(workdir):
+    with open(workdir / 'students' / 'quiz_log_dummy.json', 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    sessions = data.get('vector_test_sessions', {}).get('sessions', [])
+    return len(sessions), sum(len(s.get('logs', [])) for s in sessions)
+
+
+def run_scale(scale, workers, keep):
+    """1 規模分の全段階を実行"""
+    sessions = max(1, math.ceil(scale / AVG_LOGS_PER_SESSION))
+    root = Path(tempfile.mkdtemp(prefix=f'bench_{scale}_'))
+    results = []
+    dataset_size = actual_sessions = actual_logs = None
+    try:
+        prepare_workdir(root)
+        for stage, script in STAGES:
+            result = run_stage(root, stage, script, stage_args(stage, sessions, workers))
+            results.append(result)
+            status = 'OK' if result['returncode'] == 0 else 'NG'
+            print(f'  [{status}] {stage}: {result["wall_seconds"]:.2f} 秒', file=sys.stderr)
+            if result['returncode'] != 0 and stage == 'generate':
+                break
+        # generate が失敗した場合はデータセットが無いので、規模は null のまま段階の結果だけ返す
+        dataset_path = root / 'students' / 'quiz_log_dummy.json'
+        if dataset_path.exists():
+            dataset_size = dataset_path.stat().st_size
+            try:
+                actual_sessions, actual_logs = count_logs(root)
+            except (OSError, ValueError) as e:
+                print(f'  [警告] データセットを読み込めませんでした: {e}', file=sys.stderr)
+    finally:
+        if keep:
+            print(f'  作業用ディレクトリ: {root}', file=sys.stderr)
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+    return {
+        'scale_logs': scale,
+        'sessions': actual_sessions,
+        'logs': actual_logs,
+        'dataset_bytes': dataset_size,
+        'stages': results
+    }
+
+
+def git_commit():
+    try:
+        completed = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=SCRIPTS_DIR,
+                                   capture_output=True, text=True)
+    except OSError:
+        return None
+    return completed.stdout.strip() or None
+
+
+def parse_scales(value):
+    return [int(v) for v in value.split(',') if v.strip()]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='scripts/ のデータパイプラインを規模別に計測')
+    parser.add_argument('--scales', type=parse_scales, default=list(DEFAULT_SCALES),
+                        help='ログ件数をカンマ区切りで指定（既定 1000,100000,1000000）')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='generate 段階のプロセス数（既定 1）')
+    parser.add_argument('-o', '--output', help='結果 JSON の出力先（省略時は標準出力）')
+    parser.add_argument('--keep', action='store_true', help='作業用ディレクトリを削除しない')
+    return parser.parse_args()
+
+
+def main(scales=DEFAULT_SCALES, workers=1, output=None, keep=False):
+    report = {
+        'commit': git_commit(),
+        'created_at': datetime.now().isoformat() + 'Z',
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': []
+    }
+    for scale in scales:
+        print(f'[計測] {scale:,} ログ', file=sys.stderr)
+        report['results'].append(run_scale(scale, workers, keep))
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+        print(f'[OK] {output} に結果を書き出しました', file=sys.stderr)
+    else:
+        print(text)
+
+    failed = any(stage['returncode'] != 0
+                 for result in report['results'] for stage in result['stages'])
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    sys.exit(main(args.scales, workers=args.workers, output=args.output, keep=args.keep))
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+クラス全体の指標ごとの分布（昇順の配列）を事前計算し、全学習者のパーセンタイル順位と z スコアを書き出すスクリプト
+
+src/core/class_compare.js の calculateRelativePosition は 1 人の位置を求めるたびに全学習者を
+ソートし直すので、クラス全員を表示すると O(n² log n) になる。ここではデータセットごとに 1 回だけ
+指標ごとの値を昇順に並べ、全学習者の順位をまとめて np.searchsorted で求める。
+
+- 学習者: factor_analysis.py と同じ（log.user_id || log.student_id、なければセッションの session_id、
+  どちらもなければ 'unknown'）。logs・sessions・vector_test_sessions.sessions のログを対象にする
+- 指標: computeStats と同じ規則の accuracy / rtMean / avgPathLength と、ログの vector の軸ごとの平均
+  （vector.<軸>、値は Number(v) || 0）。反応時間・パス・vector が 1 件も無い学習者はその指標の母集団に含めない
+- パーセンタイル: calculateRelativePosition と同じく「値がその学習者以下の人数 / 人数 × 100」、
+  順位は「値がより大きい人数 + 1」。z スコアは母集団の標準偏差で割ったもの（標準偏差が 0 なら 0）
+
+出力（students/percentiles/<ファイル名>）の metrics[指標].sorted は昇順の配列なので、
+後から加わった学習者の位置も二分探索（O(log n)）で求められる（class_compare.js の lookupRelativePosition、
+このスクリプトの query）。
+
+実行方法:
+python scripts/class_percentiles.py build  # students 内の全データセット
+python scripts/class_percentiles.py build students/quiz_log_dummy.json
+python scripts/class_percentiles.py query students/percentiles/quiz_log_dummy.json --metric accuracy --value 0.75
+
+依存: numpy
+"""
+
+import argparse
+import json
+import math
+from pathlib import Path
+
+import numpy as np
+
+from concept_dependency import _js_number, is_correct
+from factor_analysis import _student_id
+from index_builder import list_dataset_files
+from pipeline_common import _is_number, atomic_write_json
+from stats_core import _js_or, _path_length, _selected
+
+PERCENTILES_DIR_NAME = 'percentiles'
+BASE_METRICS = ('accuracy', 'rtMean', 'avgPathLength')
+VECTOR_PREFIX = 'vector.'
+
+
+def iter_student_logs(data):
+    """(学習者 ID, ログ) を順に返す（factor_analysis.build_response_matrix と同じ範囲）"""
+    if isinstance(data, list):
+        for log in data:
+            if isinstance(log, dict):
+                yield str(_student_id(log, None)), log
+        return
+    if not isinstance(data, dict):
+        return
+    if isinstance(data.get('logs'), list):
+        for log in data['logs']:
+            if isinstance(log, dict):
+                yield str(_student_id(log, None)), log
+    session_lists = [data.get('sessions')]
+    if isinstance(data.get('vector_test_sessions'), dict):
+        session_lists.append(data['vector_test_sessions'].get('sessions'))
+    for sessions in session_lists:
+        if not isinstance(sessions, list):
+            continue
+        for session in sessions:
+            if isinstance(session, dict) and isinstance(session.get('logs'), list):
+                for log in session['logs']:
+                    if isinstance(log, dict):
+                        yield str(_student_id(log, session.get('session_id'))), log
+
+
+def _response_time(log):
+    """computeStats の反応時間（response_time || response_time_ms || reaction_time || time || selected.time）"""
+    selected = _selected(log)
+    value = _js_or(log.get('response_time'), log.get('response_time_ms'), log.get('reaction_time'),
+                   log.get('time'), selected.get('time') if selected else None, None)
+    return value if _is_number(value) and value >= 0 else None
+
+
+def _vector_value(value):
+    value = _js_number(value)
+    return value if value == value and value else 0
+
+
+def student_metrics(data):
+    """
+    学習者ごとの指標を計算する
+
+    Returns:
+        tuple: (学習者 ID のリスト, {指標: 学習者順の値の配列（該当なしは NaN）})
+    """
+    index = {}
+    rows, correct, rt, path_length = [], [], [], []
+    vector_rows, vector_axes, vector_values = [], [], []
+    axes = {}
+    for student, log in iter_student_logs(data):
+        row = index.setdefault(student, len(index))
+        rows.append(row)
+        correct.append(is_correct(log) or log.get('correct') == 'true')
+        value = _response_time(log)
+        rt.append(math.nan if value is None else value)
+        path_length.append(_path_length(log))
+        vector = log.get('vector')
+        if isinstance(vector, dict):
+            for axis, value in vector.items():
+                vector_rows.append(row)
+                vector_axes.append(axes.setdefault(axis, len(axes)))
+                vector_values.append(_vector_value(value))
+
+    n = len(index)
+    rows = np.asarray(rows, dtype=np.int64)
+    rt = np.asarray(rt, dtype=np.float64)
+    path_length = np.asarray(path_length, dtype=np.int64)
+    has_rt = ~np.isnan(rt)
+    has_path = path_length > 0
+
+    def ratio(weights, counts):
+        sums = np.bincount(rows, weights=weights, minlength=n) if len(rows) else np.zeros(n)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+    totals = np.bincount(rows, minlength=n)
+    metrics = {
+        'accuracy': ratio(np.asarray(correct, dtype=np.float64), totals),
+        'rtMean': ratio(np.where(has_rt, rt, 0.0), np.bincount(rows, weights=has_rt, minlength=n)),
+        'avgPathLength': ratio(np.where(has_path, path_length, 0), np.bincount(rows, weights=has_path, minlength=n))
+    }
+
+    vector_rows = np.asarray(vector_rows, dtype=np.int64)
+    vector_axes = np.asarray(vector_axes, dtype=np.int64)
+    vector_values = np.asarray(vector_values, dtype=np.float64)
+    for axis, aid in sorted(axes.items()):
+        mask = vector_axes == aid
+        counts = np.bincount(vector_rows[mask], minlength=n)
+        sums = np.bincount(vector_rows[mask], weights=vector_values[mask], minlength=n)
+        metrics[f'{VECTOR_PREFIX}{axis}'] = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+    return list(index), metrics
+
+
+class PercentileTable:
+    """1 指標のクラス全体の分布（昇順の配列と平均・標準偏差）"""
+
+    def __init__(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        self.sorted = np.sort(values[~np.isnan(values)])
+        self.mean = float(self.sorted.mean()) if self.sorted.size else 0.0
+        self.std = float(self.sorted.std()) if self.sorted.size else 0.0
+
+    @property
+    def count(self):
+        return int(self.sorted.size)
+
+    def lookup_many(self, values):
+        """
+        値の配列の (パーセンタイル, 順位, z スコア) を二分探索でまとめて求める
+
+        NaN の値はそれぞれ NaN / 0 / NaN になる。
+        """
+        values = np.asarray(values, dtype=np.float64)
+        at_or_below = np.searchsorted(self.sorted, values, side='right')
+        missing = np.isnan(values)
+        n = self.count
+        percentile = np.where(missing, np.nan, at_or_below / n * 100 if n else np.nan)
+        rank = np.where(missing, 0, n - at_or_below + 1)
+        z = np.where(missing, np.nan, (values - self.mean) / self.std if self.std > 0 else 0.0)
+        return percentile, rank, z
+
+    def lookup(self, value):
+        """後から加わった学習者など、1 つの値の位置を O(log n) で求める"""
+        if not self.count:
+            return {'percentile': None, 'rank': None, 'zScore': None, 'total': 0}
+        percentile, rank, z = self.lookup_many([value])
+        return {
+            'percentile': float(percentile[0]),
+            'rank': int(rank[0]),
+            'zScore': float(z[0]),
+            'total': self.count
+        }
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'mean': round(self.mean, 6),
+            'std': round(self.std, 6),
+            'sorted': np.round(self.sorted, 6).tolist()
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        table = cls([])
+        table.sorted = np.asarray(d.get('sorted', []), dtype=np.float64)
+        table.mean = float(d.get('mean', 0.0))
+        table.std = float(d.get('std', 0.0))
+        return table
+
+
+def _nullable(values, ndigits=6):
+    return [None if math.isnan(v) else round(float(v), ndigits) for v in values]
+
+
+def build_class_percentiles(json_file, data):
+    """サイドカーの内容（学習者 ID と、指標ごとの分布・各学習者の値・パーセンタイル・順位・z スコア）を作成"""
+    students, metrics = student_metrics(data)
+    result = {'file': json_file, 'n_students': len(students), 'students': students, 'metrics': {}}
+    for metric, values in metrics.items():
+        table = PercentileTable(values)
+        percentile, rank, z = table.lookup_many(values)
+        result['metrics'][metric] = dict(
+            table.to_dict(),
+            values=_nullable(values),
+            percentile=_nullable(percentile, 4),
+            rank=[int(r) if r else None for r in rank],
+            zScore=_nullable(z, 4)
+        )
+    return result
+
+
+def percentiles_path_for(json_path):
+    """students/<名前>.json → students/percentiles/<名前>.json"""
+    json_path = Path(json_path)
+    return json_path.parent / PERCENTILES_DIR_NAME / json_path.name
+
+
+def write_percentiles_sidecar(json_path):
+    """students/percentiles/<ファイル名> に結果を書き出す（一時ファイル経由で置き換え）"""
+    json_path = Path(json_path)
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    result = build_class_percentiles(json_path.name, data)
+
+    output = atomic_write_json(percentiles_path_for(json_path), result, separators=(',', ':'))
+    return output, result
+
+
+def command_build(files=None):
+    students_dir = Path(__file__).parent.parent / 'students'
+    paths = [Path(f) for f in files] if files else [students_dir / f for f in list_dataset_files(students_dir)]
+    for json_path in paths:
+        try:
+            output, result = write_percentiles_sidecar(json_path)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f'[エラー] {json_path}: {e}')
+            continue
+        print(f'[OK] {output}（学習者: {result["n_students"]} / 指標: {", ".join(result["metrics"])}）')
+
+
+def command_query(path, metric, value=None, student=None):
+    with open(path, 'r', encoding='utf-8') as f:
+        sidecar = json.load(f)
+    if metric not in sidecar['metrics']:
+        print(f'[エラー] 指標 {metric} がありません（{", ".join(sidecar["metrics"])}）')
+        return None
+    entry = sidecar['metrics'][metric]
+    if student is not None:
+        if student not in sidecar['students']:
+            print(f'[エラー] 学習者 {student} がいません')
+            return None
+        i = sidecar['students'].index(student)
+        result = {'value': entry['values'][i], 'percentile': entry['percentile'][i],
+                  'rank': entry['rank'][i], 'zScore': entry['zScore'][i], 'total': entry['count']}
+    else:
+        result = dict(PercentileTable.from_dict(entry).lookup(value), value=value)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return result
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='クラス全体の指標の分布と各学習者のパーセンタイル順位を事前計算する')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build = sub.add_parser('build', help='データセットから students/percentiles/ を作成する')
+    build.add_argument('files', nargs='*', help='対象の JSON（省略時は students 内の全データセット）')
+
+    query = sub.add_parser('query', help='作成済みの分布から位置を求める')
+    query.add_argument('path', help='students/percentiles/<ファイル名>')
+    query.add_argument('--metric', default='accuracy', help='指標（accuracy / rtMean / avgPathLength / vector.<軸>）')
+    target = query.add_mutually_exclusive_group(required=True)
+    target.add_argument('--value', type=float, help='値（後から加わった学習者など）')
+    target.add_argument('--student', help='学習者 ID')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.command == 'build':
+        command_build(args.files)
+    else:
+        command_query(args.path, args.metric, args.value, args.student)
+
+
+if __name__ == '__main__':
+    main()
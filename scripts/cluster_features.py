@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+cluster_features（8次元）を全セッション分まとめて計算する共通エンジン
+
+各セッションのログを一度だけ走査して列ごとの NumPy 配列（列指向）に
+展開し、8 つの特徴量をセッション単位の区間集約（np.bincount）で一括計算する。
+セッションごとの Python ループやリスト内包の繰り返しがなくなるため、
+数十万〜数百万セッションの再計算でも秒単位で終わる。
+
+特徴量:
+1. correct_rate: 正答率 (0-1)
+2. avg_response_time: 平均反応時間 (response_time / 30 秒, 上限 1)
+3. avg_path_length: 平均パス長 (path 長 / 10, 上限 1)
+4. avg_vector_logic: vector.logic の平均 (vector_min〜vector_max → 0-1)
+5. avg_vector_analysis: vector.analysis の平均 (同上)
+6. avg_vector_creativity: vector.creativity の平均 (同上)
+7. glossary_count: glossaryShown の総数 (/ 20, 上限 1)
+8. total_logs: ログ総数 (/ 50, 上限 1)
+
+正規化の定数は normalization 引数（DEFAULT_NORMALIZATION と同じキーの辞書）で
+変更できる。ログが空のセッションはすべて 0.5 になる。
+
+依存: numpy
+"""
+
+import numpy as np
+
+VECTOR_AXES = ('logic', 'analysis', 'creativity')
+FEATURE_NAMES = (
+    'correct_rate',
+    'avg_response_time',
+    'avg_path_length',
+    'avg_vector_logic',
+    'avg_vector_analysis',
+    'avg_vector_creativity',
+    'glossary_count',
+    'total_logs'
+)
+EMPTY_FEATURE_VALUE = 0.5
+
+# compute_cluster_features.py（vector は -3〜+3 を想定）
+DEFAULT_NORMALIZATION = {
+    'response_time': 30.0,
+    'path_length': 10.0,
+    'vector_min': -3.0,
+    'vector_max': 3.0,
+    'glossary_count': 20.0,
+    'total_logs': 50.0
+}
+
+# generate_demo_logs.py（vector は -1〜+1 で生成される）
+DEMO_NORMALIZATION = dict(DEFAULT_NORMALIZATION, vector_min=-1.0, vector_max=1.0)
+
+
+def flatten_session_logs(sessions_logs):
+    """
+    セッションごとのログ配列を列指向の NumPy 配列に展開
+
+    Args:
+        sessions_logs: セッションごとのログ配列のリスト [[log, ...], ...]
+
+    Returns:
+        dict: counts（セッションごとのログ数）と、ログ単位の各列
+              correct / response_time / path_length / glossary_count /
+              vector_<axis> / has_vector_<axis>
+    """
+    counts = []
+    correct = []
+    response_time = []
+    path_length = []
+    glossary_count = []
+    vectors = {axis: [] for axis in VECTOR_AXES}
+    has_vector = {axis: [] for axis in VECTOR_AXES}
+
+    for logs in sessions_logs:
+        counts.append(len(logs) if logs else 0)
+        for log in logs or ():
+            correct.append(bool(log.get('correct', False)))
+            # 0 / None / 欠損は平均から除外する（0.0 で表す）
+            response_time.append(log.get('response_time') or 0.0)
+            path = log.get('path')
+            path_length.append(len(path) if path else 0)
+            glossary_count.append(len(log.get('glossaryShown') or ()))
+            vector = log.get('vector')
+            is_dict = isinstance(vector, dict)
+            for axis in VECTOR_AXES:
+                present = is_dict and axis in vector
+                has_vector[axis].append(present)
+                vectors[axis].append(vector[axis] if present else 0.0)
+
+    columns = {
+        'counts': np.asarray(counts, dtype=np.int64),
+        'correct': np.asarray(correct, dtype=bool),
+        'response_time': np.asarray(response_time, dtype=np.float64),
+        'path_length': np.asarray(path_length, dtype=np.int64),
+        'glossary_count': np.asarray(glossary_count, dtype=np.int64)
+    }
+    for axis in VECTOR_AXES:
+        columns[f'vector_{axis}'] = np.asarray(vectors[axis], dtype=np.float64)
+        columns[f'has_vector_{axis}'] = np.asarray(has_vector[axis], dtype=bool)
+    return columns
+
+
+def compute_features_from_columns(columns, normalization=None):
+    """
+    列指向のログ配列から全セッションの cluster_features を一括計算
+
+    np.bincount はログ順に逐次加算するため、セッションごとに Python の
+    sum() で計算した値と同じ浮動小数点結果になる。
+
+    Returns:
+        numpy.ndarray: 形状 (セッション数, 8) の特徴量行列（丸め前）
+    """
+    norm = dict(DEFAULT_NORMALIZATION, **(normalization or {}))
+    counts = columns['counts']
+    n_sessions = len(counts)
+    session_ids = np.repeat(np.arange(n_sessions), counts)
+
+    def segment_sum(weights):
+        return np.bincount(session_ids, weights=weights, minlength=n_sessions)
+
+    def segment_mean(values, mask):
+        total = segment_sum(np.where(mask, values, 0.0))
+        count = segment_sum(mask.astype(np.float64))
+        return np.divide(total, count, out=np.zeros(n_sessions), where=count > 0)
+
+    total_logs = counts.astype(np.float64)
+    has_logs = counts > 0
+    safe_total = np.where(has_logs, total_logs, 1.0)
+
+    rt = columns['response_time']
+    path_length = columns['path_length']
+    vector_range = norm['vector_max'] - norm['vector_min']
+
+    features = np.empty((n_sessions, len(FEATURE_NAMES)), dtype=np.float64)
+    features[:, 0] = segment_sum(columns['correct'].astype(np.float64)) / safe_total
+    features[:, 1] = np.minimum(segment_mean(rt, rt != 0) / norm['response_time'], 1.0)
+    features[:, 2] = np.minimum(
+        segment_mean(path_length.astype(np.float64), path_length > 0) / norm['path_length'], 1.0)
+    for i, axis in enumerate(VECTOR_AXES, start=3):
+        avg = segment_mean(columns[f'vector_{axis}'], columns[f'has_vector_{axis}'])
+        features[:, i] = (avg - norm['vector_min']) / vector_range
+    features[:, 6] = np.minimum(
+        segment_sum(columns['glossary_count'].astype(np.float64)) / norm['glossary_count'], 1.0)
+    features[:, 7] = np.minimum(total_logs / norm['total_logs'], 1.0)
+
+    features[~has_logs] = EMPTY_FEATURE_VALUE
+    return features
+
+
+def compute_cluster_features_batch(sessions_logs, normalization=None):
+    """
+    全セッションの cluster_features を一括計算
+
+    Returns:
+        list: セッションごとの 8 次元リスト（小数点以下 6 桁に丸め済み）
+    """
+    columns = flatten_session_logs(sessions_logs)
+    features = compute_features_from_columns(columns, normalization)
+    return round_features(features)
+
+
+def round_features(features, ndigits=6):
+    """
+    特徴量行列を JSON 出力用のリストに変換
+
+    np.round() は x * 10**ndigits の誤差で、端数がちょうど 0.5 付近の値だけ
+    Python の round() と結果がずれることがある。既存の出力と一致させるため、
+    そうした値だけ round() で丸め直す。
+    """
+    rounded = np.round(features, ndigits)
+    scaled = features * 10.0 ** ndigits
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_tie.any():
+        rounded[near_tie] = [round(value, ndigits) for value in features[near_tie].tolist()]
+    return rounded.tolist()
+
+
+def compute_cluster_features(logs, normalization=None):
+    """1 セッション分のログ配列から cluster_features を計算"""
+    return compute_cluster_features_batch([logs], normalization)[0]
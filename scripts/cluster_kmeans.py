@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+cluster_features を k-means でクラスタリングし、結果をデータセットに書き戻すスクリプト
+
+analysis.js の simpleKMeans はランダム初期化の Lloyd 法を点と中心の組ごとに
+euclideanDistance で回しており、数千セッションを超えると使えない。
+ここでは事前に（オフラインで）クラスタリングしておき、ダッシュボードは結果を描画するだけにする。
+
+- 初期化は k-means++（候補を複数引いて最もポテンシャルが下がるものを選ぶ貪欲版）
+- セッション数が MINI_BATCH_THRESHOLD 以下なら Lloyd 法、超えたらミニバッチ k-means
+- 距離は |x|^2 - 2x・c + |c|^2 の行列演算で CHUNK_ROWS 行ずつ計算するため、
+  作業メモリはセッション数によらず CHUNK_ROWS × k で済む
+
+書き戻す内容:
+- 各セッションの cluster_label（0 始まり。cluster_features のないセッションには付けない）
+- セッション配列を持つオブジェクト（vector_test_sessions またはトップレベル）の clustering
+  {algorithm, k, seed, n_iter, feature_names, centroids, sizes, inertia}
+
+実行方法:
+python scripts/cluster_kmeans.py  # students/quiz_log_dummy.json を k=3 で
+python scripts/cluster_kmeans.py students/demo_project_02_logs.json --k 4
+python scripts/cluster_kmeans.py /tmp/bulk_1m.json --algorithm minibatch --batch-size 8192
+
+依存: numpy
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+from cluster_features import FEATURE_NAMES
+from pipeline_common import atomic_write_json
+
+DEFAULT_K = 3
+DEFAULT_SEED = 0
+CHUNK_ROWS = 65536
+MINI_BATCH_THRESHOLD = 100000
+DEFAULT_BATCH_SIZE = 4096
+MAX_ITER = 300
+TOLERANCE = 1e-4
+MAX_NO_IMPROVEMENT = 10
+
+
+def squared_distances(X, centers):
+    """X の各行と各中心の二乗距離（形状 (len(X), k)）"""
+    d = (X * X).sum(axis=1)[:, None] - 2.0 * (X @ centers.T) + (centers * centers).sum(axis=1)[None, :]
+    return np.maximum(d, 0.0, out=d)
+
+
+def assign_labels(X, centers, chunk_rows=CHUNK_ROWS):
+    """
+    各行を最も近い中心に割り当てる（CHUNK_ROWS 行ずつ計算）
+
+    Returns:
+        tuple: (labels, 最も近い中心までの二乗距離)
+    """
+    n = len(X)
+    labels = np.empty(n, dtype=np.int64)
+    min_distances = np.empty(n, dtype=np.float64)
+    for start in range(0, n, chunk_rows):
+        d = squared_distances(X[start:start + chunk_rows], centers)
+        chunk_labels = d.argmin(axis=1)
+        labels[start:start + chunk_rows] = chunk_labels
+        min_distances[start:start + chunk_rows] = d[np.arange(len(d)), chunk_labels]
+    return labels, min_distances
+
+
+def kmeans_plus_plus(X, k, rng, n_local_trials=None):
+    """k-means++ で初期中心を選ぶ"""
+    n, dim = X.shape
+    if n_local_trials is None:
+        n_local_trials = 2 + int(np.log(k))
+
+    centers = np.empty((k, dim), dtype=np.float64)
+    centers[0] = X[rng.integers(n)]
+    _, closest = assign_labels(X, centers[:1])
+    potential = closest.sum()
+
+    for c in range(1, k):
+        if potential <= 0:
+            # 全点が既存の中心と重なっている場合は残りを一様に選ぶ
+            centers[c] = X[rng.integers(n)]
+            continue
+        # 距離の二乗に比例する確率で候補を引き、ポテンシャルが最小になるものを採用
+        candidates = np.searchsorted(np.cumsum(closest), rng.random(n_local_trials) * potential)
+        candidates = np.minimum(candidates, n - 1)
+        best = None
+        for candidate in candidates:
+            _, d = assign_labels(X, X[candidate:candidate + 1])
+            np.minimum(d, closest, out=d)
+            candidate_potential = d.sum()
+            if best is None or candidate_potential < best[0]:
+                best = (candidate_potential, candidate, d)
+        potential, chosen, closest = best
+        centers[c] = X[chosen]
+    return centers
+
+
+def _update_centers(X, labels, k, centers, min_distances):
+    """所属点の平均で中心を更新。空のクラスタは最も遠い点に移す"""
+    dim = X.shape[1]
+    counts = np.bincount(labels, minlength=k)
+    sums = np.empty((k, dim), dtype=np.float64)
+    for j in range(dim):
+        sums[:, j] = np.bincount(labels, weights=X[:, j], minlength=k)
+    new_centers = centers.copy()
+    filled = counts > 0
+    new_centers[filled] = sums[filled] / counts[filled, None]
+    empty = np.flatnonzero(~filled)
+    if len(empty):
+        farthest = np.argsort(min_distances)[::-1][:len(empty)]
+        new_centers[empty] = X[farthest]
+    return new_centers
+
+
+def lloyd(X, k, rng, n_init=3, max_iter=MAX_ITER, tol=TOLERANCE):
+    """Lloyd 法（n_init 回の k-means++ 初期化から最良のものを返す）"""
+    # 中心の移動量の閾値は特徴量の分散に対する相対値にする
+    threshold = tol * float(X.var(axis=0).mean()) if len(X) else 0.0
+    best = None
+    for _ in range(n_init):
+        centers = kmeans_plus_plus(X, k, rng)
+        labels = None
+        for n_iter in range(1, max_iter + 1):
+            new_labels, min_distances = assign_labels(X, centers)
+            if labels is not None and np.array_equal(labels, new_labels):
+                break
+            labels = new_labels
+            new_centers = _update_centers(X, labels, k, centers, min_distances)
+            shift = float(((new_centers - centers) ** 2).sum())
+            centers = new_centers
+            if shift <= threshold:
+                break
+        labels, min_distances = assign_labels(X, centers)
+        inertia = float(min_distances.sum())
+        if best is None or inertia < best[3]:
+            best = (centers, labels, n_iter, inertia)
+    return best
+
+
+def mini_batch(X, k, rng, batch_size=DEFAULT_BATCH_SIZE, max_iter=MAX_ITER,
+               tol=TOLERANCE, max_no_improvement=MAX_NO_IMPROVEMENT):
+    """
+    ミニバッチ k-means（Sculley, 2010）
+
+    初期化は 3 × batch_size 行の標本に対する k-means++。各ステップでは
+    batch_size 行を抽出し、中心ごとの累積件数を学習率として中心を動かす。
+    バッチ慣性の指数移動平均が max_no_improvement ステップ改善しないか、
+    中心の移動量が閾値を下回ったら止める。ステップ数の上限は max_iter エポック分。
+    """
+    n, dim = X.shape
+    batch_size = min(batch_size, n)
+    init_rows = rng.choice(n, size=min(n, 3 * batch_size), replace=False)
+    centers = kmeans_plus_plus(X[init_rows], k, rng)
+    counts = np.zeros(k, dtype=np.float64)
+
+    threshold = tol * float(X[init_rows].var(axis=0).mean())
+    max_steps = max(1, max_iter * n // batch_size)
+    ewa_inertia = None
+    best_ewa = None
+    no_improvement = 0
+    alpha = min(1.0, 2.0 * batch_size / (n + 1))
+
+    for step in range(1, max_steps + 1):
+        batch = X[rng.integers(n, size=batch_size)]
+        labels, min_distances = assign_labels(batch, centers)
+
+        batch_counts = np.bincount(labels, minlength=k).astype(np.float64)
+        batch_sums = np.empty((k, dim), dtype=np.float64)
+        for j in range(dim):
+            batch_sums[:, j] = np.bincount(labels, weights=batch[:, j], minlength=k)
+        seen = batch_counts > 0
+        counts[seen] += batch_counts[seen]
+        old_centers = centers.copy()
+        centers[seen] += (batch_sums[seen] - batch_counts[seen, None] * centers[seen]) / counts[seen, None]
+
+        shift = float(((centers - old_centers) ** 2).sum())
+        if shift <= threshold:
+            break
+        batch_inertia = float(min_distances.sum()) / batch_size
+        ewa_inertia = batch_inertia if ewa_inertia is None else \
+            ewa_inertia * (1 - alpha) + batch_inertia * alpha
+        if best_ewa is None or ewa_inertia < best_ewa:
+            best_ewa = ewa_inertia
+            no_improvement = 0
+        else:
+            no_improvement += 1
+            if no_improvement >= max_no_improvement:
+                break
+
+    labels, min_distances = assign_labels(X, centers)
+    return centers, labels, step, float(min_distances.sum())
+
+
+def run_kmeans(X, k=DEFAULT_K, seed=DEFAULT_SEED, algorithm='auto', batch_size=DEFAULT_BATCH_SIZE):
+    """
+    特徴量行列 X（形状 (n, d)）をクラスタリング
+
+    Returns:
+        dict: algorithm / k / seed / n_iter / centroids / sizes / inertia / labels
+    """
+    if k < 1:
+        raise ValueError(f'クラスタ数は 1 以上にしてください: {k}')
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    k = min(k, len(X))
+    if algorithm == 'auto':
+        algorithm = 'minibatch' if len(X) > MINI_BATCH_THRESHOLD else 'lloyd'
+    rng = np.random.default_rng(seed)
+    if algorithm == 'minibatch':
+        centers, labels, n_iter, inertia = mini_batch(X, k, rng, batch_size)
+    else:
+        centers, labels, n_iter, inertia = lloyd(X, k, rng)
+    return {
+        'algorithm': algorithm,
+        'k': k,
+        'seed': seed,
+        'n_iter': n_iter,
+        'centroids': centers,
+        'sizes': np.bincount(labels, minlength=k),
+        'inertia': inertia,
+        'labels': labels
+    }
+
+
+def find_sessions_container(data):
+    """セッション配列を持つオブジェクトを返す（vector_test_sessions → トップレベルの順）"""
+    vector_test_sessions = data.get('vector_test_sessions')
+    if isinstance(vector_test_sessions, dict) and isinstance(vector_test_sessions.get('sessions'), list):
+        return vector_test_sessions
+    if isinstance(data.get('sessions'), list):
+        return data
+    return None
+
+
+def _has_features(session):
+    features = session.get('cluster_features')
+    return isinstance(features, list) and len(features) == len(FEATURE_NAMES)
+
+
+def cluster_dataset(data, k=DEFAULT_K, seed=DEFAULT_SEED, algorithm='auto', batch_size=DEFAULT_BATCH_SIZE):
+    """データセットのセッションをクラスタリングして cluster_label / clustering を書き込む"""
+    container = find_sessions_container(data)
+    if container is None:
+        raise ValueError('セッション配列（vector_test_sessions.sessions または sessions）が見つかりません')
+
+    sessions = container['sessions']
+    targets = [session for session in sessions if _has_features(session)]
+    if not targets:
+        raise ValueError('cluster_features を持つセッションがありません（compute_cluster_features.py を先に実行してください）')
+
+    X = np.array([session['cluster_features'] for session in targets], dtype=np.float64)
+    result = run_kmeans(X, k, seed, algorithm, batch_size)
+
+    for session in sessions:
+        session.pop('cluster_label', None)
+    for session, label in zip(targets, result['labels'].tolist()):
+        session['cluster_label'] = label
+
+    container['clustering'] = {
+        'algorithm': result['algorithm'],
+        'k': result['k'],
+        'seed': result['seed'],
+        'n_iter': result['n_iter'],
+        'feature_names': list(FEATURE_NAMES),
+        'centroids': np.round(result['centroids'], 6).tolist(),
+        'sizes': result['sizes'].tolist(),
+        'inertia': round(result['inertia'], 6)
+    }
+    return container['clustering']
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f'1 以上の整数を指定してください: {value}')
+    return number
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='cluster_features を k-means でクラスタリングして書き戻す')
+    parser.add_argument('file', nargs='?', help='対象の JSON（既定は students/quiz_log_dummy.json）')
+    parser.add_argument('--k', type=positive_int, default=DEFAULT_K, help='クラスタ数（既定 3）')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='乱数シード（既定 0）')
+    parser.add_argument('--algorithm', choices=('auto', 'lloyd', 'minibatch'), default='auto',
+                        help=f'auto はセッション数が {MINI_BATCH_THRESHOLD:,} を超えるとミニバッチ')
+    parser.add_argument('--batch-size', type=positive_int, default=DEFAULT_BATCH_SIZE,
+                        help='ミニバッチの行数（既定 4096）')
+    return parser.parse_args()
+
+
+def main(file=None, k=DEFAULT_K, seed=DEFAULT_SEED, algorithm='auto', batch_size=DEFAULT_BATCH_SIZE):
+    json_path = Path(file) if file else Path(__file__).parent.parent / 'students' / 'quiz_log_dummy.json'
+    if not json_path.exists():
+        print(f'[エラー] {json_path} が見つかりません')
+        return
+
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    started = time.time()
+    try:
+        clustering = cluster_dataset(data, k, seed, algorithm, batch_size)
+    except ValueError as e:
+        print(f'[エラー] {e}')
+        return
+    elapsed = time.time() - started
+
+    atomic_write_json(json_path, data, indent=2)
+
+    print(f'[OK] {json_path} を更新しました（{clustering["algorithm"]} / {elapsed:.2f} 秒）')
+    print(f'\n[統計] k: {clustering["k"]} / 反復: {clustering["n_iter"]} / inertia: {clustering["inertia"]}')
+    for i, size in enumerate(clustering['sizes']):
+        print(f'  クラスタ {i}: {size} セッション')
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    main(args.file, k=args.k, seed=args.seed, algorithm=args.algorithm, batch_size=args.batch_size)
@@ -2,125 +2,87 @@
 """
 quiz_log_dummy.json の各セッションから cluster_features を計算して追加するスクリプト
 
+特徴量の計算は cluster_features.py の一括計算エンジンで行う。
+
 実行方法:
 python scripts/compute_cluster_features.py
+python scripts/compute_cluster_features.py --norm vector_min=-1 --norm vector_max=1
+python scripts/compute_cluster_features.py --segments  # students/quiz_log_dummy.segments に追記
 """
 
+import argparse
 import json
 from pathlib import Path
 
+from cluster_features import DEFAULT_NORMALIZATION, compute_cluster_features_batch
+from session_log import SessionLog, load_session_log, segment_log_dir
 
-def compute_cluster_features(logs):
-    """
-    ログ配列から cluster_features を計算
-    
-    特徴量:
-    1. correct_rate: 正答率 (0-1)
-    2. avg_response_time: 平均反応時間 (正規化: 0-1, 最大30秒と仮定)
-    3. avg_path_length: 平均パス長 (正規化: 0-1, 最大10と仮定)
-    4. avg_vector_logic: vector.logic の平均 (正規化: -3〜+3 → 0-1)
-    5. avg_vector_analysis: vector.analysis の平均 (正規化: -3〜+3 → 0-1)
-    6. avg_vector_creativity: vector.creativity の平均 (正規化: -3〜+3 → 0-1)
-    7. glossary_count: glossaryShown の総数 (正規化: 0-1, 最大20と仮定)
-    8. total_logs: ログ総数 (正規化: 0-1, 最大50と仮定)
-    """
-    if not logs or len(logs) == 0:
-        # デフォルト値（すべて0.5）
-        return [0.5] * 8
-    
-    total_logs = len(logs)
-    correct_count = sum(1 for log in logs if log.get('correct', False))
-    correct_rate = correct_count / total_logs if total_logs > 0 else 0
-    
-    # 平均反応時間
-    response_times = [log.get('response_time', 0) for log in logs if log.get('response_time')]
-    avg_response_time = sum(response_times) / len(response_times) if response_times else 0
-    normalized_response_time = min(avg_response_time / 30.0, 1.0)  # 最大30秒で正規化
-    
-    # 平均パス長
-    path_lengths = [len(log.get('path', [])) for log in logs if log.get('path')]
-    avg_path_length = sum(path_lengths) / len(path_lengths) if path_lengths else 0
-    normalized_path_length = min(avg_path_length / 10.0, 1.0)  # 最大10で正規化
-    
-    # vector の平均
-    vector_logic_values = []
-    vector_analysis_values = []
-    vector_creativity_values = []
-    
-    for log in logs:
-        vector = log.get('vector', {})
-        if isinstance(vector, dict):
-            if 'logic' in vector:
-                vector_logic_values.append(vector['logic'])
-            if 'analysis' in vector:
-                vector_analysis_values.append(vector['analysis'])
-            if 'creativity' in vector:
-                vector_creativity_values.append(vector['creativity'])
-    
-    # vector の平均を計算（-3〜+3 → 0-1に正規化）
-    avg_vector_logic = sum(vector_logic_values) / len(vector_logic_values) if vector_logic_values else 0
-    normalized_vector_logic = (avg_vector_logic + 3) / 6.0  # -3〜+3 → 0-1
-    
-    avg_vector_analysis = sum(vector_analysis_values) / len(vector_analysis_values) if vector_analysis_values else 0
-    normalized_vector_analysis = (avg_vector_analysis + 3) / 6.0
-    
-    avg_vector_creativity = sum(vector_creativity_values) / len(vector_creativity_values) if vector_creativity_values else 0
-    normalized_vector_creativity = (avg_vector_creativity + 3) / 6.0
-    
-    # Glossary 提示数
-    glossary_count = sum(len(log.get('glossaryShown', [])) for log in logs)
-    normalized_glossary_count = min(glossary_count / 20.0, 1.0)  # 最大20で正規化
-    
-    # ログ総数（正規化）
-    normalized_total_logs = min(total_logs / 50.0, 1.0)  # 最大50で正規化
-    
-    # cluster_features ベクトル（8次元）
-    cluster_features = [
-        round(correct_rate, 6),
-        round(normalized_response_time, 6),
-        round(normalized_path_length, 6),
-        round(normalized_vector_logic, 6),
-        round(normalized_vector_analysis, 6),
-        round(normalized_vector_creativity, 6),
-        round(normalized_glossary_count, 6),
-        round(normalized_total_logs, 6)
-    ]
-    
-    return cluster_features
+
+def parse_normalization(items):
+    """--norm KEY=VALUE の指定を正規化定数の辞書に変換"""
+    normalization = {}
+    for item in items or []:
+        key, sep, value = item.partition('=')
+        if not sep or key not in DEFAULT_NORMALIZATION:
+            raise ValueError(f'不正な正規化指定です: {item}（指定可能: {", ".join(DEFAULT_NORMALIZATION)}）')
+        normalization[key] = float(value)
+    return normalization
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='quiz_log_dummy.json の各セッションに cluster_features を追加')
+    parser.add_argument('--norm', action='append', metavar='KEY=VALUE',
+                        help='正規化定数を上書きする（例: --norm vector_min=-1 --norm vector_max=1）')
+    parser.add_argument('--segments', action='store_true',
+                        help='JSON を書き直さず、セッションログ（<名前>.segments）に差分を追記する')
+    return parser.parse_args()
 
 
-def main():
+def main(normalization=None, segments=False):
     print('quiz_log_dummy.json の各セッションから cluster_features を計算中...')
     
     script_dir = Path(__file__).parent
     project_root = script_dir.parent
     students_dir = project_root / 'students'
     quiz_log_path = students_dir / 'quiz_log_dummy.json'
+    if segments:
+        quiz_log_path = segment_log_dir(quiz_log_path)
     
     if not quiz_log_path.exists():
         print(f'[エラー] {quiz_log_path} が見つかりません')
         return
     
     # quiz_log_dummy.json を読み込む
-    with open(quiz_log_path, 'r', encoding='utf-8') as f:
-        quiz_data = json.load(f)
+    if segments:
+        quiz_data = load_session_log(quiz_log_path)
+    else:
+        with open(quiz_log_path, 'r', encoding='utf-8') as f:
+            quiz_data = json.load(f)
     
-    updated_count = 0
+    updated = []
     
     # vector_test_sessions.sessions を処理
     if 'vector_test_sessions' in quiz_data and 'sessions' in quiz_data['vector_test_sessions']:
         sessions = quiz_data['vector_test_sessions']['sessions']
+        targets = [i for i, session in enumerate(sessions) if isinstance(session.get('logs'), list)]
         
-        for session in sessions:
-            if 'logs' in session and isinstance(session['logs'], list):
-                # cluster_features を計算
-                cluster_features = compute_cluster_features(session['logs'])
-                session['cluster_features'] = cluster_features
-                updated_count += 1
+        # cluster_features を全セッション分まとめて計算
+        features = compute_cluster_features_batch([sessions[i]['logs'] for i in targets], normalization)
+        for i, cluster_features in zip(targets, features):
+            sessions[i]['cluster_features'] = cluster_features
+        updated = targets
+    updated_count = len(updated)
     
     # ファイルに保存
-    with open(quiz_log_path, 'w', encoding='utf-8') as f:
-        json.dump(quiz_data, f, ensure_ascii=False, indent=2)
+    if segments:
+        # 変更したセッションの cluster_features だけを追記する
+        sessions = quiz_data.get('vector_test_sessions', {}).get('sessions', [])
+        with SessionLog(quiz_log_path) as session_log:
+            for i in updated:
+                session_log.patch_session(i, {'cluster_features': sessions[i]['cluster_features']})
+    else:
+        with open(quiz_log_path, 'w', encoding='utf-8') as f:
+            json.dump(quiz_data, f, ensure_ascii=False, indent=2)
     
     print(f'[OK] {updated_count} 個のセッションに cluster_features を追加しました')
     print(f'[OK] {quiz_log_path} を更新しました')
@@ -134,5 +96,6 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    args = parse_args()
+    main(normalization=parse_normalization(args.norm), segments=args.segments)
 
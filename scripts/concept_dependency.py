@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+概念依存関係グラフ（concept_dependency.js の buildConceptDependencyGraph）を差分更新で保持するビルダー
+
+buildConceptDependencyGraph はリクエストのたびに全ログの conceptTags を辿り直している。
+ここでは概念を整数 ID に置き換え（インターン）、次の配列として保持する。
+
+- ノード: 概念ごとの出現回数・正答数・反応時間の合計と件数
+- エッジ: 同じログに現れた概念の組（JS と同じく文字列として小さい方を source）ごとの
+  共起回数と誤答ボーナス
+
+ノードとエッジは最初に現れた順に ID を振るので、出力の並びは JS の Map の挿入順と同じになる。
+反応時間の合計も np.add.at でログの順に足すため、avg_response_time は JS 版と同じ値になる。
+結果は formatGraphForJSON と同じ形で students/concept_graph/<データセット>.json に書き出す。
+
+JSON データセットは内容のハッシュが変わったときだけ作り直す。セッションログ
+（session_log.py の <名前>.segments）は pipeline_common.update_from_session_log で
+追記分の概念タグだけを足し込む。
+
+実行方法:
+python scripts/concept_dependency.py build students/quiz_log_dummy.json
+python scripts/concept_dependency.py update students/quiz_log_dummy.segments
+
+依存: numpy
+"""
+
+import argparse
+import json
+import math
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from index_manifest import file_sha256
+from pipeline_common import (BATCH_LOGS, PARTS, SessionLogDataset, _is_number, atomic_write_json,
+                             update_from_session_log)
+from stats_core import _js_or, _js_string, _js_truthy, extract_dashboard_logs
+
+GRAPH_DIR_NAME = 'concept_graph'
+ERROR_BONUS = 2
+
+
+def _concept_key(value):
+    # JS の Map のキーと同じく 1 / '1' / true を区別する
+    if isinstance(value, bool):
+        return ('boolean', value)
+    if _is_number(value):
+        return ('number', value)
+    if value is None or isinstance(value, str):
+        return (type(value).__name__, value)
+    return ('object', json.dumps(value, ensure_ascii=False, sort_keys=True))
+
+
+def _js_number(value):
+    if isinstance(value, bool):
+        return int(value)
+    if _is_number(value):
+        return value
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        try:
+            return float(value.strip()) if value.strip() else 0
+        except ValueError:
+            return math.nan
+    return math.nan
+
+
+def _js_less(a, b):
+    """JS の a < b（文字列同士は辞書順、それ以外は数値に変換して比較）"""
+    if isinstance(a, str) and isinstance(b, str):
+        return a < b
+    return _js_number(a) < _js_number(b)
+
+
+def is_correct(log):
+    """log.correct === true || (log.selected && log.selected.correct === true)"""
+    if log.get('correct') is True:
+        return True
+    selected = log.get('selected')
+    return _js_truthy(selected) and isinstance(selected, dict) and selected.get('correct') is True
+
+
+class ConceptDependency:
+    """概念の共起をインターンした ID の配列で持つ"""
+
+    def __init__(self):
+        self.concepts = []
+        self.concept_index = {}
+        self.total_count = np.zeros(0, dtype=np.int64)
+        self.correct_count = np.zeros(0, dtype=np.int64)
+        self.response_time_sum = np.zeros(0)
+        self.response_time_count = np.zeros(0, dtype=np.int64)
+        self.edge_keys = []
+        self.edge_index = {}
+        self.edge_source = np.zeros(0, dtype=np.int64)
+        self.edge_target = np.zeros(0, dtype=np.int64)
+        self.co_occurrence = np.zeros(0, dtype=np.int64)
+        self.error_bonus = np.zeros(0, dtype=np.int64)
+        self.logs = 0
+        self._new_edges = []
+
+    def _intern_concept(self, concept):
+        key = _concept_key(concept)
+        concept_id = self.concept_index.get(key)
+        if concept_id is None:
+            concept_id = self.concept_index[key] = len(self.concepts)
+            self.concepts.append(concept)
+        return concept_id
+
+    def _intern_edge(self, source, target):
+        # エッジは JS と同じく `${source}->${target}` の文字列で同一視する
+        key = f'{_js_string(self.concepts[source])}->{_js_string(self.concepts[target])}'
+        edge_id = self.edge_index.get(key)
+        if edge_id is None:
+            edge_id = self.edge_index[key] = len(self.edge_keys)
+            self.edge_keys.append(key)
+            self._new_edges.append((source, target))
+        return edge_id
+
+    def _grow(self):
+        missing = len(self.concepts) - len(self.total_count)
+        if missing > 0:
+            zeros = np.zeros(missing, dtype=np.int64)
+            self.total_count = np.concatenate([self.total_count, zeros])
+            self.correct_count = np.concatenate([self.correct_count, zeros])
+            self.response_time_sum = np.concatenate([self.response_time_sum, np.zeros(missing)])
+            self.response_time_count = np.concatenate([self.response_time_count, zeros])
+        if self._new_edges:
+            added = np.asarray(self._new_edges, dtype=np.int64).reshape(-1, 2)
+            zeros = np.zeros(len(added), dtype=np.int64)
+            self.edge_source = np.concatenate([self.edge_source, added[:, 0]])
+            self.edge_target = np.concatenate([self.edge_target, added[:, 1]])
+            self.co_occurrence = np.concatenate([self.co_occurrence, zeros])
+            self.error_bonus = np.concatenate([self.error_bonus, zeros])
+            self._new_edges = []
+
+    def add_logs(self, logs):
+        """ログを BATCH_LOGS 件ずつまとめて取り込む"""
+        batch = []
+        for log in logs:
+            batch.append(log)
+            if len(batch) >= BATCH_LOGS:
+                self._add_batch(batch)
+                batch = []
+        if batch:
+            self._add_batch(batch)
+
+    def add_sessions(self, sessions):
+        self.add_logs(log for session in sessions
+                      if isinstance(session, dict) and isinstance(session.get('logs'), list)
+                      for log in session['logs'])
+
+    def _add_batch(self, logs):
+        concept_ids, concept_correct, concept_times = [], [], []
+        edge_ids, edge_correct = [], []
+        for log in logs:
+            if not isinstance(log, dict):
+                continue
+            concepts = _js_or(log.get('conceptTags'), log.get('concept_tags'), [])
+            if not isinstance(concepts, list) or not concepts:
+                continue
+            correct = is_correct(log)
+            response_time = _js_or(log.get('response_time'), log.get('response_time_ms'),
+                                   log.get('reaction_time'), 0)
+            response_time = response_time if _is_number(response_time) else 0
+
+            ids = [self._intern_concept(concept) for concept in concepts]
+            concept_ids.extend(ids)
+            concept_correct.extend([correct] * len(ids))
+            concept_times.extend([response_time] * len(ids))
+            # 同じログ内の概念の組（無向。文字列として小さい方を source にする）
+            for i in range(len(ids)):
+                for j in range(i + 1, len(ids)):
+                    if _js_less(concepts[i], concepts[j]):
+                        edge_ids.append(self._intern_edge(ids[i], ids[j]))
+                    else:
+                        edge_ids.append(self._intern_edge(ids[j], ids[i]))
+                    edge_correct.append(correct)
+            self.logs += 1
+        self._grow()
+        if not concept_ids:
+            return
+
+        size = len(self.concepts)
+        ids = np.asarray(concept_ids, dtype=np.int64)
+        correct = np.asarray(concept_correct, dtype=bool)
+        times = np.asarray(concept_times, dtype=np.float64)
+        self.total_count += np.bincount(ids, minlength=size)
+        self.correct_count += np.bincount(ids[correct], minlength=size)
+        has_time = times > 0
+        # np.add.at は先頭から順に足すので、JS の reduce と同じ順序の合計になる
+        np.add.at(self.response_time_sum, ids[has_time], times[has_time])
+        self.response_time_count += np.bincount(ids[has_time], minlength=size)
+
+        if edge_ids:
+            edges = np.asarray(edge_ids, dtype=np.int64)
+            wrong = ~np.asarray(edge_correct, dtype=bool)
+            self.co_occurrence += np.bincount(edges, minlength=len(self.edge_keys))
+            self.error_bonus += ERROR_BONUS * np.bincount(edges[wrong], minlength=len(self.edge_keys))
+
+    def merge(self, other):
+        """他のグラフを後ろに足す"""
+        concept_map = np.array([self._intern_concept(c) for c in other.concepts], dtype=np.int64)
+        edge_map = np.array([self._intern_edge(concept_map[s], concept_map[t])
+                             for s, t in zip(other.edge_source, other.edge_target)], dtype=np.int64)
+        self._grow()
+        if len(concept_map):
+            self.total_count[concept_map] += other.total_count
+            self.correct_count[concept_map] += other.correct_count
+            self.response_time_sum[concept_map] += other.response_time_sum
+            self.response_time_count[concept_map] += other.response_time_count
+        if len(edge_map):
+            np.add.at(self.co_occurrence, edge_map, other.co_occurrence)
+            np.add.at(self.error_bonus, edge_map, other.error_bonus)
+        self.logs += other.logs
+        return self
+
+    def graph(self):
+        """buildConceptDependencyGraph と同じ形（nodes / edges）のグラフを返す"""
+        nodes = []
+        for i, concept in enumerate(self.concepts):
+            total = int(self.total_count[i])
+            count = int(self.response_time_count[i])
+            nodes.append({
+                'id': concept,
+                'label': concept,
+                'correct_rate': int(self.correct_count[i]) / total if total > 0 else 0,
+                'avg_response_time': float(self.response_time_sum[i]) / count if count > 0 else 0,
+                'total_count': total,
+                'correct_count': int(self.correct_count[i])
+            })
+        edges = []
+        for i in range(len(self.edge_keys)):
+            co_occurrence = int(self.co_occurrence[i])
+            error_bonus = int(self.error_bonus[i])
+            edges.append({
+                'source': self.concepts[self.edge_source[i]],
+                'target': self.concepts[self.edge_target[i]],
+                'co_occurrence': co_occurrence,
+                'error_bonus': error_bonus,
+                'weight': co_occurrence + error_bonus
+            })
+        return {'nodes': nodes, 'edges': edges}
+
+    def to_dict(self):
+        return {
+            'logs': self.logs,
+            'concepts': self.concepts,
+            'total_count': self.total_count.tolist(),
+            'correct_count': self.correct_count.tolist(),
+            'response_time_sum': self.response_time_sum.tolist(),
+            'response_time_count': self.response_time_count.tolist(),
+            'edges': {
+                'source': self.edge_source.tolist(),
+                'target': self.edge_target.tolist(),
+                'co_occurrence': self.co_occurrence.tolist(),
+                'error_bonus': self.error_bonus.tolist()
+            }
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        graph = cls()
+        graph.logs = d['logs']
+        graph.concepts = d['concepts']
+        graph.concept_index = {_concept_key(c): i for i, c in enumerate(graph.concepts)}
+        graph.total_count = np.asarray(d['total_count'], dtype=np.int64)
+        graph.correct_count = np.asarray(d['correct_count'], dtype=np.int64)
+        graph.response_time_sum = np.asarray(d['response_time_sum'], dtype=np.float64)
+        graph.response_time_count = np.asarray(d['response_time_count'], dtype=np.int64)
+        graph.edge_source = np.asarray(d['edges']['source'], dtype=np.int64)
+        graph.edge_target = np.asarray(d['edges']['target'], dtype=np.int64)
+        graph.co_occurrence = np.asarray(d['edges']['co_occurrence'], dtype=np.int64)
+        graph.error_bonus = np.asarray(d['edges']['error_bonus'], dtype=np.int64)
+        graph.edge_keys = [f'{_js_string(graph.concepts[s])}->{_js_string(graph.concepts[t])}'
+                           for s, t in zip(graph.edge_source, graph.edge_target)]
+        graph.edge_index = {key: i for i, key in enumerate(graph.edge_keys)}
+        return graph
+
+
+def format_graph_for_json(graph, generated_at=None):
+    """formatGraphForJSON と同じ形"""
+    if generated_at is None:
+        generated_at = datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+    return {
+        'type': 'concept_dependency_graph',
+        'version': '1.0',
+        'metadata': {
+            'generated_at': generated_at,
+            'node_count': len(graph['nodes']),
+            'edge_count': len(graph['edges'])
+        },
+        'nodes': graph['nodes'],
+        'edges': graph['edges']
+    }
+
+
+class DatasetConceptGraph(SessionLogDataset):
+    """1 データセット分のグラフ（logs 由来と sessions 由来を分けて持つ）"""
+
+    def new_part(self):
+        return ConceptDependency()
+
+    def to_dict(self):
+        return {
+            'source': self.source,
+            'state': self.state,
+            'graph': format_graph_for_json(self.combined().graph()),
+            'parts': {part: graph.to_dict() for part, graph in self.parts.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        dataset = cls(d['source'])
+        dataset.state = d.get('state', {})
+        dataset.parts = {part: ConceptDependency.from_dict(d['parts'][part]) for part in PARTS}
+        return dataset
+
+
+def graph_path_for(source_path):
+    """students/<名前>.json / .segments → students/concept_graph/<名前>.json"""
+    source_path = Path(source_path)
+    name = source_path.stem if source_path.suffix in ('.json', '.segments') else source_path.name
+    return source_path.parent / GRAPH_DIR_NAME / f'{name}.json'
+
+
+def load_concept_graph(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return DatasetConceptGraph.from_dict(json.load(f))
+
+
+def save_concept_graph(dataset, path):
+    atomic_write_json(path, dataset.to_dict())
+
+
+def build_from_json(json_path):
+    """ダッシュボードと同じ規則でログを取り出してグラフを作る"""
+    json_path = Path(json_path)
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    dataset = DatasetConceptGraph(json_path.name)
+    dataset.parts['logs'].add_logs(extract_dashboard_logs(data))
+    return dataset
+
+
+def command_build(source, output=None, force=False):
+    source = Path(source)
+    output = Path(output) if output else graph_path_for(source)
+    digest = file_sha256(source)
+    if not force and output.exists():
+        existing = load_concept_graph(output)
+        if existing.state.get('sha256') == digest:
+            print(f'[OK] {output} は最新です')
+            return existing
+    dataset = build_from_json(source)
+    dataset.state['sha256'] = digest
+    save_concept_graph(dataset, output)
+    graph = dataset.parts['logs']
+    print(f'[OK] {output} を作成しました（概念タグ付きログ: {graph.logs} 件 / 概念: {len(graph.concepts)}'
+          f' / エッジ: {len(graph.edge_keys)}）')
+    return dataset
+
+
+def command_update(source, output=None):
+    source = Path(source)
+    output = Path(output) if output else graph_path_for(source)
+    dataset = load_concept_graph(output) if output.exists() else DatasetConceptGraph(source.name)
+    applied = update_from_session_log(source, dataset)
+    save_concept_graph(dataset, output)
+    print(f'[OK] {output} を更新しました（取り込んだレコード: {applied}）')
+    return dataset
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='概念依存関係グラフの作成・差分更新')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = sub.add_parser('build', help='JSON データセットからグラフを作る')
+    build_parser.add_argument('source')
+    build_parser.add_argument('-o', '--output')
+    build_parser.add_argument('--force', action='store_true', help='内容が同じでも作り直す')
+
+    update_parser = sub.add_parser('update', help='セッションログの追記分を取り込む')
+    update_parser.add_argument('source')
+    update_parser.add_argument('-o', '--output')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.command == 'build':
+        command_build(args.source, args.output, args.force)
+    else:
+        command_update(args.source, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+反応時間に ex-Gaussian 分布（正規分布 N(μ, σ²) + 指数分布 Exp(1/τ)）を学習者ごと・問題ごとに一括で当てはめるスクリプト
+
+analysis.js の runRTFitting は 1 人分ずつ平均と分散から指数分布・正規分布の値を出しており、
+/analyze/reaction-time はリクエストのたびに Julia を起動している。
+ここではデータセット内の全グループをまとめて次の手順で推定し、
+students/rt_fits/<データセット>.json に書き出す。
+
+1. モーメント法の初期値: 平均 m・標準偏差 s・歪度 γ から
+   τ = s(γ/2)^(1/3), μ = m - τ, σ² = s²(1 - (γ/2)^(2/3))（γ は GAMMA_RANGE に丸める）
+2. 最尤推定: 対数尤度の勾配を解析的に、ヘッセ行列を勾配の差分で求め、
+   Levenberg–Marquardt 法で全グループを同時に更新する（グループごとの和は np.bincount）
+
+グループは学習者（log.user_id || log.student_id、なければセッションの session_id、どちらもなければ 'unknown'）
+と questionId。反応時間は runRTFitting と同じく response_time のうち正の有限値を使う。
+サンプル数が MIN_MLE_SAMPLES 未満のグループはモーメント法の値のみ（method: 'moments'）。
+
+各グループの結果には反応時間（昇順）の SHA-256 を付けておき、
+再実行時は値が変わっていないグループの結果をそのまま使う。
+
+実行方法:
+python scripts/exgauss_fit.py                 # students 内の全データセット
+python scripts/exgauss_fit.py students/quiz_log_dummy.json --workers 4
+
+依存: numpy
+"""
+
+import argparse
+import hashlib
+import json
+import math
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from factor_analysis import _student_id
+from index_builder import list_dataset_files, resolve_workers
+from pipeline_common import atomic_write_json
+
+FITS_DIR_NAME = 'rt_fits'
+MIN_SAMPLES = 2
+MIN_MLE_SAMPLES = 5
+GAMMA_RANGE = (0.01, 1.9)
+MAX_ITER = 100
+MAX_STEP = 1.0
+# 標準化した尺度での log σ・log τ の範囲
+LOG_SCALE_RANGE = (-10.0, 5.0)
+TOLERANCE = 1e-9
+DIFF_STEP = 1e-5
+SHARD_SAMPLES = 200000
+
+LOG_SQRT_2PI = 0.5 * math.log(2 * math.pi)
+# erfc の Chebyshev 近似（Numerical Recipes, 相対誤差 1.2e-7）の係数
+_ERFC_COEFFS = (-1.26551223, 1.00002368, 0.37409196, 0.09678418, -0.18628806,
+                0.27886807, -1.13520398, 1.48851587, -0.82215223, 0.17087277)
+
+
+def _log_erfc_positive(x):
+    """x >= 0 での log erfc(x)（x が大きくてもアンダーフローしない）"""
+    t = 1.0 / (1.0 + 0.5 * x)
+    poly = np.zeros_like(x)
+    for coeff in reversed(_ERFC_COEFFS):
+        poly = coeff + t * poly
+    return np.log(t) - x * x + poly
+
+
+def log_ndtr(z):
+    """標準正規分布の累積分布関数の対数 log Φ(z)"""
+    x = -z / math.sqrt(2)
+    positive = x >= 0
+    result = np.empty_like(z)
+    # Φ(z) = erfc(x) / 2。x < 0 では erfc(x) = 2 - erfc(-x)
+    result[positive] = _log_erfc_positive(x[positive]) - math.log(2)
+    result[~positive] = np.log1p(-0.5 * np.exp(_log_erfc_positive(-x[~positive])))
+    return result
+
+
+def grouped_moments(values, groups, n_groups):
+    """グループごとのサンプル数・平均・標準偏差（不偏）・歪度"""
+    counts = np.bincount(groups, minlength=n_groups).astype(np.float64)
+    means = np.bincount(groups, weights=values, minlength=n_groups) / np.maximum(counts, 1)
+    centered = values - means[groups]
+    m2 = np.bincount(groups, weights=centered ** 2, minlength=n_groups) / np.maximum(counts, 1)
+    m3 = np.bincount(groups, weights=centered ** 3, minlength=n_groups) / np.maximum(counts, 1)
+    stds = np.sqrt(m2 * counts / np.maximum(counts - 1, 1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        skews = np.where(m2 > 0, m3 / m2 ** 1.5, 0.0)
+    return counts, means, stds, skews
+
+
+def moment_seeds(means, stds, skews):
+    """モーメント法による μ, σ, τ"""
+    gamma = np.clip(skews, *GAMMA_RANGE)
+    ratio = gamma / 2
+    tau = stds * np.cbrt(ratio)
+    mu = means - tau
+    sigma = stds * np.sqrt(1 - ratio ** (2 / 3))
+    return mu, sigma, tau
+
+
+def exgauss_loglik(values, groups, n_groups, theta, with_grad=True):
+    """
+    グループごとの平均対数尤度（と θ = (μ, log σ, log τ) についての勾配）
+
+    ℓ = -log τ + (μ - x)/τ + σ²/(2τ²) + log Φ(z),  z = (x - μ)/σ - σ/τ
+    """
+    mu, log_sigma, log_tau = theta[:, 0], theta[:, 1], theta[:, 2]
+    m, s, t = mu[groups], np.exp(log_sigma)[groups], np.exp(log_tau)[groups]
+    counts = np.bincount(groups, minlength=n_groups)
+    with np.errstate(all='ignore'):
+        z = (values - m) / s - s / t
+        log_cdf = log_ndtr(z)
+        point = -np.log(t) + (m - values) / t + s * s / (2 * t * t) + log_cdf
+        loglik = np.bincount(groups, weights=point, minlength=n_groups) / counts
+        if not with_grad:
+            return loglik, None
+
+        # 逆ミルズ比 φ(z)/Φ(z)。θ は log σ・log τ なので勾配に σ・τ を掛ける
+        mills = np.exp(-0.5 * z * z - LOG_SQRT_2PI - log_cdf)
+        d_mu = 1 / t - mills / s
+        d_sigma = s * s / (t * t) - mills * ((values - m) / s + s / t)
+        d_tau = -1 - (m - values) / t - s * s / (t * t) + mills * s / t
+        grad = np.stack([
+            np.bincount(groups, weights=d_mu, minlength=n_groups),
+            np.bincount(groups, weights=d_sigma, minlength=n_groups),
+            np.bincount(groups, weights=d_tau, minlength=n_groups)
+        ], axis=1) / counts[:, None]
+    return loglik, grad
+
+
+def refine_mle(values, groups, n_groups, theta):
+    """全グループの θ を Levenberg–Marquardt 法で同時に更新する"""
+    damping = np.full(n_groups, 1e-3)
+    loglik, grad = exgauss_loglik(values, groups, n_groups, theta)
+    active = np.ones(n_groups, dtype=bool)
+    iterations = np.zeros(n_groups, dtype=np.int64)
+    eye = np.eye(3)
+    for _ in range(MAX_ITER):
+        if not active.any():
+            break
+        ids = np.flatnonzero(active)
+        mask = active[groups]
+        sub_values = values[mask]
+        # 有効なグループだけを 0..len(ids)-1 に詰め直す
+        remap = np.full(n_groups, -1, dtype=np.int64)
+        remap[ids] = np.arange(len(ids))
+        sub_groups = remap[groups[mask]]
+        sub_theta = theta[ids]
+
+        # ヘッセ行列は勾配の前進差分（対称化する）
+        hessian = np.empty((len(ids), 3, 3))
+        for k in range(3):
+            shifted = sub_theta.copy()
+            shifted[:, k] += DIFF_STEP
+            _, shifted_grad = exgauss_loglik(sub_values, sub_groups, len(ids), shifted)
+            hessian[:, :, k] = (shifted_grad - grad[ids]) / DIFF_STEP
+        hessian = (hessian + hessian.transpose(0, 2, 1)) / 2
+
+        # ヘッセ行列が正定値でない所でも解けるよう減衰項を足し、1 回の移動量も MAX_STEP までにする
+        system = -hessian + (damping[ids] + np.maximum(0, np.linalg.eigvalsh(hessian).max(axis=1)))[:, None, None] * eye
+        step = np.linalg.solve(system, grad[ids][:, :, None])[:, :, 0]
+        step *= np.minimum(1, MAX_STEP / np.maximum(np.abs(step).max(axis=1), 1e-300))[:, None]
+        candidate = sub_theta + step
+        candidate[:, 1:] = np.clip(candidate[:, 1:], *LOG_SCALE_RANGE)
+        new_loglik, new_grad = exgauss_loglik(sub_values, sub_groups, len(ids), candidate)
+
+        improved = np.isfinite(new_loglik) & (new_loglik >= loglik[ids])
+        accepted = ids[improved]
+        theta[accepted] = candidate[improved]
+        gain = new_loglik[improved] - loglik[accepted]
+        loglik[accepted] = new_loglik[improved]
+        grad[accepted] = new_grad[improved]
+        damping[accepted] /= 3
+        damping[ids[~improved]] *= 4
+        iterations[ids] += 1
+
+        converged = np.zeros(len(ids), dtype=bool)
+        converged[improved] = (np.abs(step[improved]).max(axis=1) < TOLERANCE) | (gain < TOLERANCE * 1e-3)
+        converged |= damping[ids] > 1e12
+        active[ids[converged]] = False
+    return theta, loglik, iterations, ~active
+
+
+def fit_samples(samples):
+    """
+    サンプルの配列のリストに ex-Gaussian を当てはめる（プロセスプールで実行される）
+
+    Returns:
+        list: 各グループの {n, mu, sigma, tau, lambda, loglik, method, n_iter}（サンプル不足は None）
+    """
+    sizes = np.array([len(s) for s in samples], dtype=np.int64)
+    if not len(samples) or not sizes.sum():
+        return [None] * len(samples)
+    values = np.concatenate([np.asarray(s, dtype=np.float64) for s in samples])
+    groups = np.repeat(np.arange(len(samples)), sizes)
+    counts, means, stds, skews = grouped_moments(values, groups, len(samples))
+    mu, sigma, tau = moment_seeds(means, stds, skews)
+
+    results = [None] * len(samples)
+    for i in np.flatnonzero((counts >= MIN_SAMPLES) & ~((counts >= MIN_MLE_SAMPLES) & (stds > 0))):
+        results[i] = _result(counts[i], mu[i], sigma[i], tau[i], None, 'moments', 0)
+
+    fit = np.flatnonzero((counts >= MIN_MLE_SAMPLES) & (stds > 0))
+    if len(fit):
+        # 平均 0・標準偏差 1 に揃えてから推定し、最後に元の尺度へ戻す
+        remap = np.full(len(samples), -1, dtype=np.int64)
+        remap[fit] = np.arange(len(fit))
+        mask = remap[groups] >= 0
+        sub_groups = remap[groups[mask]]
+        center, scale = means[fit], stds[fit]
+        scaled = (values[mask] - center[sub_groups]) / scale[sub_groups]
+        theta = np.stack([(mu[fit] - center) / scale,
+                          np.log(np.maximum(sigma[fit] / scale, 1e-3)),
+                          np.log(np.maximum(tau[fit] / scale, 1e-3))], axis=1)
+        theta, loglik, iterations, converged = refine_mle(scaled, sub_groups, len(fit), theta)
+        for j, i in enumerate(fit):
+            results[i] = _result(
+                counts[i], center[j] + scale[j] * theta[j, 0], scale[j] * math.exp(theta[j, 1]),
+                scale[j] * math.exp(theta[j, 2]), counts[i] * (loglik[j] - math.log(scale[j])),
+                'mle' if converged[j] else 'mle_unconverged', iterations[j])
+    return results
+
+
+def _result(n, mu, sigma, tau, loglik, method, n_iter):
+    return {
+        'n': int(n),
+        'mu': round(float(mu), 6),
+        'sigma': round(float(sigma), 6),
+        'tau': round(float(tau), 6),
+        'lambda': round(1 / float(tau), 6) if tau > 0 else None,
+        'loglik': round(float(loglik), 6) if loglik is not None else None,
+        'method': method,
+        'n_iter': int(n_iter)
+    }
+
+
+def samples_hash(values):
+    """反応時間の集合（順序によらない）の SHA-256"""
+    return hashlib.sha256(np.sort(np.asarray(values, dtype=np.float64)).tobytes()).hexdigest()
+
+
+def _valid_time(log):
+    value = log.get('response_time')
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0 and math.isfinite(value):
+        return float(value)
+    return None
+
+
+def collect_groups(data):
+    """データセットから学習者別・問題別の反応時間を集める"""
+    students, questions = {}, {}
+
+    def add(log, session_id=None):
+        if not isinstance(log, dict):
+            return
+        value = _valid_time(log)
+        if value is None:
+            return
+        students.setdefault(str(_student_id(log, session_id)), []).append(value)
+        question = log.get('questionId')
+        if isinstance(question, str):
+            questions.setdefault(question, []).append(value)
+
+    if isinstance(data, list):
+        for log in data:
+            add(log)
+        return students, questions
+    if not isinstance(data, dict):
+        return students, questions
+    if isinstance(data.get('logs'), list):
+        for log in data['logs']:
+            add(log)
+    session_lists = [data.get('sessions')]
+    if isinstance(data.get('vector_test_sessions'), dict):
+        session_lists.append(data['vector_test_sessions'].get('sessions'))
+    for sessions in session_lists:
+        if not isinstance(sessions, list):
+            continue
+        for session in sessions:
+            if isinstance(session, dict) and isinstance(session.get('logs'), list):
+                for log in session['logs']:
+                    add(log, session.get('session_id'))
+    return students, questions
+
+
+def _shards(items, shard_samples=SHARD_SAMPLES):
+    """サンプル数の合計が shard_samples 前後になるように分ける"""
+    shard, total = [], 0
+    for item in items:
+        shard.append(item)
+        total += len(item[1])
+        if total >= shard_samples:
+            yield shard
+            shard, total = [], 0
+    if shard:
+        yield shard
+
+
+def fit_groups(groups, previous=None, workers=1):
+    """
+    {キー: 反応時間のリスト} を当てはめる
+
+    previous（前回の結果）に同じハッシュのエントリがあればそれを使う。
+
+    Returns:
+        tuple: ({キー: 結果}, 新たに推定したグループ数)
+    """
+    previous = previous or {}
+    results, pending = {}, []
+    for key, values in groups.items():
+        digest = samples_hash(values)
+        cached = previous.get(key)
+        if cached and cached.get('hash') == digest:
+            results[key] = cached
+        else:
+            pending.append((key, values, digest))
+
+    shards = list(_shards(pending))
+    if workers > 1 and len(shards) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(shards))) as executor:
+            fitted = list(executor.map(fit_samples, [[item[1] for item in shard] for shard in shards]))
+    else:
+        fitted = [fit_samples([item[1] for item in shard]) for shard in shards]
+    refitted = 0
+    for shard, shard_results in zip(shards, fitted):
+        for (key, _, digest), result in zip(shard, shard_results):
+            if result is not None:
+                results[key] = dict(result, hash=digest)
+                refitted += 1
+    return {key: results[key] for key in groups if key in results}, refitted
+
+
+def fits_path_for(json_path):
+    json_path = Path(json_path)
+    return json_path.parent / FITS_DIR_NAME / json_path.name
+
+
+def build_rt_fits(json_file, data, previous=None, workers=1):
+    """
+    サイドカーの内容（学習者別・問題別の当てはめ結果）を作成
+
+    Returns:
+        tuple: (サイドカーの内容, 新たに推定したグループ数)
+    """
+    previous = previous or {}
+    students, questions = collect_groups(data)
+    student_fits, fitted_students = fit_groups(students, previous.get('students'), workers)
+    question_fits, fitted_questions = fit_groups(questions, previous.get('questions'), workers)
+    sidecar = {
+        'file': json_file,
+        'model': 'ex_gaussian',
+        'students': student_fits,
+        'questions': question_fits
+    }
+    return sidecar, fitted_students + fitted_questions
+
+
+def fit_dataset(json_path, workers=1, force=False):
+    """データセット 1 件を当てはめて students/rt_fits/<ファイル名> に書き出す"""
+    json_path = Path(json_path)
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    output = fits_path_for(json_path)
+    previous = {}
+    if output.exists() and not force:
+        with open(output, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+    sidecar, fitted = build_rt_fits(json_path.name, data, previous, workers)
+
+    atomic_write_json(output, sidecar, indent=2)
+    return output, sidecar, fitted
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='反応時間に ex-Gaussian 分布を学習者別・問題別に当てはめる')
+    parser.add_argument('files', nargs='*', help='対象の JSON（省略時は students 内の全データセット）')
+    parser.add_argument('--workers', type=int, default=1, help='プロセス数（0 で CPU コア数、既定は 1）')
+    parser.add_argument('--force', action='store_true', help='前回の結果を使わずにすべて推定し直す')
+    return parser.parse_args()
+
+
+def main(files=None, workers=1, force=False):
+    students_dir = Path(__file__).parent.parent / 'students'
+    paths = [Path(f) for f in files] if files else [students_dir / f for f in list_dataset_files(students_dir)]
+    workers = resolve_workers(workers)
+    for json_path in paths:
+        try:
+            output, sidecar, fitted = fit_dataset(json_path, workers, force)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f'[エラー] {json_path}: {e}')
+            continue
+        groups = len(sidecar['students']) + len(sidecar['questions'])
+        print(f'[OK] {output}（学習者: {len(sidecar["students"])} / 問題: {len(sidecar["questions"])}'
+              f' / 再推定: {fitted} / 前回の結果を使用: {groups - fitted}）')
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    main(args.files, workers=args.workers, force=args.force)
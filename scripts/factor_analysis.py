@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+学習者 × 問題の正誤行列に因子分析をかけ、因子負荷量と因子スコアをサイドカーに書き出すスクリプト
+
+analysis/factor_analysis.js（window.FactorAnalysis.run）はブラウザ上で共分散行列を作り、
+Jacobi 法で固有値を求めている。学習者が数万人・問題が数百問になるとタブが固まるので、
+ここでは事前に（オフラインで）計算しておく。
+
+- 行列: 行が学習者（log.user_id || log.student_id、なければセッションの session_id、どちらもなければ 'unknown'）、
+  列が questionId、値は正誤（correct === true なら 1、それ以外で correct がある場合は 0、同じ組は平均）。
+  解いていない問題は欠測として非ゼロ要素に持たない（疎行列の COO 配列）
+- 標準化: 問題ごとに回答者の平均を引き、欠測を平均で埋めた列の標準偏差で割る
+  （factor_analysis.js の平均補完 + standardize と同じ。欠測は 0 のまま疎に保てる）
+- 固有値: 相関行列 R = ZᵀZ / (n - 1) の上位固有値を乱択部分空間反復（ランダム射影 + べき乗 + QR）で求める。
+  問題数が GRAM_MAX_ITEMS 以下なら ZᵀZ を学習者 CHUNK_ROWS 行ずつの密行列積で作り、
+  それより多ければ Z と Zᵀ の積を np.bincount で直接計算する
+- 因子数: Kaiser 基準（固有値 > 1、上限 --max-factors）
+- 因子抽出: 主因子法（R の対角を共通性に置き換えて固有分解し、共通性が収束するまで反復）
+- 回転: varimax。因子スコアは factor_analysis.js と同じく標準化データと負荷量の積
+
+出力（students/factors/<ファイル名>）は FactorAnalysis.run の戻り値と同じキー
+（eigenvalues / num_factors / loadings / factor_scores）に、共通性などのメタ情報を加えたもの。
+
+実行方法:
+python scripts/factor_analysis.py                    # students 内の全データセット
+python scripts/factor_analysis.py students/quiz_log_dummy.json --max-factors 5
+
+依存: numpy
+"""
+
+import argparse
+import json
+from array import array
+from pathlib import Path
+
+import numpy as np
+
+from cluster_kmeans import positive_int
+from index_builder import list_dataset_files
+from pipeline_common import atomic_write_json
+
+FACTORS_DIR_NAME = 'factors'
+DEFAULT_MAX_FACTORS = 10
+GRAM_MAX_ITEMS = 2000
+CHUNK_ROWS = 8192
+OVERSAMPLE = 20
+POWER_ITERATIONS = 4
+PAF_MAX_ITER = 100
+PAF_TOLERANCE = 1e-4
+COMMUNALITY_RANGE = (0.005, 0.995)
+
+
+class ResponseMatrix:
+    """学習者 × 問題の疎行列（行順に並んだ COO 配列）"""
+
+    def __init__(self, students, items, rows, cols, values):
+        self.students = students
+        self.items = items
+        self.rows = rows
+        self.cols = cols
+        self.values = values
+
+    @property
+    def shape(self):
+        return len(self.students), len(self.items)
+
+    @property
+    def nnz(self):
+        return len(self.values)
+
+    @classmethod
+    def from_triplets(cls, students, items, rows, cols, values):
+        """(行, 列, 値) の並びから作る（同じ組は平均する）"""
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        keys = rows * max(len(items), 1) + cols
+        unique, inverse = np.unique(keys, return_inverse=True)
+        sums = np.bincount(inverse, weights=values, minlength=len(unique))
+        counts = np.bincount(inverse, minlength=len(unique))
+        unique_rows, unique_cols = np.divmod(unique, max(len(items), 1))
+        return cls(students, items, unique_rows.astype(np.int32), unique_cols.astype(np.int32),
+                   sums / counts)
+
+
+def _student_id(log, session_id):
+    return log.get('user_id') or log.get('student_id') or session_id or 'unknown'
+
+
+def build_response_matrix(data):
+    """データセットから正誤の疎行列を作る"""
+    students, items = {}, {}
+    rows, cols, values = array('i'), array('i'), array('d')
+
+    def add(log, session_id=None):
+        if not isinstance(log, dict) or log.get('correct') is None:
+            return
+        item = log.get('questionId')
+        if not isinstance(item, str):
+            return
+        student = str(_student_id(log, session_id))
+        rows.append(students.setdefault(student, len(students)))
+        cols.append(items.setdefault(item, len(items)))
+        values.append(1.0 if log['correct'] is True else 0.0)
+
+    if isinstance(data, list):
+        for log in data:
+            add(log)
+    elif isinstance(data, dict):
+        if isinstance(data.get('logs'), list):
+            for log in data['logs']:
+                add(log)
+        session_lists = [data.get('sessions')]
+        if isinstance(data.get('vector_test_sessions'), dict):
+            session_lists.append(data['vector_test_sessions'].get('sessions'))
+        for sessions in session_lists:
+            if not isinstance(sessions, list):
+                continue
+            for session in sessions:
+                if isinstance(session, dict) and isinstance(session.get('logs'), list):
+                    for log in session['logs']:
+                        add(log, session.get('session_id'))
+
+    return ResponseMatrix.from_triplets(
+        list(students), list(items),
+        np.frombuffer(rows, dtype=np.int32), np.frombuffer(cols, dtype=np.int32),
+        np.frombuffer(values, dtype=np.float64))
+
+
+def standardize(matrix):
+    """
+    欠測を列平均で埋めたときの平均 0・分散 1 に標準化した値（欠測は 0 のまま）
+
+    Returns:
+        numpy.ndarray: 非ゼロ要素ごとの標準化した値
+    """
+    n, m = matrix.shape
+    counts = np.bincount(matrix.cols, minlength=m)
+    means = np.bincount(matrix.cols, weights=matrix.values, minlength=m) / np.maximum(counts, 1)
+    centered = matrix.values - means[matrix.cols]
+    # 平均で埋めた要素は偏差 0 なので、分散は観測値の偏差平方和を n で割ったもの
+    stds = np.sqrt(np.bincount(matrix.cols, weights=centered ** 2, minlength=m) / n)
+    stds[stds == 0] = 1
+    return centered / stds[matrix.cols]
+
+
+class CorrelationOperator:
+    """R = ZᵀZ / (n - 1) に対角の置き換えを加えた対称作用素"""
+
+    def __init__(self, matrix, z_values):
+        self.matrix = matrix
+        self.z_values = z_values
+        n, m = matrix.shape
+        self.scale = 1 / max(n - 1, 1)
+        self.gram = self._gram() if m <= GRAM_MAX_ITEMS else None
+        self.diagonal = np.bincount(matrix.cols, weights=z_values ** 2, minlength=m) * self.scale
+        self.diagonal_shift = np.zeros(m)
+
+    def _gram(self):
+        """ZᵀZ を学習者 CHUNK_ROWS 行ずつの密行列積で足し合わせる"""
+        n, m = self.matrix.shape
+        gram = np.zeros((m, m))
+        bounds = np.searchsorted(self.matrix.rows, np.arange(0, n + CHUNK_ROWS, CHUNK_ROWS))
+        for start_row, (lo, hi) in zip(range(0, n, CHUNK_ROWS), zip(bounds[:-1], bounds[1:])):
+            chunk = np.zeros((min(CHUNK_ROWS, n - start_row), m))
+            chunk[self.matrix.rows[lo:hi] - start_row, self.matrix.cols[lo:hi]] = self.z_values[lo:hi]
+            gram += chunk.T @ chunk
+        return gram
+
+    def times(self, vectors):
+        """Z の列空間のベクトル（m × l）に作用させる"""
+        if self.gram is not None:
+            result = self.gram @ vectors * self.scale
+        else:
+            result = self.z_transpose_times(self.z_times(vectors)) * self.scale
+        return result + self.diagonal_shift[:, None] * vectors
+
+    def z_times(self, vectors):
+        n, _ = self.matrix.shape
+        rows, cols, z = self.matrix.rows, self.matrix.cols, self.z_values
+        return np.stack([np.bincount(rows, weights=z * vectors[cols, j], minlength=n)
+                         for j in range(vectors.shape[1])], axis=1)
+
+    def z_transpose_times(self, vectors):
+        _, m = self.matrix.shape
+        rows, cols, z = self.matrix.rows, self.matrix.cols, self.z_values
+        return np.stack([np.bincount(cols, weights=z * vectors[rows, j], minlength=m)
+                         for j in range(vectors.shape[1])], axis=1)
+
+
+def top_eigen(operator, size, k, rng, start=None, iterations=POWER_ITERATIONS):
+    """
+    乱択部分空間反復で対称作用素の上位 k 個の固有値・固有ベクトルを求める
+
+    start（前回の部分空間）を渡すと、そこから反復を続ける。
+
+    Returns:
+        tuple: (固有値（降順）, 固有ベクトル（size × k）, 次回の start)
+    """
+    width = min(size, k + OVERSAMPLE)
+    basis = start if start is not None else rng.standard_normal((size, width))
+    basis, _ = np.linalg.qr(operator.times(basis))
+    for _ in range(iterations):
+        basis, _ = np.linalg.qr(operator.times(basis))
+    projected = basis.T @ operator.times(basis)
+    eigenvalues, eigenvectors = np.linalg.eigh((projected + projected.T) / 2)
+    order = np.argsort(eigenvalues)[::-1]
+    eigenvectors = basis @ eigenvectors[:, order]
+    return eigenvalues[order][:k], eigenvectors[:, :k], eigenvectors
+
+
+def principal_axis(operator, size, k, rng):
+    """主因子法（共通性が PAF_TOLERANCE 以内で変わらなくなるまで反復）"""
+    eigenvalues, eigenvectors, start = top_eigen(operator, size, k, rng)
+    loadings = eigenvectors * np.sqrt(np.maximum(eigenvalues, 0))
+    communalities = np.clip((loadings ** 2).sum(axis=1), *COMMUNALITY_RANGE)
+    iterations = 0
+    for iterations in range(1, PAF_MAX_ITER + 1):
+        operator.diagonal_shift = communalities - operator.diagonal
+        eigenvalues, eigenvectors, start = top_eigen(operator, size, k, rng, start=start, iterations=1)
+        loadings = eigenvectors * np.sqrt(np.maximum(eigenvalues, 0))
+        updated = np.clip((loadings ** 2).sum(axis=1), *COMMUNALITY_RANGE)
+        change = np.abs(updated - communalities).max()
+        communalities = updated
+        if change < PAF_TOLERANCE:
+            break
+    operator.diagonal_shift = np.zeros(size)
+    return loadings, communalities, iterations
+
+
+def varimax(loadings, max_iter=100, tolerance=1e-6):
+    """varimax 回転"""
+    p, k = loadings.shape
+    if k < 2:
+        return loadings
+    rotation = np.eye(k)
+    criterion = 0
+    for _ in range(max_iter):
+        rotated = loadings @ rotation
+        u, s, vt = np.linalg.svd(loadings.T @ (rotated ** 3 - rotated * (rotated ** 2).sum(axis=0) / p))
+        rotation = u @ vt
+        previous, criterion = criterion, s.sum()
+        if previous and criterion < previous * (1 + tolerance):
+            break
+    return loadings @ rotation
+
+
+def factor_analysis(matrix, max_factors=DEFAULT_MAX_FACTORS, seed=0):
+    """
+    因子分析を実行
+
+    Returns:
+        dict: FactorAnalysis.run と同じキー（eigenvalues / num_factors / loadings / factor_scores）と
+              items / communalities / paf_iterations など
+    """
+    n, m = matrix.shape
+    result = {
+        'method': 'principal_axis_varimax',
+        'n_students': n,
+        'n_items': m,
+        'nnz': matrix.nnz,
+        'density': round(matrix.nnz / (n * m), 6) if n and m else 0,
+        'items': matrix.items,
+        'eigenvalues': [],
+        'num_factors': 0,
+        'loadings': {},
+        'factor_scores': {}
+    }
+    if n < 2 or m < 2:
+        return result
+
+    rng = np.random.default_rng(seed)
+    z_values = standardize(matrix)
+    operator = CorrelationOperator(matrix, z_values)
+
+    # Kaiser 基準には上限 + 1 個の固有値があれば足りる
+    eigenvalues, _, _ = top_eigen(operator, m, min(m, max_factors + 1), rng)
+    num_factors = int(min((eigenvalues > 1).sum(), max_factors))
+    result['eigenvalues'] = [round(float(v), 6) for v in eigenvalues]
+    result['num_factors'] = num_factors
+    if num_factors == 0:
+        return result
+
+    loadings, communalities, iterations = principal_axis(operator, m, num_factors, rng)
+    loadings = varimax(loadings)
+    # 向きをそろえる（各因子の負荷量の合計が正になるように）
+    loadings *= np.where(loadings.sum(axis=0) < 0, -1, 1)
+    scores = operator.z_times(loadings)
+
+    factor_names = [f'F{j + 1}' for j in range(num_factors)]
+    result['paf_iterations'] = iterations
+    result['communalities'] = {item: round(float(h), 6) for item, h in zip(matrix.items, communalities)}
+    result['loadings'] = {item: [round(float(v), 6) for v in row] for item, row in zip(matrix.items, loadings)}
+    result['factor_scores'] = {student: {name: round(float(v), 6) for name, v in zip(factor_names, row)}
+                               for student, row in zip(matrix.students, scores)}
+    return result
+
+
+def build_factor_sidecar(json_file, data, max_factors=DEFAULT_MAX_FACTORS, seed=0):
+    """サイドカーの内容（ファイル名と因子分析の結果）を作成"""
+    return dict(file=json_file, **factor_analysis(build_response_matrix(data), max_factors, seed))
+
+
+def factors_path_for(json_path):
+    json_path = Path(json_path)
+    return json_path.parent / FACTORS_DIR_NAME / json_path.name
+
+
+def write_factor_sidecar(json_path, max_factors=DEFAULT_MAX_FACTORS, seed=0):
+    """students/factors/<ファイル名> に結果を書き出す（一時ファイル経由で置き換え）"""
+    json_path = Path(json_path)
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    result = build_factor_sidecar(json_path.name, data, max_factors, seed)
+
+    output = atomic_write_json(factors_path_for(json_path), result)
+    return output, result
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='学習者 × 問題の正誤行列を因子分析して students/factors/ に書き出す')
+    parser.add_argument('files', nargs='*', help='対象の JSON（省略時は students 内の全データセット）')
+    parser.add_argument('--max-factors', type=positive_int, default=DEFAULT_MAX_FACTORS,
+                        help=f'因子数の上限（既定 {DEFAULT_MAX_FACTORS}）')
+    parser.add_argument('--seed', type=int, default=0, help='乱択部分空間反復の乱数シード')
+    return parser.parse_args()
+
+
+def main(files=None, max_factors=DEFAULT_MAX_FACTORS, seed=0):
+    students_dir = Path(__file__).parent.parent / 'students'
+    paths = [Path(f) for f in files] if files else [students_dir / f for f in list_dataset_files(students_dir)]
+    for json_path in paths:
+        try:
+            output, result = write_factor_sidecar(json_path, max_factors, seed)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f'[エラー] {json_path}: {e}')
+            continue
+        print(f'[OK] {output}（学習者: {result["n_students"]} / 問題: {result["n_items"]}'
+              f' / 密度: {result["density"]:.3f} / 因子数: {result["num_factors"]}）')
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    main(args.files, max_factors=args.max_factors, seed=args.seed)
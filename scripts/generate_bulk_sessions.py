@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+負荷試験用の大規模 vector_test_sessions データセットを並列生成するスクリプト
+
+generate_vector_sessions.py と同じ generate_session()（generate_response_time /
+generate_path / generate_vector の分布）でセッションを生成する。
+セッションは CHUNK_SESSIONS 件ずつのチャンクに分け、チャンクごとに
+「シード:チャンク番号」で乱数を初期化してプロセスプールで生成する。
+同じシードなら、ワーカー数に関係なく同じ内容のファイルになる。
+
+各ワーカーは生成したセッションをその場で一時ファイルに書き出し、
+セッションをメモリに溜めない。
+--format json では一時ファイルをチャンク順に連結して 1 つの JSON
+（quiz_log_dummy.json と同じ構造、1 セッション 1 行）にする。
+--format segments ではチャンクをそのままセッションログ
+（session_log.py の <名前>.segments）のセグメントとして配置する。
+
+実行方法:
+python scripts/generate_bulk_sessions.py --sessions 100000 -o students/bulk_100k.json
+python scripts/generate_bulk_sessions.py --sessions 10000000 --workers 8 --seed 42 -o /tmp/bulk_10m.json
+python scripts/generate_bulk_sessions.py --sessions 1000000 --format segments -o /tmp/bulk_1m.segments
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from generate_vector_sessions import generate_session
+from index_builder import resolve_workers
+from session_log import SEGMENT_SUFFIX, SessionLog
+
+CHUNK_SESSIONS = 10000
+BASE_DATE = '2025-11-20T12:00:00.000'
+USER_ID = 'dummy_student'
+
+
+def seed_chunk(seed, chunk_index):
+    """チャンクごとに独立した乱数列を用意（generate_session はモジュールの random を使う）"""
+    random.seed(f'{seed}:{chunk_index}')
+
+
+def write_chunk(chunk_index, first_session, count, seed, output_format, part_path):
+    """
+    1 チャンク分のセッションを生成して part_path に書き出す
+
+    Returns:
+        tuple: (セッション数, ログ数, 書き込んだバイト数)
+    """
+    seed_chunk(seed, chunk_index)
+    base_date = datetime.fromisoformat(BASE_DATE)
+    total_logs = 0
+    with open(part_path, 'w', encoding='utf-8') as f:
+        for i in range(first_session, first_session + count):
+            session = generate_session(i, base_date)
+            total_logs += len(session['logs'])
+            if output_format == 'segments':
+                record = {'op': 'session', 'session': session}
+                f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+            else:
+                if i != first_session:
+                    f.write(',\n')
+                f.write(json.dumps(session, ensure_ascii=False, separators=(',', ':')))
+    return count, total_logs, os.path.getsize(part_path)
+
+
+def plan_chunks(total_sessions, chunk_sessions=CHUNK_SESSIONS):
+    """[(チャンク番号, 先頭のセッション番号, セッション数), ...] を返す（セッション番号は 1 始まり）"""
+    chunks = []
+    for chunk_index, start in enumerate(range(0, total_sessions, chunk_sessions)):
+        chunks.append((chunk_index, start + 1, min(chunk_sessions, total_sessions - start)))
+    return chunks
+
+
+def dataset_header(dataset_name):
+    base_date = datetime.fromisoformat(BASE_DATE)
+    return {
+        'dataset_name': dataset_name,
+        'type': 'class',
+        'created_at': base_date.isoformat() + 'Z',
+        'logs': []
+    }, {
+        'user_id': USER_ID,
+        'generated_at': base_date.isoformat() + 'Z'
+    }
+
+
+def run_chunks(chunks, seed, output_format, part_path_for, workers):
+    """チャンクを生成し、終わった順ではなくチャンク順に (チャンク, 結果) を返す"""
+    workers = min(resolve_workers(workers), len(chunks)) or 1
+    args = [(index, first, count, seed, output_format, part_path_for(index))
+            for index, first, count in chunks]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(write_chunk, *a) for a in args]
+            for chunk, future in zip(chunks, futures):
+                yield chunk, future.result()
+    else:
+        for chunk, a in zip(chunks, args):
+            yield chunk, write_chunk(*a)
+
+
+def generate_json(output_path, total_sessions, seed, workers):
+    """quiz_log_dummy.json と同じ構造の JSON を書き出す（一時ファイル経由で置き換え）"""
+    output_path = Path(output_path)
+    parts_dir = output_path.with_name(output_path.name + '.parts')
+    parts_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = output_path.with_name(output_path.name + '.tmp')
+    meta, vector_meta = dataset_header(output_path.stem)
+
+    # ヘッダーを書き、"sessions": [ の直後にチャンクを連結する
+    head = json.dumps(dict(meta, vector_test_sessions=dict(vector_meta, sessions=[])),
+                      ensure_ascii=False)
+    prefix, suffix = head[:-3], head[-3:]
+    assert suffix == ']}}'
+
+    totals = [0, 0]
+    chunks = plan_chunks(total_sessions)
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as out:
+            out.write(prefix + '\n')
+            for (index, _, _), (count, logs, _) in run_chunks(
+                    chunks, seed, 'json', lambda i: parts_dir / f'{i:06d}.part', workers):
+                part_path = parts_dir / f'{index:06d}.part'
+                if index > 0:
+                    out.write(',\n')
+                with open(part_path, 'r', encoding='utf-8') as part:
+                    shutil.copyfileobj(part, out, 1 << 20)
+                part_path.unlink()
+                totals[0] += count
+                totals[1] += logs
+                print(f'  {totals[0]:,} / {total_sessions:,} セッション')
+            out.write('\n' + suffix + '\n')
+        os.replace(tmp_path, output_path)
+    finally:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return totals
+
+
+def generate_segments(output_dir, total_sessions, seed, workers):
+    """セッションログ（<名前>.segments）として書き出す。チャンク k がセグメント k + 2 になる"""
+    output_dir = Path(output_dir)
+    if output_dir.exists() and any(output_dir.iterdir()):
+        raise FileExistsError(f'{output_dir} は空ではありません')
+    meta, vector_meta = dataset_header(output_dir.stem)
+    with SessionLog(output_dir) as session_log:
+        session_log.set_meta(meta)
+        session_log.reset_sessions(vector_meta)
+
+    def segment_path(index):
+        return output_dir / f'{index + 2:06d}{SEGMENT_SUFFIX}'
+
+    def part_path(index):
+        # 書き終わるまではセグメントとして読まれないよう別名にしておく
+        return segment_path(index).with_suffix('.part')
+
+    totals = [0, 0]
+    for (index, _, _), (count, logs, _) in run_chunks(
+            plan_chunks(total_sessions), seed, 'segments', part_path, workers):
+        os.replace(part_path(index), segment_path(index))
+        totals[0] += count
+        totals[1] += logs
+        print(f'  {totals[0]:,} / {total_sessions:,} セッション')
+    return totals
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='負荷試験用の大規模 vector_test_sessions データセットを生成')
+    parser.add_argument('-o', '--output', required=True,
+                        help='出力先（--format json なら JSON ファイル、segments ならディレクトリ）')
+    parser.add_argument('--sessions', type=int, default=100000, help='セッション数（既定 100000）')
+    parser.add_argument('--seed', type=int, default=0, help='乱数シード（既定 0）')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='生成に使うプロセス数（0 で CPU コア数、既定は 0）')
+    parser.add_argument('--format', choices=('json', 'segments'), default='json', help='出力形式')
+    return parser.parse_args()
+
+
+def main(output, sessions=100000, seed=0, workers=0, output_format='json'):
+    print(f'{sessions:,} セッションを生成中（シード: {seed} / ワーカー: {resolve_workers(workers)}）...')
+    started = time.time()
+    if output_format == 'segments':
+        total_sessions, total_logs = generate_segments(output, sessions, seed, workers)
+    else:
+        total_sessions, total_logs = generate_json(output, sessions, seed, workers)
+    elapsed = time.time() - started
+
+    print(f'[OK] {output} を作成しました')
+    print(f'[統計] セッション数: {total_sessions:,} / 総ログ数: {total_logs:,} / {elapsed:.1f} 秒')
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    main(args.output, sessions=args.sessions, seed=args.seed, workers=args.workers,
+         output_format=args.format)
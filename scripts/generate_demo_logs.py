@@ -10,6 +10,8 @@ import random
 from datetime import datetime, timedelta
 from pathlib import Path
 
+from cluster_features import DEMO_NORMALIZATION, compute_cluster_features
+
 def load_quiz_json(project_id):
     """quiz.json を読み込む"""
     quiz_path = Path(f"../projects/{project_id}/quiz.json")
@@ -59,83 +61,6 @@ def compute_vector_summary(logs):
     }
     return summary
 
-def compute_cluster_features(logs):
-    """
-    ログ配列から cluster_features を計算（8次元）
-    
-    特徴量:
-    1. correct_rate: 正答率 (0-1)
-    2. avg_response_time: 平均反応時間 (正規化: 0-1, 最大30秒と仮定)
-    3. avg_path_length: 平均パス長 (正規化: 0-1, 最大10と仮定)
-    4. avg_vector_logic: vector.logic の平均 (正規化: -3〜+3 → 0-1)
-    5. avg_vector_analysis: vector.analysis の平均 (正規化: -3〜+3 → 0-1)
-    6. avg_vector_creativity: vector.creativity の平均 (正規化: -3〜+3 → 0-1)
-    7. glossary_count: glossaryShown の総数 (正規化: 0-1, 最大20と仮定)
-    8. total_logs: ログ総数 (正規化: 0-1, 最大50と仮定)
-    """
-    if not logs or len(logs) == 0:
-        return [0.5] * 8
-    
-    total_logs = len(logs)
-    correct_count = sum(1 for log in logs if log.get('correct', False))
-    correct_rate = correct_count / total_logs if total_logs > 0 else 0
-    
-    # 平均反応時間
-    response_times = [log.get('response_time', 0) for log in logs if log.get('response_time')]
-    avg_response_time = sum(response_times) / len(response_times) if response_times else 0
-    normalized_response_time = min(avg_response_time / 30.0, 1.0)
-    
-    # 平均パス長
-    path_lengths = [len(log.get('path', [])) for log in logs if log.get('path')]
-    avg_path_length = sum(path_lengths) / len(path_lengths) if path_lengths else 0
-    normalized_path_length = min(avg_path_length / 10.0, 1.0)
-    
-    # vector の平均
-    vector_logic_values = []
-    vector_analysis_values = []
-    vector_creativity_values = []
-    
-    for log in logs:
-        vector = log.get('vector', {})
-        if isinstance(vector, dict):
-            if 'logic' in vector:
-                vector_logic_values.append(vector['logic'])
-            if 'analysis' in vector:
-                vector_analysis_values.append(vector['analysis'])
-            if 'creativity' in vector:
-                vector_creativity_values.append(vector['creativity'])
-    
-    # vector の平均を計算（-1〜+1 → 0-1に正規化）
-    avg_vector_logic = sum(vector_logic_values) / len(vector_logic_values) if vector_logic_values else 0
-    normalized_vector_logic = (avg_vector_logic + 1) / 2.0  # -1〜+1 → 0-1
-    
-    avg_vector_analysis = sum(vector_analysis_values) / len(vector_analysis_values) if vector_analysis_values else 0
-    normalized_vector_analysis = (avg_vector_analysis + 1) / 2.0
-    
-    avg_vector_creativity = sum(vector_creativity_values) / len(vector_creativity_values) if vector_creativity_values else 0
-    normalized_vector_creativity = (avg_vector_creativity + 1) / 2.0
-    
-    # Glossary 提示数
-    glossary_count = sum(len(log.get('glossaryShown', [])) for log in logs)
-    normalized_glossary_count = min(glossary_count / 20.0, 1.0)
-    
-    # ログ総数（正規化）
-    normalized_total_logs = min(total_logs / 50.0, 1.0)
-    
-    # cluster_features ベクトル（8次元）
-    cluster_features = [
-        round(correct_rate, 6),
-        round(normalized_response_time, 6),
-        round(normalized_path_length, 6),
-        round(normalized_vector_logic, 6),
-        round(normalized_vector_analysis, 6),
-        round(normalized_vector_creativity, 6),
-        round(normalized_glossary_count, 6),
-        round(normalized_total_logs, 6)
-    ]
-    
-    return cluster_features
-
 def generate_session(quiz_data, session_index):
     """1セッション分のログを生成"""
     questions = quiz_data.get("questions", [])
@@ -219,7 +144,7 @@ def generate_session(quiz_data, session_index):
     vector_summary = compute_vector_summary(logs)
     
     # クラスタ特徴量計算（ログから計算）
-    cluster_features = compute_cluster_features(logs)
+    cluster_features = compute_cluster_features(logs, DEMO_NORMALIZATION)
     
     # クラスタラベル（0,1,2）
     cluster_ground_truth = random.randint(0, 2)
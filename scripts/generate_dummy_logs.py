@@ -4,12 +4,18 @@
 
 実行方法:
 python scripts/generate_dummy_logs.py
+python scripts/generate_dummy_logs.py --segments  # students/quiz_log_dummy.segments に追記
+python scripts/generate_dummy_logs.py --compact  # インデントなしの JSON で書く
 """
 
+import argparse
 import json
 import random
 from datetime import datetime, timedelta
 
+from index_builder import json_dump_options
+from session_log import SessionLog, segment_log_dir
+
 # 設定
 TOTAL_LOGS = 50
 QUESTIONS = ['q001', 'q002', 'q003', 'q004', 'q005', 'q006', 'q007', 'q008', 'q009', 'q010']
@@ -184,7 +190,33 @@ def generate_log():
     return log
 
 
-def main():
+def save_to_session_log(output_path, logs):
+    """
+    セッションログ（追記専用）の logs を置き換える
+
+    既存の JSON を読み書きせず、今回のログを持つ reset_logs レコードを 1 行だけ追記する。
+    """
+    log_dir = segment_log_dir(output_path)
+    with SessionLog(log_dir) as session_log:
+        if not session_log.exists():
+            session_log.set_meta({
+                'dataset_name': 'quiz_log_dummy',
+                'type': 'class',
+                'created_at': datetime.now().isoformat() + 'Z'
+            })
+        session_log.reset_logs(logs)
+    return log_dir
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='ダミー quiz_log を生成')
+    parser.add_argument('--segments', action='store_true',
+                        help='JSON を書き直さず、セッションログ（<名前>.segments）に追記する')
+    parser.add_argument('--compact', action='store_true', help='JSON をインデントなしで書く（転送・解析が速くなる）')
+    return parser.parse_args()
+
+
+def main(segments=False, compact=False):
     """メイン処理"""
     print('ダミーログ生成を開始...')
     
@@ -208,6 +240,11 @@ def main():
     
     # ファイルに保存（既存のデータを保持）
     output_path = 'students/quiz_log_dummy.json'
+    if segments:
+        log_dir = save_to_session_log(output_path, logs)
+        print(f'\nセッションログに追記しました: {log_dir}')
+        return {'logs': logs}
+    
     existing_data = {}
     try:
         with open(output_path, 'r', encoding='utf-8') as f:
@@ -238,7 +275,7 @@ def main():
             log_data['vector_test_sessions'] = existing_data['vector_test_sessions']
     
     with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(log_data, f, ensure_ascii=False, indent=2)
+        json.dump(log_data, f, **json_dump_options(compact))
     
     print(f'\nファイルに保存しました: {output_path}')
     
@@ -246,7 +283,8 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    args = parse_args()
+    main(segments=args.segments, compact=args.compact)
 
 
 
@@ -2,13 +2,22 @@
 """
 vector_test_sessions 用のダミーデータを生成するスクリプト
 50セッション分のランダムデータを生成
+
+実行方法:
+python scripts/generate_vector_sessions.py
+python scripts/generate_vector_sessions.py --segments  # students/quiz_log_dummy.segments に追記
+python scripts/generate_vector_sessions.py --compact  # インデントなしの JSON で書く
 """
 
+import argparse
 import json
 import random
 from datetime import datetime, timedelta
 from pathlib import Path
 
+from index_builder import json_dump_options
+from session_log import SessionLog, segment_log_dir
+
 # 設定
 TOTAL_SESSIONS = 50
 QUESTIONS = ['q001', 'q002', 'q003', 'q004', 'q005', 'q006', 'q007', 'q008', 'q009', 'q010']
@@ -151,11 +160,57 @@ def generate_session(session_index, base_date):
     }
 
 
-def main():
+def save_to_session_log(file_path, base_date):
+    """
+    セッションを 1 件生成するごとにセッションログへ追記する
+
+    既存の JSON を読み書きしないため、1 セッションの追加はそのセッションの
+    大きさだけの書き込みで済む。
+    """
+    log_dir = segment_log_dir(file_path)
+    total_logs = 0
+    with SessionLog(log_dir) as session_log:
+        if not session_log.exists():
+            print(f'警告: {log_dir} が見つかりません。新規作成します。')
+            session_log.set_meta({
+                'dataset_name': 'quiz_log_dummy',
+                'type': 'class',
+                'created_at': base_date.isoformat() + 'Z',
+                'logs': []
+            })
+        session_log.reset_sessions({
+            'user_id': 'dummy_student',
+            'generated_at': base_date.isoformat() + 'Z'
+        })
+        for i in range(1, TOTAL_SESSIONS + 1):
+            session = generate_session(i, base_date)
+            session_log.append_session(session)
+            total_logs += len(session['logs'])
+    
+    print(f'\n✅ 完了: {TOTAL_SESSIONS}セッション分のデータを生成しました')
+    print(f'   総ログ数: {total_logs}件')
+    print(f'   セッションログ: {log_dir}')
+    return log_dir
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='vector_test_sessions 用のダミーデータを生成')
+    parser.add_argument('--segments', action='store_true',
+                        help='JSON を書き直さず、セッションログ（<名前>.segments）に追記する')
+    parser.add_argument('--compact', action='store_true', help='JSON をインデントなしで書く（転送・解析が速くなる）')
+    return parser.parse_args()
+
+
+def main(segments=False, compact=False):
     """メイン処理"""
     print('vector_test_sessions 用のダミーデータ生成を開始...')
     
     base_date = datetime.fromisoformat('2025-11-20T12:00:00.000')
+    file_path = Path(__file__).parent.parent / 'students' / 'quiz_log_dummy.json'
+    if segments:
+        save_to_session_log(file_path, base_date)
+        return None
+    
     sessions = []
     
     for i in range(1, TOTAL_SESSIONS + 1):
@@ -168,7 +223,6 @@ def main():
     }
     
     # 既存の quiz_log_dummy.json を読み込む
-    file_path = Path(__file__).parent.parent / 'students' / 'quiz_log_dummy.json'
     
     existing_data = {}
     try:
@@ -192,7 +246,7 @@ def main():
     # ファイルに保存
     try:
         with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(existing_data, f, ensure_ascii=False, indent=2)
+            json.dump(existing_data, f, **json_dump_options(compact))
     except IOError as e:
         print(f'エラー: ファイルの書き込みに失敗しました: {e}')
         return None
@@ -206,5 +260,6 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    args = parse_args()
+    main(segments=args.segments, compact=args.compact)
 
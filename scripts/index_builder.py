@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+students/index.json の各データセットエントリを並列に作成する共通処理
+
+JSON の解析は CPU 律速なので、workers > 1 のときはファイルごとの解析を
+プロセスプールに分散する。結果は必ずファイル名順に並べ直すため、
+index.json は直列実行と同じバイト列になる。
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from pipeline_common import atomic_write_json
+
+INDEX_NAME = 'index.json'
+
+
+def list_dataset_files(students_dir):
+    """students フォルダ内のデータセット JSON をファイル名順に返す"""
+    return sorted(f for f in os.listdir(students_dir) if f.endswith('.json') and f != INDEX_NAME)
+
+
+def json_dump_options(compact=False):
+    """json.dump に渡す書式（compact=True ならインデントも区切りの空白も入れない）"""
+    if compact:
+        return {'ensure_ascii': False, 'separators': (',', ':')}
+    return {'ensure_ascii': False, 'indent': 2}
+
+
+def write_index(students_dir, datasets, compact=False):
+    """index.json を一時ファイル経由で置き換える（読み込み中のクライアントが書きかけを読まないように）"""
+    return atomic_write_json(students_dir / INDEX_NAME, {'datasets': datasets}, **json_dump_options(compact))
+
+
+def resolve_workers(workers):
+    """ワーカー数を決定（0 以下なら CPU コア数）"""
+    if workers is None or workers <= 0:
+        return os.cpu_count() or 1
+    return workers
+
+
+def _safe_build(build, json_file, json_path):
+    try:
+        return True, build(json_file, json_path)
+    except Exception as e:
+        return False, str(e)
+
+
+def build_entries(students_dir, json_files, build, workers=1, manifest=None):
+    """
+    各ファイルに build(json_file, json_path) を適用してエントリを作成
+
+    build はプロセス間で受け渡すため、モジュールのトップレベル関数
+    （または functools.partial）であること。manifest を渡すと変更のない
+    ファイルは記録済みのエントリを使い、変更されたファイルだけを解析する。
+
+    Returns:
+        list: json_files と同じ順序の [(json_file, ok, entry またはエラーメッセージ), ...]
+    """
+    results = {}
+    pending = []
+    for json_file in json_files:
+        json_path = students_dir / json_file
+        if manifest:
+            found, entry = manifest.lookup(json_file, json_path)
+            if found:
+                results[json_file] = (True, entry)
+                continue
+        pending.append((json_file, json_path))
+
+    workers = min(resolve_workers(workers), len(pending))
+    names = [name for name, _ in pending]
+    paths = [path for _, path in pending]
+    if workers > 1:
+        chunksize = max(1, len(pending) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            built = list(executor.map(_safe_build, [build] * len(pending), names, paths,
+                                      chunksize=chunksize))
+    else:
+        built = [_safe_build(build, name, path) for name, path in pending]
+
+    for json_file, json_path, (ok, entry) in zip(names, paths, built):
+        if ok and manifest:
+            manifest.store(json_file, json_path, entry)
+        results[json_file] = (ok, entry)
+
+    return [(json_file, *results[json_file]) for json_file in json_files]
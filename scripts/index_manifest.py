@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+students/index.json の差分再生成用マニフェスト
+
+students/.index_manifest に、ファイルごとのサイズ・mtime・内容ハッシュと、
+そのファイルから抽出したデータセットエントリを記録する。再生成時は
+サイズと mtime が一致するファイルを再解析せず、記録済みのエントリを使う。
+mtime だけが変わったファイルはハッシュで内容の同一性を確認する。
+
+エントリの形は index スクリプトごとに異なるため、生成スクリプト名
+（builder）ごとに別の区画へ記録する。ドットファイルにしているのは、
+students/*.json のスキャンや server.js の chokidar 監視の対象外にするため。
+"""
+
+import hashlib
+import json
+import os
+import time
+
+from pipeline_common import atomic_write_json
+
+MANIFEST_NAME = '.index_manifest'
+MANIFEST_VERSION = 1
+
+# 保存直前に更新されたファイルは mtime の粒度内で再更新されうるため、
+# stat が一致してもハッシュで確認する（git の racy-clean 対策と同じ考え方）
+RACY_WINDOW_NS = 2 * 10**9
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """ファイル内容の SHA-256 を計算"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class IndexManifest:
+    """生成スクリプト 1 つ分のファイル別キャッシュ"""
+
+    def __init__(self, students_dir, builder):
+        self.path = students_dir / MANIFEST_NAME
+        self.builder = builder
+        self._data = self._load()
+        self._files = self._data['builders'].setdefault(builder, {})
+        self._saved_at_ns = self._data.get('saved_at_ns', 0)
+        self._pending = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == MANIFEST_VERSION and isinstance(data.get('builders'), dict):
+                return data
+            print(f'[警告] {self.path} のバージョンが異なるため作り直します')
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f'[警告] {self.path} の読み込みに失敗しました: {e}')
+        return {'version': MANIFEST_VERSION, 'builders': {}}
+
+    def _is_clean(self, record, stat):
+        return (record.get('size') == stat.st_size
+                and record.get('mtime_ns') == stat.st_mtime_ns
+                and stat.st_mtime_ns < self._saved_at_ns - RACY_WINDOW_NS)
+
+    def lookup(self, file_name, path):
+        """
+        記録済みのエントリが使えるか確認する
+
+        一覧を取ってから確認するまでの間にファイルが削除された場合は、記録を消して
+        (False, None) を返す（エントリの作成側で読み込みエラーとして扱われる）。
+
+        Returns:
+            tuple: (True, entry) または (False, None)
+        """
+        try:
+            stat = os.stat(path)
+            record = self._files.get(file_name)
+            digest = None
+            if record is not None:
+                if self._is_clean(record, stat):
+                    self.hits += 1
+                    return True, record['entry']
+                digest = file_sha256(path)
+                if record.get('sha256') == digest:
+                    record['size'] = stat.st_size
+                    record['mtime_ns'] = stat.st_mtime_ns
+                    self.hits += 1
+                    return True, record['entry']
+            # 解析前の内容のハッシュを取っておく（解析中に書き換えられた場合は store() で検出する）
+            if digest is None:
+                digest = file_sha256(path)
+        except FileNotFoundError:
+            self._files.pop(file_name, None)
+            return False, None
+        self._pending[file_name] = (stat, digest)
+        return False, None
+
+    def store(self, file_name, path, entry):
+        """
+        lookup() で見つからなかったファイルのエントリを記録する
+
+        lookup() からエントリの作成が終わるまでの間にファイルの stat が変わった場合は、
+        エントリが古い内容から作られた可能性があるので記録しない（次回作り直す）。
+
+        Returns:
+            bool: 記録したか
+        """
+        stat, digest = self._pending.pop(file_name, (None, None))
+        self.misses += 1
+        try:
+            if stat is None:
+                stat = os.stat(path)
+                digest = file_sha256(path)
+            current = os.stat(path)
+        except FileNotFoundError:
+            self._files.pop(file_name, None)
+            print(f'[警告] {file_name} が処理中に削除されたため、マニフェストに記録しません')
+            return False
+        if (current.st_size, current.st_mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+            self._files.pop(file_name, None)
+            print(f'[警告] {file_name} が処理中に更新されたため、マニフェストに記録しません')
+            return False
+        self._files[file_name] = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': digest,
+            'entry': entry
+        }
+        return True
+
+    def get_or_build(self, file_name, path, build):
+        """
+        変更がなければ記録済みのエントリを返し、変更があれば build(path) で作り直す
+
+        build が例外を送出した場合は記録せずにそのまま送出する。
+        エントリが None（出力対象なし）の場合も記録する。
+        """
+        found, entry = self.lookup(file_name, path)
+        if found:
+            return entry
+        entry = build(path)
+        self.store(file_name, path, entry)
+        return entry
+
+    def prune(self, file_names):
+        """file_names に含まれないファイルの記録を削除し、削除数を返す"""
+        keep = set(file_names)
+        removed = [name for name in self._files if name not in keep]
+        for name in removed:
+            del self._files[name]
+        return len(removed)
+
+    def save(self):
+        """マニフェストを一時ファイル経由で置き換える"""
+        self._data['saved_at_ns'] = time.time_ns()
+        atomic_write_json(self.path, self._data, separators=(',', ':'))
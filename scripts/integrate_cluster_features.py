@@ -4,20 +4,31 @@ quiz_log_dummy.json に cluster_features を統合するスクリプト
 
 実行方法:
 python scripts/integrate_cluster_features.py
+python scripts/integrate_cluster_features.py --segments  # students/quiz_log_dummy.segments に追記
 """
 
+import argparse
 import json
 import random
 import os
 from pathlib import Path
 
+from session_log import SessionLog, load_session_log, segment_log_dir
+
 
 def generate_random_cluster_features():
     """ランダムな8次元の cluster_features を生成"""
     return [round(random.random(), 6) for _ in range(8)]
 
 
-def main():
+def parse_args():
+    parser = argparse.ArgumentParser(description='quiz_log_dummy.json に cluster_features を統合')
+    parser.add_argument('--segments', action='store_true',
+                        help='JSON を書き直さず、セッションログ（<名前>.segments）に差分を追記する')
+    return parser.parse_args()
+
+
+def main(segments=False):
     print('cluster_features を quiz_log_dummy.json に統合中...')
     
     script_dir = Path(__file__).parent
@@ -43,12 +54,19 @@ def main():
     
     # quiz_log_dummy.json を読み込む
     quiz_log_path = students_dir / 'quiz_log_dummy.json'
+    if segments:
+        quiz_log_path = segment_log_dir(quiz_log_path)
     if not quiz_log_path.exists():
         print(f'[エラー] {quiz_log_path} が見つかりません')
         return
     
-    with open(quiz_log_path, 'r', encoding='utf-8') as f:
-        quiz_data = json.load(f)
+    if segments:
+        quiz_data = load_session_log(quiz_log_path)
+    else:
+        with open(quiz_log_path, 'r', encoding='utf-8') as f:
+            quiz_data = json.load(f)
+    
+    added = []
     
     # vector_test_sessions.sessions に cluster_features を追加
     if 'vector_test_sessions' in quiz_data and 'sessions' in quiz_data['vector_test_sessions']:
@@ -62,6 +80,7 @@ def main():
                     session['cluster_features'] = cluster_features_list[i]
                 else:
                     session['cluster_features'] = generate_random_cluster_features()
+                added.append(i)
                 added_count += 1
         
         print(f'[OK] {added_count} 個のセッションに cluster_features を追加しました')
@@ -72,8 +91,15 @@ def main():
     # ただし、analysis.js は sessions 配列を探すので、vector_test_sessions.sessions があれば十分
     
     # ファイルに保存
-    with open(quiz_log_path, 'w', encoding='utf-8') as f:
-        json.dump(quiz_data, f, ensure_ascii=False, indent=2)
+    if segments:
+        # 追加したセッションの cluster_features だけを追記する
+        with SessionLog(quiz_log_path) as session_log:
+            for i in added:
+                session = quiz_data['vector_test_sessions']['sessions'][i]
+                session_log.patch_session(i, {'cluster_features': session['cluster_features']})
+    else:
+        with open(quiz_log_path, 'w', encoding='utf-8') as f:
+            json.dump(quiz_data, f, ensure_ascii=False, indent=2)
     
     print(f'[OK] {quiz_log_path} を更新しました')
     
@@ -86,5 +112,6 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    args = parse_args()
+    main(segments=args.segments)
 
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+巨大な JSON ファイルを一定メモリで読み進めるためのプル型ストリームリーダー
+
+json.load() はファイル全体をオブジェクトに展開するため、数百 MB の
+students/*.json では時間もメモリも大きく消費する。JsonStreamReader は
+ファイルをチャンク単位で読み込み、必要な値だけを取り出し、不要な値
+（ログ本体など）はオブジェクトを構築せずに読み飛ばす。
+
+使い方:
+    with open(path, 'rb') as f:
+        reader = JsonStreamReader(f)
+        for key in reader.iter_object():
+            if key == 'dataset_name':
+                name = reader.read_value()
+            else:
+                reader.skip_value()
+
+iter_object() / iter_array() は要素ごとに制御を返すので、呼び出し側は
+yield のたびに read_value() / skip_value() / iter_*() のいずれかで
+値を必ず 1 つ消費すること。
+"""
+
+import json
+import re
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+_WS = re.compile(rb'[ \t\n\r]*')
+_STRING = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+_SCALAR = re.compile(rb'-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?|true|false|null')
+# 文字列を丸ごと含む「括弧以外」の連続部分（コンテナの読み飛ばし用）
+_SKIP_RUN = re.compile(rb'(?:[^"{}\[\]]+|"[^"\\]*(?:\\.[^"\\]*)*")*', re.S)
+
+_DECODER = json.JSONDecoder()
+_DELIMITERS = frozenset(' \t\n\r,:]}')
+_DELIMITER_BYTES = frozenset(d.encode() for d in _DELIMITERS)
+
+_OPEN = (ord('{'), ord('['))
+_QUOTE = ord('"')
+_BOM = b'\xef\xbb\xbf'
+
+
+class JsonStreamReader:
+    """バイナリファイルから JSON をプル型で読み進めるリーダー"""
+
+    def __init__(self, fp, chunk_size=DEFAULT_CHUNK_SIZE):
+        self._fp = fp
+        self._chunk_size = chunk_size
+        self._buf = b''
+        self._pos = 0
+        self._base = 0  # _buf[0] のファイル先頭からのバイトオフセット
+        self._mark = None  # 破棄してはいけない位置（絶対オフセット）
+        self._eof = False
+        # read_value() の高速経路用: _buf[_text_byte:] をデコードした文字列と、
+        # _text_byte に対応する文字位置 _text_char
+        self._text = None
+        self._text_buf = None
+        self._text_byte = 0
+        self._text_char = 0
+        self._fill()
+        if self._buf.startswith(_BOM):
+            self._pos = len(_BOM)
+
+    @property
+    def offset(self):
+        """現在位置（ファイル先頭からのバイトオフセット）"""
+        return self._base + self._pos
+
+    def _fill(self):
+        """バッファに次のチャンクを追加する。読み込めなければ False"""
+        if self._eof:
+            return False
+        keep = self._pos
+        if self._mark is not None:
+            keep = min(keep, self._mark - self._base)
+        if keep:
+            self._buf = self._buf[keep:]
+            self._base += keep
+            self._pos -= keep
+        chunk = self._fp.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf += chunk
+        return True
+
+    def _error(self, message):
+        return ValueError(f'{message} (offset {self.offset})')
+
+    def peek(self):
+        """空白を読み飛ばし、次の文字を返す（終端では空文字列）"""
+        while True:
+            self._pos = _WS.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf) or not self._fill():
+                break
+        if self._pos >= len(self._buf):
+            return ''
+        return chr(self._buf[self._pos])
+
+    def _expect(self, ch):
+        if self.peek() != ch:
+            raise self._error(f'{ch!r} が必要です')
+        self._pos += 1
+
+    def _skip_string(self):
+        while True:
+            m = _STRING.match(self._buf, self._pos)
+            if m:
+                self._pos = m.end()
+                return
+            if not self._fill():
+                raise self._error('文字列が閉じられていません')
+
+    def _skip_scalar(self):
+        while True:
+            m = _SCALAR.match(self._buf, self._pos)
+            # 直後が区切り文字であることを確かめる（"1." や "1e" で切れた数値を誤って受理しない）
+            if m and (self._buf[m.end():m.end() + 1] in _DELIMITER_BYTES if m.end() < len(self._buf) else self._eof):
+                self._pos = m.end()
+                return
+            if not self._fill():
+                if m:
+                    self._pos = m.end()
+                    return
+                raise self._error('不正な値です')
+
+    def _skip_container(self):
+        depth = 0
+        while True:
+            end = _SKIP_RUN.match(self._buf, self._pos).end()
+            self._pos = end
+            if end >= len(self._buf) or self._buf[end] == _QUOTE:
+                # バッファ末尾、または途中で切れた文字列
+                if not self._fill():
+                    raise self._error('JSON が途中で終了しています')
+                continue
+            depth += 1 if self._buf[end] in _OPEN else -1
+            self._pos = end + 1
+            if depth == 0:
+                return
+
+    def skip_value(self):
+        """次の値をオブジェクトを構築せずに読み飛ばす"""
+        ch = self.peek()
+        if ch == '"':
+            self._skip_string()
+        elif ch in ('{', '['):
+            self._skip_container()
+        elif ch:
+            self._skip_scalar()
+        else:
+            raise self._error('値が必要です')
+
+    def _text_at(self, pos):
+        """バッファの pos バイト目以降をデコードした文字列と、その文字位置を返す"""
+        if self._text_buf is not self._buf or pos < self._text_byte:
+            # バッファ末尾で切れた多バイト文字は置換文字になるが、値が途中で
+            # 切れている場合は raw_decode が失敗するか末尾まで達するので使われない
+            self._text = self._buf[pos:].decode('utf-8', 'replace')
+            self._text_buf = self._buf
+            self._text_byte = pos
+            self._text_char = 0
+        elif pos > self._text_byte:
+            # 前回の値の直後から pos まで（通常は区切りの空白とカンマ）
+            self._text_char += len(self._buf[self._text_byte:pos].decode('utf-8'))
+            self._text_byte = pos
+        return self._text, self._text_char
+
+    def read_value(self):
+        """次の値を 1 つ丸ごと読み込んで Python オブジェクトとして返す"""
+        self.peek()
+        if self._pos < len(self._buf):
+            # 値がバッファ内に収まっていれば、読み飛ばしを挟まず 1 回のデコードで読む
+            text, char_pos = self._text_at(self._pos)
+            try:
+                value, end = _DECODER.raw_decode(text, char_pos)
+            except ValueError:
+                pass
+            else:
+                # 直後が区切り文字でなければ、数値などがバッファ末尾で切れている可能性がある
+                if (text[end:end + 1] in _DELIMITERS) if end < len(text) else self._eof:
+                    self._pos += len(text[char_pos:end].encode('utf-8'))
+                    self._text_byte = self._pos
+                    self._text_char = end
+                    return value
+        start = self.offset
+        self._mark = start
+        try:
+            self.skip_value()
+            return json.loads(self._buf[start - self._base:self._pos])
+        finally:
+            self._mark = None
+
+    def iter_object(self):
+        """オブジェクトのキーを順に返す（値は呼び出し側が消費する）"""
+        self._expect('{')
+        if self.peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            if self.peek() != '"':
+                raise self._error('キーが必要です')
+            key = self.read_value()
+            self._expect(':')
+            yield key
+            ch = self.peek()
+            self._pos += 1
+            if ch == '}':
+                return
+            if ch != ',':
+                raise self._error("',' または '}' が必要です")
+
+    def iter_array(self):
+        """配列の要素インデックスを順に返す（要素は呼び出し側が消費する）"""
+        self._expect('[')
+        if self.peek() == ']':
+            self._pos += 1
+            return
+        index = 0
+        while True:
+            yield index
+            index += 1
+            ch = self.peek()
+            self._pos += 1
+            if ch == ']':
+                return
+            if ch != ',':
+                raise self._error("',' または ']' が必要です")
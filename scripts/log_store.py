@@ -0,0 +1,553 @@
+#!/usr/bin/env python3
+"""
+学習ログの列指向バイナリ形式（.logstore）への変換と読み込み
+
+quiz_log_dummy.json / demo_project_0X_logs.json は indent=2 の JSON で、
+ログごとに questionId / conceptTags / glossaryShown などのキーが繰り返される。
+.logstore ではログを列ごとの固定長配列に分解し、文字列は辞書で整数 ID に
+置き換え（インターン）、path などの可変長リストはオフセット配列で表す。
+各列は mmap した領域を numpy.frombuffer で参照するのでコピーが発生しない。
+
+ファイル構成:
+    MAGIC (8 バイト) | ヘッダ長 (uint64 LE) | ヘッダ JSON | 各セクション（8 バイト境界）
+
+    ヘッダ: 辞書（question / choice / concept / glossary）、レイアウト、
+            各セクションの dtype・オフセット・要素数
+    ログ列（要素数 = ログ数）:
+        layout, question, final_answer, timestamp_us, correct, response_time,
+        vector_layout, vector_logic, vector_analysis, vector_creativity
+    可変長リスト（<name>_offsets は要素数 = ログ数 + 1）:
+        path, concept, glossary, recommended, clicks
+        （clicks は click_layout / click_choice / click_time の 3 列）
+    group_offsets: ログ配列（トップレベルの logs、各セッションの logs）の境界
+    skeleton: ログ配列を {"__logstore_group__": n} に置き換えた元の JSON
+    extras: 列で表せない値（想定外のキーや型）を {ログ番号: {キー: 値}} で保持
+
+ログごとの「キーの順序と各値の格納方法」をレイアウトとしてインターンするので、
+キーの欠落・順序・int と float の区別まで含めて元の JSON に完全に戻せる。
+
+実行方法:
+python scripts/log_store.py to-store students/quiz_log_dummy.json
+python scripts/log_store.py to-json students/quiz_log_dummy.logstore  # students/restored/quiz_log_dummy.json
+python scripts/log_store.py to-store students/demo_project_02_logs.json --verify
+
+依存: numpy
+"""
+
+import argparse
+import json
+import mmap
+import re
+import struct
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+from pipeline_common import atomic_write_json
+
+MAGIC = b'NCLOGST1'
+FORMAT_VERSION = 1
+ALIGNMENT = 8
+GROUP_KEY = '__logstore_group__'
+RESTORED_DIR_NAME = 'restored'
+LOG_ARRAY_KEYS = ('logs', 'answer_logs')
+VECTOR_AXES = ('logic', 'analysis', 'creativity')
+
+# 可変長の文字列リスト: キー → (セクション名, 辞書名)
+LIST_FIELDS = {
+    'path': ('path', 'choice'),
+    'conceptTags': ('concept', 'concept'),
+    'glossaryShown': ('glossary', 'glossary'),
+    'recommended_terms': ('recommended', 'glossary')
+}
+DICT_NAMES = ('question', 'choice', 'concept', 'glossary')
+
+LOG_COLUMNS = {
+    'layout': '<i4',
+    'question': '<i4',
+    'final_answer': '<i4',
+    'timestamp_us': '<i8',
+    'correct': 'u1',
+    'response_time': '<f8',
+    'vector_layout': '<i4',
+    'vector_logic': '<f8',
+    'vector_analysis': '<f8',
+    'vector_creativity': '<f8'
+}
+
+# timestamp の書式（レイアウトのタグ → 小数部の桁数）
+TIMESTAMP_TAGS = {'ts': 0, 'tm': 3, 'tu': 6}
+_TIMESTAMP_RE = re.compile(r'(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})(?:\.(\d{3}|\d{6}))?Z')
+_EPOCH = datetime(1970, 1, 1)
+_MAX_EXACT_INT = 2 ** 53
+
+
+def _number_tag(value):
+    """float64 列に格納できる数値なら 'f' / 'i' を返す"""
+    if type(value) is float:
+        return 'f'
+    if type(value) is int and abs(value) < _MAX_EXACT_INT:
+        return 'i'
+    return None
+
+
+def _format_timestamp(us, tag):
+    dt = _EPOCH + timedelta(microseconds=us)
+    text = (f'{dt.year:04d}-{dt.month:02d}-{dt.day:02d}'
+            f'T{dt.hour:02d}:{dt.minute:02d}:{dt.second:02d}')
+    digits = TIMESTAMP_TAGS[tag]
+    if digits:
+        text += '.' + f'{dt.microsecond:06d}'[:digits]
+    return text + 'Z'
+
+
+def _encode_timestamp(value):
+    """ISO 8601（UTC, Z 付き）の文字列を (タグ, エポックからのマイクロ秒) に変換"""
+    if type(value) is not str:
+        return None
+    m = _TIMESTAMP_RE.fullmatch(value)
+    if not m:
+        return None
+    fraction = m.group(7) or ''
+    tag = {0: 'ts', 3: 'tm', 6: 'tu'}[len(fraction)]
+    try:
+        dt = datetime(*(int(g) for g in m.groups()[:6]), int(fraction.ljust(6, '0')))
+    except ValueError:
+        return None
+    us = (dt - _EPOCH) // timedelta(microseconds=1)
+    # 書式を戻して一致しないもの（桁のゆれなど）は列に入れない
+    if _format_timestamp(us, tag) != value:
+        return None
+    return tag, us
+
+
+class _Interner:
+    """文字列 → 整数 ID の辞書"""
+
+    def __init__(self):
+        self.ids = {}
+        self.values = []
+
+    def intern(self, value):
+        index = self.ids.get(value)
+        if index is None:
+            index = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return index
+
+
+def _strip_log_arrays(node, groups):
+    """ログ配列を取り出し、グループ番号のプレースホルダに置き換える"""
+    if isinstance(node, dict):
+        stripped = {}
+        for key, value in node.items():
+            if (key in LOG_ARRAY_KEYS and isinstance(value, list)
+                    and all(isinstance(log, dict) for log in value)):
+                stripped[key] = {GROUP_KEY: len(groups)}
+                groups.append(value)
+            else:
+                stripped[key] = _strip_log_arrays(value, groups)
+        return stripped
+    if isinstance(node, list):
+        return [_strip_log_arrays(value, groups) for value in node]
+    return node
+
+
+def _restore_log_arrays(node, load_group):
+    if isinstance(node, dict):
+        if len(node) == 1 and GROUP_KEY in node:
+            return load_group(node[GROUP_KEY])
+        return {key: _restore_log_arrays(value, load_group) for key, value in node.items()}
+    if isinstance(node, list):
+        return [_restore_log_arrays(value, load_group) for value in node]
+    return node
+
+
+class _StoreWriter:
+    """ログを 1 件ずつ列に振り分ける"""
+
+    def __init__(self):
+        self.dicts = {name: _Interner() for name in DICT_NAMES}
+        self.layouts = _Interner()
+        self.vector_layouts = _Interner()
+        self.click_layouts = _Interner()
+        self.columns = {name: [] for name in LOG_COLUMNS}
+        self.lists = {section: ([0], []) for section, _ in LIST_FIELDS.values()}
+        self.clicks_offsets = [0]
+        self.click_layout = []
+        self.click_choice = []
+        self.click_time = []
+        self.extras = {}
+        self.n_logs = 0
+
+    def _encode_string_list(self, value, dict_name):
+        if not isinstance(value, list) or not all(type(item) is str for item in value):
+            return None
+        interner = self.dicts[dict_name]
+        return [interner.intern(item) for item in value]
+
+    def _encode_vector(self, value):
+        if not isinstance(value, dict):
+            return None
+        layout = []
+        for axis, number in value.items():
+            tag = _number_tag(number)
+            if axis not in VECTOR_AXES or tag is None:
+                return None
+            layout.append((axis, tag))
+        return self.vector_layouts.intern(tuple(layout))
+
+    def _encode_clicks(self, value):
+        if not isinstance(value, list):
+            return None
+        encoded = []
+        for click in value:
+            if not isinstance(click, dict):
+                return None
+            layout = []
+            choice = -1
+            time = 0.0
+            for key, item in click.items():
+                if key == 'choiceId' and type(item) is str:
+                    layout.append((key, 's'))
+                    choice = self.dicts['choice'].intern(item)
+                elif key == 'time' and _number_tag(item):
+                    layout.append((key, _number_tag(item)))
+                    time = item
+                else:
+                    return None
+            encoded.append((self.click_layouts.intern(tuple(layout)), choice, time))
+        return encoded
+
+    def add_log(self, log):
+        index = self.n_logs
+        self.n_logs += 1
+        row = {'question': -1, 'final_answer': -1, 'timestamp_us': 0, 'correct': 0,
+               'response_time': 0.0, 'vector_layout': -1,
+               'vector_logic': 0.0, 'vector_analysis': 0.0, 'vector_creativity': 0.0}
+        lists = {}
+        clicks = ()
+        layout = []
+
+        for key, value in log.items():
+            tag = 'x'
+            if key == 'questionId' and type(value) is str:
+                row['question'] = self.dicts['question'].intern(value)
+                tag = 's'
+            elif key == 'final_answer' and type(value) is str:
+                row['final_answer'] = self.dicts['choice'].intern(value)
+                tag = 's'
+            elif key == 'timestamp' and (timestamp := _encode_timestamp(value)):
+                tag, row['timestamp_us'] = timestamp
+            elif key == 'correct' and type(value) is bool:
+                row['correct'] = int(value)
+                tag = 'b'
+            elif key == 'response_time' and _number_tag(value):
+                row['response_time'] = value
+                tag = _number_tag(value)
+            elif key in LIST_FIELDS:
+                section, dict_name = LIST_FIELDS[key]
+                ids = self._encode_string_list(value, dict_name)
+                if ids is not None:
+                    lists[section] = ids
+                    tag = 'l'
+            elif key == 'vector':
+                vector_layout = self._encode_vector(value)
+                if vector_layout is not None:
+                    row['vector_layout'] = vector_layout
+                    for axis, number in value.items():
+                        row[f'vector_{axis}'] = number
+                    tag = 'v'
+            elif key == 'clicks':
+                encoded = self._encode_clicks(value)
+                if encoded is not None:
+                    clicks = encoded
+                    tag = 'c'
+
+            if tag == 'x':
+                self.extras.setdefault(str(index), {})[key] = value
+            layout.append((key, tag))
+
+        row['layout'] = self.layouts.intern(tuple(layout))
+        for name, column in self.columns.items():
+            column.append(row[name])
+        for section, (offsets, values) in self.lists.items():
+            values.extend(lists.get(section, ()))
+            offsets.append(len(values))
+        for click_layout, choice, time in clicks:
+            self.click_layout.append(click_layout)
+            self.click_choice.append(choice)
+            self.click_time.append(time)
+        self.clicks_offsets.append(len(self.click_layout))
+
+    def sections(self):
+        """(セクション名, numpy 配列) を順に返す"""
+        for name, dtype in LOG_COLUMNS.items():
+            yield name, np.asarray(self.columns[name], dtype=dtype)
+        for section, (offsets, values) in self.lists.items():
+            yield f'{section}_offsets', np.asarray(offsets, dtype='<i8')
+            yield f'{section}_values', np.asarray(values, dtype='<i4')
+        yield 'clicks_offsets', np.asarray(self.clicks_offsets, dtype='<i8')
+        yield 'click_layout', np.asarray(self.click_layout, dtype='<i4')
+        yield 'click_choice', np.asarray(self.click_choice, dtype='<i4')
+        yield 'click_time', np.asarray(self.click_time, dtype='<f8')
+
+
+def _json_section(value):
+    return np.frombuffer(json.dumps(value, ensure_ascii=False).encode('utf-8'), dtype='u1')
+
+
+def write_log_store(data, store_path):
+    """
+    データセット（quiz_log_dummy.json などの JSON オブジェクト）を .logstore に書き出す
+
+    Returns:
+        dict: ログ数・グループ数・辞書サイズなどの概要
+    """
+    groups = []
+    skeleton = _strip_log_arrays(data, groups)
+    writer = _StoreWriter()
+    group_offsets = [0]
+    for logs in groups:
+        for log in logs:
+            writer.add_log(log)
+        group_offsets.append(writer.n_logs)
+
+    sections = list(writer.sections())
+    sections.append(('group_offsets', np.asarray(group_offsets, dtype='<i8')))
+    sections.append(('skeleton', _json_section(skeleton)))
+    sections.append(('extras', _json_section(writer.extras)))
+
+    header = {
+        'version': FORMAT_VERSION,
+        'n_logs': writer.n_logs,
+        'n_groups': len(groups),
+        'dicts': {name: interner.values for name, interner in writer.dicts.items()},
+        'layouts': writer.layouts.values,
+        'vector_layouts': writer.vector_layouts.values,
+        'click_layouts': writer.click_layouts.values,
+        'sections': {}
+    }
+    # ヘッダ長が決まらないとオフセットが決まらないため、相対オフセットで記録する
+    offset = 0
+    for name, array in sections:
+        header['sections'][name] = {'dtype': array.dtype.str, 'offset': offset, 'count': len(array)}
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    header_bytes += b' ' * (-(len(MAGIC) + 8 + len(header_bytes)) % ALIGNMENT)
+
+    tmp_path = Path(str(store_path) + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', len(header_bytes)))
+        f.write(header_bytes)
+        for _, array in sections:
+            f.write(array.tobytes())
+            f.write(b'\0' * (-array.nbytes % ALIGNMENT))
+    tmp_path.replace(store_path)
+
+    return {
+        'n_logs': writer.n_logs,
+        'n_groups': len(groups),
+        'dict_sizes': {name: len(interner.values) for name, interner in writer.dicts.items()},
+        'extras': len(writer.extras)
+    }
+
+
+class LogStore:
+    """.logstore を mmap で開き、列をコピーせずに参照する"""
+
+    def __init__(self, store_path):
+        self.path = Path(store_path)
+        self._file = open(self.path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f'{self.path} は logstore 形式ではありません')
+        (header_len,) = struct.unpack_from('<Q', self._mm, len(MAGIC))
+        data_start = len(MAGIC) + 8 + header_len
+        header = json.loads(self._mm[len(MAGIC) + 8:data_start].decode('utf-8'))
+        if header.get('version') != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f'未対応の logstore バージョンです: {header.get("version")}')
+        self.n_logs = header['n_logs']
+        self.n_groups = header['n_groups']
+        self.dicts = header['dicts']
+        self.layouts = [tuple(tuple(pair) for pair in layout) for layout in header['layouts']]
+        self.vector_layouts = [tuple(tuple(pair) for pair in layout) for layout in header['vector_layouts']]
+        self.click_layouts = [tuple(tuple(pair) for pair in layout) for layout in header['click_layouts']]
+        self._sections = header['sections']
+        self._data_start = data_start
+        self._columns = {}
+        self._extras = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        # numpy 配列が mmap を参照している間は閉じられないため、参照を先に手放す
+        self._columns = {}
+        if self._mm is not None:
+            try:
+                self._mm.close()
+            except BufferError:
+                pass
+            self._mm = None
+        self._file.close()
+
+    def column(self, name):
+        """セクションを numpy 配列として返す（mmap 上のビュー、読み取り専用）"""
+        array = self._columns.get(name)
+        if array is None:
+            info = self._sections[name]
+            array = np.frombuffer(self._mm, dtype=np.dtype(info['dtype']), count=info['count'],
+                                  offset=self._data_start + info['offset'])
+            self._columns[name] = array
+        return array
+
+    def _json_section(self, name):
+        return json.loads(self.column(name).tobytes().decode('utf-8'))
+
+    def skeleton(self):
+        """ログ配列をプレースホルダに置き換えたデータセット本体"""
+        return self._json_section('skeleton')
+
+    def group_range(self, group):
+        """グループ（ログ配列）に含まれるログ番号の範囲 [start, end)"""
+        offsets = self.column('group_offsets')
+        return int(offsets[group]), int(offsets[group + 1])
+
+    def group_logs(self, group):
+        """グループのログを元の辞書形式で返す"""
+        start, end = self.group_range(group)
+        return self.logs(start, end)
+
+    def logs(self, start=0, end=None):
+        """ログ番号 [start, end) を元の辞書形式で返す"""
+        end = self.n_logs if end is None else end
+        if self._extras is None:
+            self._extras = self._json_section('extras')
+        cols = {name: self.column(name)[start:end].tolist() for name in LOG_COLUMNS}
+        dicts = self.dicts
+        lists = {}
+        for section, dict_name in LIST_FIELDS.values():
+            offsets = self.column(f'{section}_offsets')[start:end + 1].tolist()
+            values = self.column(f'{section}_values')[offsets[0]:offsets[-1]].tolist()
+            lists[section] = (offsets, values, dicts[dict_name])
+        click_offsets = self.column('clicks_offsets')[start:end + 1].tolist()
+        click_slice = slice(click_offsets[0], click_offsets[-1])
+        click_layout = self.column('click_layout')[click_slice].tolist()
+        click_choice = self.column('click_choice')[click_slice].tolist()
+        click_time = self.column('click_time')[click_slice].tolist()
+        choices = dicts['choice']
+
+        restored = []
+        for i in range(end - start):
+            log = {}
+            for key, tag in self.layouts[cols['layout'][i]]:
+                if tag == 'x':
+                    value = self._extras[str(start + i)][key]
+                elif key == 'questionId':
+                    value = dicts['question'][cols['question'][i]]
+                elif key == 'final_answer':
+                    value = choices[cols['final_answer'][i]]
+                elif key == 'timestamp':
+                    value = _format_timestamp(cols['timestamp_us'][i], tag)
+                elif key == 'correct':
+                    value = bool(cols['correct'][i])
+                elif key == 'response_time':
+                    value = cols['response_time'][i]
+                    value = int(value) if tag == 'i' else value
+                elif key == 'vector':
+                    value = {}
+                    for axis, number_tag in self.vector_layouts[cols['vector_layout'][i]]:
+                        number = cols[f'vector_{axis}'][i]
+                        value[axis] = int(number) if number_tag == 'i' else number
+                elif key == 'clicks':
+                    value = []
+                    base = click_offsets[0]
+                    for c in range(click_offsets[i] - base, click_offsets[i + 1] - base):
+                        click = {}
+                        for click_key, click_tag in self.click_layouts[click_layout[c]]:
+                            if click_key == 'choiceId':
+                                click[click_key] = choices[click_choice[c]]
+                            else:
+                                time = click_time[c]
+                                click[click_key] = int(time) if click_tag == 'i' else time
+                        value.append(click)
+                else:
+                    offsets, values, names = lists[LIST_FIELDS[key][0]]
+                    base = offsets[0]
+                    value = [names[v] for v in values[offsets[i] - base:offsets[i + 1] - base]]
+                log[key] = value
+            restored.append(log)
+        return restored
+
+    def to_dataset(self):
+        """元の JSON と同じ構造のデータセットを復元"""
+        return _restore_log_arrays(self.skeleton(), self.group_logs)
+
+
+def read_log_store(store_path):
+    """.logstore から元の JSON オブジェクトを復元"""
+    with LogStore(store_path) as store:
+        return store.to_dataset()
+
+
+def _canonical_json(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='学習ログ JSON と列指向バイナリ形式（.logstore）の相互変換')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    to_store = sub.add_parser('to-store', help='JSON → .logstore')
+    to_store.add_argument('source', help='変換元の JSON ファイル')
+    to_store.add_argument('-o', '--output', help='出力先（既定は拡張子を .logstore にしたパス）')
+    to_store.add_argument('--verify', action='store_true',
+                          help='変換後に復元し、値・キーの順序・int と float の区別まで元の JSON と一致するか確認する'
+                               '（インデントなどの書式は比べない）')
+
+    to_json = sub.add_parser('to-json', help='.logstore → JSON')
+    to_json.add_argument('source', help='変換元の .logstore ファイル')
+    to_json.add_argument('-o', '--output',
+                         help='出力先（既定は restored/<名前>.json。元の JSON を上書きせず、'
+                              'データセットの一覧にも入らないように別フォルダに書く）')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    source = Path(args.source)
+
+    if args.command == 'to-store':
+        output = Path(args.output) if args.output else source.with_suffix('.logstore')
+        with open(source, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        summary = write_log_store(data, output)
+        print(f'[OK] {output} を作成しました')
+        print(f'  ログ数: {summary["n_logs"]} / ログ配列: {summary["n_groups"]}')
+        print('  辞書: ' + ', '.join(f'{k}={v}' for k, v in summary['dict_sizes'].items()))
+        print(f'  サイズ: {source.stat().st_size:,} → {output.stat().st_size:,} バイト')
+        if args.verify:
+            # dict の == はキーの順序や 1 と 1.0 の違いを無視するので、シリアライズした結果で比べる
+            if _canonical_json(read_log_store(output)) == _canonical_json(data):
+                print('[OK] 復元結果が元の JSON と一致しました（書式を除く）')
+            else:
+                print('[エラー] 復元結果が元の JSON と一致しません')
+                raise SystemExit(1)
+    else:
+        output = Path(args.output) if args.output else source.parent / RESTORED_DIR_NAME / f'{source.stem}.json'
+        data = read_log_store(source)
+        atomic_write_json(output, data, indent=2)
+        print(f'[OK] {output} を作成しました')
+
+
+if __name__ == '__main__':
+    main()
@@ -2,14 +2,123 @@
 """
 既存の quiz_log.json ファイルを新しいフォーマット（A方式）に変換するスクリプト
 
+--bulk を付けると、数千ファイル規模の移行向けに次の動作になる。
+- ファイルごとの変換をプロセスプールで並列に実行
+- 変換結果は一時ファイルに書いてから os.replace で置き換える（途中で落ちても元ファイルは壊れない）
+- 完了したファイルを students/.migration_journal に 1 行ずつ記録し、
+  中断後の再実行ではサイズと更新時刻が記録と同じファイルを開かずに飛ばす
+- 先頭の数 KB だけを読んで dataset_name / type を探し、移行済みのファイルは全体を解析しない
+
 実行方法:
 python scripts/migrate_to_flat_structure.py
+python scripts/migrate_to_flat_structure.py --bulk --workers 8
+python scripts/migrate_to_flat_structure.py --bulk --reset-journal  # ジャーナルを捨てて最初から
 """
 
+import argparse
+import io
 import json
 import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
+from index_builder import list_dataset_files, resolve_workers
+from json_stream import JsonStreamReader
+
+JOURNAL_NAME = '.migration_journal'
+TMP_SUFFIX = '.migrating.tmp'
+SNIFF_BYTES = 64 * 1024
+
+
+def is_new_format(data):
+    return isinstance(data, dict) and 'dataset_name' in data and 'type' in data
+
+
+def sniff_new_format(file_path, limit=SNIFF_BYTES):
+    """
+    ファイル先頭だけを読んで新形式かどうかを判定
+
+    トップレベルのキーを順に読み、dataset_name と type が先頭 limit バイト以内に
+    見つかれば True、トップレベルが配列なら False を返す。判定できなければ None。
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            head = f.read(limit)
+        reader = JsonStreamReader(io.BytesIO(head))
+        if reader.peek() != '{':
+            return False
+        found = set()
+        for key in reader.iter_object():
+            if key in ('dataset_name', 'type'):
+                found.add(key)
+                if len(found) == 2:
+                    return True
+            reader.skip_value()
+    except (OSError, ValueError):
+        # 先頭 limit バイトで判定できなかった（値が途中で切れた）
+        return None
+    return False
+
+
+def write_json_atomic(file_path, data):
+    """一時ファイルに書いてから置き換える"""
+    file_path = Path(file_path)
+    tmp_path = file_path.with_name('.' + file_path.name + TMP_SUFFIX)
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, file_path)
+
+
+def convert_to_flat(data, file_path, dataset_name=None, dataset_type='class'):
+    """読み込んだ旧形式のデータを新しいフォーマットに変換"""
+    file_path = str(file_path)
+    # ログデータを抽出
+    logs = []
+    if isinstance(data, dict):
+        if 'logs' in data:
+            logs = data['logs']
+        elif 'version' in data:
+            logs = data.get('logs', [])
+    elif isinstance(data, list):
+        logs = data
+    
+    # データセット名を決定
+    if not dataset_name:
+        file_name = Path(file_path).stem
+        # ファイル名から dataset_name を推測
+        if 'dummy' in file_name.lower():
+            dataset_name = 'quiz_log_dummy'
+        elif 'student' in file_name.lower():
+            dataset_name = file_name.replace('student', 'student').replace('_', '')
+        elif 'class' in file_name.lower():
+            dataset_name = file_name.replace('class', 'class').replace('_', '')
+        else:
+            dataset_name = file_name
+    
+    # タイプを決定
+    if not dataset_type:
+        file_name = file_path.lower()
+        if 'student' in file_name or '個人' in file_name:
+            dataset_type = 'student'
+        else:
+            dataset_type = 'class'
+    
+    # 作成日時を取得
+    created_at = None
+    if isinstance(data, dict):
+        created_at = data.get('created_at') or data.get('generated_at')
+    
+    # 新しいフォーマットに変換
+    return {
+        'dataset_name': dataset_name,
+        'type': dataset_type,
+        'created_at': created_at or '2025-11-18',
+        'logs': logs
+    }
+
+
 def migrate_file(file_path, dataset_name=None, dataset_type='class'):
     """ファイルを新しいフォーマットに変換"""
     try:
@@ -17,77 +126,151 @@ def migrate_file(file_path, dataset_name=None, dataset_type='class'):
             data = json.load(f)
         
         # 既に新形式の場合はスキップ
-        if 'dataset_name' in data and 'type' in data:
+        if is_new_format(data):
             print(f'Skipping {file_path} (already in new format)')
             return False
         
-        # ログデータを抽出
-        logs = []
-        if isinstance(data, dict):
-            if 'logs' in data:
-                logs = data['logs']
-            elif 'version' in data:
-                logs = data.get('logs', [])
-        elif isinstance(data, list):
-            logs = data
-        
-        # データセット名を決定
-        if not dataset_name:
-            file_name = Path(file_path).stem
-            # ファイル名から dataset_name を推測
-            if 'dummy' in file_name.lower():
-                dataset_name = 'quiz_log_dummy'
-            elif 'student' in file_name.lower():
-                dataset_name = file_name.replace('student', 'student').replace('_', '')
-            elif 'class' in file_name.lower():
-                dataset_name = file_name.replace('class', 'class').replace('_', '')
-            else:
-                dataset_name = file_name
-        
-        # タイプを決定
-        if not dataset_type:
-            file_name = file_path.lower()
-            if 'student' in file_name or '個人' in file_name:
-                dataset_type = 'student'
-            else:
-                dataset_type = 'class'
-        
-        # 作成日時を取得
-        created_at = None
-        if isinstance(data, dict):
-            created_at = data.get('created_at') or data.get('generated_at')
-        
-        # 新しいフォーマットに変換
-        new_data = {
-            'dataset_name': dataset_name,
-            'type': dataset_type,
-            'created_at': created_at or '2025-11-18',
-            'logs': logs
-        }
+        new_data = convert_to_flat(data, file_path, dataset_name, dataset_type)
         
         # ファイルを書き込み
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(new_data, f, ensure_ascii=False, indent=2)
+        write_json_atomic(file_path, new_data)
         
-        print(f'Migrated {file_path} -> {dataset_name} ({dataset_type})')
+        print(f'Migrated {file_path} -> {new_data["dataset_name"]} ({new_data["type"]})')
         return True
     except Exception as e:
         print(f'Error migrating {file_path}: {e}')
         return False
 
-def main():
+
+def migrate_one(file_path, dataset_type='class'):
+    """
+    一括移行の 1 ファイル分（プロセスプールで実行される）
+
+    Returns:
+        dict: file / status（migrated / skipped / error）/ 処理後の size と mtime_ns
+    """
+    file_path = Path(file_path)
+    result = {'file': file_path.name}
+    try:
+        sniffed = sniff_new_format(file_path)
+        if sniffed:
+            result['status'] = 'skipped'
+        else:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if is_new_format(data):
+                result['status'] = 'skipped'
+            else:
+                new_data = convert_to_flat(data, file_path, None, dataset_type)
+                write_json_atomic(file_path, new_data)
+                result['status'] = 'migrated'
+                result['dataset_name'] = new_data['dataset_name']
+        stat = file_path.stat()
+        result['size'] = stat.st_size
+        result['mtime_ns'] = stat.st_mtime_ns
+    except Exception as e:
+        result['status'] = 'error'
+        result['error'] = str(e)
+    return result
+
+
+class MigrationJournal:
+    """完了したファイルを 1 行 1 件で追記していくチェックポイント"""
+
+    def __init__(self, students_dir, reset=False):
+        self.path = Path(students_dir) / JOURNAL_NAME
+        self.done = {}
+        if reset and self.path.exists():
+            self.path.unlink()
+        if self.path.exists():
+            with open(self.path, 'rb') as f:
+                for line in f:
+                    # 書きかけの最終行は無視する
+                    if not line.endswith(b'\n'):
+                        break
+                    entry = json.loads(line)
+                    if entry.get('status') != 'error':
+                        self.done[entry['file']] = entry
+        self._file = open(self.path, 'ab')
+
+    def is_done(self, file_path):
+        """記録後にファイルが変わっていなければ True"""
+        entry = self.done.get(file_path.name)
+        if not entry:
+            return False
+        try:
+            stat = file_path.stat()
+        except OSError:
+            return False
+        return stat.st_size == entry.get('size') and stat.st_mtime_ns == entry.get('mtime_ns')
+
+    def record(self, result):
+        self._file.write(json.dumps(result, ensure_ascii=False).encode('utf-8') + b'\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+def bulk_migrate(students_dir, workers=0, dataset_type='class', reset_journal=False):
+    """students/ 全体をプロセスプールで移行（中断しても再実行で続きから）"""
+    students_dir = Path(students_dir)
+    # 前回中断時に残った一時ファイルを片付ける
+    for tmp_path in students_dir.glob('.*' + TMP_SUFFIX):
+        tmp_path.unlink()
+
+    journal = MigrationJournal(students_dir, reset=reset_journal)
+    json_files = [students_dir / f for f in list_dataset_files(students_dir)]
+    pending = [path for path in json_files if not journal.is_done(path)]
+    resumed = len(json_files) - len(pending)
+    print(f'Found {len(json_files)} JSON files ({resumed} already done in journal)')
+
+    counts = {'migrated': 0, 'skipped': 0, 'error': 0}
+    workers = min(resolve_workers(workers), len(pending)) or 1
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(migrate_one, str(path), dataset_type) for path in pending]
+            for future in as_completed(futures):
+                result = future.result()
+                journal.record(result)
+                counts[result['status']] += 1
+                if result['status'] == 'migrated':
+                    print(f'Migrated {result["file"]} -> {result["dataset_name"]}')
+                elif result['status'] == 'error':
+                    print(f'Error migrating {result["file"]}: {result["error"]}')
+    finally:
+        journal.close()
+
+    print(f'\nMigration complete: {counts["migrated"]} migrated / {counts["skipped"]} already in new format'
+          f' / {counts["error"]} errors / {resumed} resumed from journal')
+    return counts
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='students/*.json を新しいフォーマット（A方式）に変換')
+    parser.add_argument('--bulk', action='store_true',
+                        help='並列・再開可能な一括移行モード（students/.migration_journal を使う）')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='--bulk で使うプロセス数（0 で CPU コア数、既定は 0）')
+    parser.add_argument('--reset-journal', action='store_true', help='ジャーナルを削除して最初から移行する')
+    parser.add_argument('--dir', default='students', help='対象ディレクトリ（既定は students）')
+    return parser.parse_args()
+
+
+def main(students_dir='students'):
     """メイン処理"""
-    students_dir = Path('students')
+    students_dir = Path(students_dir)
     
     if not students_dir.exists():
-        print('students/ directory not found')
+        print(f'{students_dir}/ directory not found')
         return
     
     # students/ 直下のすべての JSON ファイルを処理
     json_files = list(students_dir.glob('*.json'))
     
     if not json_files:
-        print('No JSON files found in students/')
+        print(f'No JSON files found in {students_dir}/')
         return
     
     print(f'Found {len(json_files)} JSON files')
@@ -100,6 +283,10 @@ def main():
     print(f'\nMigration complete: {migrated_count} files migrated')
 
 if __name__ == '__main__':
-    main()
+    args = parse_args()
+    if args.bulk:
+        bulk_migrate(args.dir, workers=args.workers, reset_journal=args.reset_journal)
+    else:
+        main(args.dir)
 
 
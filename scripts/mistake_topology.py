@@ -0,0 +1,514 @@
+#!/usr/bin/env python3
+"""
+誤答パストポロジー（mistake_topology.js の buildMistakeTopology）を疎な遷移カウントとして保持するビルダー
+
+buildMistakeTopology はダッシュボードの描画のたびに全ログの path を辿り直している。
+ここでは選択肢を整数 ID に置き換え（インターン）、次の配列として保持する。
+
+- ノード: 選択肢ごとの出現回数・反応時間の合計と件数・パス長の合計・概念タグ
+- (questionId, 選択肢) ごとのノード: 問題別に切り出すときに使う
+- エッジ: (questionId, 遷移元, 遷移先) の 3 つ組とその回数
+
+ログは追記分だけを足し込めるので、ログ件数が増えても計算し直す必要はない。
+結果は normalizeTopologyGraph を通した形で students/topology/<データセット>.json に書き出す。
+合計は JS と同じ順に足し込むので、JSON から作った結果は JS 版と浮動小数点まで一致する。
+
+更新方法:
+- JSON データセット: ダッシュボードと同じ規則でログを取り出して作り直す（内容のハッシュが同じなら何もしない）
+- セッションログ（session_log.py の <名前>.segments）: pipeline_common.update_from_session_log で
+  前回の読み込み位置から追記された log / session レコードだけを取り込む。遷移カウントからは
+  取り込み済みのログを取り除けないので、それを書き換えるレコードが現れたら全体から作り直す
+
+実行方法:
+python scripts/mistake_topology.py build students/quiz_log_dummy.json
+python scripts/mistake_topology.py update students/quiz_log_dummy.segments
+python scripts/mistake_topology.py query students/topology/quiz_log_dummy.json --question q001
+
+依存: numpy
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+
+from index_manifest import file_sha256
+from pipeline_common import (BATCH_LOGS, PARTS, SessionLogDataset, _is_number, atomic_write_json,
+                             update_from_session_log)
+from stats_core import _js_or, _js_truthy, extract_dashboard_logs
+
+TOPOLOGY_DIR_NAME = 'topology'
+
+
+def _node_key(value):
+    # JS の Map と同じく値そのものをキーにする（辞書やリストは JSON 文字列で代用）
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    return json.dumps(value, ensure_ascii=False, sort_keys=True)
+
+
+def is_mistake(log):
+    """log.correct === false || (log.selected && log.selected.correct === false)"""
+    if log.get('correct') is False:
+        return True
+    selected = log.get('selected')
+    return _js_truthy(selected) and isinstance(selected, dict) and selected.get('correct') is False
+
+
+def mistake_path(log):
+    """log.path || log.clicks.map(c => c.choiceId || c.id)"""
+    path = log.get('path')
+    if _js_truthy(path):
+        return path if isinstance(path, list) else None
+    clicks = log.get('clicks')
+    if not isinstance(clicks, list):
+        return []
+    return [_js_or(c.get('choiceId'), c.get('id')) if isinstance(c, dict) else None for c in clicks]
+
+
+class NodeTable:
+    """キーを整数 ID にインターンし、ID ごとの集計値を配列で持つ"""
+
+    def __init__(self):
+        self.keys = []
+        self.index = {}
+        self.frequency = np.zeros(0, dtype=np.int64)
+        self.path_length_sum = np.zeros(0, dtype=np.int64)
+        self.response_time_sum = np.zeros(0)
+        self.response_time_count = np.zeros(0, dtype=np.int64)
+        self.concepts = []
+
+    def __len__(self):
+        return len(self.keys)
+
+    def intern(self, key):
+        node_id = self.index.get(key)
+        if node_id is None:
+            node_id = self.index[key] = len(self.keys)
+            self.keys.append(key)
+            self.concepts.append({})
+        return node_id
+
+    def _grow(self):
+        missing = len(self.keys) - len(self.frequency)
+        if missing > 0:
+            self.frequency = np.concatenate([self.frequency, np.zeros(missing, dtype=np.int64)])
+            self.path_length_sum = np.concatenate([self.path_length_sum, np.zeros(missing, dtype=np.int64)])
+            self.response_time_sum = np.concatenate([self.response_time_sum, np.zeros(missing)])
+            self.response_time_count = np.concatenate([self.response_time_count,
+                                                       np.zeros(missing, dtype=np.int64)])
+
+    def accumulate(self, ids, path_lengths, response_times, concept_ids, concept_tuples):
+        """トークン（path 上の 1 ステップ）ごとの配列を足し込む"""
+        self._grow()
+        size = len(self.keys)
+        self.frequency += np.bincount(ids, minlength=size)
+        self.path_length_sum += np.bincount(ids, weights=path_lengths, minlength=size).astype(np.int64)
+        has_time = response_times > 0
+        # np.add.at は先頭から順に足すので、JS の reduce と同じ順序の合計になる
+        np.add.at(self.response_time_sum, ids[has_time], response_times[has_time])
+        self.response_time_count += np.bincount(ids[has_time], minlength=size)
+
+        # 概念タグは (ノード, タグの組) の初出順に追加する
+        has_concepts = concept_ids >= 0
+        if has_concepts.any():
+            codes = ids[has_concepts] * len(concept_tuples) + concept_ids[has_concepts]
+            unique, first = np.unique(codes, return_index=True)
+            for code in unique[np.argsort(first)]:
+                node_id, tuple_id = divmod(int(code), len(concept_tuples))
+                node_concepts = self.concepts[node_id]
+                for concept in concept_tuples[tuple_id]:
+                    node_concepts.setdefault(concept, None)
+
+    def merge(self, other, key_map=lambda key: key):
+        """他のテーブルを後ろに足す（other の ID → self の ID の配列を返す）"""
+        mapping = np.array([self.intern(key_map(key)) for key in other.keys], dtype=np.int64)
+        self._grow()
+        if len(mapping):
+            self.frequency[mapping] += other.frequency
+            self.path_length_sum[mapping] += other.path_length_sum
+            self.response_time_sum[mapping] += other.response_time_sum
+            self.response_time_count[mapping] += other.response_time_count
+            for node_id, concepts in zip(mapping, other.concepts):
+                for concept in concepts:
+                    self.concepts[node_id].setdefault(concept, None)
+        return mapping
+
+    def node(self, node_id, label):
+        """buildMistakeTopology のノード 1 件"""
+        frequency = int(self.frequency[node_id])
+        count = int(self.response_time_count[node_id])
+        node = {}
+        # JSON.stringify と同じく undefined の id / label は出力しない
+        if label is not None:
+            node['id'] = label
+            node['label'] = label
+        node['frequency'] = frequency
+        node['avgResponseTime'] = float(self.response_time_sum[node_id]) / count if count else 0
+        node['avgPathLength'] = int(self.path_length_sum[node_id]) / frequency if frequency else 0
+        node['concepts'] = list(self.concepts[node_id])
+        return node
+
+    def to_dict(self):
+        return {
+            'keys': self.keys,
+            'frequency': self.frequency.tolist(),
+            'path_length_sum': self.path_length_sum.tolist(),
+            'response_time_sum': self.response_time_sum.tolist(),
+            'response_time_count': self.response_time_count.tolist(),
+            'concepts': [list(c) for c in self.concepts]
+        }
+
+    @classmethod
+    def from_dict(cls, d, key_type=lambda key: key):
+        table = cls()
+        table.keys = [key_type(key) for key in d['keys']]
+        table.index = {key: i for i, key in enumerate(table.keys)}
+        table.frequency = np.asarray(d['frequency'], dtype=np.int64)
+        table.path_length_sum = np.asarray(d['path_length_sum'], dtype=np.int64)
+        table.response_time_sum = np.asarray(d['response_time_sum'], dtype=np.float64)
+        table.response_time_count = np.asarray(d['response_time_count'], dtype=np.int64)
+        table.concepts = [dict.fromkeys(c) for c in d['concepts']]
+        return table
+
+
+class MistakeTopology:
+    """誤答ログの path 遷移を整数 ID の疎なカウントとして持つ"""
+
+    def __init__(self):
+        self.questions = []
+        self.question_index = {}
+        self.nodes = NodeTable()
+        self.question_nodes = NodeTable()
+        self.edge_index = {}
+        self.edge_question = np.zeros(0, dtype=np.int64)
+        self.edge_from = np.zeros(0, dtype=np.int64)
+        self.edge_to = np.zeros(0, dtype=np.int64)
+        self.edge_count = np.zeros(0, dtype=np.int64)
+        self.logs = 0
+
+    def _intern_question(self, question_id):
+        index = self.question_index.get(question_id)
+        if index is None:
+            index = self.question_index[question_id] = len(self.questions)
+            self.questions.append(question_id)
+        return index
+
+    def add_logs(self, logs):
+        """ログを BATCH_LOGS 件ずつまとめて取り込む"""
+        batch = []
+        for log in logs:
+            batch.append(log)
+            if len(batch) >= BATCH_LOGS:
+                self._add_batch(batch)
+                batch = []
+        if batch:
+            self._add_batch(batch)
+
+    def add_sessions(self, sessions):
+        self.add_logs(log for session in sessions
+                      if isinstance(session, dict) and isinstance(session.get('logs'), list)
+                      for log in session['logs'])
+
+    def _add_batch(self, logs):
+        node_ids, pair_ids, token_logs = [], [], []
+        log_questions, log_lengths, log_times, log_concepts = [], [], [], []
+        concept_tuples, concept_index = [], {}
+        for log in logs:
+            if not isinstance(log, dict) or not is_mistake(log):
+                continue
+            path = mistake_path(log)
+            if not path:
+                continue
+            question_id = log.get('questionId')
+            question = self._intern_question(question_id if isinstance(question_id, str) else '')
+            concepts = _js_or(log.get('conceptTags'), log.get('concept_tags'), [])
+            concept_id = -1
+            if isinstance(concepts, list) and concepts:
+                key = tuple(_node_key(c) for c in concepts)
+                concept_id = concept_index.get(key)
+                if concept_id is None:
+                    concept_id = concept_index[key] = len(concept_tuples)
+                    concept_tuples.append(key)
+            response_time = _js_or(log.get('response_time'), log.get('response_time_ms'),
+                                   log.get('reaction_time'), 0)
+
+            log_number = len(log_questions)
+            log_questions.append(question)
+            log_lengths.append(len(path))
+            log_times.append(response_time if _is_number(response_time) else 0)
+            log_concepts.append(concept_id)
+            for step in path:
+                key = _node_key(step)
+                node_ids.append(self.nodes.intern(key))
+                pair_ids.append(self.question_nodes.intern((question, key)))
+                token_logs.append(log_number)
+        if not node_ids:
+            return
+
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        pair_ids = np.asarray(pair_ids, dtype=np.int64)
+        token_logs = np.asarray(token_logs, dtype=np.int64)
+        log_questions = np.asarray(log_questions, dtype=np.int64)
+        token_lengths = np.asarray(log_lengths, dtype=np.int64)[token_logs]
+        token_times = np.asarray(log_times, dtype=np.float64)[token_logs]
+        token_concepts = np.asarray(log_concepts, dtype=np.int64)[token_logs]
+        self.nodes.accumulate(node_ids, token_lengths, token_times, token_concepts, concept_tuples)
+        self.question_nodes.accumulate(pair_ids, token_lengths, token_times, token_concepts, concept_tuples)
+        self.logs += len(log_questions)
+
+        # 同じログ内で隣り合うトークンの組がエッジ path[i] -> path[i + 1]
+        same_log = token_logs[:-1] == token_logs[1:]
+        self._add_edges(log_questions[token_logs[:-1][same_log]],
+                        node_ids[:-1][same_log], node_ids[1:][same_log])
+
+    def _add_edges(self, questions, sources, targets, counts=None):
+        if not len(sources):
+            return
+        size = len(self.nodes)
+        codes = (questions * size + sources) * size + targets
+        unique, first, inverse = np.unique(codes, return_index=True, return_inverse=True)
+        totals = np.bincount(inverse, weights=counts, minlength=len(unique)).astype(np.int64)
+        edge_ids = np.empty(len(unique), dtype=np.int64)
+        new_edges = []
+        # 初出順に ID を振るので、エッジの並びは JS の Map の挿入順と同じになる
+        for i in np.argsort(first, kind='stable'):
+            question, rest = divmod(int(unique[i]), size * size)
+            key = (question, *divmod(rest, size))
+            edge_id = self.edge_index.get(key)
+            if edge_id is None:
+                edge_id = self.edge_index[key] = len(self.edge_index)
+                new_edges.append(key)
+            edge_ids[i] = edge_id
+        if new_edges:
+            added = np.asarray(new_edges, dtype=np.int64).reshape(-1, 3)
+            self.edge_question = np.concatenate([self.edge_question, added[:, 0]])
+            self.edge_from = np.concatenate([self.edge_from, added[:, 1]])
+            self.edge_to = np.concatenate([self.edge_to, added[:, 2]])
+            self.edge_count = np.concatenate([self.edge_count, np.zeros(len(added), dtype=np.int64)])
+        self.edge_count[edge_ids] += totals
+
+    def merge(self, other):
+        """他のトポロジーを後ろに足す"""
+        question_map = np.array([self._intern_question(q) for q in other.questions], dtype=np.int64)
+        node_map = self.nodes.merge(other.nodes)
+        self.question_nodes.merge(other.question_nodes,
+                                  key_map=lambda key: (int(question_map[key[0]]), key[1]))
+        if len(other.edge_count):
+            self._add_edges(question_map[other.edge_question], node_map[other.edge_from],
+                            node_map[other.edge_to], other.edge_count)
+        self.logs += other.logs
+        return self
+
+    def transition_matrix(self, question=None):
+        """
+        遷移回数の CSR 表現（indptr, indices, counts）を返す
+
+        行・列はノード ID。question を指定するとその問題のエッジだけを数える。
+        """
+        mask = np.ones(len(self.edge_count), dtype=bool)
+        if question is not None:
+            index = self.question_index.get(question)
+            mask = self.edge_question == (-1 if index is None else index)
+        sources, targets, counts = self.edge_from[mask], self.edge_to[mask], self.edge_count[mask]
+        size = len(self.nodes)
+        unique, inverse = np.unique(sources * size + targets, return_inverse=True)
+        totals = np.bincount(inverse, weights=counts, minlength=len(unique)).astype(np.int64)
+        rows, columns = np.divmod(unique, size)
+        indptr = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=size), out=indptr[1:])
+        return indptr, columns, totals
+
+    def graph(self, question=None):
+        """buildMistakeTopology と同じ形（nodes / edges）のグラフを返す"""
+        if question is None:
+            nodes = [self.nodes.node(i, self.nodes.keys[i]) for i in range(len(self.nodes))]
+            mask = np.ones(len(self.edge_count), dtype=bool)
+        else:
+            index = self.question_index.get(question)
+            if index is None:
+                return {'nodes': [], 'edges': []}
+            table = self.question_nodes
+            nodes = [table.node(i, key[1]) for i, key in enumerate(table.keys) if key[0] == index]
+            mask = self.edge_question == index
+
+        # 問題をまたいで同じ (遷移元, 遷移先) は 1 本にまとめ、最初に現れたエッジの位置に置く
+        edge_ids = np.flatnonzero(mask)
+        pairs = {}
+        for edge_id in edge_ids:
+            key = (int(self.edge_from[edge_id]), int(self.edge_to[edge_id]))
+            pairs[key] = pairs.get(key, 0) + int(self.edge_count[edge_id])
+        edges = []
+        for (source, target), count in pairs.items():
+            edge = {}
+            if self.nodes.keys[source] is not None:
+                edge['from'] = self.nodes.keys[source]
+            if self.nodes.keys[target] is not None:
+                edge['to'] = self.nodes.keys[target]
+            edge['weight'] = count
+            edge['frequency'] = count
+            edges.append(edge)
+        return {'nodes': nodes, 'edges': edges}
+
+    def to_dict(self):
+        return {
+            'logs': self.logs,
+            'questions': self.questions,
+            'nodes': self.nodes.to_dict(),
+            'question_nodes': self.question_nodes.to_dict(),
+            'edges': {
+                'question': self.edge_question.tolist(),
+                'from': self.edge_from.tolist(),
+                'to': self.edge_to.tolist(),
+                'count': self.edge_count.tolist()
+            }
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        topology = cls()
+        topology.logs = d['logs']
+        topology.questions = d['questions']
+        topology.question_index = {q: i for i, q in enumerate(topology.questions)}
+        topology.nodes = NodeTable.from_dict(d['nodes'])
+        topology.question_nodes = NodeTable.from_dict(d['question_nodes'], key_type=tuple)
+        topology.edge_question = np.asarray(d['edges']['question'], dtype=np.int64)
+        topology.edge_from = np.asarray(d['edges']['from'], dtype=np.int64)
+        topology.edge_to = np.asarray(d['edges']['to'], dtype=np.int64)
+        topology.edge_count = np.asarray(d['edges']['count'], dtype=np.int64)
+        topology.edge_index = {key: i for i, key in enumerate(zip(
+            topology.edge_question.tolist(), topology.edge_from.tolist(), topology.edge_to.tolist()))}
+        return topology
+
+
+def normalize_topology_graph(graph):
+    """normalizeTopologyGraph と同じ正規化（ノードの size とエッジの width を付ける）"""
+    if not graph or not graph.get('nodes'):
+        return graph
+    max_frequency = max(node['frequency'] for node in graph['nodes'])
+    max_weight = max(edge['weight'] for edge in graph['edges']) if graph['edges'] else 1
+    nodes = [dict(node,
+                  normalizedFrequency=node['frequency'] / max_frequency if max_frequency > 0 else 0,
+                  size=max(20, min(60, 20 + (node['frequency'] / max_frequency) * 40)))
+             for node in graph['nodes']]
+    edges = [dict(edge,
+                  normalizedWeight=edge['weight'] / max_weight if max_weight > 0 else 0,
+                  width=max(1, min(5, 1 + (edge['weight'] / max_weight) * 4)))
+             for edge in graph['edges']]
+    return {'nodes': nodes, 'edges': edges}
+
+
+class DatasetTopology(SessionLogDataset):
+    """1 データセット分のトポロジー（logs 由来と sessions 由来を分けて持つ）"""
+
+    def new_part(self):
+        return MistakeTopology()
+
+    def to_dict(self):
+        return {
+            'source': self.source,
+            'state': self.state,
+            'graph': normalize_topology_graph(self.combined().graph()),
+            'parts': {part: topology.to_dict() for part, topology in self.parts.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        dataset = cls(d['source'])
+        dataset.state = d.get('state', {})
+        dataset.parts = {part: MistakeTopology.from_dict(d['parts'][part]) for part in PARTS}
+        return dataset
+
+
+def topology_path_for(source_path):
+    """students/<名前>.json / .segments → students/topology/<名前>.json"""
+    source_path = Path(source_path)
+    name = source_path.stem if source_path.suffix in ('.json', '.segments') else source_path.name
+    return source_path.parent / TOPOLOGY_DIR_NAME / f'{name}.json'
+
+
+def load_topology(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return DatasetTopology.from_dict(json.load(f))
+
+
+def save_topology(dataset, path):
+    atomic_write_json(path, dataset.to_dict())
+
+
+def build_from_json(json_path):
+    """ダッシュボードと同じ規則でログを取り出してトポロジーを作る"""
+    json_path = Path(json_path)
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    dataset = DatasetTopology(json_path.name)
+    dataset.parts['logs'].add_logs(extract_dashboard_logs(data))
+    return dataset
+
+
+def command_build(source, output=None, force=False):
+    source = Path(source)
+    output = Path(output) if output else topology_path_for(source)
+    digest = file_sha256(source)
+    if not force and output.exists():
+        existing = load_topology(output)
+        if existing.state.get('sha256') == digest:
+            print(f'[OK] {output} は最新です')
+            return existing
+    dataset = build_from_json(source)
+    dataset.state['sha256'] = digest
+    save_topology(dataset, output)
+    topology = dataset.parts['logs']
+    print(f'[OK] {output} を作成しました（誤答ログ: {topology.logs} 件 / ノード: {len(topology.nodes)}'
+          f' / エッジ: {len(topology.edge_count)}）')
+    return dataset
+
+
+def command_update(source, output=None):
+    source = Path(source)
+    output = Path(output) if output else topology_path_for(source)
+    dataset = load_topology(output) if output.exists() else DatasetTopology(source.name)
+    applied = update_from_session_log(source, dataset)
+    save_topology(dataset, output)
+    print(f'[OK] {output} を更新しました（取り込んだレコード: {applied}）')
+    return dataset
+
+
+def command_query(path, question=None):
+    graph = normalize_topology_graph(load_topology(path).combined().graph(question))
+    print(json.dumps(graph, ensure_ascii=False, indent=2))
+    return graph
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='誤答パストポロジーの作成・更新・照会')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = sub.add_parser('build', help='JSON データセットからトポロジーを作る')
+    build_parser.add_argument('source')
+    build_parser.add_argument('-o', '--output')
+    build_parser.add_argument('--force', action='store_true', help='内容が同じでも作り直す')
+
+    update_parser = sub.add_parser('update', help='セッションログの追記分を取り込む')
+    update_parser.add_argument('source')
+    update_parser.add_argument('-o', '--output')
+
+    query_parser = sub.add_parser('query', help='正規化したグラフを表示する')
+    query_parser.add_argument('topology')
+    query_parser.add_argument('--question', help='questionId を指定するとその問題だけのグラフ')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.command == 'build':
+        command_build(args.source, args.output, args.force)
+    elif args.command == 'update':
+        command_update(args.source, args.output)
+    else:
+        command_query(args.topology, args.question)
+
+
+if __name__ == '__main__':
+    main()
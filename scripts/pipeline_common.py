@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+scripts/ の集計スクリプトで共通の処理
+
+- _is_number: JS の typeof value === 'number' に当たる判定（bool は数値として扱わない）
+- atomic_write_json: 一時ファイルに書いてから os.replace で置き換える。読み手（server.js の
+  静的配信や analytics_server.py）が書きかけのファイルを読むことはない
+- SessionLogDataset / update_from_session_log: session_log.py のセッションログから差分で
+  集計を更新する仕組み（rt_sketch.py / mistake_topology.py / concept_dependency.py が使う）
+
+セッションログからの更新では、前回の読み込み位置（state['cursor']）以降の log / session を
+logs 側・sessions 側の集計器に足し込み、reset_logs / reset_sessions では該当する側だけを空にする
+（reset_logs が置き換え後のログを持っていれば、空にした側にそれを足し込む）。
+集計器は値を取り除けないので、取り込み済みのログを書き換えるレコード（fields に logs を含む
+patch_session、logs / sessions / vector_test_sessions を置き換える meta）が現れたら、
+セッションログ全体を読み直して作り直す。
+"""
+
+import json
+import os
+from pathlib import Path
+
+from session_log import apply_record, iter_records_since
+
+PARTS = ('logs', 'sessions')
+BATCH_LOGS = 100000
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def atomic_write_json(path, value, **dump_options):
+    """
+    value を JSON として path に書き出す（一時ファイル経由で置き換え）
+
+    dump_options は json.dump にそのまま渡す（ensure_ascii の既定は False）。一時ファイル名には
+    プロセス ID を含めるので、複数のプロセスが同じファイルを書いても一時ファイルは衝突しない。
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    dump_options.setdefault('ensure_ascii', False)
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(value, f, **dump_options)
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return path
+
+
+class SessionLogDataset:
+    """
+    1 データセット分の集計（logs 由来と sessions 由来を分けて持つ）の基底クラス
+
+    サブクラスは new_part() で空の集計器を返す。集計器は add_logs(logs) / add_sessions(sessions) /
+    merge(other) を持つこと。state には JSON の内容ハッシュ（sha256）や、セッションログの
+    読み込み位置（cursor = [セグメント番号, バイト位置]）を記録する。
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.parts = {part: self.new_part() for part in PARTS}
+        self.state = {}
+
+    def new_part(self):
+        raise NotImplementedError
+
+    def combined(self):
+        combined = self.new_part()
+        for part in PARTS:
+            combined.merge(self.parts[part])
+        return combined
+
+
+def rewrites_ingested_logs(record):
+    """取り込み済みのログを書き換えるレコードか（集計器には差分で反映できない）"""
+    fields = record.get('fields') or {}
+    if record.get('op') == 'patch_session':
+        return 'logs' in fields
+    if record.get('op') == 'meta':
+        return any(key in fields for key in ('logs', 'sessions', 'vector_test_sessions'))
+    return False
+
+
+def _list(value):
+    return value if isinstance(value, list) else []
+
+
+def rebuild_from_session_log(directory, dataset):
+    """セッションログ全体を読み直して集計を作り直す（読み直したレコード数を返す）"""
+    data = {}
+    cursor = None
+    applied = 0
+    for record, cursor in iter_records_since(directory, None):
+        apply_record(data, record)
+        applied += 1
+    vector_test_sessions = data.get('vector_test_sessions')
+    sessions = _list(vector_test_sessions.get('sessions') if isinstance(vector_test_sessions, dict) else None)
+    dataset.parts = {part: dataset.new_part() for part in PARTS}
+    dataset.parts['logs'].add_logs(_list(data.get('logs')))
+    dataset.parts['sessions'].add_sessions(sessions + _list(data.get('sessions')))
+    dataset.state['cursor'] = cursor
+    return applied
+
+
+def update_from_session_log(directory, dataset, batch_logs=BATCH_LOGS):
+    """
+    セッションログの前回位置以降のレコードを取り込む
+
+    ログに影響しない meta / patch_session は位置だけ進め、取り込み済みのログを書き換えるものが
+    あればセッションログ全体から作り直す。
+
+    Returns:
+        int: 取り込んだレコード数（作り直した場合は読み直したレコード数）
+    """
+    applied = 0
+    pending = {'logs': [], 'sessions': []}
+
+    def flush():
+        dataset.parts['logs'].add_logs(pending['logs'])
+        dataset.parts['sessions'].add_sessions(pending['sessions'])
+        pending['logs'], pending['sessions'] = [], []
+
+    for record, cursor in iter_records_since(directory, dataset.state.get('cursor')):
+        op = record.get('op')
+        if rewrites_ingested_logs(record):
+            print(f'[注意] 取り込み済みのログを書き換えるレコード（{op}）があるため、セッションログ全体から作り直します')
+            return rebuild_from_session_log(directory, dataset)
+        if op == 'log':
+            pending['logs'].append(record['log'])
+        elif op == 'session':
+            pending['sessions'].append(record['session'])
+        elif op in ('reset_logs', 'reset_sessions'):
+            flush()
+            dataset.parts['logs' if op == 'reset_logs' else 'sessions'] = dataset.new_part()
+            if op == 'reset_logs':
+                pending['logs'].extend(_list(record.get('logs')))
+        elif op not in ('meta', 'patch_session'):
+            raise ValueError(f'未知のレコードです: {op}')
+        if len(pending['logs']) + len(pending['sessions']) >= batch_logs:
+            flush()
+        dataset.state['cursor'] = cursor
+        applied += 1
+    flush()
+    return applied
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+students/*.json と index.json の事前圧縮サイドカー（.gz / .br）を作成するスクリプト
+
+データセットは indent=2 で書かれ、同じキーが繰り返されるので非常によく圧縮できるが、
+/students の静的配信はそのまま返している。ここでは <ファイル名>.gz（と brotli があれば
+<ファイル名>.br）を作成し、server.js の /students はブラウザの Accept-Encoding に応じて
+それを返す（nginx の gzip_static / brotli_static などもそのまま使える）。
+
+- サイドカーの mtime は元ファイルと同じにしておき、一致していれば作り直さない
+  （元ファイルが更新されると mtime がずれるので、配信側も古いサイドカーを使わない）
+- 元ファイルが無くなったサイドカーは削除する
+- --compact を付けると、先にデータセットをインデントなしの JSON に書き直す
+  （バイト位置や内容ハッシュが変わるので、その後 index.json を再生成すること）
+
+実行方法:
+python scripts/precompress.py  # students 内の全データセットと index.json
+python scripts/precompress.py --compact  # インデントなしに書き直してから圧縮
+python scripts/precompress.py students/quiz_log_dummy.json --no-brotli
+
+依存: brotli（任意。無ければ .gz だけを作成）
+"""
+
+import argparse
+import gzip
+import json
+import os
+from pathlib import Path
+
+from index_builder import INDEX_NAME, json_dump_options, list_dataset_files
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP_SUFFIX = '.gz'
+BROTLI_SUFFIX = '.br'
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 9
+
+
+def _encoders(use_brotli=True):
+    encoders = [(GZIP_SUFFIX, lambda data: gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0))]
+    if use_brotli and brotli is not None:
+        encoders.append((BROTLI_SUFFIX, lambda data: brotli.compress(data, quality=BROTLI_QUALITY)))
+    return encoders
+
+
+def _sidecar_path(path, suffix):
+    return path.with_name(path.name + suffix)
+
+
+def _is_fresh(sidecar, stat):
+    try:
+        return os.stat(sidecar).st_mtime_ns == stat.st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+
+def precompress_file(path, use_brotli=True):
+    """
+    path の圧縮サイドカーを、無いか古い場合だけ作成する
+
+    Returns:
+        list: 作成したサイドカーの拡張子
+    """
+    path = Path(path)
+    stat = os.stat(path)
+    pending = [(suffix, encode) for suffix, encode in _encoders(use_brotli)
+               if not _is_fresh(_sidecar_path(path, suffix), stat)]
+    if not use_brotli or brotli is None:
+        # .br を作らない場合、古い .br が残っていると配信側が使わないだけなので削除しておく
+        stale_br = _sidecar_path(path, BROTLI_SUFFIX)
+        if stale_br.exists() and not _is_fresh(stale_br, stat):
+            os.remove(stale_br)
+    if not pending:
+        return []
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    if os.stat(path).st_mtime_ns != stat.st_mtime_ns:
+        # 読み込み中に更新された。次回の実行（または watch_index.py の次のイベント）で作り直す
+        return []
+
+    written = []
+    for suffix, encode in pending:
+        sidecar = _sidecar_path(path, suffix)
+        tmp_path = sidecar.with_name(sidecar.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(encode(data))
+        os.utime(tmp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        os.replace(tmp_path, sidecar)
+        written.append(suffix)
+    return written
+
+
+def prune_precompressed(directory):
+    """元ファイルが無くなったサイドカーを削除し、削除数を返す"""
+    removed = 0
+    for name in os.listdir(directory):
+        for suffix in (GZIP_SUFFIX, BROTLI_SUFFIX):
+            if name.endswith('.json' + suffix) and not os.path.exists(os.path.join(directory, name[:-len(suffix)])):
+                os.remove(os.path.join(directory, name))
+                removed += 1
+    return removed
+
+
+def precompress_students(students_dir, use_brotli=True):
+    """students 内の全データセットと index.json を圧縮し、(作成したファイル数, 削除数) を返す"""
+    names = list_dataset_files(students_dir)
+    if (students_dir / INDEX_NAME).exists():
+        names.append(INDEX_NAME)
+    written = sum(1 for name in names if precompress_file(students_dir / name, use_brotli))
+    return written, prune_precompressed(students_dir)
+
+
+def compact_json_file(path):
+    """JSON ファイルをインデントなしに書き直す（一時ファイル経由で置き換え）。書き直したら True"""
+    path = Path(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    body = json.dumps(data, **json_dump_options(compact=True)).encode('utf-8')
+    if body == path.read_bytes():
+        return False
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(body)
+    os.replace(tmp_path, path)
+    return True
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='students のデータセットと index.json の .gz / .br を作成する')
+    parser.add_argument('files', nargs='*', help='対象の JSON（省略時は students 内の全データセットと index.json）')
+    parser.add_argument('--compact', action='store_true', help='先にデータセットをインデントなしの JSON に書き直す')
+    parser.add_argument('--no-brotli', action='store_true', help='brotli があっても .br を作らない')
+    return parser.parse_args()
+
+
+def main(files=None, compact=False, use_brotli=True):
+    students_dir = Path(__file__).parent.parent / 'students'
+    if files:
+        paths = [Path(f) for f in files]
+    else:
+        paths = [students_dir / f for f in list_dataset_files(students_dir)]
+        if (students_dir / INDEX_NAME).exists():
+            paths.append(students_dir / INDEX_NAME)
+    if use_brotli and brotli is None:
+        print('[警告] brotli が見つからないため .gz だけを作成します（pip install brotli）')
+
+    rewritten = 0
+    for path in paths:
+        try:
+            before = os.path.getsize(path)
+            if compact and path.name != INDEX_NAME and compact_json_file(path):
+                rewritten += 1
+            written = precompress_file(path, use_brotli)
+        except (OSError, ValueError) as e:
+            print(f'[警告] {path.name} の圧縮に失敗しました: {e}')
+            continue
+        sizes = ' / '.join(f'{suffix}: {os.path.getsize(_sidecar_path(path, suffix)):,}'
+                           for suffix, _ in _encoders(use_brotli))
+        state = '作成' if written else '変更なし'
+        print(f'[OK] {path.name}（元: {before:,} → {os.path.getsize(path):,} / {sizes} バイト、{state}）')
+
+    if not files:
+        removed = prune_precompressed(students_dir)
+        if removed:
+            print(f'[OK] 元ファイルが無くなったサイドカーを {removed} 個削除しました')
+    if rewritten:
+        print(f'[注意] {rewritten} 個のデータセットを書き直しました。index.json を再生成してください')
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    main(args.files, compact=args.compact, use_brotli=not args.no_brotli)
@@ -4,15 +4,50 @@ students フォルダ内の JSON ファイルから index.json を自動生成
 
 実行方法:ffahj
 python scripts/regenerate_index.py
+python scripts/regenerate_index.py --incremental  # 変更されたファイルだけを再解析
+python scripts/regenerate_index.py --workers 8  # 8 プロセスで並列に解析
+python scripts/regenerate_index.py --compact --precompress  # インデントなしで書き、.gz / .br も作る
 """
 
+import argparse
 import json
-import os
 from pathlib import Path
 from datetime import datetime
 
+from index_builder import build_entries, list_dataset_files, write_index
+from index_manifest import IndexManifest
+from precompress import precompress_students
 
-def main():
+
+def build_dataset_entry(json_file, json_path):
+    """1 ファイル分の index.json エントリを作成"""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    # dataset_name を取得
+    dataset_name = data.get('dataset_name') or json_file.replace('.json', '')
+    dataset_type = data.get('type') or 'class'
+
+    return {
+        'file': json_file,
+        'dataset_name': dataset_name,
+        'type': dataset_type
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='students/index.json を再生成')
+    parser.add_argument('--incremental', action='store_true',
+                        help='マニフェストを使い、変更されたファイルだけを再解析する')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='解析に使うプロセス数（0 で CPU コア数、既定は 1 = 直列）')
+    parser.add_argument('--compact', action='store_true', help='index.json をインデントなしで書く')
+    parser.add_argument('--precompress', action='store_true',
+                        help='index.json と各データセットの .gz / .br サイドカーを作成する')
+    return parser.parse_args()
+
+
+def main(incremental=False, workers=1, compact=False, precompress=False):
     print('students/index.json を再生成中...')
     
     script_dir = Path(__file__).parent
@@ -24,36 +59,29 @@ def main():
         return
     
     # students フォルダ内の JSON ファイルをスキャン
-    json_files = [f for f in os.listdir(students_dir) if f.endswith('.json') and f != 'index.json']
+    json_files = list_dataset_files(students_dir)
     
+    manifest = IndexManifest(students_dir, 'regenerate_index') if incremental else None
     datasets = []
     
-    for json_file in json_files:
-        json_path = students_dir / json_file
-        try:
-            with open(json_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                
-                # dataset_name を取得
-                dataset_name = data.get('dataset_name') or json_file.replace('.json', '')
-                dataset_type = data.get('type') or 'class'
-                
-                datasets.append({
-                    'file': json_file,
-                    'dataset_name': dataset_name,
-                    'type': dataset_type
-                })
-        except Exception as e:
-            print(f'[警告] {json_file} の読み込みに失敗しました: {e}')
+    built = build_entries(students_dir, json_files, build_dataset_entry, workers=workers, manifest=manifest)
+    for json_file, ok, result in built:
+        if ok:
+            datasets.append(result)
+        else:
+            print(f'[警告] {json_file} の読み込みに失敗しました: {result}')
+    
+    if manifest:
+        removed = manifest.prune(json_files)
+        manifest.save()
+        print(f'[差分] 再利用: {manifest.hits} / 再解析: {manifest.misses} / 削除: {removed}')
     
     # index.json を生成
-    index_data = {
-        'datasets': datasets
-    }
+    index_path = write_index(students_dir, datasets, compact=compact)
     
-    index_path = students_dir / 'index.json'
-    with open(index_path, 'w', encoding='utf-8') as f:
-        json.dump(index_data, f, ensure_ascii=False, indent=2)
+    if precompress:
+        written, removed = precompress_students(students_dir)
+        print(f'[OK] 圧縮サイドカーを {written} 個のファイルについて作成しました（削除: {removed}）')
     
     print(f'[OK] {index_path} を更新しました（{len(datasets)} 個のデータセット）')
     
@@ -64,5 +92,6 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    args = parse_args()
+    main(incremental=args.incremental, workers=args.workers, compact=args.compact, precompress=args.precompress)
 
@@ -2,96 +2,138 @@
 # -*- coding: utf-8 -*-
 """
 students/index.json を再生成し、demo_project_02_logs.json と demo_project_03_logs.json を追加
+
+実行方法:
+python scripts/regenerate_index_with_demo_logs.py
+python scripts/regenerate_index_with_demo_logs.py --incremental  # 変更されたファイルだけを再解析
+python scripts/regenerate_index_with_demo_logs.py --summaries  # サマリを事前計算してキーを記録する
+python scripts/regenerate_index_with_demo_logs.py --compact --precompress  # インデントなしで書き、.gz / .br も作る
+
+--summaries を付けると、summary_cache.py でダッシュボードのサマリを事前計算し、
+データセットに summary: {key, path} を記録する（regenerate_index_with_sessions.py --summaries と同じ。numpy が必要）。
 """
 
+import argparse
 import json
+from functools import partial
 from pathlib import Path
 from datetime import datetime
 
-def main():
+from index_builder import write_index
+from index_manifest import IndexManifest
+from precompress import precompress_students
+
+def build_quiz_log_entry(path):
+    """quiz_log_dummy.json の vector_test_sessions からエントリを作成"""
+    with open(path, 'r', encoding='utf-8') as f:
+        quiz_log_data = json.load(f)
+    
+    if 'vector_test_sessions' in quiz_log_data and 'sessions' in quiz_log_data['vector_test_sessions']:
+        sessions = quiz_log_data['vector_test_sessions']['sessions']
+        session_list = []
+        for idx, session in enumerate(sessions):
+            session_list.append({
+                "session_id": session.get("session_id", f"session_{idx:03d}"),
+                "index": idx,
+                "date": session.get("generated_at", session.get("created_at", ""))
+            })
+        
+        return {
+            "file": "quiz_log_dummy.json",
+            "dataset_name": "quiz_log_dummy",
+            "type": "class",
+            "sessions": session_list
+        }
+    return None
+
+def build_demo_entry(file_name, dataset_name, path):
+    """demo_project_0X_logs.json の sessions からエントリを作成"""
+    with open(path, 'r', encoding='utf-8') as f:
+        demo_data = json.load(f)
+    
+    if 'sessions' in demo_data:
+        sessions = demo_data['sessions']
+        session_list = []
+        for idx, session in enumerate(sessions):
+            session_list.append({
+                "session_id": session.get("session_id", f"session_{idx:03d}"),
+                "index": idx,
+                "date": session.get("generated_at", "")
+            })
+        
+        return {
+            "file": file_name,
+            "dataset_name": dataset_name,
+            "type": "class",
+            "sessions": session_list
+        }
+    return None
+
+def build_with_summary(build, path):
+    """build(path) のエントリに、事前計算したサマリの {key, path} を加える"""
+    entry = build(path)
+    if entry:
+        # summary_cache は numpy に依存するので、--summaries のときだけ読み込む
+        from summary_cache import materialize_summary
+        entry['summary'], _ = materialize_summary(path)
+    return entry
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='students/index.json を demo_project ログ込みで再生成')
+    parser.add_argument('--incremental', action='store_true',
+                        help='マニフェストを使い、変更されたファイルだけを再解析する')
+    parser.add_argument('--summaries', action='store_true',
+                        help='ダッシュボードのサマリを students/summaries/ に事前計算し、キーを index.json に記録する')
+    parser.add_argument('--compact', action='store_true', help='index.json をインデントなしで書く')
+    parser.add_argument('--precompress', action='store_true',
+                        help='index.json と各データセットの .gz / .br サイドカーを作成する')
+    return parser.parse_args()
+
+def main(incremental=False, summaries=False, compact=False, precompress=False):
     script_dir = Path(__file__).parent
     project_root = script_dir.parent
     students_dir = project_root / 'students'
-    index_path = students_dir / 'index.json'
     
+    # 既存の quiz_log_dummy.json と demo_project_02/03 のログを順に追加
+    targets = [
+        ('quiz_log_dummy.json', build_quiz_log_entry),
+        ('demo_project_02_logs.json', partial(build_demo_entry, 'demo_project_02_logs.json', 'demo_project_02')),
+        ('demo_project_03_logs.json', partial(build_demo_entry, 'demo_project_03_logs.json', 'demo_project_03'))
+    ]
+    
+    builder = 'regenerate_index_with_demo_logs' + (':summaries' if summaries else '')
+    manifest = IndexManifest(students_dir, builder) if incremental else None
     datasets = []
+    existing_files = []
     
-    # 既存の quiz_log_dummy.json を読み込む
-    quiz_log_path = students_dir / 'quiz_log_dummy.json'
-    if quiz_log_path.exists():
-        with open(quiz_log_path, 'r', encoding='utf-8') as f:
-            quiz_log_data = json.load(f)
-        
-        if 'vector_test_sessions' in quiz_log_data and 'sessions' in quiz_log_data['vector_test_sessions']:
-            sessions = quiz_log_data['vector_test_sessions']['sessions']
-            session_list = []
-            for idx, session in enumerate(sessions):
-                session_list.append({
-                    "session_id": session.get("session_id", f"session_{idx:03d}"),
-                    "index": idx,
-                    "date": session.get("generated_at", session.get("created_at", ""))
-                })
-            
-            datasets.append({
-                "file": "quiz_log_dummy.json",
-                "dataset_name": "quiz_log_dummy",
-                "type": "class",
-                "sessions": session_list
-            })
+    for file_name, build in targets:
+        path = students_dir / file_name
+        if not path.exists():
+            continue
+        existing_files.append(file_name)
+        if summaries:
+            build = partial(build_with_summary, build)
+        entry = manifest.get_or_build(file_name, path, build) if manifest else build(path)
+        if entry:
+            datasets.append(entry)
     
-    # demo_project_02_logs.json を追加
-    demo02_path = students_dir / 'demo_project_02_logs.json'
-    if demo02_path.exists():
-        with open(demo02_path, 'r', encoding='utf-8') as f:
-            demo02_data = json.load(f)
-        
-        if 'sessions' in demo02_data:
-            sessions = demo02_data['sessions']
-            session_list = []
-            for idx, session in enumerate(sessions):
-                session_list.append({
-                    "session_id": session.get("session_id", f"session_{idx:03d}"),
-                    "index": idx,
-                    "date": session.get("generated_at", "")
-                })
-            
-            datasets.append({
-                "file": "demo_project_02_logs.json",
-                "dataset_name": "demo_project_02",
-                "type": "class",
-                "sessions": session_list
-            })
+    if manifest:
+        removed = manifest.prune(existing_files)
+        manifest.save()
+        print(f"[差分] 再利用: {manifest.hits} / 再解析: {manifest.misses} / 削除: {removed}")
     
-    # demo_project_03_logs.json を追加
-    demo03_path = students_dir / 'demo_project_03_logs.json'
-    if demo03_path.exists():
-        with open(demo03_path, 'r', encoding='utf-8') as f:
-            demo03_data = json.load(f)
-        
-        if 'sessions' in demo03_data:
-            sessions = demo03_data['sessions']
-            session_list = []
-            for idx, session in enumerate(sessions):
-                session_list.append({
-                    "session_id": session.get("session_id", f"session_{idx:03d}"),
-                    "index": idx,
-                    "date": session.get("generated_at", "")
-                })
-            
-            datasets.append({
-                "file": "demo_project_03_logs.json",
-                "dataset_name": "demo_project_03",
-                "type": "class",
-                "sessions": session_list
-            })
+    if summaries:
+        from summary_cache import evict_stale_summaries
+        removed = evict_stale_summaries(students_dir, [ds['summary']['key'] for ds in datasets if 'summary' in ds])
+        if removed:
+            print(f"[OK] 古くなったサマリを {removed} 個削除しました")
     
     # index.json を生成
-    index_data = {
-        "datasets": datasets
-    }
+    write_index(students_dir, datasets, compact=compact)
     
-    with open(index_path, 'w', encoding='utf-8') as f:
-        json.dump(index_data, f, ensure_ascii=False, indent=2)
+    if precompress:
+        written, removed = precompress_students(students_dir)
+        print(f"[OK] 圧縮サイドカーを {written} 個のファイルについて作成しました（削除: {removed}）")
     
     print(f"[OK] index.json を再生成しました")
     print(f"  データセット数: {len(datasets)}")
@@ -100,5 +142,7 @@ def main():
         print(f"    - {ds['dataset_name']}: {session_count} セッション")
 
 if __name__ == '__main__':
-    main()
+    args = parse_args()
+    main(incremental=args.incremental, summaries=args.summaries, compact=args.compact,
+         precompress=args.precompress)
 
@@ -4,13 +4,51 @@ students フォルダ内の JSON ファイルから index.json を自動生成
 
 実行方法:
 python scripts/regenerate_index_with_sessions.py
+python scripts/regenerate_index_with_sessions.py --stream  # ログ本体を展開せずに抽出
+python scripts/regenerate_index_with_sessions.py --incremental  # 変更されたファイルだけを再解析
+python scripts/regenerate_index_with_sessions.py --workers 8  # 8 プロセスで並列に解析
+python scripts/regenerate_index_with_sessions.py --shards  # セッションごとのシャードも書き出す
+python scripts/regenerate_index_with_sessions.py --byte-ranges  # セッションのバイト位置を記録する
+python scripts/regenerate_index_with_sessions.py --summaries  # サマリを事前計算してキーを記録する
+python scripts/regenerate_index_with_sessions.py --compact --precompress  # インデントなしで書き、.gz / .br も作る
+
+--shards を付けると、各セッションを students/shards/<ファイル名>/<index>.json に 1 ファイルずつ書き出し、
+index.json のセッション情報に shard: {path, size}（students からの相対パスとバイト数）を記録する。
+1 セッションだけを表示するときは、データセット全体ではなくそのシャードだけを読めばよい
+（DatasetLoader.loadSession を参照）。
+
+--byte-ranges を付けると、ファイルを分割せずに、各セッションが students/<ファイル名> の中で
+占めるバイト範囲を byte_range: {offset, length} として、データセットにはファイルのバイト数 size を記録する。
+Range リクエストに対応したサーバー（express.static など）からは、その範囲だけを取得すれば
+1 セッションを読める。size が実際のファイルと異なる場合（index.json の生成後に更新された場合）は
+クライアント側でデータセット全体の読み込みに戻る。
+
+--summaries を付けると、summary_cache.py でダッシュボードのサマリを内容ハッシュごとに事前計算し、
+データセットに summary: {key, path} を記録する。参照されなくなったサマリは削除する（numpy が必要）。
+
+--compact を付けると index.json をインデントなしで書き、--precompress を付けると index.json と
+各データセットの .gz / .br サイドカーを precompress.py で作成する（変更のないファイルは作り直さない）。
 """
 
+import argparse
 import json
 import os
+import shutil
+from functools import partial
 from pathlib import Path
 from datetime import datetime
 
+from index_builder import build_entries, list_dataset_files, write_index
+from index_manifest import IndexManifest
+from json_stream import JsonStreamReader
+from precompress import precompress_students
+
+# セッション情報の抽出に必要なキー
+DATASET_KEYS = ('dataset_name', 'type')
+SESSION_KEYS = ('session_id', 'generated_at', 'timestamp_start', 'created_at')
+SESSION_LOG_KEYS = ('logs', 'answer_logs')
+SHARDS_DIR_NAME = 'shards'
+
 
 def extract_sessions_from_dataset(json_path, data):
     """
@@ -60,7 +98,284 @@ def extract_sessions_from_dataset(json_path, data):
     return sessions
 
 
-def main():
+def session_array_path(data):
+    """extract_sessions_from_dataset() と同じ優先順位で、セッション配列のキーのパスを返す"""
+    if 'vector_test_sessions' in data and 'sessions' in data['vector_test_sessions']:
+        return ('vector_test_sessions', 'sessions')
+    if 'sessions' in data and isinstance(data['sessions'], list):
+        return ('sessions',)
+    return None
+
+
+def _iter_array_at(reader, key_path):
+    """key_path の配列の要素インデックスを順に返す（要素は呼び出し側が消費する）"""
+    if not key_path:
+        if reader.peek() != '[':
+            reader.skip_value()
+            return
+        yield from reader.iter_array()
+        return
+    if reader.peek() != '{':
+        reader.skip_value()
+        return
+    for key in reader.iter_object():
+        if key == key_path[0]:
+            yield from _iter_array_at(reader, key_path[1:])
+        else:
+            reader.skip_value()
+
+
+def iter_session_values(json_path, key_path):
+    """key_path の配列の要素（セッション）を 1 つずつストリームで読み込んで返す"""
+    with open(json_path, 'rb') as f:
+        reader = JsonStreamReader(f)
+        for _ in _iter_array_at(reader, key_path):
+            yield reader.read_value()
+
+
+def iter_session_spans(json_path, key_path):
+    """
+    key_path の配列の要素（セッション）ごとに、ファイル内のバイト位置 (offset, length) を返す
+
+    JSON 配列の要素はそれ自体が連続した 1 つの JSON 値なので、この範囲だけを切り出しても
+    単独で解析できる。ファイルを書き換える必要はない。
+    """
+    with open(json_path, 'rb') as f:
+        reader = JsonStreamReader(f)
+        for _ in _iter_array_at(reader, key_path):
+            reader.peek()
+            start = reader.offset
+            reader.skip_value()
+            yield start, reader.offset - start
+
+
+def shard_dir_for(json_path):
+    """students/<名前>.json → students/shards/<名前>/"""
+    json_path = Path(json_path)
+    return json_path.parent / SHARDS_DIR_NAME / json_path.stem
+
+
+def write_session_shards(json_path, sessions, session_values):
+    """
+    セッションを 1 つずつシャードファイルに書き出し、sessions[index] に shard を記録する
+
+    シャードは一時ファイルに書いてから置き換えるため、読み込み中のクライアントが
+    書きかけのファイルを読むことはない。セッション数が減った場合の古いシャードは削除する。
+    """
+    json_path = Path(json_path)
+    shard_dir = shard_dir_for(json_path)
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    written = set()
+    for index, session in enumerate(session_values):
+        name = f'{index}.json'
+        body = json.dumps(session, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        tmp_path = shard_dir / f'{name}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(body)
+        os.replace(tmp_path, shard_dir / name)
+        sessions[index]['shard'] = {
+            'path': f'{SHARDS_DIR_NAME}/{json_path.stem}/{name}',
+            'size': len(body)
+        }
+        written.add(name)
+    for name in os.listdir(shard_dir):
+        if name not in written:
+            os.remove(shard_dir / name)
+
+
+def prune_shards(students_dir, json_files):
+    """データセットが削除された（またはセッションが無くなった）シャードのフォルダを削除"""
+    shards_dir = students_dir / SHARDS_DIR_NAME
+    if not shards_dir.is_dir():
+        return 0
+    stems = {Path(json_file).stem for json_file in json_files}
+    removed = 0
+    for name in os.listdir(shards_dir):
+        if name not in stems:
+            shutil.rmtree(shards_dir / name)
+            removed += 1
+    return removed
+
+
+def _read_first_log_skeleton(reader):
+    """ログ配列を読み進め、先頭ログの timestamp だけを残した配列を返す"""
+    skeleton = []
+    for index in reader.iter_array():
+        if index == 0 and reader.peek() == '{':
+            first_log = {}
+            for key in reader.iter_object():
+                if key == 'timestamp':
+                    first_log['timestamp'] = reader.read_value()
+                else:
+                    reader.skip_value()
+            skeleton.append(first_log)
+        elif index == 0:
+            skeleton.append(reader.read_value())
+        else:
+            reader.skip_value()
+    return skeleton
+
+
+def _read_session_skeleton(reader):
+    """セッションからセッション情報の抽出に必要なキーだけを読み込む"""
+    if reader.peek() != '{':
+        reader.skip_value()
+        return None
+    session = {}
+    for key in reader.iter_object():
+        if key in SESSION_KEYS:
+            session[key] = reader.read_value()
+        elif key in SESSION_LOG_KEYS and reader.peek() == '[':
+            session[key] = _read_first_log_skeleton(reader)
+        else:
+            reader.skip_value()
+    return session
+
+
+def _read_sessions_skeleton(reader):
+    if reader.peek() != '[':
+        reader.skip_value()
+        return []
+    return [_read_session_skeleton(reader) for _ in reader.iter_array()]
+
+
+def load_dataset_skeleton(json_path):
+    """
+    データセットをストリームで読み、index 生成に必要な骨格だけを返す
+
+    ログ本体はオブジェクトを構築せずに読み飛ばすため、メモリ使用量は
+    ログ件数ではなくセッション数にのみ比例する。返り値は
+    extract_sessions_from_dataset() にそのまま渡せる。
+
+    Returns:
+        dict: dataset_name / type / vector_test_sessions.sessions / sessions のみを含む辞書
+    """
+    data = {}
+    with open(json_path, 'rb') as f:
+        reader = JsonStreamReader(f)
+        if reader.peek() != '{':
+            raise ValueError('トップレベルがオブジェクトではありません')
+        for key in reader.iter_object():
+            if key in DATASET_KEYS:
+                data[key] = reader.read_value()
+            elif key == 'sessions':
+                data['sessions'] = _read_sessions_skeleton(reader)
+            elif key == 'vector_test_sessions' and reader.peek() == '{':
+                vector_test_sessions = {}
+                for vts_key in reader.iter_object():
+                    if vts_key == 'sessions':
+                        vector_test_sessions['sessions'] = _read_sessions_skeleton(reader)
+                    else:
+                        reader.skip_value()
+                data['vector_test_sessions'] = vector_test_sessions
+            else:
+                reader.skip_value()
+    return data
+
+
+def load_dataset(json_path, stream=False):
+    """データセットを読み込む（stream=True ならログ本体を展開しない）"""
+    if stream:
+        return load_dataset_skeleton(json_path)
+    with open(json_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def build_dataset_entry(json_file, json_path, stream=False, shards=False, byte_ranges=False, summaries=False):
+    """
+    1 ファイル分の index.json エントリを作成
+
+    shards=True ならセッションのシャードも書き出し、byte_ranges=True ならセッションのバイト範囲を記録する。
+    summaries=True ならサマリを事前計算してキーを記録する。
+    """
+    data = load_dataset(json_path, stream=stream)
+    
+    # dataset_name を取得
+    dataset_name = data.get('dataset_name') or json_file.replace('.json', '')
+    dataset_type = data.get('type') or 'class'
+    
+    # セッション情報を抽出
+    sessions = extract_sessions_from_dataset(json_path, data)
+    
+    if shards:
+        if sessions:
+            key_path = session_array_path(data)
+            if stream:
+                session_values = iter_session_values(json_path, key_path)
+            else:
+                session_values = data[key_path[0]] if len(key_path) == 1 else data[key_path[0]][key_path[1]]
+            write_session_shards(json_path, sessions, session_values)
+        elif shard_dir_for(json_path).is_dir():
+            shutil.rmtree(shard_dir_for(json_path))
+    
+    if byte_ranges and sessions:
+        # 範囲の走査中にファイルが置き換えられても検出できるよう、走査前のサイズを記録する
+        size = os.path.getsize(json_path)
+        spans = iter_session_spans(json_path, session_array_path(data))
+        for session, (offset, length) in zip(sessions, spans):
+            session['byte_range'] = {'offset': offset, 'length': length}
+    
+    dataset_entry = {
+        'file': json_file,
+        'dataset_name': dataset_name,
+        'type': dataset_type
+    }
+    
+    if byte_ranges and sessions:
+        dataset_entry['size'] = size
+    
+    if summaries:
+        # summary_cache は numpy に依存するので、--summaries のときだけ読み込む
+        from summary_cache import materialize_summary
+        dataset_entry['summary'], _ = materialize_summary(json_path)
+    
+    # セッションがある場合は追加
+    if sessions:
+        dataset_entry['sessions'] = sessions
+    
+    return dataset_entry
+
+
+def manifest_builder_name(shards=False, byte_ranges=False, summaries=False):
+    """マニフェストの区画名（シャードやバイト範囲、サマリの有無でエントリの形が変わるので区画を分ける）"""
+    builder = 'regenerate_index_with_sessions'
+    if shards:
+        builder += ':shards'
+    if byte_ranges:
+        builder += ':byte_ranges'
+    if summaries:
+        builder += ':summaries'
+    return builder
+
+
+def evict_summaries(students_dir, datasets):
+    """どのデータセットからも参照されていないサマリを削除し、削除数を返す"""
+    from summary_cache import evict_stale_summaries
+    return evict_stale_summaries(students_dir, [ds['summary']['key'] for ds in datasets if 'summary' in ds])
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='students/index.json を再生成（セッション情報を含む）')
+    parser.add_argument('--stream', action='store_true',
+                        help='ログ本体を展開せずにストリームでセッション情報を抽出する')
+    parser.add_argument('--incremental', action='store_true',
+                        help='マニフェストを使い、変更されたファイルだけを再解析する')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='解析に使うプロセス数（0 で CPU コア数、既定は 1 = 直列）')
+    parser.add_argument('--shards', action='store_true',
+                        help='セッションごとに students/shards/ へシャードを書き出し、index.json にパスとサイズを記録する')
+    parser.add_argument('--byte-ranges', action='store_true',
+                        help='各セッションのファイル内のバイト範囲を index.json に記録する（Range リクエスト用）')
+    parser.add_argument('--summaries', action='store_true',
+                        help='ダッシュボードのサマリを students/summaries/ に事前計算し、キーを index.json に記録する')
+    parser.add_argument('--compact', action='store_true', help='index.json をインデントなしで書く')
+    parser.add_argument('--precompress', action='store_true',
+                        help='index.json と各データセットの .gz / .br サイドカーを作成する')
+    return parser.parse_args()
+
+
+def main(stream=False, incremental=False, workers=1, shards=False, byte_ranges=False, summaries=False,
+         compact=False, precompress=False):
     print('students/index.json を再生成中（セッション情報を含む）...')
     
     script_dir = Path(__file__).parent
@@ -72,46 +387,41 @@ def main():
         return
     
     # students フォルダ内の JSON ファイルをスキャン
-    json_files = [f for f in os.listdir(students_dir) if f.endswith('.json') and f != 'index.json']
+    json_files = list_dataset_files(students_dir)
     
+    builder = manifest_builder_name(shards, byte_ranges, summaries)
+    manifest = IndexManifest(students_dir, builder) if incremental else None
     datasets = []
     
-    for json_file in json_files:
-        json_path = students_dir / json_file
-        try:
-            with open(json_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                
-                # dataset_name を取得
-                dataset_name = data.get('dataset_name') or json_file.replace('.json', '')
-                dataset_type = data.get('type') or 'class'
-                
-                # セッション情報を抽出
-                sessions = extract_sessions_from_dataset(json_path, data)
-                
-                dataset_entry = {
-                    'file': json_file,
-                    'dataset_name': dataset_name,
-                    'type': dataset_type
-                }
-                
-                # セッションがある場合は追加
-                if sessions:
-                    dataset_entry['sessions'] = sessions
-                
-                datasets.append(dataset_entry)
-                
-        except Exception as e:
-            print(f'[警告] {json_file} の読み込みに失敗しました: {e}')
+    build = partial(build_dataset_entry, stream=stream, shards=shards, byte_ranges=byte_ranges, summaries=summaries)
+    built = build_entries(students_dir, json_files, build, workers=workers, manifest=manifest)
+    for json_file, ok, result in built:
+        if ok:
+            datasets.append(result)
+        else:
+            print(f'[警告] {json_file} の読み込みに失敗しました: {result}')
+    
+    if manifest:
+        removed = manifest.prune(json_files)
+        manifest.save()
+        print(f'[差分] 再利用: {manifest.hits} / 再解析: {manifest.misses} / 削除: {removed}')
+    
+    if shards:
+        removed = prune_shards(students_dir, [ds['file'] for ds in datasets if ds.get('sessions')])
+        if removed:
+            print(f'[OK] 不要になったシャードのフォルダを {removed} 個削除しました')
+    
+    if summaries:
+        removed = evict_summaries(students_dir, datasets)
+        if removed:
+            print(f'[OK] 古くなったサマリを {removed} 個削除しました')
     
     # index.json を生成
-    index_data = {
-        'datasets': datasets
-    }
+    index_path = write_index(students_dir, datasets, compact=compact)
     
-    index_path = students_dir / 'index.json'
-    with open(index_path, 'w', encoding='utf-8') as f:
-        json.dump(index_data, f, ensure_ascii=False, indent=2)
+    if precompress:
+        written, removed = precompress_students(students_dir)
+        print(f'[OK] 圧縮サイドカーを {written} 個のファイルについて作成しました（削除: {removed}）')
     
     print(f'[OK] {index_path} を更新しました（{len(datasets)} 個のデータセット）')
     
@@ -123,5 +433,6 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
-
+    args = parse_args()
+    main(stream=args.stream, incremental=args.incremental, workers=args.workers, shards=args.shards,
+         byte_ranges=args.byte_ranges, summaries=args.summaries, compact=args.compact, precompress=args.precompress)
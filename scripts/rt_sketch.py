@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+"""
+response_time の分位点スケッチ（t-digest）をデータセット・questionId・conceptTag ごとに保持する集計器
+
+response_time_profile.js の computeResponseTimeProfile / getPercentile は表示のたびに
+response_time の配列全体をソートしている。ここでは t-digest（マージ型）で
+分布を高々数百個のセントロイドに要約し、students/sketches/<データセット>.json に保存する。
+p50 / p90 / p99 などはセントロイドだけから求まるので、ログ件数によらず一定時間で答えられる。
+スケッチ同士はマージできるため、シャードごとに作ったものを後から 1 つにまとめられる。
+
+更新方法:
+- JSON データセット: ストリーミングで 1 回読んで作り直す（内容のハッシュが同じなら何もしない）
+- セッションログ（session_log.py の <名前>.segments）: pipeline_common.update_from_session_log で
+  追記されたレコードだけを取り込む。logs と sessions は別々のスケッチに持つ。t-digest からは
+  値を取り除けないので、取り込み済みのログを書き換えるレコードが現れたら全体から作り直す
+
+response_time は response_time_profile.js と同じく
+response_time || response_time_ms || reaction_time || 最後のクリックの time × 1000 を使う。
+
+実行方法:
+python scripts/rt_sketch.py build students/quiz_log_dummy.json
+python scripts/rt_sketch.py update students/quiz_log_dummy.segments
+python scripts/rt_sketch.py merge shard_a.json shard_b.json -o merged.json
+python scripts/rt_sketch.py query students/sketches/quiz_log_dummy.json --question q001
+
+依存: numpy
+"""
+
+import argparse
+import json
+import math
+from pathlib import Path
+
+import numpy as np
+
+from index_manifest import file_sha256
+from json_stream import JsonStreamReader
+from pipeline_common import PARTS, SessionLogDataset, atomic_write_json, update_from_session_log
+from stats_core import _js_or, _js_truthy
+
+DEFAULT_COMPRESSION = 200
+BUFFER_SIZE = 4096
+SUMMARY_QUANTILES = (('p50', 0.5), ('p90', 0.9), ('p99', 0.99))
+SKETCH_DIR_NAME = 'sketches'
+
+
+class TDigest:
+    """
+    マージ型 t-digest
+
+    値はいったんバッファに溜め、BUFFER_SIZE を超えたらセントロイドとまとめて
+    平均値順に並べ、スケール関数 k(q) = δ/2π · asin(2q - 1) の 1 単位ごとに
+    1 つのセントロイドに統合する。両端ほどセントロイドが小さくなるので、
+    p99 のような裾の分位点も精度よく求まる。
+    """
+
+    def __init__(self, compression=DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._buffer = []
+
+    def add(self, value):
+        self._buffer.append(value)
+        if len(self._buffer) >= BUFFER_SIZE:
+            self.compress()
+
+    def add_many(self, values):
+        self._buffer.extend(values)
+        if len(self._buffer) >= BUFFER_SIZE:
+            self.compress()
+
+    def merge(self, other):
+        """他のスケッチを取り込む"""
+        other.compress()
+        self.compress()
+        if other.count == 0:
+            return self
+        self._merge_centroids(np.concatenate([self.means, other.means]),
+                              np.concatenate([self.weights, other.weights]))
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def compress(self):
+        if not self._buffer:
+            return
+        values = np.asarray(self._buffer, dtype=np.float64)
+        self._buffer = []
+        self.count += len(values)
+        self.total += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self._merge_centroids(np.concatenate([self.means, values]),
+                              np.concatenate([self.weights, np.ones(len(values))]))
+
+    def _merge_centroids(self, means, weights):
+        order = np.argsort(means, kind='mergesort')
+        means = means[order]
+        weights = weights[order]
+        total_weight = weights.sum()
+        q_left = (np.cumsum(weights) - weights) / total_weight
+        k = self.compression / (2 * math.pi) * np.arcsin(2 * q_left - 1)
+        groups = np.floor(k - k[0])
+        starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+        merged_weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / merged_weights
+        self.weights = merged_weights
+
+    def quantile(self, q):
+        """分位点（q は 0〜1 のスカラーまたは配列）"""
+        self.compress()
+        if self.count == 0:
+            return 0.0 if np.isscalar(q) else np.zeros(len(q))
+        # セントロイドの中心位置の間を線形補間し、両端は最小値・最大値に固定する
+        centers = np.cumsum(self.weights) - self.weights / 2
+        positions = np.r_[0.0, centers, self.count]
+        values = np.r_[self.min, self.means, self.max]
+        return np.interp(np.asarray(q) * self.count, positions, values)
+
+    def cdf(self, x):
+        """x 以下の割合"""
+        self.compress()
+        if self.count == 0:
+            return 0.0
+        centers = np.cumsum(self.weights) - self.weights / 2
+        positions = np.r_[0.0, centers, self.count]
+        values = np.r_[self.min, self.means, self.max]
+        return np.interp(x, values, positions) / self.count
+
+    def summary(self):
+        self.compress()
+        if self.count == 0:
+            return {'count': 0, 'mean': 0, 'min': 0, 'max': 0, **{name: 0 for name, _ in SUMMARY_QUANTILES}}
+        quantiles = self.quantile([q for _, q in SUMMARY_QUANTILES])
+        return {
+            'count': self.count,
+            'mean': round(self.total / self.count, 6),
+            'min': self.min,
+            'max': self.max,
+            **{name: round(float(value), 6) for (name, _), value in zip(SUMMARY_QUANTILES, quantiles)}
+        }
+
+    def to_dict(self):
+        self.compress()
+        return {
+            'compression': self.compression,
+            'count': self.count,
+            'sum': self.total,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+            'means': self.means.tolist(),
+            'weights': self.weights.tolist()
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        digest = cls(d.get('compression', DEFAULT_COMPRESSION))
+        digest.means = np.asarray(d['means'], dtype=np.float64)
+        digest.weights = np.asarray(d['weights'], dtype=np.float64)
+        digest.count = d['count']
+        digest.total = d['sum']
+        if digest.count:
+            digest.min = d['min']
+            digest.max = d['max']
+        return digest
+
+
+def log_response_time(log):
+    """response_time_profile.js と同じ規則で反応時間を取り出す（なければ None）"""
+    value = _js_or(log.get('response_time'), log.get('response_time_ms'), log.get('reaction_time'))
+    if not _js_truthy(value):
+        value = None
+        clicks = log.get('clicks')
+        if isinstance(clicks, list) and clicks and isinstance(clicks[-1], dict):
+            time = clicks[-1].get('time')
+            if isinstance(time, (int, float)) and not isinstance(time, bool):
+                value = time * 1000
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and value >= 0:
+        return value
+    return None
+
+
+class SketchGroup:
+    """データセット全体・questionId 別・conceptTag 別のスケッチ一式"""
+
+    def __init__(self, compression=DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.dataset = TDigest(compression)
+        self.questions = {}
+        self.concepts = {}
+
+    def add_log(self, log):
+        if not isinstance(log, dict):
+            return
+        value = log_response_time(log)
+        if value is None:
+            return
+        self.dataset.add(value)
+        question_id = log.get('questionId')
+        if isinstance(question_id, str):
+            self._digest(self.questions, question_id).add(value)
+        concepts = log.get('conceptTags') or log.get('concept_tags') or []
+        if isinstance(concepts, list):
+            for concept in concepts:
+                if isinstance(concept, str):
+                    self._digest(self.concepts, concept).add(value)
+
+    def add_session(self, session):
+        if isinstance(session, dict) and isinstance(session.get('logs'), list):
+            for log in session['logs']:
+                self.add_log(log)
+
+    def add_logs(self, logs):
+        for log in logs:
+            self.add_log(log)
+
+    def add_sessions(self, sessions):
+        for session in sessions:
+            self.add_session(session)
+
+    def _digest(self, table, key):
+        digest = table.get(key)
+        if digest is None:
+            digest = table[key] = TDigest(self.compression)
+        return digest
+
+    def merge(self, other):
+        self.dataset.merge(other.dataset)
+        for mine, theirs in ((self.questions, other.questions), (self.concepts, other.concepts)):
+            for key, digest in theirs.items():
+                self._digest(mine, key).merge(digest)
+        return self
+
+    def summary(self):
+        return {
+            'dataset': self.dataset.summary(),
+            'questions': {k: d.summary() for k, d in sorted(self.questions.items())},
+            'concepts': {k: d.summary() for k, d in sorted(self.concepts.items())}
+        }
+
+    def to_dict(self):
+        return {
+            'dataset': self.dataset.to_dict(),
+            'questions': {k: d.to_dict() for k, d in sorted(self.questions.items())},
+            'concepts': {k: d.to_dict() for k, d in sorted(self.concepts.items())}
+        }
+
+    @classmethod
+    def from_dict(cls, d, compression=DEFAULT_COMPRESSION):
+        group = cls(compression)
+        group.dataset = TDigest.from_dict(d['dataset'])
+        group.questions = {k: TDigest.from_dict(v) for k, v in d.get('questions', {}).items()}
+        group.concepts = {k: TDigest.from_dict(v) for k, v in d.get('concepts', {}).items()}
+        return group
+
+
+class DatasetSketches(SessionLogDataset):
+    """1 データセット分のスケッチ（logs 由来と sessions 由来を分けて持つ）"""
+
+    def __init__(self, source, compression=DEFAULT_COMPRESSION):
+        self.compression = compression
+        super().__init__(source)
+
+    def new_part(self):
+        return SketchGroup(self.compression)
+
+    def to_dict(self):
+        return {
+            'source': self.source,
+            'compression': self.compression,
+            'state': self.state,
+            'summary': self.combined().summary(),
+            'parts': {part: group.to_dict() for part, group in self.parts.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        sketches = cls(d['source'], d.get('compression', DEFAULT_COMPRESSION))
+        sketches.state = d.get('state', {})
+        sketches.parts = {part: SketchGroup.from_dict(d['parts'][part], sketches.compression)
+                          for part in PARTS}
+        return sketches
+
+
+def sketch_path_for(source_path):
+    """students/<名前>.json / .segments → students/sketches/<名前>.json"""
+    source_path = Path(source_path)
+    name = source_path.stem if source_path.suffix in ('.json', '.segments') else source_path.name
+    return source_path.parent / SKETCH_DIR_NAME / f'{name}.json'
+
+
+def load_sketches(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return DatasetSketches.from_dict(json.load(f))
+
+
+def save_sketches(sketches, path):
+    atomic_write_json(path, sketches.to_dict())
+
+
+def build_from_json(json_path, compression=DEFAULT_COMPRESSION):
+    """JSON データセットをストリーミングで 1 回読んでスケッチを作る"""
+    json_path = Path(json_path)
+    sketches = DatasetSketches(json_path.name, compression)
+    logs_group = sketches.parts['logs']
+    sessions_group = sketches.parts['sessions']
+    with open(json_path, 'rb') as f:
+        reader = JsonStreamReader(f)
+        for key in reader.iter_object():
+            ch = reader.peek()
+            if key == 'logs' and ch == '[':
+                for _ in reader.iter_array():
+                    logs_group.add_log(reader.read_value())
+            elif key == 'vector_test_sessions' and ch == '{':
+                for sub_key in reader.iter_object():
+                    if sub_key == 'sessions' and reader.peek() == '[':
+                        for _ in reader.iter_array():
+                            sessions_group.add_session(reader.read_value())
+                    else:
+                        reader.skip_value()
+            elif key == 'sessions' and ch == '[':
+                for _ in reader.iter_array():
+                    sessions_group.add_session(reader.read_value())
+            else:
+                reader.skip_value()
+    return sketches
+
+
+def command_build(source, output=None, compression=DEFAULT_COMPRESSION, force=False):
+    source = Path(source)
+    output = Path(output) if output else sketch_path_for(source)
+    digest = file_sha256(source)
+    if not force and output.exists():
+        existing = load_sketches(output)
+        if existing.state.get('sha256') == digest:
+            print(f'[OK] {output} は最新です')
+            return existing
+    sketches = build_from_json(source, compression)
+    sketches.state['sha256'] = digest
+    save_sketches(sketches, output)
+    summary = sketches.combined().dataset.summary()
+    print(f'[OK] {output} を作成しました（{summary["count"]} 件 / p50 {summary["p50"]} / p99 {summary["p99"]}）')
+    return sketches
+
+
+def command_update(source, output=None, compression=DEFAULT_COMPRESSION):
+    source = Path(source)
+    output = Path(output) if output else sketch_path_for(source)
+    sketches = load_sketches(output) if output.exists() else DatasetSketches(source.name, compression)
+    applied = update_from_session_log(source, sketches)
+    save_sketches(sketches, output)
+    print(f'[OK] {output} を更新しました（取り込んだレコード: {applied}）')
+    return sketches
+
+
+def command_merge(inputs, output):
+    """シャードごとのスケッチを 1 つにまとめる"""
+    merged = None
+    for path in inputs:
+        sketches = load_sketches(path)
+        if merged is None:
+            merged = DatasetSketches(Path(output).name, sketches.compression)
+        for part in PARTS:
+            merged.parts[part].merge(sketches.parts[part])
+    merged.state = {'merged_from': [Path(p).name for p in inputs]}
+    save_sketches(merged, output)
+    print(f'[OK] {len(inputs)} 個のスケッチを {output} にまとめました')
+    return merged
+
+
+def command_query(path, question=None, concept=None, quantiles=None):
+    group = load_sketches(path).combined()
+    if question:
+        digest = group.questions.get(question)
+    elif concept:
+        digest = group.concepts.get(concept)
+    else:
+        digest = group.dataset
+    if digest is None:
+        print('[エラー] 該当するスケッチがありません')
+        return None
+    result = digest.summary()
+    for q in quantiles or ():
+        result[f'q{q:g}'] = round(float(digest.quantile(q)), 6)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return result
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='response_time の分位点スケッチ（t-digest）の作成・更新・マージ・照会')
+    parser.add_argument('--compression', type=int, default=DEFAULT_COMPRESSION,
+                        help='t-digest の圧縮パラメータ δ（既定 200）')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = sub.add_parser('build', help='JSON データセットからスケッチを作る')
+    build_parser.add_argument('source')
+    build_parser.add_argument('-o', '--output')
+    build_parser.add_argument('--force', action='store_true', help='内容が同じでも作り直す')
+
+    update_parser = sub.add_parser('update', help='セッションログの追記分を取り込む')
+    update_parser.add_argument('source')
+    update_parser.add_argument('-o', '--output')
+
+    merge_parser = sub.add_parser('merge', help='複数のスケッチをマージする')
+    merge_parser.add_argument('inputs', nargs='+')
+    merge_parser.add_argument('-o', '--output', required=True)
+
+    query_parser = sub.add_parser('query', help='分位点を表示する')
+    query_parser.add_argument('sketch')
+    query_parser.add_argument('--question')
+    query_parser.add_argument('--concept')
+    query_parser.add_argument('-q', '--quantile', type=float, action='append',
+                              help='追加で求める分位点（0〜1）')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.command == 'build':
+        command_build(args.source, args.output, args.compression, args.force)
+    elif args.command == 'update':
+        command_update(args.source, args.output, args.compression)
+    elif args.command == 'merge':
+        command_merge(args.inputs, args.output)
+    else:
+        command_query(args.sketch, args.question, args.concept, args.quantile)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+データセットごとの追記専用セッションログ（JSONL セグメント形式）
+
+students/quiz_log_dummy.json は 1 セッション追加するだけでもファイル全体を
+読み込み、indent=2 で書き直していた。書き込みコストがデータセットの大きさに
+比例し、書き込み途中で落ちるとファイルが壊れる。
+
+セッションログはデータセットを students/<名前>.segments/ に置き、変更を
+1 行 1 レコードの JSONL として追記していく。1 セッションの追加は 1 行の追記で済む。
+
+    students/quiz_log_dummy.segments/
+        000001.jsonl   … 確定済みセグメント
+        000002.jsonl   … 書き込み中のセグメント（番号が最大のもの）
+
+レコード（op ごと）:
+    meta            {"op": "meta", "fields": {...}}          トップレベルの項目を設定
+    reset_logs      {"op": "reset_logs", "logs": [...]}      logs を置き換える（logs は省略可）
+    log             {"op": "log", "log": {...}}              logs に 1 件追加
+    reset_sessions  {"op": "reset_sessions", "fields": {...}} vector_test_sessions を作り直す
+    session         {"op": "session", "session": {...}}      sessions に 1 件追加
+    patch_session   {"op": "patch_session", "index": n, "fields": {...}}
+                                                             n 番目のセッションの項目を更新
+
+読み込み時はレコードを順に適用し、従来の JSON と同じ論理構造
+（dataset_name / type / created_at / logs / vector_test_sessions.sessions）を返す。
+書き込み中のセグメントが上限サイズを超えたら、fsync してから次の番号の
+セグメントを排他作成で開く（セグメントの切り替えは途中状態を残さない）。
+末尾の改行で終わらない行は書き込み途中で中断されたレコードとみなし、
+読み込みでは無視し、次に追記で開いたときに切り詰める。
+書き込みは 1 プロセスから行うこと。
+
+実行方法:
+python scripts/session_log.py import students/quiz_log_dummy.json
+python scripts/session_log.py export students/quiz_log_dummy.segments
+python scripts/session_log.py stat students/quiz_log_dummy.segments
+"""
+
+import argparse
+import json
+import os
+from pathlib import Path
+
+SEGMENT_SUFFIX = '.jsonl'
+LOG_DIR_SUFFIX = '.segments'
+DEFAULT_MAX_SEGMENT_BYTES = 64 * 1024 * 1024
+
+
+def segment_log_dir(json_path):
+    """students/<名前>.json に対応するセッションログのディレクトリ"""
+    json_path = Path(json_path)
+    return json_path.with_name(json_path.stem + LOG_DIR_SUFFIX)
+
+
+def _segment_number(path):
+    try:
+        return int(path.stem)
+    except ValueError:
+        return None
+
+
+def list_segments(directory):
+    """セグメントファイルを番号順に返す"""
+    directory = Path(directory)
+    if not directory.is_dir():
+        return []
+    segments = [p for p in directory.iterdir()
+                if p.suffix == SEGMENT_SUFFIX and _segment_number(p) is not None]
+    return sorted(segments, key=_segment_number)
+
+
+def _fsync_dir(directory):
+    # Windows ではディレクトリを開けないため、できる環境でのみ行う
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def iter_records(directory):
+    """全セグメントのレコードを書き込み順に返す"""
+    for segment in list_segments(directory):
+        with open(segment, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # 書き込み途中で中断されたレコード
+                    break
+                if line.strip():
+                    yield json.loads(line)
+
+
+def iter_records_since(directory, cursor=None):
+    """
+    cursor（[セグメント番号, バイト位置]）より後のレコードを返す
+
+    (レコード, そのレコードの直後を指す cursor) の組を書き込み順に返すので、
+    最後に受け取った cursor を保存しておけば次回は続きから読める。
+    """
+    segment, offset = cursor or (0, 0)
+    for path in list_segments(directory):
+        number = _segment_number(path)
+        if number < segment:
+            continue
+        with open(path, 'rb') as f:
+            if number == segment:
+                f.seek(offset)
+            position = f.tell()
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                position += len(line)
+                if line.strip():
+                    yield json.loads(line), [number, position]
+
+
+def apply_record(data, record):
+    """レコードを 1 件、データセット（従来の JSON と同じ構造）に適用"""
+    op = record.get('op')
+    if op == 'meta':
+        data.update(record['fields'])
+    elif op == 'reset_logs':
+        data['logs'] = list(record.get('logs', []))
+    elif op == 'log':
+        data.setdefault('logs', []).append(record['log'])
+    elif op == 'reset_sessions':
+        data['vector_test_sessions'] = dict(record.get('fields', {}), sessions=[])
+    elif op == 'session':
+        vector_test_sessions = data.setdefault('vector_test_sessions', {})
+        vector_test_sessions.setdefault('sessions', []).append(record['session'])
+    elif op == 'patch_session':
+        data['vector_test_sessions']['sessions'][record['index']].update(record['fields'])
+    else:
+        raise ValueError(f'未知のレコードです: {op}')
+
+
+def load_session_log(directory):
+    """セッションログを読み込み、従来の JSON と同じ構造の辞書を返す"""
+    data = {}
+    for record in iter_records(directory):
+        apply_record(data, record)
+    return data
+
+
+class SessionLog:
+    """セッションログへの追記"""
+
+    def __init__(self, directory, max_segment_bytes=DEFAULT_MAX_SEGMENT_BYTES):
+        self.directory = Path(directory)
+        self.max_segment_bytes = max_segment_bytes
+        self._file = None
+        self._number = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def exists(self):
+        return bool(list_segments(self.directory))
+
+    def _open_active(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        segments = list_segments(self.directory)
+        if not segments:
+            self._open_segment(1)
+            return
+        active = segments[-1]
+        self._number = _segment_number(active)
+        self._file = open(active, 'r+b')
+        self._repair_tail()
+        self._file.seek(0, os.SEEK_END)
+
+    def _repair_tail(self):
+        """末尾の書きかけレコードを切り詰める"""
+        f = self._file
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b'\n':
+            return
+        # 最後の改行を後ろから探す
+        pos = size
+        while pos > 0:
+            step = min(pos, 1 << 16)
+            f.seek(pos - step)
+            chunk = f.read(step)
+            newline = chunk.rfind(b'\n')
+            if newline >= 0:
+                f.truncate(pos - step + newline + 1)
+                return
+            pos -= step
+        f.truncate(0)
+
+    def _open_segment(self, number):
+        path = self.directory / f'{number:06d}{SEGMENT_SUFFIX}'
+        # 排他作成: 既存のセグメントを上書きしない
+        self._file = open(path, 'xb')
+        self._number = number
+        _fsync_dir(self.directory)
+
+    def _rollover(self):
+        self.sync()
+        self._file.close()
+        self._open_segment(self._number + 1)
+
+    def append(self, *records):
+        """レコードを追記（複数渡した場合は 1 回の write でまとめて書く）"""
+        if self._file is None:
+            self._open_active()
+        elif self._file.tell() >= self.max_segment_bytes:
+            self._rollover()
+        payload = b''.join(
+            json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+            for record in records
+        )
+        self._file.write(payload)
+        self._file.flush()
+
+    def set_meta(self, fields):
+        self.append({'op': 'meta', 'fields': fields})
+
+    def reset_logs(self, logs=()):
+        # 置き換え後のログも同じ 1 行に入れる（途中で落ちても空の logs だけが残ることはない）
+        self.append({'op': 'reset_logs', 'logs': list(logs)})
+
+    def append_log(self, log):
+        self.append({'op': 'log', 'log': log})
+
+    def reset_sessions(self, fields=None):
+        self.append({'op': 'reset_sessions', 'fields': fields or {}})
+
+    def append_session(self, session):
+        self.append({'op': 'session', 'session': session})
+
+    def patch_session(self, index, fields):
+        self.append({'op': 'patch_session', 'index': index, 'fields': fields})
+
+    def sync(self):
+        """書き込んだレコードをディスクに確定させる"""
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+
+def import_json(json_path, directory, max_segment_bytes=DEFAULT_MAX_SEGMENT_BYTES):
+    """従来の JSON データセットをセッションログに変換"""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    with SessionLog(directory, max_segment_bytes) as log:
+        if log.exists():
+            raise FileExistsError(f'{directory} は既に存在します')
+        # 読み込み結果のキー順が元の JSON と同じになるよう、キーの順にレコードを書く
+        meta = {}
+        for key, value in data.items():
+            if key == 'logs' and isinstance(value, list):
+                if meta:
+                    log.set_meta(meta)
+                    meta = {}
+                log.reset_logs(value)
+            elif key == 'vector_test_sessions' and isinstance(value, dict) and isinstance(value.get('sessions'), list):
+                if meta:
+                    log.set_meta(meta)
+                    meta = {}
+                log.reset_sessions({k: v for k, v in value.items() if k != 'sessions'})
+                for session in value['sessions']:
+                    log.append_session(session)
+            else:
+                meta[key] = value
+        if meta:
+            log.set_meta(meta)
+    return data
+
+
+def export_json(directory, json_path):
+    """セッションログを従来の JSON（indent=2）に書き出す（一時ファイル経由で置き換え）"""
+    data = load_session_log(directory)
+    json_path = Path(json_path)
+    tmp_path = json_path.with_name(json_path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, json_path)
+    return data
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='追記専用セッションログ（JSONL セグメント）の管理')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = sub.add_parser('import', help='JSON データセット → セッションログ')
+    import_parser.add_argument('source', help='変換元の JSON ファイル')
+    import_parser.add_argument('-o', '--output', help='出力先ディレクトリ（既定は <名前>.segments）')
+
+    export_parser = sub.add_parser('export', help='セッションログ → JSON データセット')
+    export_parser.add_argument('source', help='セッションログのディレクトリ')
+    export_parser.add_argument('-o', '--output', help='出力先 JSON（既定は <名前>.json）')
+
+    stat_parser = sub.add_parser('stat', help='セグメントとレコード数を表示')
+    stat_parser.add_argument('source', help='セッションログのディレクトリ')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    source = Path(args.source)
+
+    if args.command == 'import':
+        output = Path(args.output) if args.output else segment_log_dir(source)
+        data = import_json(source, output)
+        sessions = (data.get('vector_test_sessions') or {}).get('sessions', [])
+        print(f'[OK] {output} を作成しました（logs: {len(data.get("logs", []))} 件 / sessions: {len(sessions)} 件）')
+    elif args.command == 'export':
+        output = Path(args.output) if args.output else source.with_suffix('.json')
+        export_json(source, output)
+        print(f'[OK] {output} を作成しました')
+    else:
+        segments = list_segments(source)
+        counts = {}
+        for record in iter_records(source):
+            counts[record.get('op')] = counts.get(record.get('op'), 0) + 1
+        print(f'セグメント数: {len(segments)}')
+        for segment in segments:
+            print(f'  - {segment.name}: {segment.stat().st_size:,} バイト')
+        print('レコード数:')
+        for op, count in counts.items():
+            print(f'  - {op}: {count}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+src/core/stats_core.js の computeStats / computeMistakeRanking / computeLevelStats の Python 版
+
+ダッシュボードはデータセットを選ぶたびにブラウザで全ログを走査して統計を
+計算している。ここではログを 1 回だけ走査して列（NumPy 配列）と
+（概念, ログ）の対応表に展開し、概念別の集計を np.bincount でまとめて行う。
+結果は students/stats/<データセットのファイル名> にサイドカーとして書き出し、
+ダッシュボードはそれをそのまま読み込める。
+
+出力は JS 版と同じ値になるようにしている（JS の || の真偽判定、
+=== による比較、オブジェクトのキー順、加算の順序まで合わせている）。
+JS 版との一致は verify_stats_parity.py で確認できる。
+
+実行方法:
+python scripts/stats_core.py  # students 内の全データセット
+python scripts/stats_core.py students/quiz_log_dummy.json
+
+依存: numpy
+"""
+
+import argparse
+import json
+import math
+from pathlib import Path
+
+import numpy as np
+
+from index_builder import list_dataset_files
+from pipeline_common import _is_number, atomic_write_json
+
+DEFAULT_LEVELS = ('識別', '説明', '適用', '区別', '転移', '構造化')
+DEFAULT_TOP_N = 5
+STATS_DIR_NAME = 'stats'
+UNCLASSIFIED = '未分類'
+
+
+def _js_truthy(value):
+    """JS の真偽判定（[] や {} は真、0 / NaN / '' は偽）"""
+    if value is None or value is False:
+        return False
+    if isinstance(value, (int, float)):
+        return value == value and value != 0
+    if isinstance(value, str):
+        return value != ''
+    return True
+
+
+def _js_or(*values):
+    """a || b || ... と同じ値を返す"""
+    for value in values:
+        if _js_truthy(value):
+            return value
+    return values[-1] if values else None
+
+
+def _js_string(value):
+    """オブジェクトのキーにしたときの文字列（String(value)）"""
+    if isinstance(value, str):
+        return value
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    if value is None:
+        return 'null'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, list):
+        return ','.join('' if v is None else _js_string(v) for v in value)
+    return '[object Object]'
+
+
+def _js_key_order(keys):
+    """Object.keys() の順序（配列インデックスとみなせるキーが数値順で先頭）"""
+    index_keys = [k for k in keys if k.isdigit() and str(int(k)) == k and int(k) < 2 ** 32 - 1]
+    index_set = set(index_keys)
+    return sorted(index_keys, key=int) + [k for k in keys if k not in index_set]
+
+
+def _selected(log):
+    selected = log.get('selected')
+    return selected if isinstance(selected, dict) and selected else None
+
+
+def _path_length(log):
+    if isinstance(log.get('path'), list):
+        return len(log['path'])
+    if isinstance(log.get('clicks'), list):
+        return len(log['clicks'])
+    return 0
+
+
+def _glossary_shown(log):
+    terms = log.get('recommended_terms')
+    return (isinstance(terms, list) and len(terms) > 0) or log.get('glossary_shown') is True
+
+
+def _sequential_sum(values):
+    """左から順に足し合わせる（JS の reduce と同じ丸め）"""
+    return float(np.cumsum(values)[-1]) if len(values) else 0.0
+
+
+def _empty_stats():
+    return {
+        'total': 0,
+        'accuracy': 0,
+        'correctCount': 0,
+        'incorrectCount': 0,
+        'conceptScore': {},
+        'mistakes': [],
+        'rtMean': 0,
+        'rtMedian': 0,
+        'rtStd': 0,
+        'rtMin': 0,
+        'rtMax': 0
+    }
+
+
+def compute_stats(logs):
+    """computeStats(logs) と同じ統計情報を返す"""
+    if not isinstance(logs, list) or not logs:
+        return _empty_stats()
+
+    total = len(logs)
+    counted_correct = np.zeros(total, dtype=bool)   # correctCount 用（'true' も正解扱い）
+    strict_correct = np.zeros(total, dtype=bool)    # 概念別集計用
+    rt = np.full(total, np.nan)
+    concept_rt = np.full(total, np.nan)
+    path_length = np.zeros(total, dtype=np.int64)
+    glossary = np.zeros(total, dtype=bool)
+    session_ids = set()
+
+    # conceptScore: 出現ごとの (概念, ログ)
+    score_index = {}
+    score_concepts = []
+    score_rows = []
+    # conceptDetails: 概念ごとに一度だけ数える (概念, ログ)
+    detail_index = {}
+    detail_concepts = []
+    detail_rows = []
+
+    for i, log in enumerate(logs):
+        selected = _selected(log)
+        selected_correct = selected is not None and selected.get('correct') is True
+        correct = log.get('correct')
+        strict_correct[i] = correct is True or selected_correct
+        counted_correct[i] = strict_correct[i] or correct == 'true'
+
+        concepts = _js_or(log.get('conceptTags'), log.get('concept_tags'),
+                          selected.get('conceptTags') if selected else None, [])
+        if isinstance(concepts, list):
+            for concept in concepts:
+                key = _js_string(concept)
+                score_concepts.append(score_index.setdefault(key, len(score_index)))
+                score_rows.append(i)
+
+        detail_tags = _js_or(log.get('conceptTags'), log.get('concept_tags'), [])
+        if isinstance(detail_tags, list):
+            # includes() は === で比較するため、文字列のタグだけが概念名と一致する
+            for tag in dict.fromkeys(t for t in detail_tags if isinstance(t, str)):
+                detail_concepts.append(detail_index.setdefault(tag, len(detail_index)))
+                detail_rows.append(i)
+
+        value = _js_or(log.get('response_time'), log.get('response_time_ms'),
+                       log.get('reaction_time'), log.get('time'),
+                       selected.get('time') if selected else None, None)
+        if _is_number(value) and value >= 0:
+            rt[i] = value
+        value = _js_or(log.get('response_time'), log.get('response_time_ms'),
+                       log.get('reaction_time'), None)
+        if _is_number(value) and value >= 0:
+            concept_rt[i] = value
+
+        path_length[i] = _path_length(log)
+        glossary[i] = _glossary_shown(log)
+        if _js_truthy(log.get('session_id')):
+            session_ids.add(_js_string(log['session_id']))
+
+    correct_count = int(counted_correct.sum())
+    incorrect_count = total - correct_count
+
+    # 概念別集計
+    score_concepts = np.asarray(score_concepts, dtype=np.int64)
+    score_rows = np.asarray(score_rows, dtype=np.int64)
+    n_score = len(score_index)
+    score_total = np.bincount(score_concepts, minlength=n_score)
+    score_correct = np.bincount(score_concepts, weights=strict_correct[score_rows], minlength=n_score)
+    score_keys = _js_key_order(list(score_index))
+
+    concept_score = {}
+    for key in score_keys:
+        cid = score_index[key]
+        concept_score[key] = {'total': int(score_total[cid]), 'correct': int(score_correct[cid])}
+
+    mistakes = []
+    for key, d in concept_score.items():
+        incorrect = d['total'] - d['correct']
+        if incorrect > 0:
+            mistakes.append({
+                'concept': key,
+                'total': d['total'],
+                'correct': d['correct'],
+                'incorrect': incorrect,
+                'accuracy': d['correct'] / d['total'] if d['total'] > 0 else 0
+            })
+    mistakes.sort(key=lambda item: -item['incorrect'])
+
+    # 反応時間
+    rt_values = np.sort(rt[~np.isnan(rt)])
+    rt_mean = rt_median = rt_std = rt_min = rt_max = 0
+    if len(rt_values) > 0:
+        rt_mean = _sequential_sum(rt_values) / len(rt_values)
+        mid = len(rt_values) // 2
+        if len(rt_values) % 2 == 0:
+            rt_median = (float(rt_values[mid - 1]) + float(rt_values[mid])) / 2
+        else:
+            rt_median = rt_values[mid]
+        variance = _sequential_sum((rt_values - rt_mean) ** 2) / len(rt_values)
+        rt_std = math.sqrt(variance)
+        rt_min = rt_values[0]
+        rt_max = rt_values[-1]
+
+    # パス長
+    has_path = path_length > 0
+    path_count = int(has_path.sum())
+    avg_path_length = int(path_length[has_path].sum()) / path_count if path_count else 0
+
+    # 概念別の詳細統計
+    detail_concepts = np.asarray(detail_concepts, dtype=np.int64)
+    detail_rows = np.asarray(detail_rows, dtype=np.int64)
+    n_detail = len(detail_index)
+
+    def detail_sum(weights):
+        return np.bincount(detail_concepts, weights=weights, minlength=n_detail)
+
+    has_concept_rt = ~np.isnan(concept_rt)
+    detail_total = np.bincount(detail_concepts, minlength=n_detail)
+    detail_correct = detail_sum(strict_correct[detail_rows])
+    detail_rt_sum = detail_sum(np.where(has_concept_rt, concept_rt, 0.0)[detail_rows])
+    detail_rt_count = detail_sum(has_concept_rt[detail_rows])
+    detail_path_sum = detail_sum(path_length[detail_rows])
+    detail_path_count = detail_sum(has_path[detail_rows])
+    detail_glossary = detail_sum(glossary[detail_rows])
+
+    concept_details = {}
+    for key in score_keys:
+        cid = detail_index.get(key)
+        if cid is None:
+            continue
+        n = int(detail_total[cid])
+        rt_count = int(detail_rt_count[cid])
+        path_n = int(detail_path_count[cid])
+        concept_details[key] = {
+            'total': n,
+            'correct': int(detail_correct[cid]),
+            'accuracy': int(detail_correct[cid]) / n,
+            'avgResponseTime': float(detail_rt_sum[cid]) / rt_count if rt_count else 0,
+            'avgPathLength': int(detail_path_sum[cid]) / path_n if path_n else 0,
+            'glossaryShownRate': int(detail_glossary[cid]) / n
+        }
+
+    return {
+        'total': total,
+        'totalSessions': len(session_ids) if session_ids else 1,
+        'accuracy': correct_count / total,
+        'correctCount': correct_count,
+        'incorrectCount': incorrect_count,
+        'conceptScore': concept_score,
+        'conceptDetails': concept_details,
+        'mistakes': mistakes,
+        'rtMean': float(rt_mean),
+        'rtMedian': float(rt_median),
+        'rtStd': float(rt_std),
+        'rtMin': float(rt_min),
+        'rtMax': float(rt_max),
+        'rtCount': int(len(rt_values)),
+        'avgPathLength': avg_path_length,
+        'pathLengthCount': path_count,
+        'overallGlossaryShownRate': int(glossary.sum()) / total
+    }
+
+
+def compute_mistake_ranking(logs, top_n=DEFAULT_TOP_N):
+    """computeMistakeRanking(logs, topN) と同じ誤概念ランキングを返す"""
+    if not isinstance(logs, list) or not logs:
+        return []
+
+    counts = {}
+    for log in logs:
+        selected = _selected(log)
+        if log.get('correct') is True or (selected is not None and selected.get('correct') is True):
+            continue
+        tags = selected.get('misconceptionTags') if selected else None
+        first_tag = tags[0] if isinstance(tags, list) and tags else None
+        misconception = _js_or(selected.get('misconception') if selected else None,
+                               first_tag, log.get('misconception'), UNCLASSIFIED)
+        key = _js_string(misconception)
+        counts[key] = counts.get(key, 0) + 1
+
+    ranking = [{'label': key, 'count': counts[key]} for key in _js_key_order(list(counts))]
+    ranking.sort(key=lambda item: -item['count'])
+    return ranking[:top_n]
+
+
+def compute_level_stats(logs, levels=DEFAULT_LEVELS):
+    """computeLevelStats(logs, levels) と同じ理解階層別統計を返す"""
+    if not isinstance(logs, list) or not logs:
+        return {}
+
+    level_index = {}
+    for level in levels:
+        level_index.setdefault(_js_string(level), len(level_index))
+
+    level_ids = []
+    level_correct = []
+    for log in logs:
+        selected = _selected(log)
+        log_levels = _js_or(log.get('conceptTags'), log.get('concept_tags'),
+                            selected.get('measure') if selected else None, [])
+        is_correct = log.get('correct') is True or (selected is not None and selected.get('correct') is True)
+        if isinstance(log_levels, list):
+            for level in log_levels:
+                lid = level_index.get(_js_string(level))
+                if lid is not None:
+                    level_ids.append(lid)
+                    level_correct.append(is_correct)
+
+    level_ids = np.asarray(level_ids, dtype=np.int64)
+    totals = np.bincount(level_ids, minlength=len(level_index))
+    corrects = np.bincount(level_ids, weights=np.asarray(level_correct, dtype=bool),
+                           minlength=len(level_index))
+
+    level_stats = {}
+    for key in _js_key_order(list(level_index)):
+        lid = level_index[key]
+        total = int(totals[lid])
+        correct = int(corrects[lid])
+        level_stats[key] = {
+            'total': total,
+            'correct': correct,
+            'incorrect': total - correct,
+            'accuracy': correct / total if total > 0 else 0
+        }
+    return level_stats
+
+
+def extract_dashboard_logs(data):
+    """ダッシュボード（loadSessionData）と同じ規則でデータセットからログ配列を取り出す"""
+    if isinstance(data, list):
+        return data
+    if isinstance(data, dict):
+        if isinstance(data.get('logs'), list):
+            return data['logs']
+        if isinstance(data.get('sessions'), list):
+            logs = []
+            for session in data['sessions']:
+                if isinstance(session, dict) and isinstance(session.get('logs'), list):
+                    logs.extend(session['logs'])
+            return logs
+    return []
+
+
+def build_stats_sidecar(json_file, data, top_n=DEFAULT_TOP_N, levels=DEFAULT_LEVELS):
+    """サイドカーの内容（stats / mistakeRanking / levelStats）を作成"""
+    logs = extract_dashboard_logs(data)
+    return {
+        'file': json_file,
+        'stats': compute_stats(logs),
+        'mistakeRanking': compute_mistake_ranking(logs, top_n),
+        'levelStats': compute_level_stats(logs, levels)
+    }
+
+
+def write_stats_sidecar(json_path, top_n=DEFAULT_TOP_N):
+    """students/stats/<ファイル名> にサイドカーを書き出す（一時ファイル経由で置き換え）"""
+    json_path = Path(json_path)
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    sidecar = build_stats_sidecar(json_path.name, data, top_n)
+
+    sidecar_path = atomic_write_json(json_path.parent / STATS_DIR_NAME / json_path.name, sidecar, indent=2)
+    return sidecar_path, sidecar
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='データセットの統計情報を事前計算して students/stats/ に書き出す')
+    parser.add_argument('files', nargs='*', help='対象の JSON（省略時は students 内の全データセット）')
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP_N, help='誤概念ランキングの件数（既定 5）')
+    return parser.parse_args()
+
+
+def main(files=None, top_n=DEFAULT_TOP_N):
+    students_dir = Path(__file__).parent.parent / 'students'
+    paths = [Path(f) for f in files] if files else [students_dir / f for f in list_dataset_files(students_dir)]
+
+    for json_path in paths:
+        try:
+            sidecar_path, sidecar = write_stats_sidecar(json_path, top_n)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f'[警告] {json_path.name} の統計計算に失敗しました: {e}')
+            continue
+        stats = sidecar['stats']
+        print(f'[OK] {sidecar_path}（ログ: {stats["total"]} 件 / 正答率: {stats["accuracy"] * 100:.1f}%）')
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    main(args.files, top_n=args.top)
@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+ダッシュボードのサマリ（統計・概念別偏差・傾向サマリ・洞察）をデータセットの内容ハッシュごとに事前計算するスクリプト
+
+ダッシュボードはデータセットを開くたびに生ログから computeStats / normalizeConceptStats /
+generatePatternSummary / generateInsights を計算し直している。データセットが変わっていなければ
+結果も変わらないので、ここで 1 回だけ計算して students/summaries/<内容の SHA-256>.json に保存する。
+
+- キー: データセットファイルの SHA-256（index_manifest.file_sha256）。同じ内容なら同じキーになり、
+  内容が変われば別のキーになるので、古いサマリを読んでしまうことはない
+- index.json: regenerate_index_with_sessions.py --summaries / watch_index.py --summaries で
+  各データセットに summary: {key, path} を記録する。クライアントは path を取得し、
+  source_sha256 が key と一致すれば生ログを読まずにサマリを表示できる
+- 削除: どのデータセットからも参照されなくなったキー（元データが更新・削除されたもの）のファイルは
+  evict_stale_summaries() で削除する
+
+各値は JS 版（src/core/stats_core.js / pattern_summary.js / insights_core.js / response_time_profile.js）
+と同じになるようにしている（toFixed の丸めや、Math.abs で数値に戻した後の文字列化まで合わせている）。
+JS 版との一致は verify_summary_parity.py で確認できる。
+
+実行方法:
+python scripts/summary_cache.py  # students 内の全データセットを計算し、不要になったサマリを削除
+python scripts/summary_cache.py students/quiz_log_dummy.json
+
+依存: numpy
+"""
+
+import argparse
+import json
+import math
+import os
+from decimal import ROUND_HALF_UP, Decimal
+from pathlib import Path
+
+from concept_dependency import is_correct
+from index_builder import list_dataset_files
+from index_manifest import file_sha256
+from pipeline_common import atomic_write_json
+from rt_sketch import log_response_time
+from stats_core import _js_or, _js_string, _sequential_sum, compute_stats, extract_dashboard_logs
+
+SUMMARIES_DIR_NAME = 'summaries'
+# 計算方法を変えたら上げる（古いバージョンのサマリは作り直す）
+SUMMARY_VERSION = 1
+
+
+def _to_fixed(value, digits):
+    """Number.prototype.toFixed(digits)（0.5 は 0 から遠い方へ丸める）"""
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return 'Infinity' if value > 0 else '-Infinity'
+    if value == 0:
+        value = 0.0  # -0 は '0.00' になる
+    return str(Decimal(value).quantize(Decimal(1).scaleb(-digits), rounding=ROUND_HALF_UP))
+
+
+def _abs_string(fixed):
+    """`${Math.abs(value.toFixed(n))}`（文字列を数値に戻してから文字列化する）"""
+    return _js_string(abs(float(fixed)))
+
+
+def _divide(a, b):
+    """JS の a / b（0 除算は Infinity / NaN）"""
+    if b == 0:
+        if a == 0 or math.isnan(a):
+            return math.nan
+        return math.copysign(math.inf, a) * math.copysign(1, b)
+    return a / b
+
+
+def normalize_concept_stats(stats):
+    """normalizeConceptStats(stats) と同じく、概念別の値を全体平均からの相対偏差にする"""
+    if not stats or not stats.get('conceptDetails'):
+        return {}
+    overall_accuracy = stats['accuracy']
+    overall_rt = stats['rtMean']
+    overall_path = stats['avgPathLength']
+    overall_glossary = _js_or(stats.get('overallGlossaryShownRate'), 0)
+
+    normalized = {}
+    for concept, detail in stats['conceptDetails'].items():
+        normalized[concept] = {
+            'accuracy': (detail['accuracy'] - overall_accuracy) / overall_accuracy if overall_accuracy > 0 else 0,
+            'avgResponseTime': (detail['avgResponseTime'] - overall_rt) / overall_rt if overall_rt > 0 else 0,
+            'avgPathLength': (detail['avgPathLength'] - overall_path) / overall_path if overall_path > 0 else 0,
+            'glossaryShownRate': ((detail['glossaryShownRate'] - overall_glossary) / overall_glossary
+                                  if overall_glossary > 0 else 0)
+        }
+    return normalized
+
+
+def _mean_distribution(values):
+    """computeDistribution() のうち mean / count（昇順に並べてから左から足す）"""
+    if not values:
+        return {'mean': 0, 'count': 0}
+    ordered = sorted(values)
+    return {'mean': _sequential_sum(ordered) / len(ordered), 'count': len(ordered)}
+
+
+def response_time_by_correctness(logs):
+    """computeResponseTimeProfile(logs).byCorrectness の mean / count"""
+    if not logs:
+        # JS 版はログが空のとき byCorrectness の各値が空配列（mean を持たない）になる
+        return {'correct': {}, 'incorrect': {}}
+    correct = []
+    incorrect = []
+    for log in logs:
+        if not isinstance(log, dict):
+            continue
+        value = log_response_time(log)
+        if value is None:
+            continue
+        (correct if is_correct(log) else incorrect).append(value)
+    return {'correct': _mean_distribution(correct), 'incorrect': _mean_distribution(incorrect)}
+
+
+def generate_pattern_summary(stats, concept_stats, rt_profile):
+    """generatePatternSummary(stats, conceptStats, rtProfile) と同じ文の配列を返す"""
+    summaries = []
+    if not stats or not rt_profile:
+        return summaries
+
+    overall_accuracy = _js_or(stats.get('accuracy'), 0)
+    overall_path = _js_or(stats.get('avgPathLength'), 0)
+    overall_rt = _js_or(stats.get('rtMean'), 0)
+    overall_glossary = _js_or(stats.get('overallGlossaryShownRate'), 0)
+    concept_details = stats.get('conceptDetails') or {}
+
+    for concept in concept_stats:
+        detail = concept_details.get(concept)
+        if not detail:
+            continue
+        accuracy = _js_or(detail.get('accuracy'), 0)
+        path = _js_or(detail.get('avgPathLength'), 0)
+        rt = _js_or(detail.get('avgResponseTime'), 0)
+        glossary = _js_or(detail.get('glossaryShownRate'), 0)
+        accuracy_text = _to_fixed(accuracy * 100, 1)
+
+        # パターン1: 低正答率かつ高パス長
+        if accuracy < overall_accuracy - 0.1 and path > overall_path * 1.2:
+            accuracy_diff = _to_fixed((accuracy - overall_accuracy) * 100, 1)
+            path_diff = _to_fixed((_divide(path, overall_path) - 1) * 100, 1)
+            summaries.append(
+                f'概念「{concept}」では正答率が全体平均より{_abs_string(accuracy_diff)}%低く（{accuracy_text}%）、'
+                f'平均パス長が{path_diff}%長い（{_to_fixed(path, 2)}）。'
+            )
+
+        # パターン2: 反応時間のみが長い（正答率は平均的）
+        if abs(accuracy - overall_accuracy) < 0.1 and rt > overall_rt * 1.3:
+            rt_diff = _to_fixed((_divide(rt, overall_rt) - 1) * 100, 1)
+            summaries.append(
+                f'概念「{concept}」では正答率は全体平均とほぼ同等（{accuracy_text}%）だが、'
+                f'平均反応時間が{rt_diff}%長い（{_to_fixed(rt / 1000, 2)}秒）。'
+            )
+
+        # パターン3: Glossary 表示されたが誤答率が高い
+        if glossary > overall_glossary * 1.5 and accuracy < overall_accuracy - 0.15:
+            glossary_diff = _to_fixed((_divide(glossary, overall_glossary) - 1) * 100, 1)
+            accuracy_diff = _to_fixed((accuracy - overall_accuracy) * 100, 1)
+            summaries.append(
+                f'概念「{concept}」ではGlossary表示率が全体平均より{glossary_diff}%高い（{_to_fixed(glossary * 100, 1)}%）'
+                f'にもかかわらず、正答率が{_abs_string(accuracy_diff)}%低い（{accuracy_text}%）。'
+            )
+
+        # パターン4: 正答率が高いが反応時間も長い
+        if accuracy > overall_accuracy + 0.15 and rt > overall_rt * 1.2:
+            accuracy_diff = _to_fixed((accuracy - overall_accuracy) * 100, 1)
+            rt_diff = _to_fixed((_divide(rt, overall_rt) - 1) * 100, 1)
+            summaries.append(
+                f'概念「{concept}」では正答率が全体平均より{accuracy_diff}%高い（{accuracy_text}%）が、'
+                f'平均反応時間も{rt_diff}%長い（{_to_fixed(rt / 1000, 2)}秒）。'
+            )
+
+    # 反応時間プロファイルからのパターン
+    by_correctness = rt_profile.get('byCorrectness')
+    if by_correctness:
+        correct_rt = _js_or(by_correctness['correct'].get('mean'), 0)
+        incorrect_rt = _js_or(by_correctness['incorrect'].get('mean'), 0)
+        incorrect_text = _to_fixed(incorrect_rt / 1000, 2)
+        correct_text = _to_fixed(correct_rt / 1000, 2)
+
+        # パターン5: 誤答時の反応時間が正答時より長い
+        if incorrect_rt > correct_rt * 1.2:
+            rt_diff = _to_fixed((_divide(incorrect_rt, correct_rt) - 1) * 100, 1)
+            summaries.append(
+                f'誤答時の平均反応時間（{incorrect_text}秒）は正答時（{correct_text}秒）より{rt_diff}%長い。'
+            )
+
+        # パターン6: 誤答時の反応時間が正答時より短い
+        if incorrect_rt < correct_rt * 0.8:
+            rt_diff = _to_fixed((1 - incorrect_rt / correct_rt) * 100, 1)
+            summaries.append(
+                f'誤答時の平均反応時間（{incorrect_text}秒）は正答時（{correct_text}秒）より{rt_diff}%短い。'
+            )
+
+    # 全体統計からのパターン
+    if stats.get('avgPathLength', 0) > 3 and stats['accuracy'] < 0.5:
+        summaries.append(
+            f'全体として平均パス長が{_to_fixed(stats["avgPathLength"], 2)}と長く、'
+            f'正答率が{_to_fixed(stats["accuracy"] * 100, 1)}%と低い傾向が見られる。'
+        )
+    if stats['rtMean'] > 5000 and stats['accuracy'] > 0.7:
+        summaries.append(
+            f'全体として平均反応時間が{_to_fixed(stats["rtMean"] / 1000, 2)}秒と長いが、'
+            f'正答率は{_to_fixed(stats["accuracy"] * 100, 1)}%と高い。'
+        )
+    return summaries
+
+
+def _insight(kind, category, message, detail):
+    return {'type': kind, 'category': category, 'message': message, 'detail': detail}
+
+
+def generate_insights(stats):
+    """generateInsights(stats) と同じ洞察の配列を返す"""
+    if not stats or stats['total'] == 0:
+        return ['データが不足しています。分析には十分なログデータが必要です。']
+    insights = []
+    acc = stats['accuracy'] * 100
+    acc_text = _to_fixed(acc, 1)
+
+    # 1. 総評（正答率ベース）
+    if acc < 40:
+        insights.append(_insight('critical', '総評', '理解の基盤が不安定で、再構築が必要です。',
+                                 f'正答率が{acc_text}%と低く、基本的な概念の理解から見直す必要があります。'))
+    elif acc < 60:
+        insights.append(_insight('warning', '総評', '理解が部分的で、特定概念に依存した誤答傾向があります。',
+                                 f'正答率が{acc_text}%で、一部の概念で理解が不足しています。'))
+    elif acc < 80:
+        insights.append(_insight('info', '総評', '全体として理解は安定していますが、一部概念が弱点です。',
+                                 f'正答率が{acc_text}%で、基本的な理解はできていますが、改善の余地があります。'))
+    else:
+        insights.append(_insight('success', '総評', '高い理解度を示し、概念間の接続も強固です。',
+                                 f'正答率が{acc_text}%と高く、概念の理解が定着しています。'))
+
+    # 2. 弱点概念
+    concept_entries = list((stats.get('conceptScore') or {}).items())
+    if concept_entries:
+        answered = [(concept, data) for concept, data in concept_entries if data['total'] > 0]
+        answered.sort(key=lambda entry: entry[1]['correct'] / entry[1]['total'])
+        if answered:
+            concept, data = answered[0]
+            weakest_acc = _to_fixed(data['correct'] / data['total'] * 100, 1)
+            insights.append(_insight(
+                'warning', '弱点概念', f'最も弱い概念: {concept}（正答率 {weakest_acc}%）',
+                f'概念「{concept}」は{data["total"]}問中{data["correct"]}問しか正答できておらず、集中的な復習が必要です。'
+            ))
+
+        weak_concepts = [(concept, data['correct'] / data['total']) for concept, data in concept_entries
+                         if data['total'] > 0 and data['correct'] / data['total'] < 0.6]
+        weak_concepts.sort(key=lambda entry: entry[1])
+        weak_concepts = weak_concepts[:3]
+        if len(weak_concepts) > 1:
+            insights.append(_insight(
+                'info', '弱点概念', f'他にも{len(weak_concepts)}個の弱点概念があります。',
+                '、'.join(f'{concept}（{_to_fixed(accuracy * 100, 1)}%）' for concept, accuracy in weak_concepts)
+            ))
+
+    # 3. 反応時間
+    if _js_or(stats.get('rtCount'), 0) > 0:
+        rt_mean_text = _to_fixed(stats['rtMean'] / 1000, 1)
+        if stats['rtMean'] > 7000:
+            insights.append(_insight('warning', '反応時間', '反応時間が長く、処理負荷が高い設問で迷いやすい傾向があります。',
+                                     f'平均反応時間が{rt_mean_text}秒と長く、問題解決に時間がかかっています。'))
+        elif stats['rtMean'] < 2000:
+            insights.append(_insight('success', '反応時間', '反応時間が短く、直感的な理解ができています。',
+                                     f'平均反応時間が{rt_mean_text}秒と短く、概念の理解が定着しています。'))
+        if stats['rtStd'] > 3000:
+            insights.append(_insight('warning', '反応時間', '反応時間のばらつきが大きく、曖昧な理解が残っています。',
+                                     f'標準偏差が{_to_fixed(stats["rtStd"] / 1000, 1)}秒と大きく、'
+                                     f'問題によって反応時間に大きな差があります。'))
+        if stats['rtMean'] > 5000 and acc < 60:
+            insights.append(_insight('critical', '反応時間', '長時間考えても正答率が低く、理解が不十分です。',
+                                     '反応時間が長いにもかかわらず正答率が低いため、基礎的な理解から見直す必要があります。'))
+
+    # 4. 誤答密集パターン
+    mistakes = stats.get('mistakes') or []
+    if mistakes:
+        top_mistakes = mistakes[:3]
+        for index, mistake in enumerate(top_mistakes):
+            mistake_rate = _to_fixed(mistake['incorrect'] / mistake['total'] * 100, 1)
+            insights.append(_insight(
+                'warning', '誤答パターン', f'概念「{mistake["concept"]}」は誤答が多く、理解構造の弱点です。',
+                f'{mistake["total"]}問中{mistake["incorrect"]}問を誤答（誤答率{mistake_rate}%）しており、'
+                f'{"最も" if index == 0 else ""}集中的な復習が必要です。'
+            ))
+        total_mistakes = sum(mistake['incorrect'] for mistake in mistakes)
+        top3_mistakes = sum(mistake['incorrect'] for mistake in top_mistakes)
+        concentration = _divide(top3_mistakes, total_mistakes) * 100
+        if concentration > 60:
+            insights.append(_insight(
+                'info', '誤答パターン', '誤答が特定の概念に集中しています。',
+                f'誤答の{_to_fixed(concentration, 1)}%が上位3つの概念に集中しており、'
+                f'これらの概念を重点的に復習することで大幅な改善が期待できます。'
+            ))
+
+    # 5. データの信頼性
+    if stats['total'] < 10:
+        insights.append(_insight('warning', 'データ品質', 'データ量が少なく、分析結果の信頼性が低い可能性があります。',
+                                 f'総回答数が{stats["total"]}問と少ないため、より多くのデータを収集することを推奨します。'))
+    elif stats['total'] >= 50:
+        insights.append(_insight('success', 'データ品質', '十分なデータ量があり、分析結果の信頼性が高いです。',
+                                 f'総回答数が{stats["total"]}問と十分なため、分析結果は信頼できます。'))
+    return insights
+
+
+def build_summary(logs):
+    """生ログからサマリ一式（stats / conceptStats / rtProfile / patternSummary / insights）を作成"""
+    stats = compute_stats(logs)
+    concept_stats = normalize_concept_stats(stats)
+    rt_profile = {'byCorrectness': response_time_by_correctness(logs)}
+    return {
+        'stats': stats,
+        'conceptStats': concept_stats,
+        'rtProfile': rt_profile,
+        'patternSummary': generate_pattern_summary(stats, concept_stats, rt_profile),
+        'insights': generate_insights(stats)
+    }
+
+
+def summary_relative_path(key):
+    """index.json に記録する students からの相対パス"""
+    return f'{SUMMARIES_DIR_NAME}/{key}.json'
+
+
+def _load_summary(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def materialize_summary(json_path, key=None):
+    """
+    データセットのサマリを用意し、index.json に記録する {key, path} を返す
+
+    同じキー・同じバージョンのサマリが既にあれば計算しない。key（内容の SHA-256）を
+    呼び出し側で計算済みなら渡せる。
+
+    Returns:
+        tuple: ({'key': ..., 'path': ...}, 計算したか)
+    """
+    json_path = Path(json_path)
+    key = key or file_sha256(json_path)
+    summaries_dir = json_path.parent / SUMMARIES_DIR_NAME
+    summary_path = summaries_dir / f'{key}.json'
+    entry = {'key': key, 'path': summary_relative_path(key)}
+
+    cached = _load_summary(summary_path)
+    if cached and cached.get('version') == SUMMARY_VERSION and cached.get('source_sha256') == key:
+        return entry, False
+
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    summary = {'version': SUMMARY_VERSION, 'source_sha256': key, 'file': json_path.name}
+    summary.update(build_summary(extract_dashboard_logs(data)))
+
+    atomic_write_json(summary_path, summary, separators=(',', ':'))
+    return entry, True
+
+
+def evict_stale_summaries(students_dir, live_keys):
+    """live_keys に含まれないキーのサマリを削除し、削除数を返す"""
+    summaries_dir = Path(students_dir) / SUMMARIES_DIR_NAME
+    if not summaries_dir.is_dir():
+        return 0
+    live = {f'{key}.json' for key in live_keys}
+    removed = 0
+    for name in os.listdir(summaries_dir):
+        if name not in live and not name.endswith('.tmp'):
+            os.remove(summaries_dir / name)
+            removed += 1
+    return removed
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='データセットのサマリを内容ハッシュごとに students/summaries/ へ事前計算する')
+    parser.add_argument('files', nargs='*', help='対象の JSON（省略時は students 内の全データセットを計算し、不要なサマリを削除）')
+    return parser.parse_args()
+
+
+def main(files=None):
+    students_dir = Path(__file__).parent.parent / 'students'
+    paths = [Path(f) for f in files] if files else [students_dir / f for f in list_dataset_files(students_dir)]
+
+    live_keys = []
+    for json_path in paths:
+        try:
+            entry, computed = materialize_summary(json_path)
+        except (OSError, ValueError) as e:
+            print(f'[警告] {json_path.name} のサマリ計算に失敗しました: {e}')
+            continue
+        live_keys.append(entry['key'])
+        state = '計算' if computed else '再利用'
+        print(f'[OK] {json_path.name} → {entry["path"]}（{state}）')
+
+    if not files:
+        removed = evict_stale_summaries(students_dir, live_keys)
+        print(f'[統計] サマリ: {len(live_keys)} 件 / 削除: {removed} 件')
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    main(args.files)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+concept_dependency.py（Python 版）と src/core/concept_dependency.js（JS 版）の出力が一致するかを確認するスクリプト
+
+students 内の全データセットと EDGE_CASE_LOGS について、
+JS 版の formatGraphForJSON(buildConceptDependencyGraph(logs)) と Python 版の結果を
+metadata.generated_at 以外すべて比較する。
+ログを小分けにして取り込み、保存・読み込みを挟んでマージした場合の件数も確認する。
+
+実行方法:
+python scripts/verify_concept_graph_parity.py
+python scripts/verify_concept_graph_parity.py /tmp/bulk_100k.json  # 任意のデータセットを比較
+
+依存: node（src/core/concept_dependency.js を ES モジュールとして読み込む）, numpy
+"""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from concept_dependency import ConceptDependency, format_graph_for_json
+from index_builder import list_dataset_files
+from stats_core import extract_dashboard_logs
+from verify_stats_parity import EDGE_CASE_LOGS, diff
+
+PROJECT_ROOT = Path(__file__).parent.parent
+CONCEPT_DEPENDENCY_JS = PROJECT_ROOT / 'src' / 'core' / 'concept_dependency.js'
+
+# JS 側: stdin の {名前: ログ配列} からグラフを作る
+NODE_RUNNER = '''
+import { readFileSync } from 'node:fs';
+import { pathToFileURL } from 'node:url';
+const concept = await import(pathToFileURL(process.argv[1]).href);
+const datasets = JSON.parse(readFileSync(0, 'utf-8'));
+const result = {};
+for (const [name, logs] of Object.entries(datasets)) {
+  result[name] = concept.formatGraphForJSON(concept.buildConceptDependencyGraph(logs));
+}
+process.stdout.write(JSON.stringify(result));
+'''
+
+# 同じ組が逆順に現れるログ、重複したタグ、数値と文字列が混ざったタグ
+CONCEPT_EDGE_CASE_LOGS = EDGE_CASE_LOGS + [
+    {'correct': True, 'conceptTags': ['説明', '識別', '適用'], 'response_time': 0.1},
+    {'correct': False, 'conceptTags': ['識別', '説明'], 'response_time': 0.2},
+    {'selected': {'correct': True}, 'concept_tags': ['b', 'a', 'b'], 'reaction_time': 0.7},
+    {'correct': False, 'conceptTags': [2, '10', 'x', None], 'response_time': 3}
+]
+
+
+def js_results(datasets):
+    completed = subprocess.run(
+        ['node', '--no-warnings', '--input-type=module', '-e', NODE_RUNNER, str(CONCEPT_DEPENDENCY_JS)],
+        input=json.dumps(datasets, ensure_ascii=False), capture_output=True, text=True, encoding='utf-8'
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip())
+    return json.loads(completed.stdout)
+
+
+def python_graph(logs, chunk=None):
+    """chunk を指定すると、その件数ずつ別々のグラフに取り込んでからマージする"""
+    graph = ConceptDependency()
+    if chunk is None:
+        graph.add_logs(logs)
+    else:
+        for start in range(0, len(logs), chunk):
+            part = ConceptDependency()
+            part.add_logs(logs[start:start + chunk])
+            graph.merge(ConceptDependency.from_dict(json.loads(json.dumps(part.to_dict()))))
+    return json.loads(json.dumps(format_graph_for_json(graph.graph()), ensure_ascii=False))
+
+
+def main(files=None):
+    students_dir = PROJECT_ROOT / 'students'
+    paths = [Path(f) for f in files] if files else [students_dir / f for f in list_dataset_files(students_dir)]
+    datasets = {}
+    for json_path in paths:
+        with open(json_path, 'r', encoding='utf-8') as f:
+            datasets[json_path.name] = extract_dashboard_logs(json.load(f))
+    datasets['EDGE_CASE_LOGS'] = CONCEPT_EDGE_CASE_LOGS
+
+    try:
+        expected = js_results(datasets)
+    except (OSError, RuntimeError) as e:
+        print(f'[エラー] JS 版の実行に失敗しました: {e}')
+        return 1
+
+    failures = 0
+    for name, logs in datasets.items():
+        actual = python_graph(logs)
+        actual['metadata']['generated_at'] = expected[name]['metadata']['generated_at']
+        found = diff(expected[name], actual)
+        if found:
+            failures += 1
+            print(f'[NG] {name}: {found}')
+            continue
+        # 分割して取り込むと合計の順序が変わるので、件数と並びだけを比べる
+        chunked = python_graph(logs, chunk=7)
+        counts = lambda graph: ([(n['id'], n['total_count'], n['correct_count']) for n in graph['nodes']],
+                                [(e['source'], e['target'], e['weight']) for e in graph['edges']])
+        if counts(expected[name]) != counts(chunked):
+            failures += 1
+            print(f'[NG] {name}: 分割して取り込んだ結果が一致しません')
+        else:
+            metadata = expected[name]['metadata']
+            print(f'[OK] {name}（概念: {metadata["node_count"]} / エッジ: {metadata["edge_count"]}）')
+
+    print(f'\n[統計] 一致: {len(datasets) - failures} / 不一致: {failures}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -1,173 +1,340 @@
 #!/usr/bin/env python3
-"""ダミーログの整合性を確認するスクリプト"""
+"""
+ダミーログの整合性を確認するスクリプト
 
+ファイルを JsonStreamReader で先頭から 1 回だけ読み進め、ログ・セッションを
+1 件ずつ取り出しながら、すべての規則の検査と統計の集計を同時に行う。
+ファイル全体を読み込まないので、巨大なファイルでもメモリは 1 セッション分で済む。
+複数ファイルはプロセスプールで並列に検証する。
+
+規則（エラーは規則ごとに --max-errors 件まで記録し、件数はすべて数える）:
+    json              JSON として読めない
+    missing_logs      logs / sessions のどちらもない
+    required_keys     ログに必須キーがない
+    click_integrity   path と clicks が対応していない / 最後のクリック時刻が response_time と違う
+    session_id        セッションに session_id がない
+    vector            vector が辞書でない / 値が -1, 0, 1 以外
+
+実行方法:
+python scripts/verify_dummy_logs.py  # students/quiz_log_dummy.json
+python scripts/verify_dummy_logs.py --all --workers 4  # students 内の全データセット
+python scripts/verify_dummy_logs.py students/demo_project_02_logs.json --report report.json
+"""
+
+import argparse
 import json
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-file_path = Path('students/quiz_log_dummy.json')
-
-try:
-    with open(file_path, encoding='utf-8') as f:
-        data = json.load(f)
-except FileNotFoundError:
-    print(f'エラー: {file_path} が見つかりません。')
-    exit(1)
-except json.JSONDecodeError as e:
-    print(f'エラー: {file_path} のJSON解析に失敗しました: {e}')
-    exit(1)
-
-# logs の存在確認
-if 'logs' not in data:
-    print('エラー: "logs" キーが見つかりません。')
-    exit(1)
-
-logs = data['logs']
-
-if not logs:
-    print('警告: logs が空です。')
-    exit(0)
-
-print(f'Total logs: {len(logs)}')
-print(f'Dataset name: {data.get("dataset_name", "N/A")}')
-print(f'Type: {data.get("type", "N/A")}')
-print(f'Created at: {data.get("created_at", data.get("generated_at", "N/A"))}')
-
-# 必須キーのチェック
-required_keys = ['questionId', 'clicks', 'path', 'final_answer', 'correct', 'response_time', 'timestamp']
-all_keys_valid = all(all(key in log for key in required_keys) for log in logs)
-print(f'All required keys present: {all_keys_valid}')
-
-# 正答・誤答の統計
-correct_count = sum(1 for l in logs if l['correct'])
-error_count = sum(1 for l in logs if not l['correct'])
-print(f'Correct: {correct_count} ({correct_count/len(logs)*100:.1f}%)')
-print(f'Error: {error_count} ({error_count/len(logs)*100:.1f}%)')
-
-# conceptTags と recommended_terms の統計
-with_concept_tags = sum(1 for l in logs if 'conceptTags' in l)
-with_recommended = sum(1 for l in logs if 'recommended_terms' in l)
-print(f'With conceptTags: {with_concept_tags} (should be {error_count})')
-print(f'With recommended_terms: {with_recommended} (should be {error_count})')
-
-# 反応時間分類
-instant_count = sum(1 for l in logs if l['response_time'] <= 2)
-searching_count = sum(1 for l in logs if 2 < l['response_time'] < 15)
-deliberate_count = sum(1 for l in logs if l['response_time'] >= 15)
-print('\nResponse time distribution:')
-print(f'  instant (<=2s): {instant_count} ({instant_count/len(logs)*100:.1f}%)')
-print(f'  searching (2-15s): {searching_count} ({searching_count/len(logs)*100:.1f}%)')
-print(f'  deliberate (>=15s): {deliberate_count} ({deliberate_count/len(logs)*100:.1f}%)')
-
-# path の統計
-path_lengths = [len(l['path']) for l in logs]
-print('\nPath length distribution:')
-for length in range(1, 5):
-    count = sum(1 for pl in path_lengths if pl == length)
-    print(f'  {length} steps: {count} ({count/len(logs)*100:.1f}%)')
-
-# clicks と path の整合性チェック
-integrity_ok = True
-for i, log in enumerate(logs):
-    if 'path' not in log or 'clicks' not in log:
-        print(f'Warning: Log {i} - path または clicks が存在しません')
-        integrity_ok = False
-        continue
-    
-    path = log['path']
-    clicks = log['clicks']
-    
-    if not path or not clicks:
-        print(f'Warning: Log {i} - path または clicks が空です')
-        integrity_ok = False
-        continue
-    
-    if len(path) != len(clicks):
-        print(f'Warning: Log {i} - path length ({len(path)}) != clicks length ({len(clicks)})')
-        integrity_ok = False
-    for j, (p, c) in enumerate(zip(path, clicks)):
-        if 'choiceId' not in c:
-            print(f'Warning: Log {i}, click {j} - choiceId が存在しません')
-            integrity_ok = False
-            continue
-        if p != c['choiceId']:
-            print(f'Warning: Log {i}, click {j} - path choice ({p}) != click choiceId ({c["choiceId"]})')
-            integrity_ok = False
-    if clicks and 'time' in clicks[-1]:
-        if clicks[-1]['time'] != log['response_time']:
-            print(f'Warning: Log {i} - last click time ({clicks[-1]["time"]}) != response_time ({log["response_time"]})')
-            integrity_ok = False
-
-print(f'\nIntegrity check: {"OK" if integrity_ok else "FAILED"}')
-
-# vector_test_sessions の検証
-if 'vector_test_sessions' in data:
-    print('\n' + '='*50)
-    print('vector_test_sessions の検証')
-    print('='*50)
-    
-    vts = data['vector_test_sessions']
-    sessions = vts.get('sessions', [])
-    print(f'セッション数: {len(sessions)}')
-    print(f'User ID: {vts.get("user_id", "N/A")}')
-    print(f'Generated at: {vts.get("generated_at", "N/A")}')
-    
-    total_vector_logs = 0
-    vector_logs_with_vector = 0
-    vector_errors = []
-    
-    for session_idx, session in enumerate(sessions):
-        if 'session_id' not in session:
-            print(f'警告: Session {session_idx} に session_id がありません')
-            continue
-        
-        session_logs = session.get('logs', [])
-        if not session_logs:
-            continue
-        
-        total_vector_logs += len(session_logs)
-        
+from index_builder import list_dataset_files, resolve_workers
+from json_stream import JsonStreamReader
+
+REQUIRED_KEYS = ('questionId', 'clicks', 'path', 'final_answer', 'correct', 'response_time', 'timestamp')
+META_KEYS = ('dataset_name', 'type', 'created_at', 'generated_at', 'user_id')
+VECTOR_VALUES = (-1, 0, 1)
+DEFAULT_MAX_ERRORS = 10
+
+
+class DatasetValidator:
+    """1 ファイル分の検査結果と統計を 1 パスで集計する"""
+
+    def __init__(self, max_errors=DEFAULT_MAX_ERRORS):
+        self.max_errors = max_errors
+        self.errors = {}
+        self.warnings = []
+        self.meta = {}
+        self.has_logs = False
+        self.logs = {
+            'total': 0,
+            'correct': 0,
+            'error': 0,
+            'with_concept_tags': 0,
+            'with_recommended_terms': 0,
+            'with_all_required_keys': 0,
+            'response_time': {'instant': 0, 'searching': 0, 'deliberate': 0},
+            'path_length': {}
+        }
+        self.sessions = {}
+
+    def error(self, rule, message):
+        entry = self.errors.setdefault(rule, {'count': 0, 'samples': []})
+        entry['count'] += 1
+        if len(entry['samples']) < self.max_errors:
+            entry['samples'].append(message)
+
+    def check_log(self, i, log):
+        """トップレベルの logs の 1 件を検査・集計"""
+        stats = self.logs
+        stats['total'] += 1
+        if not isinstance(log, dict):
+            self.error('required_keys', f'Log {i} - オブジェクトではありません')
+            return
+
+        missing = [key for key in REQUIRED_KEYS if key not in log]
+        if missing:
+            self.error('required_keys', f'Log {i} - {", ".join(missing)} が存在しません')
+        else:
+            stats['with_all_required_keys'] += 1
+
+        if log.get('correct'):
+            stats['correct'] += 1
+        else:
+            stats['error'] += 1
+        if 'conceptTags' in log:
+            stats['with_concept_tags'] += 1
+        if 'recommended_terms' in log:
+            stats['with_recommended_terms'] += 1
+
+        response_time = log.get('response_time')
+        if isinstance(response_time, (int, float)) and not isinstance(response_time, bool):
+            if response_time <= 2:
+                stats['response_time']['instant'] += 1
+            elif response_time < 15:
+                stats['response_time']['searching'] += 1
+            else:
+                stats['response_time']['deliberate'] += 1
+
+        path = log.get('path')
+        if isinstance(path, list):
+            length = str(len(path))
+            stats['path_length'][length] = stats['path_length'].get(length, 0) + 1
+
+        self._check_clicks(i, log)
+
+    def _check_clicks(self, i, log):
+        rule = 'click_integrity'
+        if 'path' not in log or 'clicks' not in log:
+            self.error(rule, f'Log {i} - path または clicks が存在しません')
+            return
+        path = log['path']
+        clicks = log['clicks']
+        if not path or not clicks:
+            self.error(rule, f'Log {i} - path または clicks が空です')
+            return
+        if len(path) != len(clicks):
+            self.error(rule, f'Log {i} - path length ({len(path)}) != clicks length ({len(clicks)})')
+        for j, (p, c) in enumerate(zip(path, clicks)):
+            if not isinstance(c, dict) or 'choiceId' not in c:
+                self.error(rule, f'Log {i}, click {j} - choiceId が存在しません')
+                continue
+            if p != c['choiceId']:
+                self.error(rule, f'Log {i}, click {j} - path choice ({p}) != click choiceId ({c["choiceId"]})')
+        last = clicks[-1]
+        if isinstance(last, dict) and 'time' in last and last['time'] != log.get('response_time'):
+            self.error(rule, f'Log {i} - last click time ({last["time"]}) != response_time ({log.get("response_time")})')
+
+    def start_sessions(self, source):
+        """セッション配列（vector_test_sessions / トップレベルの sessions）ごとの集計を始める"""
+        self.sessions[source] = {
+            'meta': {},
+            'total': 0,
+            'total_logs': 0,
+            'logs_with_vector': 0,
+            'vector_errors': 0
+        }
+        return self.sessions[source]
+
+    def check_session(self, source, session_idx, session):
+        """セッション 1 件（vector_test_sessions.sessions / sessions）を検査・集計"""
+        stats = self.sessions[source]
+        stats['total'] += 1
+        if not isinstance(session, dict) or 'session_id' not in session:
+            self.error('session_id', f'Session {session_idx} に session_id がありません')
+            return
+
+        session_logs = session.get('logs') or []
+        stats['total_logs'] += len(session_logs)
+        session_id = session['session_id']
         for log_idx, log in enumerate(session_logs):
-            if not isinstance(log, dict):
+            if not isinstance(log, dict) or 'vector' not in log:
+                continue
+            stats['logs_with_vector'] += 1
+            vector = log['vector']
+            if not isinstance(vector, dict):
+                stats['vector_errors'] += 1
+                self.error('vector', f'Session {session_id}, Log {log_idx}: vector が辞書型ではありません')
                 continue
-            
-            if 'vector' in log:
-                vector_logs_with_vector += 1
-                vector = log['vector']
-                if not isinstance(vector, dict):
-                    vector_errors.append(
-                        f'Session {session["session_id"]}, Log {log_idx}: '
-                        f'vector が辞書型ではありません'
-                    )
-                    continue
-                
-                # ベクトルの値が -1, 0, 1 のいずれかであることを確認
-                for axis, value in vector.items():
-                    if not isinstance(value, (int, float)):
-                        vector_errors.append(
-                            f'Session {session["session_id"]}, Log {log_idx}: '
-                            f'vector[{axis}] = {value} (型が不正: {type(value).__name__})'
-                        )
-                    elif value not in [-1, 0, 1]:
-                        vector_errors.append(
-                            f'Session {session["session_id"]}, Log {log_idx}: '
-                            f'vector[{axis}] = {value} (expected -1, 0, or 1)'
-                        )
-    
-    print(f'総ログ数: {total_vector_logs}件')
-    print(f'vector フィールドを持つログ: {vector_logs_with_vector}件')
-    
-    if vector_errors:
-        print(f'\n⚠️ ベクトル値のエラー: {len(vector_errors)}件')
-        for error in vector_errors[:10]:  # 最初の10件のみ表示
-            print(f'  {error}')
-        if len(vector_errors) > 10:
-            print(f'  ... 他 {len(vector_errors) - 10}件のエラー')
+            for axis, value in vector.items():
+                if not isinstance(value, (int, float)) or isinstance(value, bool):
+                    stats['vector_errors'] += 1
+                    self.error('vector', f'Session {session_id}, Log {log_idx}: '
+                                         f'vector[{axis}] = {value} (型が不正: {type(value).__name__})')
+                elif value not in VECTOR_VALUES:
+                    stats['vector_errors'] += 1
+                    self.error('vector', f'Session {session_id}, Log {log_idx}: '
+                                         f'vector[{axis}] = {value} (expected -1, 0, or 1)')
+
+    def report(self, file_name):
+        if not self.has_logs and not self.sessions and 'json' not in self.errors:
+            self.error('missing_logs', '"logs" キーが見つかりません。')
+        return {
+            'file': file_name,
+            'ok': not self.errors,
+            'meta': self.meta,
+            'logs': self.logs if self.has_logs else None,
+            'sessions': self.sessions,
+            'warnings': self.warnings,
+            'errors': self.errors
+        }
+
+
+def _read_meta(reader, meta):
+    for key in reader.iter_object():
+        if key in META_KEYS and reader.peek() not in ('{', '['):
+            meta[key] = reader.read_value()
+        elif key == 'sessions' and reader.peek() == '[':
+            yield key
+        else:
+            reader.skip_value()
+
+
+def _walk_sessions(reader, validator, source):
+    for index in reader.iter_array():
+        validator.check_session(source, index, reader.read_value())
+
+
+def validate_file(json_path, max_errors=DEFAULT_MAX_ERRORS):
+    """1 ファイルをストリーミングで 1 回読み、検証結果（辞書）を返す"""
+    json_path = Path(json_path)
+    validator = DatasetValidator(max_errors)
+    try:
+        with open(json_path, 'rb') as f:
+            reader = JsonStreamReader(f)
+            for key in reader.iter_object():
+                ch = reader.peek()
+                if key == 'logs' and ch == '[':
+                    validator.has_logs = True
+                    for index in reader.iter_array():
+                        validator.check_log(index, reader.read_value())
+                elif key == 'vector_test_sessions' and ch == '{':
+                    stats = validator.start_sessions('vector_test_sessions')
+                    for _ in _read_meta(reader, stats['meta']):
+                        _walk_sessions(reader, validator, 'vector_test_sessions')
+                elif key == 'sessions' and ch == '[':
+                    validator.start_sessions('sessions')
+                    _walk_sessions(reader, validator, 'sessions')
+                elif key in META_KEYS and ch not in ('{', '['):
+                    validator.meta[key] = reader.read_value()
+                else:
+                    reader.skip_value()
+    except (ValueError, UnicodeDecodeError) as e:
+        validator.error('json', f'JSON解析に失敗しました: {e}')
+    except OSError as e:
+        validator.error('json', f'読み込みに失敗しました: {e}')
+
+    if validator.has_logs and validator.logs['total'] == 0:
+        validator.warnings.append('logs が空です。')
+    return validator.report(json_path.name)
+
+
+def _percent(count, total):
+    return f'{count / total * 100:.1f}%' if total else '-'
+
+
+def print_report(report):
+    """検証結果を従来の表示形式で出力"""
+    print('=' * 50)
+    print(report['file'])
+    print('=' * 50)
+    meta = report['meta']
+    logs = report['logs']
+    if logs is not None:
+        total = logs['total']
+        print(f'Total logs: {total}')
+        print(f'Dataset name: {meta.get("dataset_name", "N/A")}')
+        print(f'Type: {meta.get("type", "N/A")}')
+        print(f'Created at: {meta.get("created_at", meta.get("generated_at", "N/A"))}')
+        print(f'All required keys present: {logs["with_all_required_keys"] == total}')
+        print(f'Correct: {logs["correct"]} ({_percent(logs["correct"], total)})')
+        print(f'Error: {logs["error"]} ({_percent(logs["error"], total)})')
+        print(f'With conceptTags: {logs["with_concept_tags"]} (should be {logs["error"]})')
+        print(f'With recommended_terms: {logs["with_recommended_terms"]} (should be {logs["error"]})')
+        rt = logs['response_time']
+        print('\nResponse time distribution:')
+        print(f'  instant (<=2s): {rt["instant"]} ({_percent(rt["instant"], total)})')
+        print(f'  searching (2-15s): {rt["searching"]} ({_percent(rt["searching"], total)})')
+        print(f'  deliberate (>=15s): {rt["deliberate"]} ({_percent(rt["deliberate"], total)})')
+        print('\nPath length distribution:')
+        for length in sorted(logs['path_length'], key=int):
+            count = logs['path_length'][length]
+            print(f'  {length} steps: {count} ({_percent(count, total)})')
+        print(f'\nIntegrity check: {"FAILED" if "click_integrity" in report["errors"] else "OK"}')
+
+    for source, sessions in report['sessions'].items():
+        print('\n' + '=' * 50)
+        print(f'{source} の検証')
+        print('=' * 50)
+        print(f'セッション数: {sessions["total"]}')
+        print(f'User ID: {sessions["meta"].get("user_id", meta.get("user_id", "N/A"))}')
+        print(f'Generated at: {sessions["meta"].get("generated_at", "N/A")}')
+        print(f'総ログ数: {sessions["total_logs"]}件')
+        print(f'vector フィールドを持つログ: {sessions["logs_with_vector"]}件')
+        if sessions['vector_errors']:
+            print(f'⚠️ ベクトル値のエラー: {sessions["vector_errors"]}件')
+        else:
+            print('✅ ベクトル値の検証: OK')
+
+    for warning in report['warnings']:
+        print(f'警告: {warning}')
+    for rule, entry in report['errors'].items():
+        print(f'\n⚠️ {rule}: {entry["count"]}件')
+        for message in entry['samples']:
+            print(f'  {message}')
+        if entry['count'] > len(entry['samples']):
+            print(f'  ... 他 {entry["count"] - len(entry["samples"])}件のエラー')
+    print()
+
+
+def validate_files(paths, workers=1, max_errors=DEFAULT_MAX_ERRORS):
+    """複数ファイルを検証（workers > 1 ならプロセスプールで並列）。結果は paths と同じ順序"""
+    workers = min(resolve_workers(workers), len(paths)) or 1
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(validate_file, paths, [max_errors] * len(paths)))
+    return [validate_file(path, max_errors) for path in paths]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='students/*.json の整合性を検証')
+    parser.add_argument('files', nargs='*', help='検証する JSON（既定は students/quiz_log_dummy.json）')
+    parser.add_argument('--all', action='store_true', help='students 内の全データセットを検証する')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='検証に使うプロセス数（0 で CPU コア数、既定は 1）')
+    parser.add_argument('--max-errors', type=int, default=DEFAULT_MAX_ERRORS,
+                        help='規則ごとに記録するエラーの最大件数（既定 10）')
+    parser.add_argument('--report', help='検証結果を JSON で書き出すファイル')
+    parser.add_argument('--quiet', action='store_true', help='ファイルごとの表示を省略する')
+    return parser.parse_args()
+
+
+def main(files=None, all_files=False, workers=1, max_errors=DEFAULT_MAX_ERRORS, report_path=None, quiet=False):
+    students_dir = Path(__file__).parent.parent / 'students'
+    if all_files:
+        paths = [students_dir / f for f in list_dataset_files(students_dir)]
+    elif files:
+        paths = [Path(f) for f in files]
     else:
-        print('✅ ベクトル値の検証: OK')
-else:
-    print('\nvector_test_sessions は見つかりませんでした。')
+        paths = [students_dir / 'quiz_log_dummy.json']
 
+    reports = validate_files(paths, workers, max_errors)
+    if not quiet:
+        for report in reports:
+            print_report(report)
 
+    failed = [report['file'] for report in reports if not report['ok']]
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump({'ok': not failed, 'files': reports}, f, ensure_ascii=False, indent=2)
+        print(f'[OK] {report_path} に検証結果を書き出しました')
 
+    print(f'[統計] 検証: {len(reports)} ファイル / 問題あり: {len(failed)}')
+    for name in failed:
+        print(f'  - {name}')
+    return 1 if failed else 0
 
 
+if __name__ == '__main__':
+    args = parse_args()
+    sys.exit(main(args.files, all_files=args.all, workers=args.workers, max_errors=args.max_errors,
+                  report_path=args.report, quiet=args.quiet))
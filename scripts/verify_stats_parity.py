@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+stats_core.py（Python 版）と src/core/stats_core.js（JS 版）の出力が一致するかを確認するスクリプト
+
+students 内の全データセットと、判定の分かれやすいログを集めた EDGE_CASE_LOGS について、
+両方の computeStats / computeMistakeRanking / computeLevelStats を実行して比較する。
+数値は浮動小数点まで完全一致、オブジェクトはキー順まで一致することを確認する。
+
+実行方法:
+python scripts/verify_stats_parity.py
+python scripts/verify_stats_parity.py /tmp/bulk_100k.json  # 任意のデータセットを比較
+
+依存: node（src/core/stats_core.js を ES モジュールとして読み込む）
+"""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from index_builder import list_dataset_files
+from stats_core import compute_level_stats, compute_mistake_ranking, compute_stats, extract_dashboard_logs
+
+PROJECT_ROOT = Path(__file__).parent.parent
+STATS_CORE_JS = PROJECT_ROOT / 'src' / 'core' / 'stats_core.js'
+
+# JS 側: stdin の {名前: データセット} を dashboard.js と同じ規則でログ配列にして計算する
+NODE_RUNNER = '''
+import { readFileSync } from 'node:fs';
+import { pathToFileURL } from 'node:url';
+const core = await import(pathToFileURL(process.argv[1]).href);
+const datasets = JSON.parse(readFileSync(0, 'utf-8'));
+const result = {};
+for (const [name, dataset] of Object.entries(datasets)) {
+  let logs = [];
+  if (Array.isArray(dataset)) {
+    logs = dataset;
+  } else if (dataset && dataset.logs && Array.isArray(dataset.logs)) {
+    logs = dataset.logs;
+  } else if (dataset && dataset.sessions && Array.isArray(dataset.sessions)) {
+    dataset.sessions.forEach(session => {
+      if (session.logs && Array.isArray(session.logs)) {
+        logs = logs.concat(session.logs);
+      }
+    });
+  }
+  result[name] = {
+    stats: core.computeStats(logs),
+    mistakeRanking: core.computeMistakeRanking(logs),
+    levelStats: core.computeLevelStats(logs)
+  };
+}
+process.stdout.write(JSON.stringify(result));
+'''
+
+# 真偽判定・フォールバック・キー順の違いが出やすいログ
+EDGE_CASE_LOGS = [
+    {'correct': 'true', 'conceptTags': ['注意', '注意'], 'response_time': 0, 'time': 3.5, 'path': []},
+    {'correct': False, 'concept_tags': ['識別'], 'response_time_ms': 1200, 'clicks': ['c1', 'c2'],
+     'recommended_terms': ['注意制御'], 'session_id': 's1'},
+    {'selected': {'correct': True, 'conceptTags': ['説明'], 'time': 4.25}, 'session_id': 's2'},
+    {'selected': {'correct': False, 'misconception': '混同', 'measure': ['適用']}, 'conceptTags': []},
+    {'selected': {'misconceptionTags': ['10', '2']}, 'conceptTags': [1, '1', True], 'reaction_time': 7.1},
+    {'correct': False, 'misconception': '2', 'conceptTags': ['区別', '転移'], 'glossary_shown': True,
+     'response_time': -1, 'path': ['c1', 'c3', 'c2']},
+    {'correct': True, 'conceptTags': ['構造化', '注意'], 'response_time': 12.3, 'path': ['c4']},
+    {'correct': None, 'conceptTags': 'not-a-list', 'response_time': '5', 'session_id': 's1'}
+]
+
+
+def js_results(datasets):
+    completed = subprocess.run(
+        ['node', '--no-warnings', '--input-type=module', '-e', NODE_RUNNER, str(STATS_CORE_JS)],
+        input=json.dumps(datasets, ensure_ascii=False), capture_output=True, text=True, encoding='utf-8'
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip())
+    return json.loads(completed.stdout)
+
+
+def python_results(datasets):
+    result = {}
+    for name, dataset in datasets.items():
+        logs = extract_dashboard_logs(dataset)
+        result[name] = {
+            'stats': compute_stats(logs),
+            'mistakeRanking': compute_mistake_ranking(logs),
+            'levelStats': compute_level_stats(logs)
+        }
+    # JS と同じく JSON を経由した値で比較する
+    return json.loads(json.dumps(result, ensure_ascii=False))
+
+
+def diff(expected, actual, path='$'):
+    """最初に見つかった不一致の説明を返す（一致すれば None）"""
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        if list(expected) != list(actual):
+            return f'{path}: キーが異なります JS={list(expected)} Python={list(actual)}'
+        for key in expected:
+            found = diff(expected[key], actual[key], f'{path}.{key}')
+            if found:
+                return found
+        return None
+    if isinstance(expected, list) and isinstance(actual, list):
+        if len(expected) != len(actual):
+            return f'{path}: 要素数が異なります JS={len(expected)} Python={len(actual)}'
+        for i, (e, a) in enumerate(zip(expected, actual)):
+            found = diff(e, a, f'{path}[{i}]')
+            if found:
+                return found
+        return None
+    # True == 1 にならないよう真偽値は型も比較する
+    if isinstance(expected, bool) != isinstance(actual, bool) or expected != actual:
+        return f'{path}: JS={expected!r} Python={actual!r}'
+    return None
+
+
+def main(files=None):
+    students_dir = PROJECT_ROOT / 'students'
+    paths = [Path(f) for f in files] if files else [students_dir / f for f in list_dataset_files(students_dir)]
+    datasets = {}
+    for json_path in paths:
+        with open(json_path, 'r', encoding='utf-8') as f:
+            datasets[json_path.name] = json.load(f)
+    datasets['EDGE_CASE_LOGS'] = EDGE_CASE_LOGS
+
+    try:
+        expected = js_results(datasets)
+    except (OSError, RuntimeError) as e:
+        print(f'[エラー] JS 版の実行に失敗しました: {e}')
+        return 1
+    actual = python_results(datasets)
+
+    failures = 0
+    for name in datasets:
+        found = diff(expected[name], actual[name])
+        if found:
+            failures += 1
+            print(f'[NG] {name}: {found}')
+        else:
+            print(f'[OK] {name}（ログ: {expected[name]["stats"]["total"]} 件）')
+
+    print(f'\n[統計] 一致: {len(datasets) - failures} / 不一致: {failures}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
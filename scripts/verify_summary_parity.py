@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+summary_cache.py（Python 版）のサマリが JS 版の計算結果と一致するかを確認するスクリプト
+
+students 内の全データセットと EDGE_CASE_LOGS、各傾向パターンが出るように作ったログについて、
+ダッシュボードと同じ computeStats → normalizeConceptStats → computeResponseTimeProfile →
+generatePatternSummary / generateInsights を JS で実行し、Python 版の build_summary() と比較する。
+文は toFixed の丸めまで含めて完全一致することを確認する。
+
+実行方法:
+python scripts/verify_summary_parity.py
+python scripts/verify_summary_parity.py /tmp/bulk_100k.json  # 任意のデータセットを比較
+
+依存: node（src/core/*.js を ES モジュールとして読み込む）, numpy
+"""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from index_builder import list_dataset_files
+from stats_core import extract_dashboard_logs
+from summary_cache import build_summary
+from verify_stats_parity import EDGE_CASE_LOGS, diff
+
+PROJECT_ROOT = Path(__file__).parent.parent
+CORE_DIR = PROJECT_ROOT / 'src' / 'core'
+
+# JS 側: stdin の {名前: ログ配列} からサマリを作る（rtProfile は mean / count だけを返す）
+NODE_RUNNER = '''
+import { readFileSync } from 'node:fs';
+import { pathToFileURL } from 'node:url';
+const load = name => import(pathToFileURL(process.argv[1] + '/' + name).href);
+const { computeStats, normalizeConceptStats } = await load('stats_core.js');
+const { computeResponseTimeProfile } = await load('response_time_profile.js');
+const { generatePatternSummary } = await load('pattern_summary.js');
+const { generateInsights } = await load('insights_core.js');
+const pick = d => ({ mean: d.mean, count: d.count });
+const datasets = JSON.parse(readFileSync(0, 'utf-8'));
+const result = {};
+for (const [name, logs] of Object.entries(datasets)) {
+  const stats = computeStats(logs);
+  const conceptStats = normalizeConceptStats(stats);
+  const rtProfile = computeResponseTimeProfile(logs);
+  result[name] = {
+    stats,
+    conceptStats,
+    rtProfile: { byCorrectness: {
+      correct: pick(rtProfile.byCorrectness.correct),
+      incorrect: pick(rtProfile.byCorrectness.incorrect)
+    } },
+    patternSummary: generatePatternSummary(stats, conceptStats, rtProfile),
+    insights: generateInsights(stats)
+  };
+}
+process.stdout.write(JSON.stringify(result));
+'''
+
+
+def _log(correct, concept, rt, path_length=1, glossary=False):
+    return {'correct': correct, 'conceptTags': [concept], 'response_time': rt,
+            'path': ['c'] * path_length, 'glossary_shown': glossary}
+
+
+def pattern_case_logs():
+    """パターン 1〜6 と全体パターンがそれぞれ出るように作ったログ"""
+    cases = {}
+    # パターン1・3: 低正答率・長いパス・Glossary 表示が多い概念、パターン5: 誤答が遅い
+    logs = [_log(True, '基礎', 1000) for _ in range(40)]
+    logs += [_log(i % 5 == 0, '応用', 4000, path_length=4, glossary=True) for i in range(20)]
+    cases['PATTERN_LOW_ACCURACY'] = logs
+    # パターン2・4・6: 正答率は同等だが遅い概念、正答率が高く遅い概念、誤答が速い
+    logs = [_log(i % 2 == 0, '平均', 1500 if i % 2 == 0 else 600) for i in range(40)]
+    logs += [_log(i % 2 == 0, '遅い', 5000 if i % 2 == 0 else 700) for i in range(20)]
+    logs += [_log(True, '得意', 4000) for _ in range(15)]
+    cases['PATTERN_SLOW_CONCEPTS'] = logs
+    # 全体パターン: パス長が長く正答率が低い / 反応時間が長く正答率が高い（0.125 など丸めの境界も含む）
+    cases['PATTERN_OVERALL_LOW'] = [_log(i % 8 == 0, '迷い', 2125, path_length=5) for i in range(8)]
+    cases['PATTERN_OVERALL_SLOW'] = [_log(i % 10 != 0, '熟考', 8000 + i * 125) for i in range(60)]
+    cases['EMPTY'] = []
+    return cases
+
+
+def js_results(datasets):
+    completed = subprocess.run(
+        ['node', '--no-warnings', '--input-type=module', '-e', NODE_RUNNER, str(CORE_DIR)],
+        input=json.dumps(datasets, ensure_ascii=False), capture_output=True, text=True, encoding='utf-8'
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip())
+    return json.loads(completed.stdout)
+
+
+def main(files=None):
+    students_dir = PROJECT_ROOT / 'students'
+    paths = [Path(f) for f in files] if files else [students_dir / f for f in list_dataset_files(students_dir)]
+    datasets = {}
+    for json_path in paths:
+        with open(json_path, 'r', encoding='utf-8') as f:
+            datasets[json_path.name] = extract_dashboard_logs(json.load(f))
+    datasets['EDGE_CASE_LOGS'] = EDGE_CASE_LOGS
+    datasets.update(pattern_case_logs())
+
+    try:
+        expected = js_results(datasets)
+    except (OSError, RuntimeError) as e:
+        print(f'[エラー] JS 版の実行に失敗しました: {e}')
+        return 1
+
+    failures = 0
+    for name, logs in datasets.items():
+        actual = json.loads(json.dumps(build_summary(logs), ensure_ascii=False))
+        found = diff(expected[name], actual)
+        if found:
+            failures += 1
+            print(f'[NG] {name}: {found}')
+        else:
+            print(f'[OK] {name}（傾向: {len(actual["patternSummary"])} 件 / 洞察: {len(actual["insights"])} 件）')
+
+    print(f'\n[統計] 一致: {len(datasets) - failures} / 不一致: {failures}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
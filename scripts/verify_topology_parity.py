@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+mistake_topology.py（Python 版）と src/core/mistake_topology.js（JS 版）の出力が一致するかを確認するスクリプト
+
+students 内の全データセットと EDGE_CASE_LOGS について、
+JS 版の normalizeTopologyGraph(buildMistakeTopology(logs)) と Python 版の結果を比較する。
+ログを小分けにして取り込んだ場合と、保存・読み込みを挟んだ場合も同じ結果になることを確認する。
+
+実行方法:
+python scripts/verify_topology_parity.py
+python scripts/verify_topology_parity.py /tmp/bulk_100k.json  # 任意のデータセットを比較
+
+依存: node（src/core/mistake_topology.js を ES モジュールとして読み込む）, numpy
+"""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from index_builder import list_dataset_files
+from mistake_topology import MistakeTopology, normalize_topology_graph
+from stats_core import extract_dashboard_logs
+from verify_stats_parity import EDGE_CASE_LOGS, diff
+
+PROJECT_ROOT = Path(__file__).parent.parent
+MISTAKE_TOPOLOGY_JS = PROJECT_ROOT / 'src' / 'core' / 'mistake_topology.js'
+
+# JS 側: stdin の {名前: ログ配列} からグラフを作る
+NODE_RUNNER = '''
+import { readFileSync } from 'node:fs';
+import { pathToFileURL } from 'node:url';
+const topology = await import(pathToFileURL(process.argv[1]).href);
+const datasets = JSON.parse(readFileSync(0, 'utf-8'));
+const result = {};
+for (const [name, logs] of Object.entries(datasets)) {
+  result[name] = topology.normalizeTopologyGraph(topology.buildMistakeTopology(logs));
+}
+process.stdout.write(JSON.stringify(result));
+'''
+
+# 同じ選択肢が複数の問題に出るログと、path が無く clicks から作るログ
+TOPOLOGY_EDGE_CASE_LOGS = EDGE_CASE_LOGS + [
+    {'correct': False, 'questionId': 'q1', 'path': ['A', 'B', 'A', 'C'], 'response_time': 0.1,
+     'conceptTags': ['識別', '説明']},
+    {'correct': False, 'questionId': 'q2', 'path': ['A', 'B'], 'response_time': 0.2, 'concept_tags': ['説明', '適用']},
+    {'selected': {'correct': False}, 'questionId': 'q2', 'clicks': [{'choiceId': 'B'}, {'id': 'C'}, {'time': 1}],
+     'reaction_time': 0.7},
+    {'correct': False, 'questionId': 'q1', 'path': 'A', 'response_time': 3},
+    {'correct': False, 'path': [1, '1', 'A'], 'response_time': 2.5}
+]
+
+
+def js_results(datasets):
+    completed = subprocess.run(
+        ['node', '--no-warnings', '--input-type=module', '-e', NODE_RUNNER, str(MISTAKE_TOPOLOGY_JS)],
+        input=json.dumps(datasets, ensure_ascii=False), capture_output=True, text=True, encoding='utf-8'
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip())
+    return json.loads(completed.stdout)
+
+
+def python_graph(logs, chunk=None):
+    """chunk を指定すると、その件数ずつ別々のトポロジーに取り込んでからマージする"""
+    if chunk is None:
+        topology = MistakeTopology()
+        topology.add_logs(logs)
+    else:
+        topology = MistakeTopology()
+        for start in range(0, len(logs), chunk):
+            part = MistakeTopology()
+            part.add_logs(logs[start:start + chunk])
+            # 保存・読み込みを挟んでもよいことも確かめる
+            topology.merge(MistakeTopology.from_dict(json.loads(json.dumps(part.to_dict()))))
+    return json.loads(json.dumps(normalize_topology_graph(topology.graph()), ensure_ascii=False))
+
+
+def main(files=None):
+    students_dir = PROJECT_ROOT / 'students'
+    paths = [Path(f) for f in files] if files else [students_dir / f for f in list_dataset_files(students_dir)]
+    datasets = {}
+    for json_path in paths:
+        with open(json_path, 'r', encoding='utf-8') as f:
+            datasets[json_path.name] = extract_dashboard_logs(json.load(f))
+    datasets['EDGE_CASE_LOGS'] = TOPOLOGY_EDGE_CASE_LOGS
+
+    try:
+        expected = js_results(datasets)
+    except (OSError, RuntimeError) as e:
+        print(f'[エラー] JS 版の実行に失敗しました: {e}')
+        return 1
+
+    failures = 0
+    for name, logs in datasets.items():
+        found = diff(expected[name], python_graph(logs))
+        if found:
+            failures += 1
+            print(f'[NG] {name}: {found}')
+            continue
+        # 分割して取り込むと合計の順序が変わるので、件数と形だけを比べる
+        chunked = python_graph(logs, chunk=7)
+        counts = lambda graph: ([(n.get('id'), n['frequency'], n['concepts']) for n in graph['nodes']],
+                                [(e.get('from'), e.get('to'), e['weight']) for e in graph['edges']])
+        if counts(expected[name]) != counts(chunked):
+            failures += 1
+            print(f'[NG] {name}: 分割して取り込んだ結果が一致しません')
+        else:
+            print(f'[OK] {name}（ノード: {len(expected[name]["nodes"])} / エッジ: {len(expected[name]["edges"])}）')
+
+    print(f'\n[統計] 一致: {len(datasets) - failures} / 不一致: {failures}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+students フォルダを監視し、変更されたファイルだけを再解析して index.json を更新し続けるデーモン
+
+server.js の chokidar 監視は変更のたびに全ファイルを走査し直すため、一括取り込みで
+数千ファイルが置かれると同じ数だけ全件再生成が走る。このスクリプトは
+
+- Linux では inotify（ctypes 経由、追加パッケージ不要）、それ以外ではポーリングでイベントを受け取り
+- 最後のイベントから --debounce 秒イベントが来なくなるまで（最長 --max-wait 秒）まとめてから
+- 変更・追加されたファイルだけを regenerate_index_with_sessions.py と同じ処理で再解析し、
+  それ以外のファイルは前回のエントリをそのまま使って
+- index.json を一時ファイル経由で置き換える（内容が変わらなければ書き込まない）
+
+server.js と併用する場合は PYTHON_INDEX_WATCHER=1 npm start で起動し、server.js 側の
+index.json の生成と監視を止めること（止めないと index.json が server.js の形式で上書きされる）。
+
+起動時は .index_manifest を使った差分再生成を 1 回行うので、再起動しても全件再解析にはならない。
+inotify のイベントキューが溢れた場合や、更新中にエラーが起きた場合（エラーを表示して監視は続ける）は、
+次の更新で全ファイルをマニフェストと照合し直す。
+
+実行方法:
+python scripts/watch_index.py
+python scripts/watch_index.py --stream --byte-ranges --debounce 2
+python scripts/watch_index.py --summaries  # 変更されたデータセットのサマリも計算し直す
+python scripts/watch_index.py --compact --precompress  # インデントなしで書き、.gz / .br も作り直す
+python scripts/watch_index.py --poll --interval 5  # inotify を使わずにポーリングする
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from functools import partial
+from pathlib import Path
+
+from index_builder import INDEX_NAME, build_entries, list_dataset_files, write_index
+from index_manifest import IndexManifest
+from precompress import precompress_students
+from regenerate_index_with_sessions import build_dataset_entry, evict_summaries, manifest_builder_name, prune_shards
+
+DEFAULT_DEBOUNCE = 1.0
+DEFAULT_MAX_WAIT = 30.0
+DEFAULT_POLL_INTERVAL = 1.0
+
+# inotify(7) の定数
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE
+_EVENT_HEADER = struct.Struct('iIII')
+
+# イベントキューが溢れたなど、どのファイルが変わったか分からないときの印
+RESCAN = object()
+
+
+def is_dataset_file(name):
+    """list_dataset_files() の対象になるファイル名か（隠しファイル・一時ファイルは除く）"""
+    return name.endswith('.json') and name != INDEX_NAME and not name.startswith('.')
+
+
+class InotifySource:
+    """inotify で students 直下のファイルの書き込み完了・移動・削除を受け取る"""
+
+    name = 'inotify'
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 に失敗しました')
+        if libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, 'inotify_add_watch に失敗しました')
+
+    def wait(self, timeout=None):
+        """timeout 秒（None なら無期限）イベントを待ち、変更されたファイル名の集合を返す"""
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+        touched = set()
+        while True:
+            try:
+                data = os.read(self._fd, 1 << 16)
+            except BlockingIOError:
+                return touched
+            pos = 0
+            while pos < len(data):
+                _, mask, _, length = _EVENT_HEADER.unpack_from(data, pos)
+                pos += _EVENT_HEADER.size
+                if mask & IN_Q_OVERFLOW:
+                    touched.add(RESCAN)
+                elif length:
+                    touched.add(os.fsdecode(data[pos:pos + length].rstrip(b'\0')))
+                pos += length
+
+    def close(self):
+        os.close(self._fd)
+
+
+class PollingSource:
+    """一定間隔でサイズと mtime を比べて変更を検出する（inotify が使えない環境用）"""
+
+    name = 'polling'
+
+    def __init__(self, directory, interval=DEFAULT_POLL_INTERVAL):
+        self._directory = directory
+        self._interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self):
+        snapshot = {}
+        with os.scandir(self._directory) as entries:
+            for entry in entries:
+                if not is_dataset_file(entry.name):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    # 走査中に削除・移動されたファイル（次の走査で削除として検出される）
+                    continue
+                snapshot[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def wait(self, timeout=None):
+        """timeout 秒（None なら無期限）変更を待ち、変更されたファイル名の集合を返す"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = self._interval if deadline is None else min(self._interval, deadline - time.monotonic())
+            if remaining > 0:
+                time.sleep(remaining)
+            snapshot = self._scan()
+            touched = {name for name in snapshot.keys() | self._snapshot.keys()
+                       if snapshot.get(name) != self._snapshot.get(name)}
+            self._snapshot = snapshot
+            if touched or (deadline is not None and time.monotonic() >= deadline):
+                return touched
+
+    def close(self):
+        pass
+
+
+def open_event_source(directory, poll=False, interval=DEFAULT_POLL_INTERVAL):
+    """inotify が使えればそれを、使えなければポーリングを返す"""
+    if not poll and sys.platform.startswith('linux'):
+        try:
+            return InotifySource(directory)
+        except (OSError, AttributeError) as e:
+            print(f'[警告] inotify を使えないためポーリングで監視します: {e}')
+    return PollingSource(directory, interval)
+
+
+class IndexWatcher:
+    """データセットごとのエントリを保持し、変更されたファイルだけを作り直して index.json を書き出す"""
+
+    def __init__(self, students_dir, stream=False, shards=False, byte_ranges=False, summaries=False, workers=1,
+                 compact=False, precompress=False):
+        self.students_dir = students_dir
+        self.shards = shards
+        self.summaries = summaries
+        self.compact = compact
+        self.precompress = precompress
+        self.workers = workers
+        self.build = partial(build_dataset_entry, stream=stream, shards=shards, byte_ranges=byte_ranges,
+                             summaries=summaries)
+        self.manifest = IndexManifest(students_dir, manifest_builder_name(shards, byte_ranges, summaries))
+        self.entries = {}
+        self.failed = set()
+        self.datasets = None
+
+    def refresh(self, touched=None):
+        """
+        touched（ファイル名の集合、None なら全ファイル）を再解析して index.json を更新する
+
+        全ファイルを対象にした場合も、マニフェストと一致するファイルは解析しない。
+
+        Returns:
+            tuple: (再解析したファイル数, 削除されたファイル数, index.json を書き換えたか)
+        """
+        json_files = list_dataset_files(self.students_dir)
+        present = set(json_files)
+        if touched is None or RESCAN in touched:
+            changed = json_files
+        else:
+            changed = sorted(name for name in touched if name in present)
+            changed += [name for name in json_files
+                        if name not in self.entries and name not in self.failed and name not in touched]
+        removed = [name for name in self.entries if name not in present]
+        for name in removed:
+            del self.entries[name]
+        self.failed &= present
+
+        manifest = self.manifest
+        manifest.hits = manifest.misses = 0
+        for json_file, ok, result in build_entries(self.students_dir, changed, self.build,
+                                                   workers=self.workers, manifest=manifest):
+            if ok:
+                self.entries[json_file] = result
+                self.failed.discard(json_file)
+            else:
+                self.entries.pop(json_file, None)
+                self.failed.add(json_file)
+                print(f'[警告] {json_file} の読み込みに失敗しました: {result}')
+        manifest.prune(json_files)
+        manifest.save()
+
+        datasets = [self.entries[name] for name in json_files if name in self.entries]
+        if self.shards:
+            prune_shards(self.students_dir, [ds['file'] for ds in datasets if ds.get('sessions')])
+        if self.summaries:
+            evict_summaries(self.students_dir, datasets)
+        written = datasets != self.datasets
+        if written:
+            write_index(self.students_dir, datasets, compact=self.compact)
+            self.datasets = datasets
+        if self.precompress:
+            # 変更のないファイルは mtime の比較だけで済む
+            precompress_students(self.students_dir)
+        return manifest.misses, len(removed), written
+
+
+def collect_events(source, debounce=DEFAULT_DEBOUNCE, max_wait=DEFAULT_MAX_WAIT):
+    """
+    最初のイベントを待ち、debounce 秒イベントが途切れるまで（最長 max_wait 秒）まとめて返す
+
+    Returns:
+        set: 変更されたデータセットのファイル名（RESCAN を含むことがある）
+    """
+    touched = set()
+    while not touched:
+        touched = {name for name in source.wait() if name is RESCAN or is_dataset_file(name)}
+    deadline = time.monotonic() + max_wait
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return touched
+        more = source.wait(min(debounce, remaining))
+        if not more:
+            return touched
+        touched.update(name for name in more if name is RESCAN or is_dataset_file(name))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='students フォルダを監視して index.json を差分更新し続ける')
+    parser.add_argument('--stream', action='store_true',
+                        help='ログ本体を展開せずにストリームでセッション情報を抽出する')
+    parser.add_argument('--shards', action='store_true',
+                        help='セッションごとのシャードも書き出す（regenerate_index_with_sessions.py --shards と同じ）')
+    parser.add_argument('--byte-ranges', action='store_true',
+                        help='セッションのバイト範囲を記録する（regenerate_index_with_sessions.py --byte-ranges と同じ）')
+    parser.add_argument('--summaries', action='store_true',
+                        help='サマリを事前計算してキーを記録する（regenerate_index_with_sessions.py --summaries と同じ）')
+    parser.add_argument('--compact', action='store_true', help='index.json をインデントなしで書く')
+    parser.add_argument('--precompress', action='store_true',
+                        help='index.json と変更されたデータセットの .gz / .br サイドカーを作り直す')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='解析に使うプロセス数（0 で CPU コア数、既定は 1 = 直列）')
+    parser.add_argument('--debounce', type=float, default=DEFAULT_DEBOUNCE,
+                        help=f'この秒数イベントが途切れたら再生成する（既定: {DEFAULT_DEBOUNCE}）')
+    parser.add_argument('--max-wait', type=float, default=DEFAULT_MAX_WAIT,
+                        help=f'イベントが続いていてもこの秒数で再生成する（既定: {DEFAULT_MAX_WAIT}）')
+    parser.add_argument('--poll', action='store_true', help='inotify を使わずにポーリングで監視する')
+    parser.add_argument('--interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                        help=f'ポーリングの間隔（秒、既定: {DEFAULT_POLL_INTERVAL}）')
+    return parser.parse_args()
+
+
+def main(stream=False, shards=False, byte_ranges=False, summaries=False, workers=1, debounce=DEFAULT_DEBOUNCE,
+         max_wait=DEFAULT_MAX_WAIT, poll=False, interval=DEFAULT_POLL_INTERVAL, compact=False, precompress=False):
+    students_dir = Path(__file__).parent.parent / 'students'
+    if not students_dir.exists():
+        print(f'[エラー] {students_dir} が見つかりません')
+        return 1
+
+    watcher = IndexWatcher(students_dir, stream=stream, shards=shards, byte_ranges=byte_ranges, summaries=summaries,
+                           workers=workers, compact=compact, precompress=precompress)
+    # 起動時のスキャンより後の変更を取りこぼさないよう、監視を先に始める
+    source = open_event_source(students_dir, poll=poll, interval=interval)
+    # 更新に失敗したときは、どのファイルまで反映できたか分からないので次回は全ファイルを照合し直す
+    retry = set()
+    try:
+        parsed, _, _ = watcher.refresh()
+        print(f'[OK] {students_dir / INDEX_NAME} を更新しました（{len(watcher.datasets)} 個のデータセット / 再解析: {parsed}）')
+    except Exception as e:
+        print(f'[エラー] index.json の更新に失敗しました（次の変更で再試行します）: {e}')
+        retry = {RESCAN}
+    print(f'[監視] {students_dir} を {source.name} で監視しています（Ctrl+C で終了）')
+
+    try:
+        while True:
+            touched = collect_events(source, debounce=debounce, max_wait=max_wait) | retry
+            started = time.perf_counter()
+            try:
+                parsed, removed, written = watcher.refresh(touched)
+            except Exception as e:
+                print(f'[エラー] index.json の更新に失敗しました（次の変更で再試行します）: {e}')
+                retry = {RESCAN}
+                continue
+            retry = set()
+            elapsed = time.perf_counter() - started
+            if written:
+                print(f'[OK] index.json を更新しました（変更: {len(touched)} / 再解析: {parsed} / '
+                      f'削除: {removed} / {elapsed:.2f} 秒）')
+            else:
+                print(f'[監視] 変更: {len(touched)} 件（index.json の内容に変化なし）')
+    except KeyboardInterrupt:
+        print('\n[監視] 終了します')
+    finally:
+        source.close()
+    return 0
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    sys.exit(main(stream=args.stream, shards=args.shards, byte_ranges=args.byte_ranges, summaries=args.summaries,
+                  workers=args.workers, debounce=args.debounce, max_wait=args.max_wait, poll=args.poll,
+                  interval=args.interval, compact=args.compact, precompress=args.precompress))
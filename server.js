@@ -11,9 +11,71 @@ const PORT = process.env.PORT || 3000;
 // 注意: express.static() を使う場合、URLパスからディレクトリ名は除外されます
 // 例: public/dashboard.html → http://localhost:3000/dashboard.html（/public/dashboard.html ではない）
 app.use(express.static(path.join(__dirname, 'public')));
+
+// 事前圧縮されたサイドカー（scripts/precompress.py で作成した <ファイル名>.br / .gz）があれば、
+// Accept-Encoding に応じてそちらを返す。サイドカーの mtime が元ファイルと一致しない（古い）場合と、
+// Range リクエスト（セッション単位の読み込み）の場合は元ファイルをそのまま返す
+const PRECOMPRESSED_ENCODINGS = [['br', '.br'], ['gzip', '.gz']];
+app.use('/students', (req, res, next) => {
+  if ((req.method !== 'GET' && req.method !== 'HEAD') || req.headers.range || !req.path.endsWith('.json')) {
+    return next();
+  }
+  const studentsRoot = path.join(__dirname, 'students');
+  let filePath;
+  try {
+    filePath = path.join(studentsRoot, decodeURIComponent(req.path));
+  } catch (error) {
+    return next();
+  }
+  if (!filePath.startsWith(studentsRoot + path.sep)) {
+    return next();
+  }
+  const accepted = req.headers['accept-encoding'] || '';
+  res.vary('Accept-Encoding');
+  for (const [encoding, suffix] of PRECOMPRESSED_ENCODINGS) {
+    if (!accepted.includes(encoding)) continue;
+    try {
+      const source = fs.statSync(filePath);
+      const compressed = fs.statSync(filePath + suffix);
+      if (compressed.mtimeMs !== source.mtimeMs) continue;
+    } catch (error) {
+      continue;
+    }
+    res.set('Content-Encoding', encoding);
+    res.type('application/json');
+    return res.sendFile(filePath + suffix, { headers: { 'Cache-Control': 'no-cache' } });
+  }
+  next();
+});
 app.use('/students', express.static(path.join(__dirname, 'students')));
 app.use('/analysis', express.static(path.join(__dirname, 'analysis')));
 
+// 🧮 分析サービスへの転送（ANALYSIS_SERVICE_URL を設定した場合のみ）
+// scripts/analytics_server.py の起動済みワーカープールとジョブキューで分析し、リクエストごとに julia を起動しない。
+// 本文は express.json() を通さずにそのまま転送する（大きなデータセットでも 100kb の上限に掛からない）
+const ANALYSIS_SERVICE_URL = process.env.ANALYSIS_SERVICE_URL;
+if (ANALYSIS_SERVICE_URL) {
+  const forwardToAnalysisService = async (req, res) => {
+    try {
+      const response = await fetch(new URL(req.originalUrl, ANALYSIS_SERVICE_URL), {
+        method: req.method,
+        headers: { 'Content-Type': 'application/json' },
+        body: req.method === 'POST' ? req : undefined,
+        duplex: 'half'
+      });
+      res.status(response.status).type('application/json').send(Buffer.from(await response.arrayBuffer()));
+    } catch (error) {
+      console.error('Analysis service error:', error);
+      res.status(502).json({ error: `分析サービスに接続できません: ${error.message}` });
+    }
+  };
+  app.post('/trigger_analysis', forwardToAnalysisService);
+  app.get('/analysis_status', forwardToAnalysisService);
+  app.get('/api/run-analysis', forwardToAnalysisService);
+  app.post('/analyze/reaction-time', forwardToAnalysisService);
+  app.use('/jobs', forwardToAnalysisService);
+}
+
 // JSONパーサー
 app.use(express.json());
 
@@ -1054,15 +1116,25 @@ function generateDatasetIndex() {
   }
 }
 
-// 初回生成
-generateDatasetIndex();
+// scripts/watch_index.py で index.json を管理する場合（PYTHON_INDEX_WATCHER=1）は、ここでの生成と監視を行わない。
+// 両方を動かすと index.json がこの形式で上書きされ、shard / byte_range / size / summary が失われる
+const PYTHON_INDEX_WATCHER = process.env.PYTHON_INDEX_WATCHER === '1';
+
+if (PYTHON_INDEX_WATCHER) {
+  console.log('ℹ️  PYTHON_INDEX_WATCHER=1: index.json の生成と監視は scripts/watch_index.py に任せます');
+} else {
+  // 初回生成
+  generateDatasetIndex();
+}
 
 // ファイル監視（A2）
-if (fs.existsSync(STUDENTS_DIR)) {
+// students 直下のデータセットだけを見る（stats/ や shards/ などのサイドカーの書き込みでは再生成しない）
+if (!PYTHON_INDEX_WATCHER && fs.existsSync(STUDENTS_DIR)) {
   const watcher = chokidar.watch(STUDENTS_DIR, {
     ignored: /(^|[\/\\])\../, // .gitignore等の隠しファイルを無視
     persistent: true,
-    ignoreInitial: true
+    ignoreInitial: true,
+    depth: 0
   });
 
   watcher.on('add', (filePath) => {
@@ -89,6 +89,22 @@
       });
   }
 
+  /**
+   * データセットのフォルダ内のファイルの URL を返す
+   *
+   * folder プロパティがある場合は ../students/${folder}/${name}、ない場合は ../students/${name}。
+   * config.dataset_folder を優先し、なければ dataset.folder を使用
+   */
+  function datasetUrl(dataset, name, config) {
+    var folderPart = '';
+    if (config && config.dataset_folder) {
+      folderPart = config.dataset_folder.replace(/\/?$/, '/');
+    } else if (dataset.folder) {
+      folderPart = dataset.folder.replace(/\/?$/, '/');
+    }
+    return '../students/' + folderPart + name;
+  }
+
   /**
    * 指定されたデータセットファイルを読み込む（index.json方式）
    * @param {Object} dataset - データセット情報オブジェクト { file, dataset_name, type }
@@ -100,15 +116,7 @@
       return Promise.reject(new Error('無効なデータセット情報です'));
     }
 
-    // folder プロパティがある場合は ../students/${folder}/${file}、ない場合は ../students/${file}
-    // config.dataset_folder を優先し、なければ dataset.folder を使用
-    var folderPart = '';
-    if (config && config.dataset_folder) {
-      folderPart = config.dataset_folder.replace(/\/?$/, '/');
-    } else if (dataset.folder) {
-      folderPart = dataset.folder.replace(/\/?$/, '/');
-    }
-    var filePath = '../students/' + folderPart + dataset.file;
+    var filePath = datasetUrl(dataset, dataset.file, config);
     console.log('[DatasetLoader] loading:', filePath);
 
     return fetch(filePath)
@@ -251,6 +259,95 @@
       });
   }
 
+  /**
+   * データセットの 1 セッションだけを読み込む
+   *
+   * index.json のセッション情報に shard（regenerate_index_with_sessions.py --shards で作成）があれば
+   * そのシャードファイルだけを取得する。byte_range（--byte-ranges で作成）があれば、データセットファイルの
+   * その範囲だけを Range リクエストで取得する。どちらもない場合や、サーバーが Range に対応していない場合、
+   * ファイルが index.json の生成後に更新されている場合は、データセット全体を読み込んでセッションを取り出す。
+   * @param {Object} dataset - データセット情報オブジェクト { file, dataset_name, type, sessions }
+   * @param {string|number} sessionRef - session_id、またはセッションの index
+   * @param {Object} config - オプション設定（loadDataset に渡す）
+   * @returns {Promise<Object|null>} セッションオブジェクト（見つからない場合は null）
+   */
+  function loadSession(dataset, sessionRef, config) {
+    if (!dataset || !dataset.file) {
+      return Promise.reject(new Error('無効なデータセット情報です'));
+    }
+
+    var entry = (dataset.sessions || []).find(function (session) {
+      return typeof sessionRef === 'number' ? session.index === sessionRef : session.session_id === sessionRef;
+    });
+
+    if (entry && entry.shard && entry.shard.path) {
+      var shardPath = datasetUrl(dataset, entry.shard.path, config);
+      console.log('[DatasetLoader] loading shard:', shardPath, '(' + entry.shard.size + ' bytes)');
+      return fetch(shardPath)
+        .then(function (response) {
+          if (!response.ok) {
+            throw new Error('シャードの読み込みに失敗しました: ' + entry.shard.path + ' (' + response.status + ' ' + response.statusText + ')');
+          }
+          return response.json();
+        });
+    }
+
+    if (entry && entry.byte_range && dataset.size) {
+      return loadSessionRange(dataset, entry.byte_range, config).then(function (session) {
+        return session !== undefined ? session : loadSessionFromDataset(dataset, entry, sessionRef, config);
+      });
+    }
+
+    return loadSessionFromDataset(dataset, entry, sessionRef, config);
+  }
+
+  /**
+   * データセットファイルのバイト範囲を Range リクエストで取得してセッションとして解析する
+   * @returns {Promise<Object|undefined>} セッションオブジェクト（範囲で読めなかった場合は undefined）
+   */
+  function loadSessionRange(dataset, byteRange, config) {
+    var filePath = datasetUrl(dataset, dataset.file, config);
+    var rangeHeader = 'bytes=' + byteRange.offset + '-' + (byteRange.offset + byteRange.length - 1);
+    console.log('[DatasetLoader] loading range:', filePath, rangeHeader);
+
+    return fetch(filePath, { headers: { Range: rangeHeader }, cache: 'no-store' })
+      .then(function (response) {
+        // 206 でない（Range 非対応）か、ファイルの総サイズが index.json と異なる（生成後に更新された）場合は使わない
+        var contentRange = response.headers.get('Content-Range') || '';
+        var total = Number(contentRange.split('/')[1]);
+        if (response.status !== 206 || total !== dataset.size) {
+          if (response.body && response.body.cancel) {
+            response.body.cancel();
+          }
+          console.warn('[DatasetLoader] Range で読み込めないため、データセット全体を読み込みます:', dataset.file);
+          return undefined;
+        }
+        return response.json();
+      })
+      .catch(function (error) {
+        console.warn('[DatasetLoader] Range での読み込みに失敗しました:', error);
+        return undefined;
+      });
+  }
+
+  /**
+   * データセット全体を読み込んでセッションを取り出す
+   */
+  function loadSessionFromDataset(dataset, entry, sessionRef, config) {
+    return loadDataset(dataset, config).then(function (result) {
+      var sessions = result.sessions || [];
+      if (entry) {
+        return sessions[entry.index] || null;
+      }
+      if (typeof sessionRef === 'number') {
+        return sessions[sessionRef] || null;
+      }
+      return sessions.find(function (session) {
+        return session.session_id === sessionRef;
+      }) || null;
+    });
+  }
+
   /**
    * index.json を更新（新しいデータセットを追加）
    * @param {string} fileName - ファイル名（例: "classA_2025.json"）
@@ -410,6 +507,7 @@
   global.DatasetLoader = {
     listDatasets: listDatasets,
     loadDataset: loadDataset,
+    loadSession: loadSession,
     loadStudentLog: loadStudentLog,
     loadStudentLogForId: loadStudentLogForId,
     createNewDataset: createNewDataset,
@@ -206,38 +206,110 @@ export function compareMultipleStudents(students, group) {
   return results;
 }
 
+// 指標ごとの「データがあるログ数」のキー（computeStats の total / rtCount / pathLengthCount）
+const METRIC_COUNT_KEYS = {
+  accuracy: 'total',
+  rtMean: 'rtCount',
+  avgPathLength: 'pathLengthCount'
+};
+
 /**
- * クラス内での相対的な位置を計算
+ * 学習者の指標の値（データが無ければ null）
+ * scripts/class_percentiles.py と同じく、その指標のデータが 1 件も無い学習者は母集団に含めない
  * @param {Object} student - 学習者の統計データ
+ * @param {string} metric - 指標のキー
+ * @returns {number|null}
+ */
+function metricValue(student, metric) {
+  if (!student) {
+    return null;
+  }
+  const countKey = METRIC_COUNT_KEYS[metric];
+  if (countKey && student[countKey] === 0) {
+    return null;
+  }
+  const value = student[metric];
+  return typeof value === 'number' && Number.isFinite(value) ? value : null;
+}
+
+/**
+ * クラス全体の指標の分布（昇順の配列）を作成
+ * 1 回だけソートしておけば、各学習者の位置は lookupRelativePosition で二分探索（O(log n)）で求まる。
+ * scripts/class_percentiles.py が students/percentiles/ に書き出す metrics[指標] も同じ形で使える
  * @param {Array<Object>} allStudents - 全学習者の統計データ配列
- * @returns {Object} 相対位置情報
+ * @param {string} metric - 指標のキー（既定は accuracy）
+ * @returns {Object} { count, mean, std, sorted }
  */
-export function calculateRelativePosition(student, allStudents) {
-  if (!student || !Array.isArray(allStudents) || allStudents.length === 0) {
+export function buildPercentileTable(allStudents, metric = 'accuracy') {
+  const sorted = (Array.isArray(allStudents) ? allStudents : [])
+    .map(s => metricValue(s, metric))
+    .filter(v => v !== null)
+    .sort((a, b) => a - b);
+  const count = sorted.length;
+  const mean = count > 0 ? sorted.reduce((sum, v) => sum + v, 0) / count : 0;
+  const std = count > 0 ? Math.sqrt(sorted.reduce((sum, v) => sum + (v - mean) * (v - mean), 0) / count) : 0;
+  return { count, mean, std, sorted };
+}
+
+/**
+ * 分布の中での値の位置を二分探索で求める
+ * @param {Object} table - buildPercentileTable() の結果、または class_percentiles.py の metrics[指標]
+ * @param {number|null} value - 学習者の値（後から加わった学習者でもよい。null ならその指標のデータが無い）
+ * @returns {Object} 相対位置情報（calculateRelativePosition と同じ形に zScore を加えたもの）
+ */
+export function lookupRelativePosition(table, value) {
+  const sorted = table && Array.isArray(table.sorted) ? table.sorted : [];
+  const total = sorted.length;
+  if (total === 0 || typeof value !== 'number' || !Number.isFinite(value)) {
     return {
       percentile: null,
       rank: null,
-      total: 0
+      total: total
     };
   }
 
-  // 正答率でソート
-  const sorted = [...allStudents]
-    .map(s => ({ ...s, accuracy: s.accuracy || 0 }))
-    .sort((a, b) => b.accuracy - a.accuracy);
+  // value 以下の値の個数（upper bound）
+  let lo = 0;
+  let hi = total;
+  while (lo < hi) {
+    const mid = (lo + hi) >>> 1;
+    if (sorted[mid] <= value) {
+      lo = mid + 1;
+    } else {
+      hi = mid;
+    }
+  }
 
-  const studentAccuracy = student.accuracy || 0;
-  const rank = sorted.findIndex(s => s.accuracy <= studentAccuracy) + 1;
-  const percentile = ((sorted.length - rank + 1) / sorted.length) * 100;
+  const rank = total - lo + 1;
+  const percentile = (lo / total) * 100;
+  const zScore = table.std > 0 ? (value - table.mean) / table.std : 0;
 
   return {
     percentile: percentile,
     rank: rank,
-    total: sorted.length,
-    message: `クラス内で${rank}位/${sorted.length}人中（上位${percentile.toFixed(1)}%）`
+    total: total,
+    zScore: zScore,
+    message: `クラス内で${rank}位/${total}人中（上位${percentile.toFixed(1)}%）`
   };
 }
 
+/**
+ * クラス内での相対的な位置を計算
+ * @param {Object} student - 学習者の統計データ
+ * @param {Array<Object>|Object} allStudents - 全学習者の統計データ配列、または buildPercentileTable() の結果
+ *   （クラス全員の位置を求める場合は、表を 1 回だけ作って渡す）
+ * @returns {Object} 相対位置情報
+ */
+export function calculateRelativePosition(student, allStudents) {
+  const table = Array.isArray(allStudents) ? buildPercentileTable(allStudents) : allStudents;
+  if (!student || !table || !table.sorted || table.sorted.length === 0) {
+    return {
+      percentile: null,
+      rank: null,
+      total: 0
+    };
+  }
 
-
-
+  // 正答率での位置
+  return lookupRelativePosition(table, metricValue(student, 'accuracy'));
+}
@@ -2,9 +2,25 @@
  * Quiz Log 読み込み機能
  */
 
+/**
+ * students/index.json のエントリを探す
+ *
+ * 手で管理している index.json は id / name を持ち、scripts/regenerate_index*.py が書く index.json は
+ * dataset_name / file だけを持つので、どちらでも見つかるようにする。
+ * @param {Object} indexData - students/index.json の内容
+ * @param {string} datasetName - id / name / dataset_name / file のいずれか
+ * @returns {Object|undefined} データセットのエントリ
+ */
+export function findIndexDataset(indexData, datasetName) {
+  return (indexData.datasets || []).find(ds =>
+    ds.id === datasetName || ds.name === datasetName ||
+    ds.dataset_name === datasetName || ds.file === datasetName
+  );
+}
+
 /**
  * データセットを読み込む（A4: 統一ローダー）
- * @param {string} datasetName - データセット名（dataset_index.jsonのid）
+ * @param {string} datasetName - データセット名（index.json の id / name / dataset_name / file）
  * @returns {Promise<Object>} { logs: Array, sessions: Array, metadata: Object }
  */
 export async function loadDataset(datasetName) {
@@ -16,7 +32,7 @@ export async function loadDataset(datasetName) {
     }
     const indexData = await indexResponse.json();
     
-    const dataset = indexData.datasets.find(ds => ds.id === datasetName || ds.name === datasetName);
+    const dataset = findIndexDataset(indexData, datasetName);
     if (!dataset) {
       throw new Error(`データセットが見つかりません: ${datasetName}`);
     }
@@ -54,8 +70,8 @@ export async function loadDataset(datasetName) {
       logs: logs,
       sessions: sessions,
       metadata: {
-        id: dataset.id,
-        name: dataset.name,
+        id: dataset.id || dataset.file,
+        name: dataset.name || dataset.dataset_name,
         type: dataset.type,
         file: dataset.file,
         logCount: logs.length,
@@ -68,6 +84,43 @@ export async function loadDataset(datasetName) {
   }
 }
 
+/**
+ * 事前計算されたサマリを読み込む（scripts/summary_cache.py で作成）
+ *
+ * students/index.json のデータセットに summary: { key, path } があり、サマリの source_sha256 が
+ * key と一致する（データセットがサマリ作成後に変わっていない）場合だけ返す。
+ * @param {string} datasetName - データセット名（index.json の id / name / dataset_name / file）
+ * @returns {Promise<Object|null>} { stats, conceptStats, rtProfile, patternSummary, insights, dataset } または null
+ *   （dataset は index.json のエントリ）
+ */
+export async function loadDatasetSummary(datasetName) {
+  try {
+    const indexResponse = await fetch('/students/index.json', { cache: 'no-store' });
+    if (!indexResponse.ok) {
+      return null;
+    }
+    const indexData = await indexResponse.json();
+    const dataset = findIndexDataset(indexData, datasetName);
+    if (!dataset || !dataset.summary || !dataset.summary.path) {
+      return null;
+    }
+
+    // サマリはキー（内容ハッシュ）ごとに別ファイルなので、ブラウザのキャッシュを使ってよい
+    const summaryResponse = await fetch(`/students/${dataset.summary.path}`);
+    if (!summaryResponse.ok) {
+      return null;
+    }
+    const summary = await summaryResponse.json();
+    if (summary.source_sha256 !== dataset.summary.key) {
+      return null;
+    }
+    return { ...summary, dataset };
+  } catch (error) {
+    console.warn('Dataset summary load failed:', error);
+    return null;
+  }
+}
+
 /**
  * クイズログを読み込む（後方互換性のため保持）
  * @param {string} projectId - プロジェクトID（またはデータセット名）